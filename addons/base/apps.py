@@ -4,7 +4,8 @@ import mimetypes
 
 from django.apps import AppConfig
 
-from mako.lookup import TemplateLookup
+from addons.base import auth_cache
+from framework.mako_modules import CachedTemplateLookup
 from framework.routing import process_rules
 from framework.flask import app
 from website import settings
@@ -91,7 +92,7 @@ class BaseAddonAppConfig(AppConfig):
             )
         )
         if template_dirs:
-            self.template_lookup = TemplateLookup(
+            self.template_lookup = CachedTemplateLookup(
                 directories=template_dirs,
                 default_filters=[
                     'unicode',  # default filter; must set explicitly when overriding
@@ -169,3 +170,6 @@ class BaseAddonAppConfig(AppConfig):
         # Set up Flask routes
         for route_group in self.routes:
             process_rules(app, **route_group)
+        # Keep cached WaterButler credentials in step with the node settings
+        if self.node_settings is not None:
+            auth_cache.connect_node_settings(self.node_settings)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Short-lived cache of the WaterButler credentials handed out by
+``addons.base.views.get_auth``.
+
+A zip download or folder listing makes WaterButler call ``get_auth`` many
+times a second for the same user, node and provider. An entry records that
+``check_access`` allowed a class of actions and holds the addon's serialized
+credentials and settings, so repeated calls skip the node, permission and
+addon lookups. Only allowed requests are cached.
+
+Entries are tagged with the node, the user and the addon's external account,
+and a tag is invalidated when it changes:
+
+* contributor changes invalidate the user, since they may also change the
+  user's access to components of the node;
+* node privacy and deletion, and component moves, invalidate the node;
+* node addon settings changes invalidate the node;
+* external account changes (e.g. refreshed OAuth tokens) invalidate the account.
+
+Other changes (e.g. prereg admin permissions) are picked up once entries
+expire after ``WATERBUTLER_AUTH_CACHE_TTL`` seconds, which must stay well
+under ``WATERBUTLER_JWT_EXPIRATION``.
+
+The backend is chosen with ``settings.WATERBUTLER_AUTH_CACHE``:
+
+* ``'local'``: a bounded, in-process LRU. Invalidations only reach the
+  process that made the change.
+* ``'django'``: the Django cache named by
+  ``settings.WATERBUTLER_AUTH_CACHE_ALIAS``. Entries hold addon credentials,
+  so only use a cache that is private to the OSF.
+* ``None``: no caching.
+"""
+import copy
+import logging
+import uuid
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from framework.caching import BaseStore, DjangoCacheMixin, NullStore, StoreSelector, TTLCache
+from framework.metrics import metrics
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'osf-wb-auth:'
+TAG_KEY_PREFIX = 'osf-wb-auth-tag:'
+
+# Node fields that check_access depends on
+NODE_ACCESS_FIELDS = {'is_public', 'is_deleted'}
+
+
+def node_tag(node_id):
+    return 'node:{}'.format(node_id)
+
+
+def user_tag(user_id):
+    return 'user:{}'.format(user_id)
+
+
+def account_tag(account_id):
+    return 'account:{}'.format(account_id)
+
+
+class BaseAuthStore(BaseStore):
+    """Entries are removed by tag rather than by key."""
+
+    def invalidate(self, tag):
+        raise NotImplementedError
+
+
+class NullAuthStore(NullStore, BaseAuthStore):
+
+    def invalidate(self, tag):
+        pass
+
+
+class LocalAuthStore(BaseAuthStore):
+    """In-process ``TTLCache`` of entries, indexed by tag."""
+
+    def __init__(self, max_size=None, ttl=None):
+        self._entries = TTLCache(
+            max_size or settings.WATERBUTLER_AUTH_CACHE_MAX_SIZE,
+            ttl or settings.WATERBUTLER_AUTH_CACHE_TTL,
+            on_evict=self._untag,
+        )
+        self._tagged = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _untag(self, key, entry):
+        for tag in entry[1]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value, tags):
+        value = copy.deepcopy(value)
+        with self._entries.lock:
+            self._entries.set(key, (value, tuple(tags)))
+            if key in self._entries:
+                for tag in tags:
+                    self._tagged.setdefault(tag, set()).add(key)
+
+    def invalidate(self, tag):
+        with self._entries.lock:
+            for key in list(self._tagged.get(tag, ())):
+                self._entries.delete(key)
+
+    def clear(self):
+        with self._entries.lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+
+class DjangoAuthStore(DjangoCacheMixin, BaseAuthStore):
+    """Store backed by a (possibly shared) Django cache.
+
+    Every tag has a version in the cache, which changes when the tag is
+    invalidated. Entries record the versions of their tags when they were set
+    and are ignored once any of them has changed.
+    """
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.WATERBUTLER_AUTH_CACHE_ALIAS
+        self.ttl = ttl or settings.WATERBUTLER_AUTH_CACHE_TTL
+
+    def versions(self, tags):
+        keys = [TAG_KEY_PREFIX + tag for tag in tags]
+        found = self.cache.get_many(keys)
+        return {tag: found.get(key) for tag, key in zip(tags, keys)}
+
+    def get(self, key):
+        entry = self.cache.get(CACHE_KEY_PREFIX + key)
+        if entry is None:
+            return None
+        value, versions = entry
+        if self.versions(list(versions)) != versions:
+            return None
+        return value
+
+    def set(self, key, value, tags):
+        self.cache.set(CACHE_KEY_PREFIX + key, (value, self.versions(list(tags))), self.ttl)
+
+    def invalidate(self, tag):
+        # Once the new version expires, every entry set under an older one has too
+        self.cache.set(TAG_KEY_PREFIX + tag, uuid.uuid4().hex, self.ttl * 2)
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    'local': LocalAuthStore,
+    'django': DjangoAuthStore,
+    None: NullAuthStore,
+}
+
+get_store = StoreSelector(BACKENDS, lambda: settings.WATERBUTLER_AUTH_CACHE)
+
+
+def load_auth(key):
+    """Return the entry cached under ``key``, or ``None``."""
+    try:
+        value = get_store().get(key)
+    except Exception:
+        logger.exception('Failed to read WaterButler auth {} from cache'.format(key))
+        value = None
+    metrics.incr('waterbutler.auth_cache.hit' if value is not None else 'waterbutler.auth_cache.miss')
+    return value
+
+
+def cache_auth(key, value, tags):
+    try:
+        get_store().set(key, value, tags)
+    except Exception:
+        logger.exception('Failed to cache WaterButler auth {}'.format(key))
+
+
+def invalidate(tag):
+    """Invalidate ``tag`` now, and again once the current transaction
+    commits, in case another request cached the old state in the meantime.
+    """
+    def _invalidate():
+        try:
+            get_store().invalidate(tag)
+        except Exception:
+            logger.exception('Failed to invalidate WaterButler auth {}'.format(tag))
+
+    _invalidate()
+    transaction.on_commit(_invalidate)
+
+
+@receiver(post_save, sender='osf.Contributor')
+@receiver(post_delete, sender='osf.Contributor')
+def invalidate_contributor(sender, instance, **kwargs):
+    invalidate(user_tag(instance.user_id))
+
+
+@receiver(post_save, sender='osf.NodeRelation')
+@receiver(post_delete, sender='osf.NodeRelation')
+def invalidate_node_relation(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        invalidate(node_tag(instance.child_id))
+
+
+@receiver(pre_save, sender='osf.AbstractNode')
+@receiver(pre_save, sender='osf.Node')
+@receiver(pre_save, sender='osf.Registration')
+@receiver(pre_save, sender='osf.QuickFilesNode')
+def invalidate_node(sender, instance, **kwargs):
+    if instance.pk and NODE_ACCESS_FIELDS.intersection(instance.get_dirty_fields()):
+        invalidate(node_tag(instance.pk))
+
+
+def invalidate_node_settings(sender, instance, **kwargs):
+    if instance.owner_id:
+        invalidate(node_tag(instance.owner_id))
+
+
+def connect_node_settings(model):
+    """Invalidate nodes when their ``model`` addon settings change. Called by
+    ``BaseAddonAppConfig.ready`` for each addon's node settings model.
+    """
+    post_save.connect(invalidate_node_settings, sender=model)
+    post_delete.connect(invalidate_node_settings, sender=model)
+
+
+@receiver(post_save, sender='osf.ExternalAccount')
+@receiver(post_delete, sender='osf.ExternalAccount')
+def invalidate_external_account(sender, instance, **kwargs):
+    invalidate(account_tag(instance.pk))
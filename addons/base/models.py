@@ -8,7 +8,7 @@ from django.db import models
 from framework.auth import Auth
 from framework.auth.decorators import must_be_logged_in
 from framework.exceptions import HTTPError, PermissionsError
-from mako.lookup import TemplateLookup
+from framework.mako_modules import CachedTemplateLookup
 from osf.models.base import BaseModel, ObjectIDMixin
 from osf.models.external import ExternalAccount
 from osf.models.node import AbstractNode
@@ -18,7 +18,7 @@ from website import settings
 from addons.base import logger, serializer
 from website.oauth.signals import oauth_complete
 
-lookup = TemplateLookup(
+lookup = CachedTemplateLookup(
     directories=[
         settings.TEMPLATES_PATH
     ],
@@ -51,6 +51,14 @@ class BaseAddonSettings(ObjectIDMixin, BaseModel):
     def short_name(self):
         return self.config.short_name
 
+    def save(self, *args, **kwargs):
+        ret = super(BaseAddonSettings, self).save(*args, **kwargs)
+        # Update the settings AddonModelMixin.get_addon memoized on the owner, if it is loaded
+        owner = getattr(self, '_owner_cache', None)
+        if owner is not None and '_addon_settings_cache' in owner.__dict__:
+            owner._addon_settings[self.config.short_name] = self
+        return ret
+
     def delete(self, save=True):
         self.deleted = True
         self.on_delete()
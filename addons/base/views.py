@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import httplib
 import os
 import uuid
@@ -29,6 +30,7 @@ from framework.sentry import log_exception
 from framework.transactions.handlers import no_auto_transaction
 from website import mails
 from website import settings
+from addons.base import auth_cache
 from addons.base import exceptions
 from addons.base import signals as file_signals
 from addons.base.utils import format_last_known_metadata
@@ -212,6 +214,25 @@ def check_access(node, auth, action, cas_resp):
     raise HTTPError(httplib.FORBIDDEN if auth.user else httplib.UNAUTHORIZED)
 
 
+def get_auth_cache_key(auth, node_id, provider_name, action, access_token=None):
+    """Return the key that ``get_auth`` caches its decision for this request
+    under, or ``None`` if it must not be cached.
+    """
+    permission = permission_map.get(action)
+    if permission is None or auth.private_key:
+        return None
+    # check_access allows these actions in cases where it does not allow
+    # others that need the same permission
+    action_class = action if action in ('copyfrom', 'copyto', 'download') else permission
+    return ':'.join([
+        str(auth.user.pk) if auth.user else '',
+        node_id,
+        provider_name,
+        action_class,
+        hashlib.sha256(access_token).hexdigest() if access_token else '',
+    ])
+
+
 def make_auth(user):
     if user is not None:
         return {
@@ -225,6 +246,7 @@ def make_auth(user):
 @collect_auth
 def get_auth(auth, **kwargs):
     cas_resp = None
+    access_token = None
     if not auth.user:
         # Central Authentication Server OAuth Bearer Token
         authorization = request.headers.get('Authorization')
@@ -261,35 +283,44 @@ def get_auth(auth, **kwargs):
     except KeyError:
         raise HTTPError(httplib.BAD_REQUEST)
 
-    node = AbstractNode.load(node_id)
-    if not node:
-        raise HTTPError(httplib.NOT_FOUND)
+    cache_key = get_auth_cache_key(auth, node_id, provider_name, action, access_token)
+    cached = auth_cache.load_auth(cache_key) if cache_key else None
+    if cached is None:
+        node = AbstractNode.load(node_id)
+        if not node:
+            raise HTTPError(httplib.NOT_FOUND)
 
-    check_access(node, auth, action, cas_resp)
+        check_access(node, auth, action, cas_resp)
 
-    provider_settings = node.get_addon(provider_name)
-    if not provider_settings:
-        raise HTTPError(httplib.BAD_REQUEST)
+        provider_settings = node.get_addon(provider_name)
+        if not provider_settings:
+            raise HTTPError(httplib.BAD_REQUEST)
 
-    try:
-        credentials = provider_settings.serialize_waterbutler_credentials()
-        waterbutler_settings = provider_settings.serialize_waterbutler_settings()
-    except exceptions.AddonError:
-        log_exception()
-        raise HTTPError(httplib.BAD_REQUEST)
+        try:
+            cached = {
+                'credentials': provider_settings.serialize_waterbutler_credentials(),
+                'settings': provider_settings.serialize_waterbutler_settings(),
+                'callback_url': node.api_url_for(
+                    ('create_waterbutler_log' if not node.is_registration else 'registration_callbacks'),
+                    _absolute=True,
+                    _internal=True
+                ),
+            }
+        except exceptions.AddonError:
+            log_exception()
+            raise HTTPError(httplib.BAD_REQUEST)
+
+        if cache_key:
+            tags = [auth_cache.node_tag(node.pk)]
+            if auth.user:
+                tags.append(auth_cache.user_tag(auth.user.pk))
+            if getattr(provider_settings, 'external_account_id', None):
+                tags.append(auth_cache.account_tag(provider_settings.external_account_id))
+            auth_cache.cache_auth(cache_key, cached, tags)
 
     return {'payload': jwe.encrypt(jwt.encode({
         'exp': timezone.now() + datetime.timedelta(seconds=settings.WATERBUTLER_JWT_EXPIRATION),
-        'data': {
-            'auth': make_auth(auth.user),  # A waterbutler auth dict not an Auth object
-            'credentials': credentials,
-            'settings': waterbutler_settings,
-            'callback_url': node.api_url_for(
-                ('create_waterbutler_log' if not node.is_registration else 'registration_callbacks'),
-                _absolute=True,
-                _internal=True
-            ),
-        }
+        'data': dict(cached, auth=make_auth(auth.user)),  # A waterbutler auth dict not an Auth object
     }, settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM), WATERBUTLER_JWE_KEY)}
 
 
@@ -14,7 +14,7 @@ from dropbox.client import DropboxOAuth2Flow
 from flask import request
 from framework.auth import Auth
 from framework.exceptions import HTTPError
-from framework.sessions import session
+from framework.sessions import mark_session_dirty, session
 from osf.models.external import ExternalProvider
 from osf.models.files import File, Folder, BaseFileNode
 from addons.base import exceptions
@@ -76,7 +76,7 @@ class Provider(ExternalProvider):
     @property
     def auth_url(self):
         ret = self.oauth_flow.start('force_reapprove=true')
-        session.save()
+        mark_session_dirty()
         return ret
 
     # Overrides ExternalProvider
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import mock
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
 from nose.tools import *  # noqa (PEP8 asserts)
 import pytest
 import unittest
 
 from framework.auth import Auth
+from osf.models import ExternalAccount
 from addons.base.tests.models import (OAuthAddonNodeSettingsTestSuiteMixin,
                                       OAuthAddonUserSettingTestSuiteMixin)
 
@@ -33,6 +36,18 @@ class TestGoogleDriveProvider(unittest.TestCase):
         assert_equal(res['display_name'], 'fakename')
         assert_equal(res['profile_url'], 'fakeUrl')
 
+    @mock.patch.object(GoogleDriveProvider, 'client_id', 'fake_client_id')
+    @mock.patch.object(GoogleDriveProvider, 'client_secret', 'fake_client_secret')
+    def test_fetch_access_token_returns_token_refreshed_by_another_worker(self):
+        account = GoogleDriveAccountFactory(oauth_key='old_key', expires_at=timezone.now() - relativedelta(minutes=1))
+        ExternalAccount.objects.filter(pk=account.pk).update(
+            oauth_key='new_key',
+            expires_at=timezone.now() + relativedelta(hours=1),
+        )
+        with mock.patch('requests_oauthlib.OAuth2Session.refresh_token') as mock_refresh_token:
+            assert_equal(GoogleDriveProvider(account).fetch_access_token(), 'new_key')
+        assert_false(mock_refresh_token.called)
+
 class TestUserSettings(OAuthAddonUserSettingTestSuiteMixin, unittest.TestCase):
 
     short_name = 'googledrive'
@@ -289,6 +289,42 @@ class TestOsfstorageFileNode(StorageTestCase):
         assert_equal(copied.parent, copy_to)
         assert_equal(to_copy.parent, self.node_settings.get_root())
 
+    def test_copy_nested(self):
+        new_project = ProjectFactory()
+        copy_to = new_project.get_addon('osfstorage').get_root().append_folder('Cloud')
+
+        to_copy = self.node_settings.get_root().append_folder('Carp')
+        child = to_copy.append_folder('A dee um').append_file('Fish')
+        versions = [factories.FileVersionFactory() for _ in range(3)]
+        child.versions.add(*versions)
+        to_copy.append_file('Trashed').delete()
+
+        copied = to_copy.copy_under(copy_to, name='Copy')
+
+        assert_is_instance(copied, OsfStorageFolder)
+        assert_equal(copied.name, 'Copy')
+        assert_equal(copied.parent, copy_to)
+        assert_equal(copied.copied_from, to_copy)
+        assert_equal([c.name for c in copied.children], ['A dee um'])
+        copied_child = copied.find_child_by_name('A dee um').find_child_by_name('Fish')
+        assert_is_instance(copied_child, OsfStorageFile)
+        assert_not_equal(copied_child._id, child._id)
+        assert_equal(copied_child.copied_from, child)
+        assert_equal(copied_child.node, new_project)
+        assert_equal(copied_child.materialized_path, '/Cloud/Copy/A dee um/Fish')
+        assert_equal(list(copied_child.versions.all()), versions)
+        assert_equal(list(child.versions.all()), versions)
+        assert_equal(to_copy.node, self.project)
+
+    @mock.patch('website.search.search.update_files')
+    def test_copy_reindexes_copied_files(self, mock_update_files):
+        to_copy = self.node_settings.get_root().append_folder('Carp')
+        to_copy.append_file('Fish')
+
+        copied = to_copy.copy_under(self.node_settings.get_root(), name='Copy')
+
+        mock_update_files.assert_called_once_with([copied.find_child_by_name('Fish').id])
+
     def test_move(self):
         to_move = self.node_settings.get_root().append_file('Carp')
         move_to = self.node_settings.get_root().append_folder('Cloud')
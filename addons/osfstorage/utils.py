@@ -109,26 +109,3 @@ def must_be(_type):
             return func(self, *args, **kwargs)
         return wrapped
     return _must_be
-
-
-def copy_files(src, target_settings, parent=None, name=None):
-    """Copy the files from src to the target nodesettings
-    :param OsfStorageFileNode src: The source to copy children from
-    :param NodeSettings target_settings: The node settings of the project to copy files to
-    :param OsfStorageFileNode parent: The parent of to attach the clone of src to, if applicable
-    """
-    cloned = src.clone()
-    cloned.parent = parent
-    cloned.name = name or cloned.name
-    cloned.node_settings = target_settings
-
-    if src.is_file:
-        cloned.versions = src.versions
-
-    cloned.save()
-
-    if src.is_folder:
-        for child in src.children:
-            copy_files(child, target_settings, parent=cloned)
-
-    return cloned
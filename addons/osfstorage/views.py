@@ -11,7 +11,7 @@ from django.db import transaction
 from flask import request
 
 from framework.auth import Auth
-from framework.sessions import get_session
+from framework.sessions import get_session, mark_session_dirty
 from framework.exceptions import HTTPError
 from framework.auth.decorators import must_be_signed
 
@@ -103,8 +103,7 @@ def osfstorage_get_revisions(file_node, node_addon, payload, **kwargs):
     counter_prefix = 'download:{}:{}:'.format(file_node.node._id, file_node._id)
 
     version_count = file_node.versions.count()
-    # Don't worry. The only % at the end of the LIKE clause, the index is still used
-    counts = dict(PageCounter.objects.filter(_id__startswith=counter_prefix).values_list('_id', 'total'))
+    counts = PageCounter.get_totals_by_prefix(counter_prefix)
     qs = FileVersion.includable_objects.filter(basefilenode__id=file_node.id).include('creator__guids').order_by('-created')
 
     for i, version in enumerate(qs):
@@ -330,7 +329,7 @@ def osfstorage_download(file_node, payload, node_addon, **kwargs):
     if user_id:
         current_session = get_session()
         current_session.data['auth_user_id'] = user_id
-        current_session.save()
+        mark_session_dirty()
 
     if not request.args.get('version'):
         version_id = None
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-17 14:08
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0099_throttlecounter'),
+        ('addons_wiki', '0010_migrate_node_wiki_pages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedWikiVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('renderer_version', models.IntegerField()),
+                ('html', models.TextField()),
+                ('raw_text', models.TextField()),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='osf.AbstractNode')),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendered', to='addons_wiki.WikiVersion')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='renderedwikiversion',
+            unique_together=set([('version', 'node', 'renderer_version')]),
+        ),
+    ]
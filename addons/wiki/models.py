@@ -10,14 +10,16 @@ from bleach.callbacks import nofollow
 from bleach import Cleaner
 from functools import partial
 from bleach.linkifier import LinkifyFilter
-from django.db import models
+from django.db import connection, models
 from framework.forms.utils import sanitize
+from framework.metrics import metrics
 from markdown.extensions import codehilite, fenced_code, wikilinks
 from osf.models import AbstractNode, NodeLog, OSFUser
 from osf.models.base import BaseModel, GuidMixin, ObjectIDMixin
 from osf.utils.fields import NonNaiveDateTimeField
 from osf.utils.requests import DummyRequest, get_request_and_user_id
 from website import settings
+from addons.wiki import settings as wiki_settings
 from addons.wiki import utils as wiki_utils
 from website.exceptions import NodeStateError
 from website.util import api_v2_url
@@ -85,6 +87,74 @@ def build_wiki_url(node, label, base, end):
     return '/{pid}/wiki/{wname}/'.format(pid=node._id, wname=label)
 
 
+STORE_RENDERED_SQL = """
+    INSERT INTO addons_wiki_renderedwikiversion (version_id, node_id, renderer_version, html, raw_text)
+    SELECT unnest(%s::int[]), unnest(%s::int[]), %s, unnest(%s::text[]), unnest(%s::text[])
+    ON CONFLICT (version_id, node_id, renderer_version) DO NOTHING;
+"""
+
+
+class RenderedWikiVersion(models.Model):
+    """The output of ``WikiVersion.html`` and ``WikiVersion.raw_text`` for a
+    node, rendered by ``WIKI_RENDERER_VERSION``.
+
+    Versions are never edited, and the node only changes the wikilinks, so
+    rows never go stale; rows of other renderer versions are ignored and
+    removed by ``manage.py purge_wiki_render_cache``.
+    """
+    version = models.ForeignKey('WikiVersion', related_name='rendered', on_delete=models.CASCADE)
+    node = models.ForeignKey('osf.AbstractNode', related_name='+', on_delete=models.CASCADE)
+    renderer_version = models.IntegerField()
+    html = models.TextField()
+    raw_text = models.TextField()
+
+    class Meta:
+        unique_together = ('version', 'node', 'renderer_version')
+
+    @classmethod
+    def store(cls, rendered, node):
+        """Store ``rendered``, a list of ``(version, (html, raw_text))``
+        rendered for ``node``, keeping rows that already exist.
+        """
+        if not rendered:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(STORE_RENDERED_SQL, [
+                [version.id for version, _ in rendered],
+                [node.id] * len(rendered),
+                wiki_settings.WIKI_RENDERER_VERSION,
+                [html for _, (html, _) in rendered],
+                [raw_text for _, (_, raw_text) in rendered],
+            ])
+
+    @classmethod
+    def render(cls, versions, node):
+        """Return a dict of version id to ``(html, raw_text)`` for
+        ``versions`` rendered for ``node``, rendering and storing the ones that
+        are not cached yet.
+        """
+        versions = [version for version in versions if version.pk is not None]
+        cached = {
+            version_id: (html, raw_text)
+            for version_id, html, raw_text in cls.objects.filter(
+                version__in=versions,
+                node=node,
+                renderer_version=wiki_settings.WIKI_RENDERER_VERSION,
+            ).values_list('version_id', 'html', 'raw_text')
+        }
+        missing = [version for version in versions if version.id not in cached]
+        metrics.incr('wiki.render_cache.hit', len(cached))
+        metrics.incr('wiki.render_cache.miss', len(missing))
+
+        rendered = []
+        for version in missing:
+            html = version.render_html(node)
+            rendered.append((version, (html, sanitize(html, tags=[], strip=True))))
+        cls.store(rendered, node)
+        cached.update((version.id, output) for version, output in rendered)
+        return cached
+
+
 class WikiVersion(ObjectIDMixin, BaseModel):
     user = models.ForeignKey('osf.OSFUser', null=True, blank=True, on_delete=models.CASCADE)
     wiki_page = models.ForeignKey('WikiPage', null=True, blank=True, on_delete=models.CASCADE, related_name='versions')
@@ -97,6 +167,10 @@ class WikiVersion(ObjectIDMixin, BaseModel):
 
     def html(self, node):
         """The cleaned HTML of the page"""
+        return self._rendered(node)[0]
+
+    def render_html(self, node):
+        """Render the cleaned HTML of the page, bypassing the cache"""
         html_output = build_html_output(self.content, node=node)
         try:
             cleaner = Cleaner(
@@ -113,7 +187,28 @@ class WikiVersion(ObjectIDMixin, BaseModel):
     def raw_text(self, node):
         """ The raw text of the page, suitable for using in a test search"""
 
-        return sanitize(self.html(node), tags=[], strip=True)
+        return self._rendered(node)[1]
+
+    def _rendered(self, node):
+        if self.pk is None or node.pk is None:
+            html = self.render_html(node)
+            return html, sanitize(html, tags=[], strip=True)
+        memo = self.__dict__.setdefault('_rendered_cache', {})
+        if node.id not in memo:
+            memo[node.id] = RenderedWikiVersion.render([self], node)[self.id]
+        return memo[node.id]
+
+    @classmethod
+    def prefetch_rendered(cls, versions, node):
+        """Load the rendered output of ``versions`` for ``node`` in one query,
+        rendering only the versions that are not cached yet.
+        """
+        versions = list(versions)
+        rendered = RenderedWikiVersion.render(versions, node)
+        for version in versions:
+            if version.id in rendered:
+                version.__dict__.setdefault('_rendered_cache', {})[node.id] = rendered[version.id]
+        return versions
 
     @property
     def rendered_before_update(self):
@@ -143,7 +238,7 @@ class WikiVersion(ObjectIDMixin, BaseModel):
     def save(self, *args, **kwargs):
         rv = super(WikiVersion, self).save(*args, **kwargs)
         if self.wiki_page.node:
-            self.wiki_page.node.update_search()
+            self.wiki_page.node.update_search(include_files=False)
         self.wiki_page.modified = self.created
         self.wiki_page.save()
         self.spam_check()
@@ -197,7 +292,7 @@ class WikiPage(GuidMixin, BaseModel):
     def save(self, *args, **kwargs):
         rv = super(WikiPage, self).save(*args, **kwargs)
         if self.node and self.node.is_public:
-            self.node.update_search()
+            self.node.update_search(include_files=False)
         return rv
 
     def update_active_sharejs(self, node):
@@ -433,7 +528,7 @@ class NodeWikiPage(GuidMixin, BaseModel):
     def save(self, *args, **kwargs):
         rv = super(NodeWikiPage, self).save(*args, **kwargs)
         if self.node:
-            self.node.update_search()
+            self.node.update_search(include_files=False)
         return rv
 
     def rename(self, new_name, save=True):
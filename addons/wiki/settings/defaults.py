@@ -13,3 +13,7 @@ SHAREJS_DB_URL = os.environ.get('SHAREJS_DB_URL', 'mongodb://{}:{}/{}'.format(se
 
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098).replace(tzinfo=pytz.utc)
+
+# Version of the wiki HTML renderer. Rendered output cached under another version is not used;
+# bump it when the output of WikiVersion.render_html changes (markdown extensions, WIKI_WHITELIST, ...)
+WIKI_RENDERER_VERSION = 1
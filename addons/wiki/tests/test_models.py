@@ -1,9 +1,12 @@
 import pytest
 import pytz
 import datetime
+import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from addons.wiki.exceptions import NameMaximumLengthError
 
-from addons.wiki.models import WikiPage
+from addons.wiki.models import RenderedWikiVersion, WikiPage, WikiVersion
 from addons.wiki.tests.factories import WikiFactory, WikiVersionFactory
 from osf_tests.factories import NodeFactory, UserFactory, ProjectFactory
 from tests.base import OsfTestCase
@@ -83,3 +86,53 @@ class TestWikiPage(OsfTestCase):
         wiki.save()
         url = '{}wiki/{}/'.format(self.project.url, wiki.page_name)
         assert wiki.url == url
+
+
+class TestRenderedWikiVersion:
+
+    @pytest.fixture()
+    def node(self):
+        return ProjectFactory()
+
+    @pytest.fixture()
+    def version(self, node):
+        page = WikiFactory(node=node)
+        return WikiVersionFactory(wiki_page=page, content='**bold** [[home]]')
+
+    def test_html_is_stored(self, node, version):
+        html = version.html(node)
+        assert '<strong>bold</strong>' in html
+        rendered = RenderedWikiVersion.objects.get(version=version, node=node)
+        assert rendered.html == html
+        assert rendered.raw_text == version.raw_text(node)
+        assert 'bold' in rendered.raw_text and '<' not in rendered.raw_text
+
+    def test_cached_html_is_not_rendered_again(self, node, version):
+        html = version.html(node)
+        fresh = WikiVersion.objects.get(id=version.id)
+        with mock.patch.object(WikiVersion, 'render_html') as mock_render:
+            assert fresh.html(node) == html
+            assert fresh.raw_text(node) == version.raw_text(node)
+        assert not mock_render.called
+
+    def test_other_renderer_versions_are_ignored(self, node, version):
+        RenderedWikiVersion.objects.create(version=version, node=node, renderer_version=0, html='stale', raw_text='stale')
+        with mock.patch('addons.wiki.settings.WIKI_RENDERER_VERSION', 0):
+            assert version.html(node) == 'stale'
+        fresh = WikiVersion.objects.get(id=version.id)
+        assert '<strong>bold</strong>' in fresh.html(node)
+        assert RenderedWikiVersion.objects.filter(version=version, node=node).count() == 2
+
+    def test_prefetch_rendered(self, node, version):
+        other = WikiVersionFactory(wiki_page=WikiFactory(node=node, page_name='other'), content='other')
+        other.html(node)
+        versions = WikiVersion.objects.filter(id__in=[version.id, other.id])
+        with CaptureQueriesContext(connection) as queries:
+            versions = WikiVersion.prefetch_rendered(versions, node)
+        # Load the versions, load the cached output, store the missing output
+        assert len(queries) == 3
+        with CaptureQueriesContext(connection) as queries:
+            for prefetched in versions:
+                prefetched.html(node)
+                prefetched.raw_text(node)
+        assert len(queries) == 0
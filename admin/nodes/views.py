@@ -10,12 +10,11 @@ from django.shortcuts import redirect
 from django.views.defaults import page_not_found
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.http import HttpResponse
-from django.db.models import Q
 
 from website import search
 from osf.models import NodeLog
 from osf.models.user import OSFUser
-from osf.models.node import Node
+from osf.models.node import Node, get_logs_query
 from osf.models.registrations import Registration
 from osf.models import SpamStatus
 from admin.base.utils import change_embargo_date, validate_embargo_date
@@ -224,7 +223,9 @@ class AdminNodeLogView(PermissionRequiredMixin, ListView):
 
     def get_queryset(self):
         node = self.get_object()
-        query = Q(node_id__in=list(Node.objects.get_children(node).values_list('id', flat=True)) + [node.id])
+        nodes = list(Node.objects.get_children(node).values_list('id', 'forked_from_id', 'inherited_logs_until'))
+        nodes.append((node.id, node.forked_from_id, node.inherited_logs_until))
+        query = get_logs_query(nodes)
         return NodeLog.objects.filter(query).order_by('-date').include(
             'node__guids', 'user__guids', 'original_node__guids', limit_includes=10
         )
@@ -586,11 +586,11 @@ class RelationshipField(ser.HyperlinkedIdentityField):
                 field_counts_requested = self.process_related_counts_parameters(show_related_counts, value)
 
                 if utils.is_truthy(show_related_counts):
-                    meta[key] = utils.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
+                    meta[key] = self.get_related_count(meta_data[key], value)
                 elif utils.is_falsy(show_related_counts):
                     continue
                 elif self.field_name in field_counts_requested:
-                    meta[key] = utils.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
+                    meta[key] = self.get_related_count(meta_data[key], value)
                 else:
                     continue
             elif key == 'projects_in_common':
@@ -603,6 +603,16 @@ class RelationshipField(ser.HyperlinkedIdentityField):
                 meta[key] = utils.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
         return meta
 
+    def get_related_count(self, meta_value, value):
+        """
+        Returns a count or unread meta value, from the values the serializer prefetched for the page if there are any
+        """
+        serializer = self.parent.parent if getattr(self.parent, 'field', None) else self.parent
+        prefetched = getattr(serializer, 'prefetched_meta', {})
+        if isinstance(meta_value, basestring) and value is not None and value.pk in prefetched.get(meta_value, {}):
+            return prefetched[meta_value][value.pk]
+        return utils.rapply(meta_value, _url_val, obj=value, serializer=self.parent, request=self.context['request'])
+
     def lookup_attribute(self, obj, lookup_field):
         """
         Returns attribute from target object unless attribute surrounded in angular brackets where it returns the lookup field.
@@ -1062,6 +1072,9 @@ class JSONAPIListSerializer(ser.ListSerializer):
         if isinstance(data, collections.Mapping):
             errors = data.get('errors', None)
             data = data.get('data', None)
+        if not enable_esi and getattr(self.child, 'bulk_related_meta', None):
+            data = list(data)
+            self.child.prefetch_related_meta(data)
         if enable_esi:
             ret = [
                 self.child.to_esi_representation(item, envelope=None) for item in data
@@ -1180,12 +1193,36 @@ class JSONAPISerializer(BaseAPISerializer):
         'nodes:node-registrations',
     }
 
+    # Maps related_meta methods to methods that return their values for a list of objects as
+    # a dict keyed by pk, so that related counts for a page cost a fixed number of queries
+    bulk_related_meta = {}
+    prefetched_meta = {}
+
     # overrides Serializer
     @classmethod
     def many_init(cls, *args, **kwargs):
         kwargs['child'] = cls(*args, **kwargs)
         return JSONAPIListSerializer(*args, **kwargs)
 
+    def prefetch_related_meta(self, objs):
+        """Compute the related counts requested with the related_counts query parameter for all of `objs`, using
+        `bulk_related_meta`.
+        """
+        self.prefetched_meta = {}
+        request = self.context['request']
+        show_related_counts = request.query_params.get('related_counts', False)
+        if utils.is_falsy(show_related_counts) or (request.parser_context.get('kwargs') or {}).get('is_embedded'):
+            return
+        requested = None if utils.is_truthy(show_related_counts) else show_related_counts.split(',')
+        methods = set()
+        for field_name, field in self.fields.items():
+            if requested is not None and field_name not in requested:
+                continue
+            related_meta = getattr(getattr(field, 'field', field), 'related_meta', None) or {}
+            methods.update(related_meta[key] for key in ('count', 'unread') if related_meta.get(key) in self.bulk_related_meta)
+        for method in methods:
+            self.prefetched_meta[method] = getattr(self, self.bulk_related_meta[method])(objs)
+
     def invalid_embeds(self, fields, embeds):
         fields_check = fields[:]
         for index, field in enumerate(fields_check):
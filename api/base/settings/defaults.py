@@ -32,6 +32,18 @@ DATABASES = {
 }
 
 DATABASE_ROUTERS = ['osf.db.router.PostgreSQLFailoverRouter', ]
+# Streaming replicas are listed in DATABASES next to the primary, e.g.
+#   'replica': dict(DATABASES['default'], HOST='...', ATOMIC_REQUESTS=False, TEST={'MIRROR': 'default'}),
+# The router reads from replicas no more than DATABASE_REPLICA_MAX_LAG seconds behind.
+DATABASE_REPLICA_MAX_LAG = 5
+# Seconds a thread keeps reading from the primary after it commits a write. Values under
+# DATABASE_REPLICA_MAX_LAG are raised to it, so the write has reached every replica read from
+DATABASE_PRIMARY_PIN_SECONDS = DATABASE_REPLICA_MAX_LAG
+# Seconds between checks of which database is the primary and how far behind the replicas are
+DATABASE_ROUTER_CHECK_INTERVAL = 10
+DATABASE_ROUTER_CONNECT_TIMEOUT = 2
+# Consecutive health checks without a writable database before the router stops routing to the last known primary
+DATABASE_ROUTER_MAX_FAILURES = 3
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
     'django.contrib.auth.hashers.BCryptPasswordHasher',
@@ -177,6 +189,19 @@ REST_FRAMEWORK = {
     }
 }
 
+# Where throttle counters are kept: 'database' (osf_throttlecounter, shared by all processes,
+# at the cost of a query and a committed write per throttled request) or 'cache' (the Django
+# cache THROTTLE_CACHE_ALIAS). Only use 'cache' once CACHES points THROTTLE_CACHE_ALIAS at a
+# cache shared by every API process (memcached, redis); with Django's default per-process
+# cache each process counts on its own, multiplying the limits by the number of processes
+THROTTLE_STORE = 'database'
+THROTTLE_CACHE_ALIAS = 'default'
+# Buckets per throttle window; more buckets make the sliding window more exact
+THROTTLE_BUCKETS = 10
+# Autocommit connections per process for the database throttle store, opened as needed and on
+# top of Django's own; the number of API processes times this must fit in max_connections
+THROTTLE_DB_POOL_SIZE = 5
+
 # Settings related to CORS Headers addon: allow API to receive authenticated requests from OSF
 # CORS plugin only matches based on "netloc" part of URL, so as workaround we add that to the list
 CORS_ORIGIN_ALLOW_ALL = False
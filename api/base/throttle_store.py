@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Sliding-window request counters for ``api.base.throttling``.
+
+A throttle's window of ``duration`` seconds is split into ``THROTTLE_BUCKETS``
+buckets of equal width, and each key keeps one count per bucket. The number of
+requests in the window ending now is estimated as the sum of the buckets the
+window covers, counting the oldest, partly covered bucket in proportion to its
+overlap. Memory per key is fixed no matter how high the rate is.
+
+The backend is chosen with ``settings.THROTTLE_STORE``:
+
+* ``'database'`` (the default): counts in ``osf_throttlecounter``, shared by
+  every API process. Every throttled request costs a SELECT and a committed
+  upsert, and each API process holds up to ``settings.THROTTLE_DB_POOL_SIZE``
+  connections besides Django's own.
+* ``'cache'``: the Django cache named by ``settings.THROTTLE_CACHE_ALIAS``.
+  Counts are only shared if that cache is (e.g. memcached or redis). With
+  Django's default local-memory cache each process keeps its own counts, so
+  the limits are multiplied by the number of processes.
+"""
+import contextlib
+import hashlib
+import math
+import threading
+import time
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from django.db import connections
+
+from api.base import settings
+from framework.caching import BaseStore, DjangoCacheMixin, StoreSelector
+
+GET_COUNTS_SQL = """
+    SELECT bucket, count FROM osf_throttlecounter
+    WHERE key = %s AND bucket >= %s AND bucket <= %s;
+"""
+
+INCREMENT_SQL = """
+    INSERT INTO osf_throttlecounter (key, bucket, count, expires)
+    VALUES (%s, %s, 1, to_timestamp(%s))
+    ON CONFLICT (key, bucket) DO UPDATE SET count = osf_throttlecounter.count + 1;
+"""
+
+
+def make_key(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class SlidingWindow(object):
+
+    def __init__(self, duration, buckets=None):
+        self.duration = duration
+        self.buckets = buckets or settings.THROTTLE_BUCKETS
+        self.width = float(duration) / self.buckets
+
+    def current(self, now):
+        return int(now // self.width)
+
+    def oldest(self, now):
+        """The oldest bucket that overlaps the window ending at ``now``."""
+        return self.current(now) - self.buckets
+
+    def count(self, counts, now):
+        """Estimate the number of requests in the window ending at ``now``
+        from ``counts``, a dict of bucket to count.
+        """
+        current = self.current(now)
+        overlap = 1 - (now - current * self.width) / self.width
+        total = sum(counts.get(bucket, 0) for bucket in range(current - self.buckets + 1, current + 1))
+        return total + counts.get(current - self.buckets, 0) * overlap
+
+    def expires(self, bucket):
+        """Timestamp after which ``bucket`` is outside every window."""
+        return (bucket + 1) * self.width + self.duration
+
+    def wait(self, now):
+        """Seconds until the oldest bucket leaves the window."""
+        return (self.current(now) + 1) * self.width - now
+
+
+class BaseThrottleStore(BaseStore):
+
+    def get_counts(self, key, first, last):
+        """Return a dict of bucket to count for the buckets of ``key`` from ``first`` to ``last``."""
+        raise NotImplementedError
+
+    def incr(self, key, bucket, expires):
+        raise NotImplementedError
+
+
+class DatabaseThrottleStore(BaseThrottleStore):
+    """Counts in ``osf_throttlecounter``, written on a separate pool of
+    autocommit connections. Increments are committed at once, so the row lock
+    they take is not held for the rest of the request's transaction.
+    Expired rows are removed by ``scripts.clear_expired_throttle_counters``.
+
+    Connections are opened as needed, up to ``pool_size`` per process; budget
+    ``pool_size`` times the number of API processes against the database's
+    ``max_connections``.
+    """
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or settings.THROTTLE_DB_POOL_SIZE
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                params = connections['default'].get_connection_params()
+                self._pool = ThreadedConnectionPool(0, self.pool_size, **params)
+        return self._pool
+
+    @contextlib.contextmanager
+    def cursor(self):
+        pool = self.pool
+        conn = pool.getconn()
+        broken = False
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+        except psycopg2.Error:
+            broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def get_counts(self, key, first, last):
+        with self.cursor() as cursor:
+            cursor.execute(GET_COUNTS_SQL, [make_key(key), first, last])
+            return dict(cursor.fetchall())
+
+    def incr(self, key, bucket, expires):
+        with self.cursor() as cursor:
+            cursor.execute(INCREMENT_SQL, [make_key(key), bucket, expires])
+
+    def clear(self):
+        with self.cursor() as cursor:
+            cursor.execute('DELETE FROM osf_throttlecounter;')
+
+
+class CacheThrottleStore(DjangoCacheMixin, BaseThrottleStore):
+    """Counts in a Django cache, one cache entry per bucket."""
+
+    def __init__(self, alias=None):
+        self.alias = alias or settings.THROTTLE_CACHE_ALIAS
+
+    def bucket_key(self, key, bucket):
+        return 'throttle:{}:{}'.format(make_key(key), bucket)
+
+    def get_counts(self, key, first, last):
+        keys = {self.bucket_key(key, bucket): bucket for bucket in range(first, last + 1)}
+        return {keys[cache_key]: count for cache_key, count in self.cache.get_many(keys.keys()).items()}
+
+    def incr(self, key, bucket, expires):
+        cache_key = self.bucket_key(key, bucket)
+        timeout = max(int(math.ceil(expires - time.time())), 1)
+        if self.cache.add(cache_key, 1, timeout):
+            return
+        try:
+            self.cache.incr(cache_key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.add(cache_key, 1, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    'database': DatabaseThrottleStore,
+    'cache': CacheThrottleStore,
+}
+
+get_store = StoreSelector(BACKENDS, lambda: settings.THROTTLE_STORE)
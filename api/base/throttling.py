@@ -2,6 +2,7 @@ from rest_framework.throttling import UserRateThrottle, AnonRateThrottle, Simple
 import logging
 
 from api.base import settings
+from api.base.throttle_store import SlidingWindow, get_store
 
 logger = logging.getLogger(__name__)
 
@@ -28,16 +29,25 @@ class BaseThrottle(SimpleRateThrottle):
         if self.key is None:
             return True
 
-        self.history = self.cache.get(self.key, [])
         self.now = self.timer()
+        self.window = SlidingWindow(self.duration)
+        store = get_store()
+        try:
+            counts = store.get_counts(self.key, self.window.oldest(self.now), self.window.current(self.now))
+            if self.window.count(counts, self.now) >= self.num_requests:
+                return self.throttle_failure()
+            bucket = self.window.current(self.now)
+            store.incr(self.key, bucket, self.window.expires(bucket))
+        except Exception:
+            # Do not fail requests because the throttle store is unavailable
+            logger.exception('Failed to update throttle counter {}'.format(self.key))
+        return self.throttle_success()
 
-        # Drop any requests from the history which have now passed the throttle duration
-        while self.history and self.history[-1] <= self.now - self.duration:
-            self.history.pop()
+    def throttle_success(self):
+        return True
 
-        if len(self.history) >= self.num_requests:
-            return self.throttle_failure()
-        return self.throttle_success()
+    def wait(self):
+        return self.window.wait(self.now)
 
 
 class NonCookieAuthThrottle(BaseThrottle, AnonRateThrottle):
@@ -14,6 +14,7 @@ urlpatterns = [
             [
                 url(r'^', include('waffle.urls')),
                 url(r'^banners/', include('api.banners.urls', namespace='banners')),
+                url(r'^metrics/', views.metrics, name='metrics'),
             ],
         )
         ),
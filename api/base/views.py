@@ -1,13 +1,14 @@
-from collections import defaultdict
+from collections import OrderedDict
 
 from django_bulk_update.helper import bulk_update
 from django.conf import settings as django_settings
 from django.db import transaction
 from django.http import JsonResponse
+from django.utils import timezone
 from rest_framework import generics
 from rest_framework import permissions as drf_permissions
 from rest_framework import status
-from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.exceptions import ValidationError, NotFound
 from rest_framework.mixins import ListModelMixin
 from rest_framework.response import Response
@@ -32,7 +33,9 @@ from api.nodes.permissions import ContributorOrPublicForRelationshipPointers
 from api.nodes.permissions import ReadOnlyIfRegistration
 from api.users.serializers import UserSerializer
 from framework.auth.oauth_scopes import CoreScopes
+from framework.metrics import metrics as process_metrics
 from osf.models import Contributor, MaintenanceState, BaseFileNode
+from website.files.utils import insert_file_nodes
 
 
 class JSONAPIBaseView(generics.GenericAPIView):
@@ -432,6 +435,14 @@ def status_check(request, format=None, **kwargs):
     })
 
 
+@api_view(('GET',))
+@permission_classes([drf_permissions.IsAdminUser])
+def metrics(request, format=None, **kwargs):
+    """In-process metrics of the worker that served this request, optionally
+    filtered with `?prefix=`."""
+    return Response(process_metrics.snapshot(prefix=request.query_params.get('prefix', '')))
+
+
 def error_404(request, format=None, *args, **kwargs):
     return JsonResponse(
         {'errors': [{'detail': 'Not found.'}]},
@@ -535,14 +546,15 @@ class WaterButlerMixin(object):
     def bulk_get_file_nodes_from_wb_resp(self, files_list):
         """Takes a list of file data from wb response, touches/updates metadata for each, and returns list of file objects.
         This function mirrors all the actions of get_file_node_from_wb_resp except the create and updates are done in bulk.
-        The bulk_update and bulk_create do not call the base class update and create so the actions of those functions are
+        The bulk update and insert do not call the base class update and create so the actions of those functions are
         done here where needed
+
+        Existing file nodes are looked up with one query per file class. Only the ones whose metadata changed are
+        rewritten; the others just have ``last_touched`` bumped in a single update.
         """
         node = self.get_node(check_object_permissions=False)
 
-        objs_to_create = defaultdict(lambda: [])
-        file_objs = []
-
+        items_by_class = OrderedDict()
         for item in files_list:
             attrs = item['attributes']
             base_class = BaseFileNode.resolve_class(
@@ -550,26 +562,53 @@ class WaterButlerMixin(object):
                 BaseFileNode.FOLDER if attrs['kind'] == 'folder'
                 else BaseFileNode.FILE
             )
+            items_by_class.setdefault(base_class, []).append(('/' + attrs['path'].lstrip('/'), attrs))
 
+        file_objs = []
+        changed, unchanged = [], []
+        # Unsaved file objects to the rows a concurrent listing inserted for them
+        replacements = {}
+        for base_class, items in items_by_class.items():
             # mirrors BaseFileNode get_or_create
-            try:
-                file_obj = base_class.objects.get(node=node, _path='/' + attrs['path'].lstrip('/'))
-            except base_class.DoesNotExist:
-                # create method on BaseFileNode appends provider, bulk_create bypasses this step so it is added here
-                file_obj = base_class(node=node, _path='/' + attrs['path'].lstrip('/'), provider=base_class._provider)
-                objs_to_create[base_class].append(file_obj)
-            else:
+            existing = {}
+            for file_obj in base_class.objects.filter(node=node, _path__in=[path for path, attrs in items]).order_by('id'):
+                existing.setdefault(file_obj._path, file_obj)
+
+            objs_to_create = []
+            for path, attrs in items:
+                file_obj = existing.get(path)
+                if file_obj is None:
+                    # create method on BaseFileNode appends provider, bulk inserts bypass this step so it is added here
+                    file_obj = base_class(node=node, _path=path, provider=base_class._provider)
+                    file_obj.update(None, attrs, user=self.request.user, save=False)
+                    objs_to_create.append(file_obj)
+                else:
+                    file_obj.node = node
+                    metadata = (file_obj.name, file_obj._materialized_path, len(file_obj._history))
+                    file_obj.update(None, attrs, user=self.request.user, save=False)
+                    if (file_obj.name, file_obj._materialized_path, len(file_obj._history)) != metadata:
+                        changed.append(file_obj)
+                    else:
+                        unchanged.append(file_obj)
                 file_objs.append(file_obj)
 
-            file_obj.update(None, attrs, user=self.request.user, save=False)
-
-        bulk_update(file_objs)
-
-        for base_class in objs_to_create:
-            base_class.objects.bulk_create(objs_to_create[base_class])
-            file_objs += objs_to_create[base_class]
-
-        return file_objs
+            insert_file_nodes(objs_to_create)
+            conflicts = [file_obj for file_obj in objs_to_create if file_obj.pk is None]
+            if conflicts:
+                # Inserted by a concurrent listing of the same folder
+                inserted = {}
+                for file_obj in base_class.objects.filter(node=node, _path__in=[file_obj._path for file_obj in conflicts]).order_by('id'):
+                    inserted.setdefault(file_obj._path, file_obj)
+                for file_obj in conflicts:
+                    replacements[id(file_obj)] = inserted.get(file_obj._path)
+
+        if changed:
+            bulk_update(changed)
+        if unchanged:
+            BaseFileNode.objects.filter(id__in=[file_obj.id for file_obj in unchanged]).update(last_touched=timezone.now())
+
+        file_objs = [replacements.get(id(file_obj), file_obj) for file_obj in file_objs]
+        return [file_obj for file_obj in file_objs if file_obj is not None]
 
     def get_file_node_from_wb_resp(self, item):
         """Takes file data from wb response, touches/updates metadata for it, and returns file object"""
@@ -0,0 +1,126 @@
+"""Batched dispatch of Varnish BAN requests.
+
+Ban patterns are collected over a request, collapsed so that no pattern is
+sent when a broader one already covers it, and sent to every Varnish server
+concurrently over pooled keep-alive connections.
+"""
+import logging
+import threading
+import urlparse
+from collections import defaultdict
+
+import gevent
+import requests
+from gevent.pool import Pool
+from requests.adapters import HTTPAdapter
+
+from framework.metrics import metrics
+from framework.postcommit_tasks.handlers import enqueue_postcommit_task, postcommit_queue
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def collapse_paths(paths):
+    """Drop every path that starts with another path in ``paths``.
+
+    Bans are sent as ``<path>.*`` and Varnish matches them as unanchored regular
+    expressions against the request URL, so a ban for ``/v2/nodes/abc12/``
+    already covers ``/v2/nodes/abc12/contributors/``.
+    """
+    collapsed = []
+    for path in sorted(set(paths)):
+        if not collapsed or not path.startswith(collapsed[-1]):
+            collapsed.append(path)
+    return collapsed
+
+
+class BanDispatcher(object):
+
+    def __init__(self, servers=None, timeout=None, pool_size=None):
+        self._servers = servers
+        self.timeout = timeout or settings.VARNISH_BAN_TIMEOUT
+        self.pool_size = pool_size or settings.VARNISH_BAN_POOL_SIZE
+        self._session = None
+        self._pool = None
+
+    @property
+    def servers(self):
+        # TODO: this should get the varnish servers from HAProxy or a setting
+        return self._servers if self._servers is not None else settings.VARNISH_SERVERS
+
+    @property
+    def session(self):
+        # Created lazily so that each forked worker gets its own connections
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max(len(self.servers), 1), pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = Pool(self.pool_size)
+        return self._pool
+
+    def ban(self, hostname, paths):
+        """Ban ``paths`` for ``hostname`` on every Varnish server and wait for
+        the responses. Returns the number of BAN requests sent.
+        """
+        collapsed = collapse_paths(paths)
+        metrics.incr('varnish.ban.collapsed', len(set(paths)) - len(collapsed))
+        greenlets = []
+        for server in self.servers:
+            varnish_parsed_url = urlparse.urlparse(server)
+            for path in collapsed:
+                url = '{scheme}://{netloc}{path}.*'.format(scheme=varnish_parsed_url.scheme,
+                                                           netloc=varnish_parsed_url.netloc,
+                                                           path=path)
+                greenlets.append(self.pool.spawn(self._send, url, hostname))
+        gevent.joinall(greenlets)
+        return len(greenlets)
+
+    def _send(self, url, hostname):
+        try:
+            with metrics.timer('varnish.ban'):
+                response = self.session.request('BAN', url, timeout=self.timeout, headers={'Host': hostname})
+        except Exception as ex:
+            logger.error('Banning {} failed: {}'.format(url, ex))
+            return
+        if not response.ok:
+            metrics.incr('varnish.ban.rejected')
+            logger.error('Banning {} failed: {}'.format(url, response.text))
+        else:
+            logger.info('Banning {} succeeded'.format(url))
+
+    # Request-scoped batching
+
+    def request_batch(self):
+        """Return the bans collected for the current request, as a dict of
+        hostname -> set of paths. The first call in a request enqueues a
+        postcommit task that sends the whole batch.
+        """
+        queue = postcommit_queue()
+        owner, batch = getattr(_local, 'ban_batch', (None, None))
+        if owner is not queue:
+            batch = defaultdict(set)
+            _local.ban_batch = (queue, batch)
+            enqueue_postcommit_task(self.flush, (batch, ), {}, once_per_request=False)
+        return batch
+
+    def add(self, hostname, paths):
+        self.request_batch()[hostname].update(paths)
+
+    def flush(self, batch):
+        sent = 0
+        for hostname, paths in batch.items():
+            sent += self.ban(hostname, paths)
+        return sent
+
+
+dispatcher = BanDispatcher()
@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+import threading
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import mock
+import requests
+from nose.tools import *  # flake8: noqa
+
+from api.caching.dispatcher import BanDispatcher, collapse_paths
+
+
+class VarnishStandIn(ThreadingMixIn, HTTPServer):
+    """Records every BAN it receives."""
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), BanHandler)
+        self.bans = []
+        self.connections = set()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_port)
+
+
+class BanHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_BAN(self):
+        self.server.bans.append((self.headers.get('Host'), self.path))
+        self.server.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCollapsePaths(unittest.TestCase):
+
+    def test_removes_duplicates_and_covered_paths(self):
+        paths = [
+            '/v2/nodes/abc12/',
+            '/v2/nodes/abc12/contributors/',
+            '/v2/nodes/abc12/',
+            '/v2/comments/def34/',
+        ]
+        assert_equal(collapse_paths(paths), ['/v2/comments/def34/', '/v2/nodes/abc12/'])
+
+    def test_keeps_siblings(self):
+        assert_equal(collapse_paths(['/v2/nodes/abc12/', '/v2/nodes/abc13/']), ['/v2/nodes/abc12/', '/v2/nodes/abc13/'])
+
+
+class TestBanDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.varnishes = [VarnishStandIn(), VarnishStandIn()]
+        self.threads = [threading.Thread(target=varnish.serve_forever) for varnish in self.varnishes]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+        self.dispatcher = BanDispatcher(servers=[varnish.url for varnish in self.varnishes], timeout=1, pool_size=4)
+
+    def tearDown(self):
+        self.dispatcher.session.close()
+        for varnish in self.varnishes:
+            varnish.shutdown()
+            varnish.server_close()
+
+    def test_ban_sends_collapsed_paths_to_every_server(self):
+        sent = self.dispatcher.ban('api.osf.io', ['/v2/nodes/abc12/', '/v2/nodes/abc12/files/', '/v2/users/def34/'])
+
+        assert_equal(sent, 4)
+        for varnish in self.varnishes:
+            assert_equal(
+                sorted(varnish.bans),
+                [('api.osf.io', '/v2/nodes/abc12/.*'), ('api.osf.io', '/v2/users/def34/.*')]
+            )
+
+    def test_ban_reuses_connections(self):
+        Session = requests.Session
+        with mock.patch.object(Session, 'request', autospec=True, side_effect=Session.request) as mock_request, \
+                mock.patch('api.caching.dispatcher.requests.Session', wraps=Session) as mock_session:
+            for path in ['/v2/nodes/abc12/', '/v2/nodes/def34/', '/v2/users/ghi56/']:
+                self.dispatcher.ban('api.osf.io', [path])
+
+        # One session is built and every BAN goes through it
+        assert_equal(mock_session.call_count, 1)
+        assert_equal(mock_request.call_count, 6)
+        assert_equal({call[0][0] for call in mock_request.call_args_list}, {self.dispatcher.session})
+        for varnish in self.varnishes:
+            assert_equal(len(varnish.bans), 3)
+            assert_equal(len(varnish.connections), 1)
+
+    def test_request_batch_is_flushed_once_after_commit(self):
+        queue = {}
+        with mock.patch('api.caching.dispatcher.postcommit_queue', return_value=queue), \
+                mock.patch('api.caching.dispatcher.enqueue_postcommit_task') as mock_enqueue:
+            self.dispatcher.add('api.osf.io', ['/v2/nodes/abc12/'])
+            self.dispatcher.add('api.osf.io', ['/v2/nodes/abc12/', '/v2/nodes/abc12/logs/'])
+
+        assert_equal(mock_enqueue.call_count, 1)
+        flush, (batch, ), _ = mock_enqueue.call_args[0][:3]
+        assert_equal(self.varnishes[0].bans, [])
+
+        flush(batch)
+        for varnish in self.varnishes:
+            assert_equal(varnish.bans, [('api.osf.io', '/v2/nodes/abc12/.*')])
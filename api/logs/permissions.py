@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from rest_framework import permissions
 
-from osf.models import NodeLog
+from api.base.utils import get_user_auth
+from osf.models import AbstractNode, NodeLog
+from osf.models.node import get_inheriting_node_ids
 
 from api.nodes.permissions import ContributorOrPublic
 
@@ -10,4 +12,15 @@ class ContributorOrPublicForLogs(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         assert isinstance(obj, NodeLog), 'obj must be a NodeLog, got {}'.format(obj)
-        return ContributorOrPublic().has_object_permission(request, view, obj.node)
+        if ContributorOrPublic().has_object_permission(request, view, obj.node):
+            return True
+        if request.method not in permissions.SAFE_METHODS:
+            return False
+        # Forks show the logs they inherit from the node they were forked from
+        inheriting_node_ids = get_inheriting_node_ids(obj.node_id, log_id=obj.id)
+        if not inheriting_node_ids:
+            return False
+        auth = get_user_auth(request)
+        return AbstractNode.objects.filter(id__in=inheriting_node_ids).can_view(
+            user=auth.user, private_link=auth.private_key
+        ).exists()
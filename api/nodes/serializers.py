@@ -1,4 +1,5 @@
 from django.db import connection
+from django.db.models import Count
 
 from api.base.exceptions import (Conflict, EndpointNotImplementedError,
                                  InvalidModelValueError,
@@ -23,10 +24,11 @@ from rest_framework import serializers as ser
 from rest_framework import exceptions
 from addons.base.exceptions import InvalidAuthError, InvalidFolderError
 from website.exceptions import NodeStateError
-from osf.models import (Comment, DraftRegistration, Institution,
-                        MetaSchema, AbstractNode, PrivateLink)
+from osf.models import (Comment, Contributor, DraftRegistration, Institution,
+                        MetaSchema, AbstractNode, NodeLog, NodeRelation, PrivateLink)
 from osf.models.external import ExternalAccount
 from osf.models.licenses import NodeLicense
+from osf.models.node import count_inherited_logs
 from osf.models.preprint_service import PreprintService
 from website.project import new_private_link
 from website.project.metadata.schemas import LATEST_SCHEMA_VERSION
@@ -386,6 +388,17 @@ class NodeSerializer(TaxonomizableSerializerMixin, JSONAPISerializer):
         auth = Auth(user if not user.is_anonymous else None)
         return obj.can_comment(auth)
 
+    bulk_related_meta = {
+        'get_logs_count': 'get_logs_counts',
+        'get_node_count': 'get_node_counts',
+        'get_contrib_count': 'get_contrib_counts',
+        'get_registration_count': 'get_registration_counts',
+        'get_pointers_count': 'get_pointers_counts',
+        'get_node_links_count': 'get_node_links_counts',
+        'get_registration_links_count': 'get_registration_links_counts',
+        'get_unread_comments_count': 'get_unread_comments_counts',
+    }
+
     class Meta:
         type_ = 'nodes'
 
@@ -402,14 +415,10 @@ class NodeSerializer(TaxonomizableSerializerMixin, JSONAPISerializer):
         user_id = getattr(auth.user, 'id', None)
         with connection.cursor() as cursor:
             cursor.execute('''
-                WITH RECURSIVE parents AS (
-                  SELECT parent_id, child_id
-                  FROM osf_noderelation
-                  WHERE child_id = %s AND is_node_link IS FALSE
-                UNION ALL
-                  SELECT osf_noderelation.parent_id, parents.parent_id AS child_id
-                  FROM parents JOIN osf_noderelation ON parents.PARENT_ID = osf_noderelation.child_id
-                  WHERE osf_noderelation.is_node_link IS FALSE
+                WITH parents AS (
+                  SELECT ancestor_id AS parent_id
+                  FROM osf_nodeclosure
+                  WHERE descendant_id = %s
                 ), has_admin AS (SELECT * FROM osf_contributor WHERE (node_id IN (SELECT parent_id FROM parents) OR node_id = %s) AND user_id = %s AND admin IS TRUE LIMIT 1)
                 SELECT DISTINCT
                   COUNT(child_id)
@@ -466,6 +475,81 @@ class NodeSerializer(TaxonomizableSerializerMixin, JSONAPISerializer):
             'node': node_comments
         }
 
+    # Counts for a page of nodes, see JSONAPISerializer.bulk_related_meta
+
+    def count_per_node(self, nodes, queryset, node_field, count_field='id'):
+        counts = {node.pk: 0 for node in nodes}
+        counts.update(
+            queryset.filter(**{'{}__in'.format(node_field): [node.pk for node in nodes]})
+            .order_by().values(node_field).annotate(count=Count(count_field, distinct=True))
+            .values_list(node_field, 'count')
+        )
+        return counts
+
+    def get_viewable_nodes(self, auth):
+        """The nodes `AbstractNode.can_view` allows `auth` to view, as a queryset"""
+        private_link = auth.private_link
+        if getattr(private_link, 'anonymous', False):
+            return private_link.nodes.all()
+        return AbstractNode.objects.can_view(user=auth.user, private_link=auth.private_key)
+
+    def get_logs_counts(self, nodes):
+        counts = self.count_per_node(nodes, NodeLog.objects.all(), 'node_id')
+        # Forks also have the logs they inherit
+        forks = [node for node in nodes if node.inherited_logs_until is not None]
+        for node_id, count in count_inherited_logs(forks).items():
+            counts[node_id] += count
+        return counts
+
+    def get_node_counts(self, nodes):
+        auth = get_user_auth(self.context['request'])
+        children = AbstractNode.objects.can_view(user=auth.user, private_link=auth.private_key).filter(is_deleted=False)
+        return self.count_per_node(
+            nodes,
+            NodeRelation.objects.filter(is_node_link=False, child__in=children.values('id')),
+            'parent_id', 'child_id'
+        )
+
+    def get_contrib_counts(self, nodes):
+        return self.count_per_node(nodes, Contributor.objects.all(), 'node_id')
+
+    def get_registration_counts(self, nodes):
+        auth = get_user_auth(self.context['request'])
+        Registration = apps.get_model('osf.Registration')
+        return self.count_per_node(
+            nodes,
+            Registration.objects.filter(id__in=self.get_viewable_nodes(auth).values('id')),
+            'registered_from_id'
+        )
+
+    def get_pointers_counts(self, nodes):
+        return self.count_per_node(nodes, NodeRelation.objects.filter(is_node_link=True), 'parent_id', 'child_id')
+
+    def get_node_links_counts(self, nodes):
+        auth = get_user_auth(self.context['request'])
+        linked = self.get_viewable_nodes(auth).filter(is_deleted=False).exclude(type__in=['osf.collection', 'osf.registration'])
+        return self.count_per_node(
+            nodes,
+            NodeRelation.objects.filter(is_node_link=True, child__in=linked.values('id')),
+            'parent_id', 'child_id'
+        )
+
+    def get_registration_links_counts(self, nodes):
+        auth = get_user_auth(self.context['request'])
+        linked = self.get_viewable_nodes(auth).filter(is_deleted=False, type='osf.registration')
+        return self.count_per_node(
+            nodes,
+            NodeRelation.objects.filter(is_node_link=True, child__in=linked.values('id')),
+            'parent_id', 'child_id'
+        )
+
+    def get_unread_comments_counts(self, nodes):
+        user = get_user_auth(self.context['request']).user
+        return {
+            node_id: {'node': count}
+            for node_id, count in Comment.find_n_unread_for_nodes(user=user, nodes=nodes).items()
+        }
+
     def create(self, validated_data):
         request = self.context['request']
         user = request.user
@@ -797,6 +881,45 @@ class NodeForksSerializer(NodeSerializer):
         return fork
 
 
+class NodeForkJobSerializer(JSONAPISerializer):
+    """A fork of a large project that is being made in the background, see ``ForkJob``"""
+
+    id = IDField(source='_id', read_only=True)
+    type = TypeField()
+    status = ser.CharField(read_only=True)
+    nodes_forked = ser.IntegerField(source='forked_count', read_only=True)
+    nodes_total = ser.IntegerField(source='total_nodes', read_only=True)
+    date_created = VersionedDateTimeField(source='created', read_only=True)
+    date_completed = VersionedDateTimeField(read_only=True)
+
+    node = RelationshipField(
+        related_view=lambda n: 'registrations:registration-detail' if getattr(n, 'is_registration', False) else 'nodes:node-detail',
+        related_view_kwargs={'node_id': '<src_node._id>'},
+    )
+
+    fork = RelationshipField(
+        related_view='nodes:node-detail',
+        related_view_kwargs={'node_id': '<dst_node._id>'},
+    )
+
+    links = LinksField({
+        'self': 'get_absolute_url',
+    })
+
+    class Meta:
+        type_ = 'fork-jobs'
+
+    def get_absolute_url(self, obj):
+        return absolute_reverse(
+            'nodes:node-fork-job-detail',
+            kwargs={
+                'node_id': obj.src_node._id,
+                'job_id': obj._id,
+                'version': self.context['request'].parser_context['kwargs']['version'],
+            },
+        )
+
+
 class ContributorIDField(IDField):
     """ID field to use with the contributor resource. Contributor IDs have the form "<node-id>-<user-id>"."""
 
@@ -6,7 +6,7 @@ from django.utils import timezone
 from rest_framework import generics, permissions as drf_permissions
 from rest_framework.exceptions import PermissionDenied, ValidationError, NotFound, MethodNotAllowed, NotAuthenticated
 from rest_framework.response import Response
-from rest_framework.status import HTTP_204_NO_CONTENT
+from rest_framework.status import HTTP_202_ACCEPTED, HTTP_204_NO_CONTENT
 
 from addons.osfstorage.models import OsfStorageFolder
 from api.addons.serializers import NodeAddonFolderSerializer
@@ -49,7 +49,7 @@ from api.base.views import (
     LinkedRegistrationsRelationship,
     WaterButlerMixin
 )
-from api.caching.tasks import ban_url
+from api.caching.tasks import enqueue_ban
 from api.citations.utils import render_citation
 from api.comments.permissions import CanCommentOrPublic
 from api.comments.serializers import (CommentCreateSerializer,
@@ -79,6 +79,7 @@ from api.nodes.serializers import (
     NodeAddonSettingsSerializer,
     NodeLinksSerializer,
     NodeForksSerializer,
+    NodeForkJobSerializer,
     NodeDetailSerializer,
     NodeProviderSerializer,
     DraftRegistrationSerializer,
@@ -101,15 +102,15 @@ from api.users.views import UserMixin
 from api.users.serializers import UserSerializer
 from api.wikis.serializers import NodeWikiSerializer
 from framework.auth.oauth_scopes import CoreScopes
-from framework.postcommit_tasks.handlers import enqueue_postcommit_task
 from osf.models import AbstractNode
 from osf.models import (Node, PrivateLink, Institution, Comment, DraftRegistration,)
 from osf.models import OSFUser
 from osf.models import NodeRelation, Guid
-from osf.models import BaseFileNode
+from osf.models import BaseFileNode, ForkJob
 from osf.models.files import File, Folder
 from osf.utils.permissions import ADMIN, PERMISSIONS
 from website import mails
+from website import settings as osf_settings
 from website.exceptions import NodeStateError
 
 
@@ -859,6 +860,24 @@ class NodeForksList(JSONAPIBaseView, generics.ListCreateAPIView, NodeMixin, Node
         node_pks = [node.pk for node in all_forks if node.can_view(auth)]
         return AbstractNode.objects.filter(pk__in=node_pks)
 
+    # overrides ListCreateAPIView
+    def create(self, request, *args, **kwargs):
+        """Fork in the request, or for projects with more than FORK_SYNC_MAX_NODES
+        nodes, start a fork job and return it with 202 Accepted.
+        """
+        node = self.get_node()
+        if AbstractNode.objects.get_children(node, active=True).count() + 1 <= osf_settings.FORK_SYNC_MAX_NODES:
+            return super(NodeForksList, self).create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = get_user_auth(request).user
+        if not (node.is_public or node.has_permission(user, 'read')):
+            raise PermissionDenied
+        job = ForkJob.start(node, user, title=serializer.validated_data.get('title'))
+        job_serializer = NodeForkJobSerializer(job, context=self.get_serializer_context())
+        return Response(job_serializer.data, status=HTTP_202_ACCEPTED)
+
     # overrides ListCreateAPIView
     def perform_create(self, serializer):
         user = get_user_auth(self.request).user
@@ -881,6 +900,32 @@ class NodeForksList(JSONAPIBaseView, generics.ListCreateAPIView, NodeMixin, Node
         return res
 
 
+class NodeForkJobDetail(JSONAPIBaseView, generics.RetrieveAPIView):
+    """The progress of a fork of this node that is being made in the background.
+    Only the user who asked for the fork can see it.
+    """
+    permission_classes = (
+        drf_permissions.IsAuthenticated,
+        base_permissions.TokenHasScope,
+    )
+
+    required_read_scopes = [CoreScopes.NODE_FORKS_READ]
+    required_write_scopes = [CoreScopes.NULL]
+
+    serializer_class = NodeForkJobSerializer
+    view_category = 'nodes'
+    view_name = 'node-fork-job-detail'
+
+    def get_object(self):
+        # Also serves the fork jobs of registrations, which NodeMixin.get_node does not find
+        try:
+            return ForkJob.objects.select_related('src_node', 'dst_node').get(
+                _id=self.kwargs['job_id'], src_node__guids___id=self.kwargs['node_id'], initiator=self.request.user,
+            )
+        except ForkJob.DoesNotExist:
+            raise NotFound
+
+
 class NodeFilesList(JSONAPIBaseView, generics.ListAPIView, WaterButlerMixin, ListFilterMixin, NodeMixin):
     """The documentation for this endpoint can be found [here](https://developer.osf.io/#operation/nodes_files_list).
 
@@ -1745,7 +1790,7 @@ class NodeViewOnlyLinkDetail(JSONAPIBaseView, generics.RetrieveUpdateDestroyAPIV
         assert isinstance(link, PrivateLink), 'link must be a PrivateLink'
         link.is_deleted = True
         link.save()
-        enqueue_postcommit_task(ban_url, (self.get_node(),), {}, celery=True, once_per_request=True)
+        enqueue_ban(self.get_node())
 
 
 class NodeIdentifierList(NodeMixin, IdentifierList):
@@ -0,0 +1,90 @@
+import datetime
+
+import mock
+import pytest
+from django.utils import timezone
+
+from api.base import throttling
+from api.base.throttle_store import CacheThrottleStore, DatabaseThrottleStore, SlidingWindow
+from osf.models import ThrottleCounter
+
+
+class TestSlidingWindow:
+
+    def test_count_weighs_oldest_bucket_by_overlap(self):
+        window = SlidingWindow(10, buckets=10)
+        # Window (15.5, 25.5] covers buckets 16-25 and the second half of bucket 15
+        counts = {14: 100, 15: 4, 16: 1, 25: 2, 26: 100}
+        assert window.oldest(25.5) == 15
+        assert window.count(counts, 25.5) == 5
+
+    def test_expires_and_wait(self):
+        window = SlidingWindow(60, buckets=6)
+        assert window.expires(3) == 100
+        assert window.wait(25) == 5
+
+
+class TestCacheThrottleStore:
+
+    def test_incr_and_get_counts(self):
+        store = CacheThrottleStore()
+        store.clear()
+        store.incr('throttle_test', 1, 60)
+        store.incr('throttle_test', 1, 60)
+        store.incr('throttle_test', 2, 60)
+        store.incr('throttle_other', 2, 60)
+        assert store.get_counts('throttle_test', 0, 2) == {1: 2, 2: 1}
+
+
+@pytest.mark.django_db
+class TestDatabaseThrottleStore:
+
+    @pytest.yield_fixture()
+    def store(self):
+        store = DatabaseThrottleStore()
+        store.clear()
+        yield store
+        store.clear()
+
+    def test_incr_and_get_counts(self, store):
+        store.incr('throttle_test', 1, 60)
+        store.incr('throttle_test', 1, 60)
+        store.incr('throttle_test', 3, 60)
+        store.incr('throttle_other', 2, 60)
+        assert store.get_counts('throttle_test', 0, 2) == {1: 2}
+        assert store.get_counts('throttle_test', 0, 3) == {1: 2, 3: 1}
+
+    def test_delete_expired(self):
+        ThrottleCounter.objects.create(key='a', bucket=1, count=1, expires=timezone.now() - datetime.timedelta(seconds=1))
+        ThrottleCounter.objects.create(key='a', bucket=2, count=1, expires=timezone.now() + datetime.timedelta(seconds=60))
+        assert ThrottleCounter.delete_expired() == 1
+        assert list(ThrottleCounter.objects.values_list('bucket', flat=True)) == [2]
+
+
+class TestBaseThrottle:
+
+    @pytest.fixture()
+    def request_(self):
+        return mock.Mock(META={'REMOTE_ADDR': '10.0.0.1'}, user=mock.Mock(is_authenticated=False))
+
+    def test_requests_over_the_rate_are_throttled(self, request_):
+        store = CacheThrottleStore()
+        store.clear()
+        with mock.patch('api.base.throttling.get_store', return_value=store):
+            throttle = throttling.TestAnonRateThrottle()
+            throttle.num_requests = 2
+            assert throttle.allow_request(request_, None)
+            assert throttle.allow_request(request_, None)
+            assert not throttle.allow_request(request_, None)
+            assert 0 < throttle.wait() <= throttle.duration
+
+    def test_store_failure_allows_request(self, request_):
+        store = mock.Mock(get_counts=mock.Mock(side_effect=ValueError))
+        with mock.patch('api.base.throttling.get_store', return_value=store):
+            assert throttling.TestAnonRateThrottle().allow_request(request_, None)
+
+    def test_bypass_token(self, request_):
+        request_.META['HTTP_X_THROTTLE_TOKEN'] = 'test-token'
+        with mock.patch('api.base.throttling.get_store') as mock_store:
+            assert throttling.TestAnonRateThrottle().allow_request(request_, None)
+        assert not mock_store.called
@@ -140,6 +140,29 @@ class TestLogDetail(LogsTestCase):
         assert res.status_code == 200
         assert log_public._id in unicode(res.body, 'utf-8')
 
+    def test_log_detail_inherited_by_public_fork(
+            self, app, url_log_detail_private,
+            user_one, user_two, node_private, log_private):
+        fork = node_private.fork_node(auth=Auth(user_one))
+        fork.set_privacy('public', auth=Auth(user_one))
+        node_private.add_tag('after', auth=Auth(node_private.creator))
+
+        # test_log_detail_inherited_log_readable_through_fork
+        res = app.get(url_log_detail_private, auth=user_two.auth)
+        assert res.status_code == 200
+        assert res.json['data']['id'] == log_private._id
+
+        res = app.get(url_log_detail_private)
+        assert res.status_code == 200
+
+        # test_log_detail_log_after_fork_not_readable_through_fork
+        log_after_fork = node_private.logs.latest()
+        res = app.get(
+            '/{}logs/{}/'.format(API_BASE, log_after_fork._id),
+            auth=user_two.auth, expect_errors=True
+        )
+        assert res.status_code == 403
+
 
 @pytest.mark.django_db
 class TestNodeFileLogDetail:
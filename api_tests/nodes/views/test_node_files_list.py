@@ -8,7 +8,7 @@ from nose.tools import *  # flake8: noqa
 
 from framework.auth.core import Auth
 
-from addons.github.models import GithubFolder
+from addons.github.models import GithubFile, GithubFolder
 from addons.github.tests.factories import GitHubAccountFactory
 from api.base.settings.defaults import API_BASE
 from api.base.utils import waterbutler_api_url_for
@@ -286,6 +286,39 @@ class TestNodeFilesList(ApiTestCase):
         assert_equal(res.json['data'][0]['attributes']['name'], 'NewFile')
         assert_equal(res.json['data'][0]['attributes']['provider'], 'github')
 
+    @responses.activate
+    def test_listing_only_rewrites_changed_files(self):
+        files = [
+            {'name': 'unchanged', 'path': '/unchanged', 'materialized': '/unchanged', 'etag': 'unchanged'},
+            {'name': 'renamed', 'path': '/renamed', 'materialized': '/renamed', 'etag': 'renamed'},
+        ]
+        self._prepare_mock_wb_response(provider='github', files=files)
+        self.add_github()
+        url = '/{}nodes/{}/files/github/'.format(API_BASE, self.project._id)
+        self.app.get(url, auth=self.user.auth)
+        unchanged = GithubFile.objects.get(node=self.project, _path='/unchanged')
+        renamed = GithubFile.objects.get(node=self.project, _path='/renamed')
+
+        responses.reset()
+        files[1] = dict(files[1], name='new name', materialized='/new name')
+        files.append({'name': 'added', 'path': '/added', 'materialized': '/added', 'etag': 'added'})
+        self._prepare_mock_wb_response(provider='github', files=files)
+        res = self.app.get(url, auth=self.user.auth)
+
+        assert_equal(
+            sorted(item['attributes']['name'] for item in res.json['data']),
+            ['added', 'new name', 'unchanged']
+        )
+        assert_equal(GithubFile.objects.filter(node=self.project).count(), 3)
+        renamed.refresh_from_db()
+        assert_equal(renamed.name, 'new name')
+        assert_equal(renamed.materialized_path, '/new name')
+        last_touched = unchanged.last_touched
+        unchanged.refresh_from_db()
+        assert_equal(unchanged.name, 'unchanged')
+        assert_greater(unchanged.last_touched, last_touched)
+        assert_equal(len(unchanged.history), 1)
+
     @responses.activate
     def test_returns_folder_metadata_not_children(self):
         folder = GithubFolder(
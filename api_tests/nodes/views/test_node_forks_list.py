@@ -10,8 +10,10 @@ from osf_tests.factories import (
     AuthUserFactory,
     ForkFactory
 )
+from osf.models import ForkJob
 from rest_framework import exceptions
 from website import mails
+from website.project.tasks import run_fork_job
 from osf.utils import permissions
 
 from api.nodes.serializers import NodeForksSerializer
@@ -442,3 +444,35 @@ class TestNodeForkCreate:
                         guid=public_project._id,
                         mimetype='html',
                         can_change_preferences=False)
+
+    def test_large_project_is_forked_by_a_job(
+            self, app, user, user_two, public_project, public_project_url,
+            fork_data_with_title):
+        NodeFactory(parent=public_project, creator=user, is_public=True)
+        with mock.patch('website.settings.FORK_SYNC_MAX_NODES', 1), \
+                mock.patch.object(mails, 'send_mail', return_value=None):
+            res = app.post_json_api(
+                public_project_url,
+                fork_data_with_title,
+                auth=user.auth)
+            assert res.status_code == 202
+            assert res.json['data']['type'] == 'fork-jobs'
+            assert res.json['data']['attributes']['nodes_total'] == 2
+            job_url = res.json['data']['links']['self']
+
+            job = ForkJob.load(res.json['data']['id'])
+            assert job.title == 'My Forked Project'
+            run_fork_job(job._id)
+
+        res = app.get(job_url, auth=user.auth)
+        assert res.status_code == 200
+        assert res.json['data']['attributes']['status'] == ForkJob.SUCCESS
+        assert res.json['data']['attributes']['nodes_forked'] == 2
+        fork = public_project.forks.get()
+        assert res.json['data']['relationships']['fork']['links']['related']['href'].endswith('/nodes/{}/'.format(fork._id))
+        assert fork.title == 'My Forked Project'
+        assert fork.nodes[0].forked_from == public_project.nodes[0]
+
+        #   only the user who forked can see the job
+        res = app.get(job_url, auth=user_two.auth, expect_errors=True)
+        assert res.status_code == 404
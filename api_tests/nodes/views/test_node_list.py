@@ -16,6 +16,8 @@ from osf_tests.factories import (
     PreprintFactory,
     InstitutionFactory
 )
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import exceptions
 from tests.utils import assert_items_equal
 from website.views import find_bookmark_collection
@@ -3187,6 +3189,63 @@ class TestNodeListPagination:
         assert res.json['data'][0]['embeds']['contributors']['links']['meta']['per_page'] == 10
 
 
+def related_meta(node_json):
+    return {
+        name: relation['links']['related'].get('meta', {})
+        for name, relation in node_json['relationships'].items()
+        if isinstance(relation, dict) and 'related' in relation.get('links', {})
+    }
+
+
+@pytest.mark.django_db
+class TestNodeListRelatedCounts:
+
+    @pytest.fixture()
+    def projects(self, user):
+        projects = [ProjectFactory(is_public=True, creator=user) for _ in range(3)]
+        NodeFactory(parent=projects[0], creator=user, is_public=True)
+        NodeFactory(parent=projects[0], creator=user, is_public=False)
+        projects[1].add_node_link(projects[2], auth=Auth(user), save=True)
+        projects[1].add_node_link(ProjectFactory(is_public=False), auth=Auth(user), save=True)
+        RegistrationFactory(project=projects[2], creator=user, is_public=True)
+        return projects
+
+    @pytest.fixture()
+    def url(self):
+        return '/{}nodes/?filter[parent]=null&related_counts=true'.format(API_BASE)
+
+    def test_counts_match_node_detail(self, app, user, non_contrib, projects, url):
+        for auth in (user.auth, non_contrib.auth, None):
+            res = app.get(url, auth=auth)
+            assert len(res.json['data']) == 3
+            for node_json in res.json['data']:
+                detail = app.get('/{}nodes/{}/?related_counts=true'.format(API_BASE, node_json['id']), auth=auth)
+                assert related_meta(node_json) == related_meta(detail.json['data'])
+
+    def test_children_count_depends_on_user(self, app, user, non_contrib, projects, url):
+        counts = {
+            node_json['id']: related_meta(node_json)['children']['count']
+            for node_json in app.get(url, auth=non_contrib.auth).json['data']
+        }
+        assert counts[projects[0]._id] == 1
+        counts = {
+            node_json['id']: related_meta(node_json)['children']['count']
+            for node_json in app.get(url, auth=user.auth).json['data']
+        }
+        assert counts[projects[0]._id] == 2
+
+    def test_count_queries_do_not_depend_on_page_size(self, app, user, projects, url):
+        def count_queries(query_string):
+            with CaptureQueriesContext(connection) as ctx:
+                app.get(query_string, auth=user.auth)
+            return len(ctx.captured_queries)
+
+        plain_url = url.replace('&related_counts=true', '')
+        small = count_queries(url + '&page[size]=1') - count_queries(plain_url + '&page[size]=1')
+        large = count_queries(url + '&page[size]=3') - count_queries(plain_url + '&page[size]=3')
+        assert small == large
+
+
 @pytest.mark.django_db
 class TestNodeListFiltering(NodesListFilteringMixin):
 
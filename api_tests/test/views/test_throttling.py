@@ -2,12 +2,20 @@ import mock
 import pytest
 
 from api.base.settings.defaults import API_BASE
+from api.base.throttle_store import get_store
 from osf_tests.factories import AuthUserFactory
 
 
 @pytest.mark.django_db
 class TestThrottling:
 
+    @pytest.yield_fixture(autouse=True)
+    def clear_throttle_counters(self):
+        # Counters are committed outside of the test's transaction
+        get_store().clear()
+        yield
+        get_store().clear()
+
     @pytest.fixture()
     def user(self):
         return AuthUserFactory()
@@ -1,6 +1,7 @@
 import os
 from json import load as load_json
-from mako.lookup import TemplateLookup
+
+from framework.mako_modules import CachedTemplateLookup
 
 CLASS_MAP = {
     'full': 'success',
@@ -52,7 +53,7 @@ def read_capabilities(filename):
 here, _ = os.path.split(__file__)
 here = os.path.abspath(here)
 
-lookup = TemplateLookup(
+lookup = CachedTemplateLookup(
     directories=[os.path.join(here, 'templates')],
     default_filters=[
         'unicode',  # default filter; must set explicitly when overriding
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Write-behind buffer for page and download counters.
+
+Increments are accumulated in process and flushed to the database in batches
+with additive upserts, so that concurrent views of a popular page never contend
+for a row lock. Reads merge the flushed values with whatever is still pending.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('total', 'unique', 'day_total', 'day_unique')
+
+
+class CounterBuffer(object):
+    """Thread-safe accumulator of pending counter increments, keyed by
+    ``(page, date_string)``.
+    """
+
+    def __init__(self, flush_interval=None, flush_threshold=None):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+        self._last_flush = time.time()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def increment(self, page, date_string, **increments):
+        with self._lock:
+            counts = self._pending[(page, date_string)]
+            for field, value in increments.items():
+                counts[field] += value
+
+    def pending(self, page):
+        """Return pending ``(unique, total)`` increments for ``page``, or
+        ``None`` if nothing is pending.
+        """
+        with self._lock:
+            rows = [counts for (key, _), counts in self._pending.items() if key == page]
+        if not rows:
+            return None
+        return sum(row['unique'] for row in rows), sum(row['total'] for row in rows)
+
+    def pending_totals(self, prefix):
+        """Return a dict of pending total increments for every page starting
+        with ``prefix``.
+        """
+        totals = defaultdict(int)
+        with self._lock:
+            for (page, _), counts in self._pending.items():
+                if page.startswith(prefix):
+                    totals[page] += counts['total']
+        return dict(totals)
+
+    def drain(self):
+        """Atomically remove and return all pending increments."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+            self._last_flush = time.time()
+        return dict(pending)
+
+    def restore(self, pending):
+        """Put drained increments back, e.g. after a failed flush."""
+        for (page, date_string), counts in pending.items():
+            self.increment(page, date_string, **counts)
+
+    def is_due(self):
+        interval = settings.PAGE_COUNTER_FLUSH_INTERVAL if self.flush_interval is None else self.flush_interval
+        threshold = settings.PAGE_COUNTER_FLUSH_THRESHOLD if self.flush_threshold is None else self.flush_threshold
+        if not self._pending:
+            return False
+        return len(self._pending) >= threshold or time.time() - self._last_flush >= interval
+
+    def flush(self):
+        """Write all pending increments to the database. Returns the number of
+        ``(page, date)`` rows written.
+        """
+        pending = self.drain()
+        if not pending:
+            return 0
+
+        from osf.models import PageCounter
+        try:
+            PageCounter.bulk_increment(pending)
+        except Exception:
+            logger.exception('Failed to flush {} page counter increments; will retry'.format(len(pending)))
+            self.restore(pending)
+            return 0
+        return len(pending)
+
+
+counter_buffer = CounterBuffer()
+
+
+def flush_counters():
+    return counter_buffer.flush()
+
+
+def flush_counters_if_due(*args, **kwargs):
+    """`teardown_request` handler that flushes the buffer once it is large or
+    old enough.
+    """
+    if counter_buffer.is_due():
+        flush_counters()
+
+
+atexit.register(flush_counters)
+
+handlers = {
+    'teardown_request': flush_counters_if_due,
+}
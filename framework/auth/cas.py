@@ -1,19 +1,31 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import furl
+import hashlib
 import httplib as http
 import json
+import logging
+import threading
 import urllib
 
 from lxml import etree
 import requests
+from requests.adapters import HTTPAdapter
 
 from framework.auth import authenticate, external_first_login_authenticate
 from framework.auth.core import get_user, generate_verification_key
+from framework.caching import BaseStore, DjangoCacheMixin, NullStore, StoreSelector, TTLCache
 from framework.flask import redirect
 from framework.exceptions import HTTPError
+from framework.metrics import metrics
 from website import settings
 
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY_PREFIX = 'osf-cas-profile:'
+PROFILE_GENERATION_KEY = PROFILE_KEY_PREFIX + 'generation'
+
 
 class CasError(HTTPError):
     """General CAS-related error."""
@@ -53,6 +65,138 @@ class CasResponse(object):
         self.attributes = attributes or {}
 
 
+def make_profile_key(access_token):
+    # Keyed by a hash so that tokens are never held in a cache as keys
+    return hashlib.sha256(access_token).hexdigest()
+
+
+class LocalProfileStore(BaseStore):
+    """Per-process LRU of profile responses. Revocations only evict entries
+    in the process that made them, so a token revoked in another process
+    stays valid here for up to ``ttl`` seconds.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.entries = TTLCache(
+            max_size or settings.CAS_PROFILE_CACHE_MAX_SIZE,
+            ttl or settings.CAS_PROFILE_CACHE_TTL,
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        return copy.deepcopy(value) if value is not None else None
+
+    def set(self, key, cas_response):
+        self.entries.set(key, copy.deepcopy(cas_response))
+
+    def delete(self, key):
+        self.entries.delete(key)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class DjangoProfileStore(DjangoCacheMixin, BaseStore):
+    """Store backed by a Django cache shared by every process, so that a
+    revocation evicts the token everywhere at once.
+
+    ``clear`` only drops profiles: keys include a generation number, which
+    it changes.
+    """
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.CAS_PROFILE_CACHE_ALIAS
+        self.ttl = ttl or settings.CAS_PROFILE_CACHE_TTL
+
+    def make_key(self, key):
+        generation = self.cache.get(PROFILE_GENERATION_KEY) or 0
+        return '{}{}:{}'.format(PROFILE_KEY_PREFIX, generation, key)
+
+    def get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def set(self, key, cas_response):
+        self.cache.set(self.make_key(key), cas_response, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def clear(self):
+        self.cache.add(PROFILE_GENERATION_KEY, 0, None)
+        self.cache.incr(PROFILE_GENERATION_KEY)
+
+
+BACKENDS = {
+    'local': LocalProfileStore,
+    'django': DjangoProfileStore,
+    None: NullStore,
+}
+
+get_profile_store = StoreSelector(BACKENDS, lambda: settings.CAS_PROFILE_CACHE)
+
+_profile_cache_counts = {'hit': 0, 'miss': 0}
+
+
+def profile_cache_hit_rate():
+    total = _profile_cache_counts['hit'] + _profile_cache_counts['miss']
+    return float(_profile_cache_counts['hit']) / total if total else 0
+
+
+metrics.register_gauge('cas.profile_cache.hit_rate', profile_cache_hit_rate)
+
+
+def load_profile(access_token):
+    """Return the cached profile response for ``access_token``, or ``None``."""
+    key = make_profile_key(access_token)
+    try:
+        cas_response = get_profile_store().get(key)
+    except Exception:
+        logger.exception('Failed to read CAS profile {} from cache'.format(key))
+        cas_response = None
+    outcome = 'hit' if cas_response is not None else 'miss'
+    _profile_cache_counts[outcome] += 1
+    metrics.incr('cas.profile_cache.{}'.format(outcome))
+    return cas_response
+
+
+def cache_profile(access_token, cas_response):
+    key = make_profile_key(access_token)
+    try:
+        get_profile_store().set(key, cas_response)
+    except Exception:
+        logger.exception('Failed to cache CAS profile {}'.format(key))
+
+
+def evict_profile(access_token=None):
+    """Evict the profile of ``access_token``, or every profile if it is ``None``.
+    Errors are raised, since a revoked token must not stay cached.
+    """
+    if access_token is None:
+        get_profile_store().clear()
+    else:
+        get_profile_store().delete(make_profile_key(access_token))
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return this process's keep-alive session for requests to CAS."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.CAS_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
 class CasClient(object):
     """HTTP client for the CAS server."""
 
@@ -114,7 +258,8 @@ class CasClient(object):
         url.args['ticket'] = ticket
         url.args['service'] = service_url
 
-        resp = requests.get(url.url)
+        with metrics.timer('cas.service_validate'):
+            resp = get_session().get(url.url, timeout=settings.CAS_REQUEST_TIMEOUT)
         if resp.status_code == 200:
             return self._parse_service_validation(resp.content)
         else:
@@ -123,19 +268,28 @@ class CasClient(object):
     def profile(self, access_token):
         """
         Send request to get profile information, given an access token.
+        Successful responses are cached for ``CAS_PROFILE_CACHE_TTL`` seconds
+        in the ``CAS_PROFILE_CACHE`` backend.
 
         :param str access_token: CAS access_token.
         :rtype: CasResponse
         :raises: CasError if an unexpected response is returned.
         """
 
+        cas_response = load_profile(access_token)
+        if cas_response is not None:
+            return cas_response
+
         url = self.get_profile_url()
         headers = {
             'Authorization': 'Bearer {}'.format(access_token),
         }
-        resp = requests.get(url, headers=headers)
+        with metrics.timer('cas.profile'):
+            resp = get_session().get(url, headers=headers, timeout=settings.CAS_REQUEST_TIMEOUT)
         if resp.status_code == 200:
-            return self._parse_profile(resp.content, access_token)
+            cas_response = self._parse_profile(resp.content, access_token)
+            cache_profile(access_token, cas_response)
+            return cas_response
         else:
             self._handle_error(resp)
 
@@ -182,8 +336,14 @@ class CasClient(object):
         """Revoke a tokens based on payload"""
         url = self.get_auth_token_revocation_url()
 
-        resp = requests.post(url, data=payload)
+        # Evict before revoking so that a failed request cannot leave a revoked token cached,
+        # and again after, since a concurrent lookup may have cached it while CAS revoked it.
+        # Cached entries do not record their application, so revoking by client clears them all.
+        evict_profile(payload.get('token'))
+
+        resp = get_session().post(url, data=payload, timeout=settings.CAS_REQUEST_TIMEOUT)
         if resp.status_code == 204:
+            evict_profile(payload.get('token'))
             return True
         else:
             self._handle_error(resp)
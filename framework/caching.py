@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Building blocks for the read-through caches kept by the OSF, e.g. of
+sessions, guids, CAS profiles and WaterButler credentials.
+
+A cache module defines its backends as subclasses of ``BaseStore``, maps
+backend names to them in a ``BACKENDS`` dict, with ``NullStore`` for no
+caching, and picks one with ``get_store = StoreSelector(...)``. Per-process
+backends keep their entries in a ``TTLCache``; shared backends use a Django
+cache through ``DjangoCacheMixin``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaseStore(object):
+    """A cache backend. What ``set`` takes depends on what the module caches."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, *args):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullStore(BaseStore):
+    """Caches nothing."""
+
+    def get(self, key):
+        return None
+
+    def set(self, *args):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class TTLCache(object):
+    """Thread-safe LRU of at most ``max_size`` entries, each of which expires
+    ``ttl`` seconds after it was set.
+
+    ``on_evict(key, value)`` is called, with the lock held, whenever an entry
+    is removed other than by ``clear``.
+    """
+
+    def __init__(self, max_size, ttl, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def lock(self):
+        return self._lock
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self.on_evict is not None:
+            self.on_evict(key, entry[1])
+
+    def get(self, key):
+        """Return the value set for ``key``, or ``None`` if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                if self.on_evict is not None:
+                    self.on_evict(key, value)
+                return None
+            # Re-insert to mark as most recently used
+            self._entries[key] = entry
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.time() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheMixin(object):
+    """For stores backed by the Django cache named by ``self.alias``."""
+
+    alias = None
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+
+class StoreSelector(object):
+    """Creates, on first use, the backend that ``get_name()`` names in
+    ``backends``, and returns it from then on.
+
+    Tests can swap in another store by patching the selector's ``store``.
+    """
+
+    def __init__(self, backends, get_name):
+        self.backends = backends
+        self.get_name = get_name
+        self.store = None
+
+    def __call__(self):
+        if self.store is None:
+            self.store = self.backends[self.get_name()]()
+        return self.store
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of compiled Mako templates.
+
+Compiled templates are written to ``settings.MAKO_MODULE_DIRECTORY`` as Python
+modules, in one subdirectory per set of compiler options (the escaping and
+non-escaping lookups compile the same file differently). Module files are named
+after a checksum of the template's source and URI, so a template is compiled
+again when it changes, and otherwise every process sharing the directory
+reuses the module, whatever the template file's mtime.
+
+``precompile`` (``invoke precompile_templates``) fills the directory ahead of
+time so that new web and celery workers do not compile templates while
+serving their first requests and emails.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import os
+import stat
+import weakref
+
+from mako.lookup import TemplateLookup
+from mako.template import Template
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+# Template arguments that change the generated module
+COMPILE_OPTIONS = (
+    'default_filters',
+    'imports',
+    'input_encoding',
+    'buffer_filters',
+    'future_imports',
+    'strict_undefined',
+    'enable_loop',
+    'disable_unicode',
+)
+
+
+def options_key(template_args):
+    options = [(name, template_args.get(name)) for name in COMPILE_OPTIONS]
+    return hashlib.sha1(repr(options)).hexdigest()[:12]
+
+
+def module_filename(filename, uri, template_args, module_directory=None):
+    """Return the path of the compiled module for the template at ``filename``."""
+    module_directory = module_directory or settings.MAKO_MODULE_DIRECTORY
+    filename = os.path.abspath(filename)
+    with open(filename, 'rb') as fp:
+        checksum = hashlib.sha1(fp.read())
+    checksum.update(uri.encode('utf-8'))
+
+    relpath = os.path.relpath(filename, settings.APP_PATH)
+    if relpath.startswith(os.pardir):
+        relpath = filename.lstrip(os.sep)
+    path = os.path.join(
+        module_directory,
+        options_key(template_args),
+        '{}.{}.py'.format(relpath, checksum.hexdigest()[:16]),
+    )
+    try:
+        source_mtime = os.path.getmtime(filename)
+        if os.path.getmtime(path) < source_mtime:
+            # The checksum matches, so the module is current even though the
+            # template was touched after it; stop Mako from compiling it again
+            os.utime(path, (source_mtime, source_mtime))
+    except OSError:
+        pass
+    return path
+
+
+class CachedTemplateLookup(TemplateLookup):
+    """A ``TemplateLookup`` whose templates are compiled to
+    ``MAKO_MODULE_DIRECTORY``. Instances are tracked so that ``precompile``
+    can find every template directory in use.
+    """
+    instances = weakref.WeakSet()
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('modulename_callable', self.get_module_filename)
+        super(CachedTemplateLookup, self).__init__(**kwargs)
+        self._module_filenames = {}
+        CachedTemplateLookup.instances.add(self)
+
+    def get_module_filename(self, filename, uri):
+        path = self._module_filenames[uri] = module_filename(filename, uri, self.template_args)
+        return path
+
+    def _check(self, uri, template):
+        """Reload ``template`` only if its source changed. Mako reloads
+        whenever the template file is newer than the time its module was
+        compiled, which after a checkout or a touch is on every lookup.
+        """
+        if template.filename is None:
+            return template
+        try:
+            mtime = os.stat(template.filename)[stat.ST_MTIME]
+        except OSError:
+            return super(CachedTemplateLookup, self)._check(uri, template)
+        if template.module._modified_time >= mtime:
+            return template
+        if module_filename(template.filename, uri, self.template_args) == self._module_filenames.get(uri):
+            # Same checksum; don't check again until the file is touched again
+            template.module._modified_time = mtime
+            return template
+        return super(CachedTemplateLookup, self)._check(uri, template)
+
+
+def load_template(filename, uri, **kwargs):
+    """Load the template at ``filename`` directly rather than through a
+    lookup, keeping its compiled module in ``MAKO_MODULE_DIRECTORY``.
+    """
+    return Template(
+        filename=filename,
+        uri=uri,
+        module_filename=module_filename(filename, uri, kwargs),
+        **kwargs
+    )
+
+
+def template_files(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.mako'):
+                yield os.path.join(root, name)
+
+
+def precompile(load_page_template=None, page_directories=()):
+    """Compile every template that can be loaded through a
+    ``CachedTemplateLookup``, and every template under ``page_directories``
+    with ``load_page_template(filename)``. Templates that several lookups share
+    with the same options are compiled once.
+
+    :return: (number of modules compiled or found current, number of failures)
+    """
+    seen = set()
+    compiled = failed = 0
+
+    def compile_once(path, load):
+        if path in seen:
+            return
+        seen.add(path)
+        try:
+            load()
+        except Exception:
+            logger.exception('Failed to compile {}'.format(path))
+            return False
+        return True
+
+    for lookup in list(CachedTemplateLookup.instances):
+        for directory in lookup.directories:
+            for filename in template_files(directory):
+                uri = os.path.relpath(filename, directory)
+                path = lookup.get_module_filename(filename, uri)
+                result = compile_once(path, lambda: lookup.get_template(uri))
+                compiled += result is True
+                failed += result is False
+
+    if load_page_template is not None:
+        for directory in page_directories:
+            for filename in template_files(directory):
+                result = compile_once(filename, lambda: load_page_template(filename))
+                compiled += result is True
+                failed += result is False
+
+    return compiled, failed
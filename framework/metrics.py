@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""In-process counters, timers and gauges.
+
+Metrics are kept per process and are exposed through ``snapshot`` (and the
+``/_/metrics/`` API endpoint). Names are dotted, e.g. ``postcommit.ban_url``,
+so that a subsystem's metrics can be selected by prefix.
+"""
+from __future__ import absolute_import
+
+import contextlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class TimingStats(object):
+    """Call count, failure count and latency of one kind of operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration, failed=False):
+        self.count += 1
+        self.failures += int(failed)
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class MetricsRegistry(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(TimingStats)
+        self._gauges = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def record(self, name, duration, failed=False):
+        with self._lock:
+            self._timings[name].record(duration, failed=failed)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time the wrapped block, counting it as failed if it raises."""
+        start = time.time()
+        try:
+            yield
+        except Exception:
+            self.record(name, time.time() - start, failed=True)
+            raise
+        self.record(name, time.time() - start)
+
+    def register_gauge(self, name, func):
+        """Register a callable whose return value is reported as ``name``."""
+        self._gauges[name] = func
+
+    def snapshot(self, prefix=''):
+        with self._lock:
+            data = {name: value for name, value in self._counters.items() if name.startswith(prefix)}
+            data.update({name: stats.as_dict() for name, stats in self._timings.items() if name.startswith(prefix)})
+        for name, func in self._gauges.items():
+            if name.startswith(prefix):
+                try:
+                    data[name] = func()
+                except Exception:
+                    logger.exception('Failed to read gauge {}'.format(name))
+                    data[name] = None
+        return data
+
+    def reset(self, prefix=''):
+        with self._lock:
+            for store in (self._counters, self._timings):
+                for name in [name for name in store if name.startswith(prefix)]:
+                    del store[name]
+
+
+metrics = MetricsRegistry()
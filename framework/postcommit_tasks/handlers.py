@@ -12,8 +12,10 @@ from celery import chain
 from celery.canvas import Signature
 from framework.celery_tasks import app
 from celery.local import PromiseProxy
+import gevent
 from gevent.pool import Pool
 
+from framework.metrics import metrics
 from website import settings
 
 _local = threading.local()
@@ -32,6 +34,7 @@ def postcommit_celery_queue():
 def postcommit_before_request():
     _local.postcommit_queue = OrderedDict()
     _local.postcommit_celery_queue = OrderedDict()
+    _local.postcommit_coalesced = 0
 
 @app.task(max_retries=5, default_retry_delay=60)
 def postcommit_celery_task_wrapper(queue):
@@ -41,6 +44,54 @@ def postcommit_celery_task_wrapper(queue):
     # https://sentry.cos.io/sentry/osf-iy/issues/289209/
     chain([Signature.from_dict(task_dict) for task_dict in queue.values()]).apply()
 
+class PostcommitExecutor(object):
+    """Long-lived greenlet pool that runs each request's postcommit tasks.
+
+    The pool is shared by every request in the process, so the number of
+    concurrent postcommit tasks (and the db connections they hold) is bounded
+    by ``settings.POSTCOMMIT_POOL_SIZE``. Each process makes its own pool, so
+    forked workers never share their parent's. Tasks still running after
+    ``settings.POSTCOMMIT_TIMEOUT`` seconds are killed, so they cannot hold
+    slots other requests need. Latency and failures of each task are recorded
+    under ``postcommit.<module>.<function>``.
+    """
+    def __init__(self, size=None, timeout=None):
+        self.size = size
+        self.timeout = timeout
+        self._pool = None
+        self._pid = None
+
+    @property
+    def pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = Pool(self.size or settings.POSTCOMMIT_POOL_SIZE)
+            self._pid = os.getpid()
+        return self._pool
+
+    def run(self, tasks):
+        """Run ``tasks``, an iterable of ``(name, callable)`` pairs, and wait
+        for them to finish. Reraises the first exception raised by a task.
+        """
+        tasks = list(tasks)
+        greenlets = [self.pool.spawn(self._run_task, name, func) for name, func in tasks]
+        timeout = self.timeout or settings.POSTCOMMIT_TIMEOUT
+        gevent.joinall(greenlets, timeout=timeout, raise_error=True)
+        unfinished = [(name, greenlet) for (name, _), greenlet in zip(tasks, greenlets) if not greenlet.ready()]
+        if unfinished:
+            metrics.incr('postcommit.timeouts', len(unfinished))
+            logger.warning('Killing postcommit tasks that did not finish within {}s: {}'.format(
+                timeout, ', '.join(name for name, _ in unfinished)
+            ))
+            gevent.killall([greenlet for _, greenlet in unfinished], block=False)
+
+    def _run_task(self, name, func):
+        with metrics.timer('postcommit.{}'.format(name)):
+            func()
+
+
+executor = PostcommitExecutor()
+
+
 def postcommit_after_request(response, base_status_error_code=500):
     if response.status_code >= base_status_error_code:
         _local.postcommit_queue = OrderedDict()
@@ -48,11 +99,8 @@ def postcommit_after_request(response, base_status_error_code=500):
         return response
     try:
         if postcommit_queue():
-            number_of_threads = 30  # one db connection per greenlet, let's share
-            pool = Pool(number_of_threads)
-            for func in postcommit_queue().values():
-                pool.spawn(func)
-            pool.join(timeout=5.0, raise_error=True)  # 5 second timeout and reraise exceptions
+            metrics.incr('postcommit.coalesced', getattr(_local, 'postcommit_coalesced', 0))
+            executor.run(postcommit_queue().values())
 
         if postcommit_celery_queue():
             if settings.USE_CELERY:
@@ -67,11 +115,27 @@ def postcommit_after_request(response, base_status_error_code=500):
             logger.error('Post commit task queue not initialized: {}'.format(ex))
     return response
 
+def coalesce_repr(value):
+    """Representation used to decide whether two postcommit calls are
+    equivalent. Model instances are identified by their table and primary key,
+    so that calls for the same object coalesce even when they were made with
+    different instances.
+    """
+    meta = getattr(value, '_meta', None)
+    if meta is not None and getattr(value, 'pk', None) is not None:
+        return '<{}:{}>'.format(meta.label_lower, value.pk)
+    if isinstance(value, (list, tuple)):
+        return '({})'.format(', '.join(coalesce_repr(each) for each in value))
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join('{!r}: {}'.format(k, coalesce_repr(v)) for k, v in sorted(value.items())))
+    return repr(value)
+
+
 def enqueue_postcommit_task(fn, args, kwargs, celery=False, once_per_request=True):
     # make a hash of the pertinent data
     raw = [fn.__name__, fn.__module__, args, kwargs]
     m = hashlib.md5()
-    m.update('-'.join([x.__repr__() for x in raw]))
+    m.update('-'.join([coalesce_repr(x) for x in raw]))
     key = m.hexdigest()
 
     if not once_per_request:
@@ -79,9 +143,14 @@ def enqueue_postcommit_task(fn, args, kwargs, celery=False, once_per_request=Tru
         key = '{}:{}'.format(key, binascii.hexlify(os.urandom(8)))
 
     if celery and isinstance(fn, PromiseProxy):
-        postcommit_celery_queue().update({key: fn.si(*args, **kwargs)})
+        queue = postcommit_celery_queue()
+        task = fn.si(*args, **kwargs)
     else:
-        postcommit_queue().update({key: functools.partial(fn, *args, **kwargs)})
+        queue = postcommit_queue()
+        task = ('{}.{}'.format(fn.__module__, fn.__name__), functools.partial(fn, *args, **kwargs))
+    if key in queue:
+        _local.postcommit_coalesced = getattr(_local, 'postcommit_coalesced', 0) + 1
+    queue.update({key: task})
 
 handlers = {
     'before_request': postcommit_before_request,
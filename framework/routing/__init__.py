@@ -8,8 +8,6 @@ import logging
 import os
 
 from flask import request, make_response
-from mako.lookup import TemplateLookup
-from mako.template import Template
 import markupsafe
 from werkzeug.exceptions import NotFound
 import werkzeug.wrappers
@@ -17,6 +15,7 @@ import werkzeug.wrappers
 from framework import sentry
 from framework.exceptions import HTTPError
 from framework.flask import app, redirect
+from framework.mako_modules import CachedTemplateLookup, load_template
 from framework.sessions import session
 
 from website import settings
@@ -25,7 +24,7 @@ logger = logging.getLogger(__name__)
 
 TEMPLATE_DIR = settings.TEMPLATES_PATH
 
-_TPL_LOOKUP = TemplateLookup(
+_TPL_LOOKUP = CachedTemplateLookup(
     default_filters=[
         'unicode',  # default filter; must set explicitly when overriding
     ],
@@ -33,10 +32,9 @@ _TPL_LOOKUP = TemplateLookup(
         TEMPLATE_DIR,
         settings.ADDON_PATH,
     ],
-    module_directory='/tmp/mako_modules'
 )
 
-_TPL_LOOKUP_SAFE = TemplateLookup(
+_TPL_LOOKUP_SAFE = CachedTemplateLookup(
     default_filters=[
         'unicode',  # default filter; must set explicitly when overriding
         'temp_ampersand_fixer',  # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
@@ -49,7 +47,6 @@ _TPL_LOOKUP_SAFE = TemplateLookup(
         TEMPLATE_DIR,
         settings.ADDON_PATH,
     ],
-    module_directory='/tmp/mako_modules',
 )
 
 REDIRECT_CODES = [
@@ -208,6 +205,21 @@ def render_jinja_string(tpl, data):
     pass
 
 mako_cache = {}
+
+def get_mako_template(filename, trust=True):
+    lookup_obj = _TPL_LOOKUP_SAFE if trust is False else _TPL_LOOKUP
+    return load_template(
+        filename,
+        # Includes are looked up relative to the template directory, as for templates compiled from text
+        uri=os.path.basename(filename),
+        format_exceptions=settings.DEBUG_MODE,  # thanks to abought
+        lookup=lookup_obj,
+        input_encoding='utf-8',
+        output_encoding='utf-8',
+        default_filters=lookup_obj.template_args['default_filters'],
+        imports=lookup_obj.template_args['imports']  # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
+    )
+
 def render_mako_string(tpldir, tplname, data, trust=True):
     """Render a mako template to a string.
 
@@ -217,30 +229,34 @@ def render_mako_string(tpldir, tplname, data, trust=True):
     :param trust: Optional. If ``False``, markup-save escaping will be enabled
     """
 
-    show_errors = settings.DEBUG_MODE  # thanks to abought
     # TODO: The "trust" flag is expected to be temporary, and should be removed
     #       once all templates manually set it to False.
-
-    lookup_obj = _TPL_LOOKUP_SAFE if trust is False else _TPL_LOOKUP
-
-    tpl = mako_cache.get(tplname)
+    filename = os.path.join(tpldir, tplname)
+    tpl = mako_cache.get((filename, trust is False))
     if tpl is None:
-        with open(os.path.join(tpldir, tplname)) as f:
-            tpl_text = f.read()
-        tpl = Template(
-            tpl_text,
-            format_exceptions=show_errors,
-            lookup=lookup_obj,
-            input_encoding='utf-8',
-            output_encoding='utf-8',
-            default_filters=lookup_obj.template_args['default_filters'],
-            imports=lookup_obj.template_args['imports']  # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
-        )
+        tpl = get_mako_template(filename, trust=trust)
     # Don't cache in debug mode
     if not app.debug:
-        mako_cache[tplname] = tpl
+        mako_cache[(filename, trust is False)] = tpl
     return tpl.render(**data)
 
+def precompile_templates():
+    """Compile every template of the web app and of the mails and addons
+    lookups to ``MAKO_MODULE_DIRECTORY``.
+    """
+    from framework.mako_modules import precompile
+
+    def load_page_template(filename):
+        get_mako_template(filename, trust=True)
+        get_mako_template(filename, trust=False)
+
+    page_directories = [TEMPLATE_DIR] + [
+        os.path.join(settings.ADDON_PATH, addon, 'templates')
+        for addon in sorted(os.listdir(settings.ADDON_PATH))
+        if os.path.isdir(os.path.join(settings.ADDON_PATH, addon, 'templates'))
+    ]
+    return precompile(load_page_template, page_directories)
+
 
 renderer_extension_map = {
     '.stache': render_mustache_string,
@@ -15,6 +15,7 @@ from weakref import WeakKeyDictionary
 from werkzeug.local import LocalProxy
 
 from framework.flask import redirect
+from framework.sessions.store import cache_session, load_session
 from framework.sessions.utils import remove_session
 from website import settings
 
@@ -88,17 +89,31 @@ def set_session(session):
     sessions[request._get_current_object()] = session
 
 
+def mark_session_dirty():
+    """Schedule the current session to be saved. Dirty sessions are written
+    at most once per request, in ``after_request``.
+    """
+    dirty_sessions[request._get_current_object()] = True
+
+
+def save_session(user_session):
+    """Write ``user_session`` to the database and the session cache."""
+    user_session.save()
+    cache_session(user_session)
+
+
 def create_session(response, data=None):
     Session = apps.get_model('osf.Session')
     current_session = get_session()
     if current_session:
         current_session.data.update(data or {})
-        current_session.save()
+        save_session(current_session)
+        dirty_sessions.pop(request._get_current_object(), None)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(current_session._id)
     else:
         session_id = str(bson.objectid.ObjectId())
         new_session = Session(_id=session_id, data=data or {})
-        new_session.save()
+        save_session(new_session)
         cookie_value = itsdangerous.Signer(settings.SECRET_KEY).sign(session_id)
         set_session(new_session)
     if response is not None:
@@ -108,6 +123,7 @@ def create_session(response, data=None):
 
 
 sessions = WeakKeyDictionary()
+dirty_sessions = WeakKeyDictionary()
 session = LocalProxy(get_session)
 
 
@@ -150,7 +166,7 @@ def before_request():
             user_session.data['auth_user_fullname'] = user.fullname
             if user_session.data.get('auth_user_id', None) != user._primary_key:
                 user_session.data['auth_user_id'] = user._primary_key
-                user_session.save()
+                mark_session_dirty()
         else:
             # Invalid key: Not found in database
             user_session.data['auth_error_code'] = http.UNAUTHORIZED
@@ -160,7 +176,7 @@ def before_request():
     if cookie:
         try:
             session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
-            user_session = Session.load(session_id) or Session(_id=session_id)
+            user_session = load_session(session_id) or Session(_id=session_id)
         except itsdangerous.BadData:
             return
         if not throttle_period_expired(user_session.created, settings.OSF_SESSION_TIMEOUT):
@@ -179,6 +195,11 @@ def before_request():
 
 
 def after_request(response):
+    # Write the session at most once per request
+    if dirty_sessions.pop(request._get_current_object(), False):
+        user_session = sessions.get(request._get_current_object())
+        if user_session is not None:
+            save_session(user_session)
     # Disallow embedding in frames
     response.headers['X-Frame-Options'] = 'SAMEORIGIN'
     return response
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Read-through caches for ``osf.models.Session``.
+
+The backend is chosen with ``settings.SESSION_CACHE``:
+
+* ``'django'``: the Django cache named by ``settings.SESSION_CACHE_ALIAS``.
+  This must be a cache shared by every worker (e.g. memcached or redis), so
+  that logging out or revoking a session evicts it everywhere.
+* ``None``: no caching; every lookup goes to the database.
+
+There is deliberately no per-process backend: a session removed by one worker
+would stay valid in every other worker until it expired from their caches.
+"""
+import copy
+import logging
+
+from django.apps import apps
+
+from framework.caching import BaseStore, DjangoCacheMixin, NullStore, StoreSelector
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'osf-session:'
+
+
+def to_cache(session):
+    return {
+        'id': session.id,
+        '_id': session._id,
+        'data': session.data,
+        'created': session.created,
+        'modified': session.modified,
+    }
+
+
+def from_cache(value):
+    Session = apps.get_model('osf.Session')
+    session = Session(**copy.deepcopy(value))
+    session._state.adding = False
+    session._state.db = 'default'
+    return session
+
+
+class DjangoSessionStore(DjangoCacheMixin, BaseStore):
+    """Store backed by a (possibly shared) Django cache."""
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.SESSION_CACHE_ALIAS
+        self.ttl = ttl or settings.SESSION_CACHE_TTL
+
+    def get(self, session_id):
+        value = self.cache.get(CACHE_KEY_PREFIX + session_id)
+        return from_cache(value) if value is not None else None
+
+    def set(self, session):
+        self.cache.set(CACHE_KEY_PREFIX + session._id, to_cache(session), self.ttl)
+
+    def delete(self, session_id):
+        self.cache.delete(CACHE_KEY_PREFIX + session_id)
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    'django': DjangoSessionStore,
+    None: NullStore,
+}
+
+get_store = StoreSelector(BACKENDS, lambda: settings.SESSION_CACHE)
+
+
+def load_session(session_id):
+    """Load a session by ``_id``, consulting the cache before the database.
+    Returns ``None`` if no such session exists.
+    """
+    store = get_store()
+    try:
+        session = store.get(session_id)
+    except Exception:
+        logger.exception('Failed to read session {} from cache'.format(session_id))
+        session = None
+    if session is not None:
+        return session
+    Session = apps.get_model('osf.Session')
+    session = Session.load(session_id)
+    if session is not None:
+        cache_session(session)
+    return session
+
+
+def cache_session(session):
+    try:
+        get_store().set(session)
+    except Exception:
+        logger.exception('Failed to cache session {}'.format(session._id))
+
+
+def evict_session(session_id):
+    try:
+        get_store().delete(session_id)
+    except Exception:
+        logger.exception('Failed to evict session {} from cache'.format(session_id))
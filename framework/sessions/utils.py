@@ -9,9 +9,13 @@ def remove_sessions_for_user(user):
     :return:
     """
     from osf.models import Session
+    from framework.sessions.store import evict_session
 
     if user._id:
-        Session.objects.filter(data__auth_user_id=user._id).delete()
+        user_sessions = Session.objects.filter(data__auth_user_id=user._id)
+        for session_id in user_sessions.values_list('_id', flat=True):
+            evict_session(session_id)
+        user_sessions.delete()
 
 
 def remove_session(session):
@@ -22,4 +26,7 @@ def remove_session(session):
     :return:
     """
     from osf.models import Session
+    from framework.sessions.store import evict_session
+
+    evict_session(session._id)
     Session.objects.filter(id=session.id).delete()
@@ -2,7 +2,7 @@
 
 from collections import namedtuple
 
-from framework.sessions import session
+from framework.sessions import mark_session_dirty, session
 
 Status = namedtuple('Status', ['message', 'jumbotron', 'css_class', 'dismissible', 'trust', 'id', 'extra'])  # trust=True displays msg as raw HTML
 
@@ -57,7 +57,7 @@ def push_status_message(message, kind='warning', dismissible=True, trust=True, j
                            extra=extra,
                            trust=trust))
     session.data['status'] = statuses
-    session.save()
+    mark_session_dirty()
 
 def pop_status_messages(level=0):
     messages = session.data.get('status')
@@ -67,12 +67,12 @@ def pop_status_messages(level=0):
     session.status_prev = messages
     if 'status' in session.data:
         del session.data['status']
-        session.save()
+        mark_session_dirty()
     return messages
 
 def pop_previous_status_messages(level=0):
     messages = session.data.get('status_prev')
     if 'status_prev' in session.data:
         del session.data['status_prev']
-        session.save()
+        mark_session_dirty()
     return messages
@@ -1,3 +1,4 @@
+import re
 import uuid
 
 import psycopg2
@@ -5,6 +6,10 @@ from django.conf import settings
 from django.db.backends.postgresql.base import \
     DatabaseWrapper as PostgresqlDatabaseWrapper
 from django.db.backends.postgresql.base import utc_tzinfo_factory
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+
+# Statements that change data, including data-modifying WITH queries
+WRITE_SQL = re.compile(r'^\s*(INSERT|UPDATE|DELETE|COPY|TRUNCATE|WITH\b.*\b(INSERT|UPDATE|DELETE)\b)', re.IGNORECASE | re.DOTALL)
 
 
 class server_side_cursors(object):
@@ -33,6 +38,33 @@ class server_side_cursors(object):
         self.connection.server_side_cursor_itersize = None
 
 
+class WriteTrackingMixin(object):
+    """Tells the router about writes made through any cursor, so that the
+    transaction reads them back from the primary (see ``osf.db.router``).
+    """
+
+    def note_sql(self, sql):
+        if isinstance(sql, basestring) and WRITE_SQL.match(sql):
+            from osf.db.router import note_write
+            note_write(self.db)
+
+    def execute(self, sql, params=None):
+        self.note_sql(sql)
+        return super(WriteTrackingMixin, self).execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.note_sql(sql)
+        return super(WriteTrackingMixin, self).executemany(sql, param_list)
+
+
+class WriteTrackingCursorWrapper(WriteTrackingMixin, CursorWrapper):
+    pass
+
+
+class WriteTrackingCursorDebugWrapper(WriteTrackingMixin, CursorDebugWrapper):
+    pass
+
+
 # TODO: Server-side cursors are supported in Django 1.11. Remove our
 # implementation in favor of Django's
 class DatabaseWrapper(PostgresqlDatabaseWrapper):
@@ -65,3 +97,9 @@ class DatabaseWrapper(PostgresqlDatabaseWrapper):
         cursor.itersize = self.server_side_cursor_itersize
 
         return cursor
+
+    def make_cursor(self, cursor):
+        return WriteTrackingCursorWrapper(cursor, self)
+
+    def make_debug_cursor(self, cursor):
+        return WriteTrackingCursorDebugWrapper(cursor, self)
@@ -1,40 +1,197 @@
+import logging
+import os
+import random
+import threading
+import time
+
 from django.conf import settings
+from django.db import connections
+from django.db.utils import OperationalError
+from flask import _app_ctx_stack as context_stack
 import psycopg2
 
+from api.base.api_globals import api_globals
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Replication lag in seconds for replicas, 0 for the primary. Lag is measured
+# from the last replayed transaction, so an idle primary makes replicas look
+# lagged; writes are frequent enough in production for this not to matter.
+HEALTH_CHECK_SQL = """
+    SELECT
+        current_setting('transaction_read_only'),
+        CASE WHEN pg_is_in_recovery()
+            THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            ELSE 0
+        END;
+"""
+
+
+def pin_to_primary(seconds=None):
+    """Send this thread's reads to the primary for ``seconds``, so that
+    recently written data is read back consistently. The pin never ends
+    before a replica DATABASE_REPLICA_MAX_LAG seconds behind has the data.
+    """
+    seconds = max(
+        settings.DATABASE_PRIMARY_PIN_SECONDS if seconds is None else seconds,
+        settings.DATABASE_REPLICA_MAX_LAG,
+    )
+    _local.pinned_until = max(getattr(_local, 'pinned_until', 0), time.time() + seconds)
+
+
+def unpin():
+    _local.pinned_until = 0
+
+
+def has_written(connection):
+    """Whether the transaction ``connection`` is in has written. Rolling back
+    the transaction (or the savepoint the write was in) drops its commit hooks,
+    and with them the record of the write.
+    """
+    return any(func is pin_to_primary for _, func in connection.run_on_commit)
+
+
+def note_write(connection):
+    """Record that ``connection`` wrote, through the ORM or a raw cursor:
+    reads go to the primary until its transaction ends, and are then pinned
+    to it (see ``pin_to_primary``) until replicas have caught up.
+    """
+    if not connection.in_atomic_block:
+        pin_to_primary()
+    elif not has_written(connection):
+        connection.on_commit(pin_to_primary)
+
+
+def in_request():
+    return context_stack.top is not None or getattr(api_globals, 'request', None) is not None
+
 
 class PostgreSQLFailoverRouter(object):
     """
-    A custom database router that loops through the databases defined in django.conf.settings.DATABASES and returns the
-    first one that is not read only. If it finds none that are writable it calls exit() in order to convince docker
-    to restart the container.
+    A custom database router that sends writes to the first database defined in
+    django.conf.settings.DATABASES that is not read only, and spreads reads over
+    the replicas that are no more than DATABASE_REPLICA_MAX_LAG seconds behind.
+
+    Only requests read from replicas. Their reads go to the primary when
+      * they happen inside a transaction that has written (through the ORM or a
+        raw cursor, see ``note_write``), or inside an explicit transaction,
+      * this thread committed a write within the last DATABASE_PRIMARY_PIN_SECONDS,
+        which is never less than DATABASE_REPLICA_MAX_LAG, or
+      * no replica is healthy.
+
+    Roles are re-checked every DATABASE_ROUTER_CHECK_INTERVAL seconds, so a
+    failover is picked up without a restart. A check that finds no writable
+    database keeps the last known primary; only after
+    DATABASE_ROUTER_MAX_FAILURES checks in a row does routing raise
+    OperationalError, until a writable database is found again.
     """
-    DSNS = dict()
-    CACHED_MASTER = None
 
     def __init__(self):
         """
         Builds the list of DSNs from django's config and determines the writeable host.
         """
+        self.DSNS = dict()
+        self.CACHED_MASTER = None
+        self.REPLICAS = []
+        self.CHECKED_AT = 0
+        self.failures = 0
+        self._reset_connections()
         self._get_dsns()
-        if not self.CACHED_MASTER:
-            self.CACHED_MASTER = self._get_master()
+        with self._lock:
+            self._check_health()
+
+    def _reset_connections(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conns = dict()
+
+    def _check_fork(self):
+        """
+        Gives a forked process its own lock and health check connections.
+        Inherited connections share their sockets with the parent, so they are
+        kept referenced rather than closed or garbage collected, either of
+        which would terminate the parent's session.
+        """
+        if self._pid != os.getpid():
+            self._inherited_conns = getattr(self, '_inherited_conns', []) + self._conns.values()
+            self._reset_connections()
+
+    def _check_health(self):
+        """
+        Finds the first database that's writeable and the replicas that are
+        caught up. Must be called with the lock held.
+        """
+        master, replicas = None, []
+        for name, dsn in sorted(self.DSNS.iteritems()):
+            row = self._query(name, dsn)
+            if row is None:
+                continue
+            read_only, lag = row
+            if read_only == u'off':  # 'on' for slaves, 'off' for masters
+                master = master or name
+            elif lag <= settings.DATABASE_REPLICA_MAX_LAG:
+                replicas.append(name)
+            else:
+                logger.warning('Not reading from {}: {}s behind the primary'.format(name, lag))
+        self.REPLICAS, self.CHECKED_AT = replicas, time.time()
+        if master is None:
+            self.failures += 1
+            if self.CACHED_MASTER is None:
+                return None
+            if self.failures < settings.DATABASE_ROUTER_MAX_FAILURES:
+                logger.warning('No writable database found ({} of {} checks), still using {}'.format(
+                    self.failures, settings.DATABASE_ROUTER_MAX_FAILURES, self.CACHED_MASTER
+                ))
+                return self.CACHED_MASTER
+            logger.error('No writable database found in {} checks, {} is no longer used'.format(self.failures, self.CACHED_MASTER))
+        else:
+            self.failures = 0
+            if self.CACHED_MASTER is not None and master != self.CACHED_MASTER:
+                logger.warning('Primary database changed from {} to {}'.format(self.CACHED_MASTER, master))
+        self.CACHED_MASTER = master
+        return master
+
+    def _maybe_check_health(self):
+        self._check_fork()
+        # Without a primary, look for one more often
+        interval = settings.DATABASE_ROUTER_CHECK_INTERVAL if self.CACHED_MASTER else 1
+        if time.time() - self.CHECKED_AT < interval:
+            return
+        with self._lock:
+            # Another thread may have checked while we waited for the lock
+            if time.time() - self.CHECKED_AT >= interval:
+                self._check_health()
 
     def _get_master(self):
+        self._maybe_check_health()
+        if not self.CACHED_MASTER:
+            raise OperationalError('PostgreSQLFailoverRouter found no writable database')
+        return self.CACHED_MASTER
+
+    def _query(self, name, dsn):
         """
-        Finds the first database that's writeable and returns the configuration name.
-        :return: :str: name of database config or None
+        Runs the health check on a long-lived connection, reconnecting once if
+        the connection has gone away.
+        :return: (transaction_read_only, lag in seconds) or None if unreachable
         """
-        for name, dsn in self.DSNS.iteritems():
-            conn = self._get_conn(dsn)
-            cur = conn.cursor()
-            cur.execute('SHOW transaction_read_only;')  # 'on' for slaves, 'off' for masters
-            row = cur.fetchone()
-            if row[0] == u'off':
+        for attempt in range(2):
+            try:
+                conn = self._conns.get(name)
+                if conn is None or conn.closed:
+                    conn = self._conns[name] = self._get_conn(dsn)
+                    conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(HEALTH_CHECK_SQL)
+                row = cur.fetchone()
                 cur.close()
-                conn.close()
-                return name
-            cur.close()
-            conn.close()
+                return row[0], float(row[1])
+            except psycopg2.Error as e:
+                logger.warning('Health check of {} failed: {}'.format(name, e))
+                conn = self._conns.pop(name, None)
+                if conn is not None and not conn.closed:
+                    conn.close()
         return None
 
     def _get_dsns(self):
@@ -56,36 +213,62 @@ class PostgreSQLFailoverRouter(object):
         :param dsn: postgres DSN
         :return: psycopg2 connection
         """
-        return psycopg2.connect(dsn)
+        return psycopg2.connect(dsn, connect_timeout=settings.DATABASE_ROUTER_CONNECT_TIMEOUT)
+
+    def _is_pinned(self):
+        # Celery tasks, scripts and management commands always read from the
+        # primary: they often read what was committed moments before.
+        if not in_request():
+            return True
+        if getattr(_local, 'pinned_until', 0) > time.time():
+            return True
+        conn = connections[self.CACHED_MASTER]
+        if not conn.in_atomic_block:
+            return False
+        # The implicit transaction wrapping each request (ATOMIC_REQUESTS,
+        # transaction_before_request) may read from replicas until it writes;
+        # explicit (nested) transactions may not.
+        return bool(conn.savepoint_ids) or has_written(conn)
 
     def db_for_read(self, model, **hints):
         """
-        Returns a django database connection name for reading or kills itself
+        Returns a django database connection name for reading
         :param model: django model (disused)
-        :param hints: hints to help choosing a database (disused)
+        :param hints: hints to help choosing a database; reads of an instance
+            stay on the database it was loaded from
         :return:
+        :raises OperationalError: if no database has been writable for a while
         """
-        if not self.CACHED_MASTER:
-            exit()
-        return self.CACHED_MASTER
+        master = self._get_master()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if not self.REPLICAS or self._is_pinned():
+            return master
+        return random.choice(self.REPLICAS)
 
     def db_for_write(self, model, **hints):
         """
-        Returns a django database connection name for writing or kills itself
+        Returns a django database connection name for writing
         :param model: django model (disused)
         :param hints: hints to help choosing a database (disused)
         :return:
+        :raises OperationalError: if no database has been writable for a while
         """
-        if not self.CACHED_MASTER:
-            exit()
-        return self.CACHED_MASTER
+        master = self._get_master()
+        note_write(connections[master])
+        return master
 
     def allow_relation(self, obj1, obj2, **hints):
-        # None if the router has no opinion
+        # Replicas hold the same data as the primary
         # https://docs.djangoproject.com/en/1.10/topics/db/multi-db/#allow_relation
+        if obj1._state.db in self.DSNS and obj2._state.db in self.DSNS:
+            return True
         return None
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
-        # None if the router has no opinion.
+        # Only the primary is migrated; replicas follow through replication.
         # https://docs.djangoproject.com/en/1.10/topics/db/multi-db/#allow_migrate
+        if self.CACHED_MASTER and db != self.CACHED_MASTER and db in self.REPLICAS:
+            return False
         return None
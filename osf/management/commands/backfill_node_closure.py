@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""Rebuild osf_nodeclosure from osf_noderelation, and osf_effectivepermission
+from the result. Safe to re-run; only closure rows that differ from what
+NodeRelation implies are written.
+"""
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+
+from osf.models import EffectivePermission, NodeClosure
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Backfill (or repair) the node ancestry closure table.
+
+    Examples:
+
+        python manage.py backfill_node_closure
+    """
+    def handle(self, *args, **options):
+        inserted, deleted = NodeClosure.rebuild()
+        logger.info('Inserted {} and deleted {} node closure rows'.format(inserted, deleted))
+        EffectivePermission.rebuild()
+        logger.info('Rebuilt effective permissions')
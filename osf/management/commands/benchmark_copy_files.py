@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Compare copying an osfstorage file tree node by node, as copy_files did
+before it inserted the copies in bulk, with website.files.utils.copy_files.
+
+Two trees are copied: a deep one (``--depth`` nested folders holding one file
+each) and a wide one (one folder holding ``--files`` files). Every file has
+``--versions`` versions. The benchmark data is created in a transaction that
+is rolled back afterwards.
+"""
+from __future__ import division, unicode_literals
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from addons.osfstorage.models import OsfStorageFile, OsfStorageFolder
+from osf.models import BaseFileNode, FileVersion, Node, OSFUser
+from website.files.utils import copy_files
+
+
+def legacy_copy_files(src, target_node, parent=None, name=None):
+    cloned = src.clone()
+    cloned.parent = parent
+    cloned.node = target_node
+    cloned.name = name or cloned.name
+    cloned.copied_from = src
+
+    cloned.save()
+
+    if src.is_file and src.versions.exists():
+        cloned.versions.add(*src.versions.all())
+
+    if not src.is_file:
+        for child in src.children:
+            legacy_copy_files(child, target_node, parent=cloned)
+
+    return cloned
+
+
+def create_files(node, parents, count, versions):
+    """Create ``count`` files under each of ``parents``, with ``versions`` versions each."""
+    files = BaseFileNode.objects.bulk_create([
+        OsfStorageFile(type=OsfStorageFile._typedmodels_type, provider='osfstorage', node=node, parent=parent, name='file {}'.format(i))
+        for parent in parents for i in range(count)
+    ])
+    file_versions = FileVersion.objects.bulk_create([
+        FileVersion(identifier=str(i + 1), size=1024, location={'service': 'cloud', 'object': uuid.uuid4().hex})
+        for _ in files for i in range(versions)
+    ])
+    BaseFileNode.versions.through.objects.bulk_create([
+        BaseFileNode.versions.through(basefilenode_id=file_.id, fileversion_id=file_versions[i * versions + j].id)
+        for i, file_ in enumerate(files) for j in range(versions)
+    ])
+    return files
+
+
+def create_folders(node, parents, count):
+    return BaseFileNode.objects.bulk_create([
+        OsfStorageFolder(type=OsfStorageFolder._typedmodels_type, provider='osfstorage', node=node, parent=parent, name='folder {}'.format(i))
+        for parent in parents for i in range(count)
+    ])
+
+
+def create_deep_tree(node, depth, versions):
+    root = folder = create_folders(node, [None], 1)[0]
+    for _ in range(depth):
+        create_files(node, [folder], 1, versions)
+        folder = create_folders(node, [folder], 1)[0]
+    return root
+
+
+def create_wide_tree(node, files, versions):
+    root = create_folders(node, [None], 1)[0]
+    create_files(node, [root], files, versions)
+    return root
+
+
+def measure(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.time()
+        func()
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+class Command(BaseCommand):
+    """Benchmark copying deep and wide osfstorage file trees.
+
+    Examples:
+
+        python manage.py benchmark_copy_files
+        python manage.py benchmark_copy_files --depth 500 --files 20000 --iterations 3
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--depth', type=int, default=200, help='Number of nested folders in the deep tree')
+        parser.add_argument('--files', type=int, default=2000, help='Number of files in the wide tree')
+        parser.add_argument('--versions', type=int, default=2, help='Number of versions of every file')
+        parser.add_argument('--iterations', type=int, default=5, help='Number of timed copies of each tree')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        rows = []
+        with transaction.atomic():
+            user = OSFUser(username='benchmark-{}@osf.io'.format(uuid.uuid4().hex), fullname='Benchmark User')
+            user.save()
+            source, target = Node.objects.bulk_create([
+                Node(title='Benchmark source', category='project', creator=user),
+                Node(title='Benchmark target', category='project', creator=user),
+            ])
+            trees = (
+                ('deep', options['depth'] * 2 + 1, create_deep_tree(source, options['depth'], options['versions'])),
+                ('wide', options['files'] + 1, create_wide_tree(source, options['files'], options['versions'])),
+            )
+            for tree_name, size, root in trees:
+                for name, copy in (('node by node', legacy_copy_files), ('bulk', copy_files)):
+                    rows.append((tree_name, name, size, measure(lambda: copy(root, target), iterations)))
+            transaction.set_rollback(True)
+
+        self.stdout.write('{:<8}{:<16}{:>12}{:>12}'.format('tree', 'strategy', 'nodes', 'copy ms'))
+        for row in rows:
+            self.stdout.write('{:<8}{:<16}{:>12}{:>12.2f}'.format(*row))
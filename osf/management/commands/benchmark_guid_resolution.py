@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Measure resolving file guids the way the ``/<guid>/download`` shortcut in
+website.views.resolve_guid does (``Guid.load``, then the referent and its
+``deep_url``) with each guid cache backend.
+
+Requests are drawn from ``--files`` osfstorage files with a skewed
+distribution, so that a few guids are requested often, as they are when a
+popular file is linked. The benchmark data is created in a transaction that
+is rolled back afterwards.
+"""
+from __future__ import division, unicode_literals
+import random
+import time
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from addons.osfstorage.models import OsfStorageFile
+from osf.models import BaseFileNode, Guid, Node, OSFUser
+from osf.models.base import generate_guid
+from osf.utils import guid_cache
+
+
+def create_files(node, count):
+    files = BaseFileNode.objects.bulk_create([
+        OsfStorageFile(type=OsfStorageFile._typedmodels_type, provider='osfstorage', node=node, parent=node.get_addon('osfstorage').get_root(), name='file {}'.format(i))
+        for i in range(count)
+    ])
+    content_type = ContentType.objects.get_for_model(OsfStorageFile)
+    guids = Guid.objects.bulk_create([
+        Guid(_id=generate_guid(), content_type=content_type, object_id=file_.id)
+        for file_ in files
+    ])
+    return [guid._id for guid in guids]
+
+
+def resolve(guid_id):
+    referent = Guid.load(guid_id).referent
+    assert referent.is_file
+    return referent.deep_url
+
+
+def measure(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.time()
+        func()
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+class Command(BaseCommand):
+    """Benchmark guid resolution for download traffic.
+
+    Examples:
+
+        python manage.py benchmark_guid_resolution
+        python manage.py benchmark_guid_resolution --files 10000 --requests 5000 --backends none,local,django
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--files', type=int, default=1000, help='Number of files with guids')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of guids resolved per run')
+        parser.add_argument('--backends', default='none,local', help='Comma-separated guid cache backends to compare (none, local, django)')
+        parser.add_argument('--iterations', type=int, default=5, help='Number of timed runs per backend')
+
+    def handle(self, *args, **options):
+        backends = [(name, None if name == 'none' else name) for name in options['backends'].split(',')]
+        rows = []
+        original_store = guid_cache.get_store.store
+        try:
+            with transaction.atomic():
+                user = OSFUser(username='benchmark-{}@osf.io'.format(uuid.uuid4().hex), fullname='Benchmark User')
+                user.save()
+                node = Node(title='Benchmark project', category='project', creator=user)
+                node.save()
+                guid_ids = create_files(node, options['files'])
+                # Zipf-like: a few popular files get most of the requests
+                traffic = [
+                    guid_ids[min(int(random.paretovariate(1.2)) - 1, len(guid_ids) - 1)]
+                    for _ in range(options['requests'])
+                ]
+
+                for name, backend in backends:
+                    store = guid_cache.get_store.store = guid_cache.BACKENDS[backend]()
+                    store.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        for guid_id in traffic:
+                            resolve(guid_id)
+                    # Later runs see a warm cache
+                    run_ms = measure(lambda: [resolve(guid_id) for guid_id in traffic], options['iterations'])
+                    store.clear()
+                    rows.append((
+                        name,
+                        len(set(traffic)),
+                        len(queries) / len(traffic),
+                        run_ms / len(traffic),
+                    ))
+                transaction.set_rollback(True)
+        finally:
+            guid_cache.get_store.store = original_store
+
+        self.stdout.write('{:<12}{:>12}{:>16}{:>16}'.format('backend', 'distinct', 'cold queries/req', 'warm ms/req'))
+        for row in rows:
+            self.stdout.write('{:<12}{:>12}{:>16.2f}{:>16.3f}'.format(*row))
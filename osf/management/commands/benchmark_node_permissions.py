@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Compare the latency of listing the nodes a user can view using the
+recursive implicit-admin query that preceded osf_effectivepermission, and
+using osf_effectivepermission.
+
+The benchmark data (one user, admin on ``--projects`` projects with
+``--components`` components each, which they can read only as an admin of the
+parent) is created in a transaction that is rolled back afterwards.
+"""
+from __future__ import division, unicode_literals
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from osf.models import (
+    AbstractNode, Contributor, EffectivePermission, Node, NodeClosure, NodeRelation, OSFUser
+)
+
+LEGACY_IMPLICIT_READ_SQL = '''
+    "osf_abstractnode".id in (
+        WITH RECURSIVE implicit_read AS (
+            SELECT "osf_contributor"."node_id"
+            FROM "osf_contributor"
+            WHERE "osf_contributor"."user_id" = %s
+            AND "osf_contributor"."admin" is TRUE
+        UNION ALL
+            SELECT "osf_noderelation"."child_id"
+            FROM "implicit_read"
+            LEFT JOIN "osf_noderelation" ON "osf_noderelation"."parent_id" = "implicit_read"."node_id"
+            WHERE "osf_noderelation"."is_node_link" IS FALSE
+        ) SELECT * FROM implicit_read
+    )
+'''
+
+
+def legacy_can_view(queryset, user_id):
+    qs = queryset.filter(is_public=True)
+    sqs = Contributor.objects.filter(node=OuterRef('pk'), user__id=user_id, read=True)
+    qs |= queryset.annotate(can_view=Exists(sqs)).filter(can_view=True)
+    qs |= queryset.extra(where=[LEGACY_IMPLICIT_READ_SQL], params=(user_id, ))
+    return qs
+
+
+def legacy_has_read(node, user):
+    if user.contributor_set.filter(node=node, read=True).exists():
+        return True
+    while node:
+        if user.contributor_set.filter(node=node, admin=True).exists():
+            return True
+        node = node.parent_node
+    return False
+
+
+def create_nodes(user, projects, components):
+    roots = Node.objects.bulk_create([
+        Node(title='Benchmark project {}'.format(i), category='project', creator=user)
+        for i in range(projects)
+    ])
+    Contributor.objects.bulk_create([
+        Contributor(user=user, node=root, read=True, write=True, admin=True, visible=True, _order=0)
+        for root in roots
+    ])
+    children = Node.objects.bulk_create([
+        Node(title='Benchmark component {}'.format(i), category='data', creator=user)
+        for root in roots for i in range(components)
+    ])
+    pairs = [(roots[i // components], child) for i, child in enumerate(children)] if components else []
+    NodeRelation.objects.bulk_create([
+        NodeRelation(parent=root, child=child, is_node_link=False, _order=i % components)
+        for i, (root, child) in enumerate(pairs)
+    ])
+    NodeClosure.objects.bulk_create([
+        NodeClosure(ancestor=root, descendant=child, depth=1) for root, child in pairs
+    ])
+    EffectivePermission.refresh([root.id for root in roots])
+    return roots, children
+
+
+def measure(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.time()
+        func()
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+class Command(BaseCommand):
+    """Benchmark node visibility checks for a user with many nodes.
+
+    Examples:
+
+        python manage.py benchmark_node_permissions
+        python manage.py benchmark_node_permissions --projects 5000 --components 2 --iterations 20
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--projects', type=int, default=1000, help='Number of projects the user administers')
+        parser.add_argument('--components', type=int, default=2, help='Number of components per project')
+        parser.add_argument('--iterations', type=int, default=10, help='Number of timed runs of each query')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        with transaction.atomic():
+            user = OSFUser(username='benchmark-{}@osf.io'.format(uuid.uuid4().hex), fullname='Benchmark User')
+            user.save()
+            roots, children = create_nodes(user, options['projects'], options['components'])
+            component_id = (children or roots)[-1].id
+
+            base = AbstractNode.objects.filter(type='osf.node', is_deleted=False)
+            strategies = (
+                ('recursive', lambda: legacy_can_view(base, user.id), lambda: legacy_has_read(AbstractNode.objects.get(id=component_id), user)),
+                ('effective permissions', lambda: base.can_view(user=user.id), lambda: AbstractNode.objects.get(id=component_id).has_permission(user, 'read')),
+            )
+            rows = []
+            for name, get_queryset, has_read in strategies:
+                visible = get_queryset().count()
+                rows.append((
+                    name,
+                    visible,
+                    measure(lambda: get_queryset().count(), iterations),
+                    measure(lambda: list(get_queryset().order_by('-modified').values_list('id', flat=True)[:10]), iterations),
+                    measure(lambda: list(get_queryset().values_list('id', flat=True)), iterations),
+                    measure(has_read, iterations),
+                ))
+            transaction.set_rollback(True)
+
+        self.stdout.write('{:<24}{:>10}{:>12}{:>12}{:>12}{:>16}'.format(
+            'strategy', 'visible', 'count ms', 'page ms', 'all ids ms', 'has_perm ms'
+        ))
+        for row in rows:
+            self.stdout.write('{:<24}{:>10}{:>12.2f}{:>12.2f}{:>12.2f}{:>16.2f}'.format(*row))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Compare how long a new worker takes to import the template machinery and
+load its first templates when templates are compiled in memory (as before
+framework.mako_modules), compiled on demand to an empty module directory, and
+loaded from a directory filled by ``invoke precompile_templates``.
+
+Every run happens in a fresh Python process, so nothing is cached in memory.
+"""
+from __future__ import division, unicode_literals
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+# Run in a fresh interpreter; argv is the strategy, module directory, page names and mail template names
+WORKER_SCRIPT = '''
+import json, os, sys, time
+from website.app import setup_django
+setup_django()
+from website import settings
+settings.MAKO_MODULE_DIRECTORY = sys.argv[2]
+
+start = time.time()
+from framework import routing
+from website.mails import mails
+import_time = time.time() - start
+
+if sys.argv[1] == 'in-memory':
+    from mako.template import Template
+
+    def load_page(filename):
+        with open(filename) as f:
+            return Template(
+                f.read(),
+                lookup=routing._TPL_LOOKUP,
+                input_encoding='utf-8',
+                output_encoding='utf-8',
+                default_filters=routing._TPL_LOOKUP.template_args['default_filters'],
+                imports=routing._TPL_LOOKUP.template_args['imports'],
+            )
+
+    def load_mail(name):
+        with open(os.path.join(mails.EMAIL_TEMPLATES_DIR, name)) as f:
+            return Template(f.read())
+else:
+    load_page = routing.get_mako_template
+
+    def load_mail(name):
+        return mails._tpl_lookup.get_template(name)
+
+pages = [os.path.join(settings.TEMPLATES_PATH, name) for name in json.loads(sys.argv[3])]
+mail_names = json.loads(sys.argv[4])
+
+start = time.time()
+load_page(pages[0])
+first_page = time.time() - start
+
+start = time.time()
+for page in pages[1:]:
+    load_page(page)
+for name in mail_names:
+    load_mail(name)
+rest = time.time() - start
+
+print(json.dumps([import_time * 1000, first_page * 1000, rest * 1000]))
+'''
+
+PAGES = [
+    'project/project.mako',
+    'home.mako',
+    'project/files.mako',
+    'project/settings.mako',
+    'profile.mako',
+    'search.mako',
+    # Inherited and included by most pages
+    'base.mako',
+    'nav.mako',
+    'footer.mako',
+]
+
+
+class Command(BaseCommand):
+    """Benchmark template compilation in new workers.
+
+    Examples:
+
+        python manage.py benchmark_template_precompile
+        python manage.py benchmark_template_precompile --iterations 10
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=5, help='Number of fresh processes per strategy')
+
+    def run_worker(self, strategy, module_directory, pages, mail_names):
+        output = subprocess.check_output([
+            sys.executable, '-c', WORKER_SCRIPT, strategy, module_directory, json.dumps(pages), json.dumps(mail_names),
+        ])
+        return json.loads(output.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        from framework.mako_modules import template_files
+        from framework.routing import precompile_templates
+        from website import settings
+        from website.mails import mails
+
+        iterations = options['iterations']
+        pages = [page for page in PAGES if os.path.exists(os.path.join(settings.TEMPLATES_PATH, page))]
+        mail_names = [
+            os.path.relpath(filename, mails.EMAIL_TEMPLATES_DIR)
+            for filename in template_files(mails.EMAIL_TEMPLATES_DIR)
+        ][:20]
+
+        directory = tempfile.mkdtemp()
+        original_directory = settings.MAKO_MODULE_DIRECTORY
+        try:
+            cold = os.path.join(directory, 'cold')
+            precompiled = os.path.join(directory, 'precompiled')
+            settings.MAKO_MODULE_DIRECTORY = precompiled
+            precompile_templates()
+
+            rows = []
+            for name, strategy, module_directory in (
+                ('in-memory', 'in-memory', cold),
+                ('empty directory', 'cached', cold),
+                ('precompiled', 'cached', precompiled),
+            ):
+                timings = []
+                for _ in range(iterations):
+                    shutil.rmtree(cold, ignore_errors=True)
+                    timings.append(self.run_worker(strategy, module_directory, pages, mail_names))
+                medians = [sorted(column)[len(column) // 2] for column in zip(*timings)]
+                rows.append([name] + medians)
+        finally:
+            settings.MAKO_MODULE_DIRECTORY = original_directory
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write('{} pages, {} mail templates, median of {} processes'.format(len(pages), len(mail_names), iterations))
+        self.stdout.write('{:<20}{:>12}{:>16}{:>20}'.format('strategy', 'import ms', 'first page ms', 'other templates ms'))
+        for row in rows:
+            self.stdout.write('{:<20}{:>12.2f}{:>16.2f}{:>20.2f}'.format(*row))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Report rows of osf_nodeclosure that disagree with osf_noderelation."""
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+
+from osf.models import NodeClosure
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Check the node ancestry closure table against NodeRelation. Run
+    ``backfill_node_closure`` to repair any inconsistencies found.
+
+    Examples:
+
+        python manage.py check_node_closure
+        python manage.py check_node_closure --limit 100
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            dest='limit',
+            help='Number of inconsistent rows of each kind to log',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        missing, stale = NodeClosure.find_inconsistencies()
+        for ancestor_id, descendant_id, depth in missing[:limit]:
+            logger.warning('Missing: ancestor={} descendant={} depth={}'.format(ancestor_id, descendant_id, depth))
+        for ancestor_id, descendant_id, depth in stale[:limit]:
+            logger.warning('Stale: ancestor={} descendant={} depth={}'.format(ancestor_id, descendant_id, depth))
+        if missing or stale:
+            logger.error('{} missing and {} stale node closure rows'.format(len(missing), len(stale)))
+        else:
+            logger.info('Node closure table is consistent')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# This is a management command, rather than a migration, because the legacy
+# blobs are large and exploding them takes a long time. It can be interrupted
+# and re-run; every batch is committed on its own.
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from osf.models import PageCounter, PageCounterDay, UserActivityCounter
+from osf.models.analytics import _parse_day
+
+logger = logging.getLogger(__name__)
+
+
+def explode_page_counters(batch_size, dry_run=False):
+    """Move the ``date`` blob of every PageCounter into PageCounterDay rows,
+    ``batch_size`` counters at a time. Returns the number of counters migrated.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            counters = list(
+                PageCounter.objects
+                .filter(id__gt=last_id)
+                .exclude(legacy_date={})
+                .order_by('id')
+                .select_for_update()
+                .values_list('id', 'legacy_date')[:batch_size]
+            )
+            if not counters:
+                break
+            rows = [
+                (counter_id, _parse_day(key), values.get('total', 0), values.get('unique', 0))
+                for counter_id, legacy_date in counters
+                for key, values in legacy_date.items()
+            ]
+            ids = [counter_id for counter_id, _ in counters]
+            last_id = ids[-1]
+            migrated += len(ids)
+            logger.info('Exploding {} days from {} page counters (through id {})'.format(len(rows), len(ids), last_id))
+            if not dry_run:
+                PageCounterDay.bulk_increment(rows)
+                PageCounter.objects.filter(id__in=ids).update(legacy_date={})
+    return migrated
+
+
+def explode_user_activity_counters(batch_size, dry_run=False):
+    """Move the ``action`` and ``date`` blobs of every UserActivityCounter into
+    UserActivityCounterDay rows. Per-day activity that is not accounted for by
+    any action is kept under the empty action.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            counters = list(
+                UserActivityCounter.objects
+                .filter(id__gt=last_id)
+                .exclude(legacy_date={}, legacy_action={})
+                .order_by('id')
+                .select_for_update()
+                .values_list('id', 'legacy_action', 'legacy_date')[:batch_size]
+            )
+            if not counters:
+                break
+            rows = []
+            for counter_id, legacy_action, legacy_date in counters:
+                attributed = {}
+                for action, values in legacy_action.items():
+                    for key, count in values.get('date', {}).items():
+                        day = _parse_day(key)
+                        attributed[day] = attributed.get(day, 0) + count
+                        rows.append((counter_id, action, day, count))
+                for key, values in legacy_date.items():
+                    day = _parse_day(key)
+                    unattributed = values.get('total', 0) - attributed.get(day, 0)
+                    if unattributed > 0:
+                        rows.append((counter_id, '', day, unattributed))
+            ids = [counter_id for counter_id, _, _ in counters]
+            last_id = ids[-1]
+            migrated += len(ids)
+            logger.info('Exploding {} days from {} user activity counters (through id {})'.format(len(rows), len(ids), last_id))
+            if not dry_run and rows:
+                values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO osf_useractivitycounterday (counter_id, action, date, total)
+                        VALUES {values}
+                        ON CONFLICT (counter_id, action, date) DO UPDATE SET
+                            total = osf_useractivitycounterday.total + EXCLUDED.total;
+                    """.format(values=values), [param for row in rows for param in row])
+            if not dry_run:
+                UserActivityCounter.objects.filter(id__in=ids).update(legacy_date={}, legacy_action={})
+    return migrated
+
+
+class Command(BaseCommand):
+    """Explode the per-day JSON blobs on PageCounter and UserActivityCounter
+    into the PageCounterDay and UserActivityCounterDay tables.
+
+    Examples:
+
+        python manage.py explode_counter_dates --dry
+        python manage.py explode_counter_dates --batch-size 500
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            dest='batch_size',
+            help='Number of counters to migrate per transaction',
+        )
+        parser.add_argument(
+            '--dry',
+            action='store_true',
+            dest='dry_run',
+            help='Log what would be migrated without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options.get('dry_run', False)
+        pages = explode_page_counters(batch_size, dry_run=dry_run)
+        users = explode_user_activity_counters(batch_size, dry_run=dry_run)
+        logger.info('{}Exploded {} page counters and {} user activity counters'.format('[DRY] ' if dry_run else '', pages, users))
@@ -4,7 +4,8 @@ import logging
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from osf.models import Node, BaseFileNode, TrashedFileNode
+from osf.models import AbstractNode, Node, BaseFileNode, TrashedFileNode
+from osf.models.node import get_inheriting_node_ids
 from scripts import utils as script_utils
 
 logger = logging.getLogger(__name__)
@@ -25,7 +26,11 @@ def remove_logs_and_files(node_guid):
         logger.info('{} - Deleting trashed file nodes...'.format(n._id))
         BaseFileNode.objects.filter(type__in=TrashedFileNode._typedmodels_subtypes, node=n).delete()
         logger.info('{} - Deleting logs...'.format(n._id))
-        n.logs.exclude(id=n.logs.earliest().id).delete()
+        # Forks of n would lose the logs they inherit from it
+        for fork in AbstractNode.objects.filter(id__in=get_inheriting_node_ids(n.id)).order_by('-id'):
+            fork.materialize_inherited_logs()
+        # n.logs also has the logs n inherits, which belong to the node it was forked from
+        n.own_logs.exclude(id=n.own_logs.earliest().id).delete()
 
 class Command(BaseCommand):
     """
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Delete rendered wiki output (addons_wiki_renderedwikiversion) that was
+rendered by another WIKI_RENDERER_VERSION, or all of it with ``--all``.
+"""
+from django.core.management.base import BaseCommand
+
+from addons.wiki import settings as wiki_settings
+from addons.wiki.models import RenderedWikiVersion
+
+
+class Command(BaseCommand):
+    """Purge the wiki render cache.
+
+    Examples:
+
+        python manage.py purge_wiki_render_cache
+        python manage.py purge_wiki_render_cache --all
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--all', action='store_true', dest='all', help='Also delete output of the current renderer version')
+
+    def handle(self, *args, **options):
+        queryset = RenderedWikiVersion.objects.all()
+        if not options['all']:
+            queryset = queryset.exclude(renderer_version=wiki_settings.WIKI_RENDERER_VERSION)
+        deleted = queryset.delete()[0]
+        self.stdout.write('Deleted {} rendered wiki versions'.format(deleted))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Render the wiki versions that are missing from the wiki render cache
+(addons_wiki_renderedwikiversion) for the current WIKI_RENDERER_VERSION, e.g.
+after deploying a new renderer version.
+"""
+import logging
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef
+
+from addons.wiki import settings as wiki_settings
+from addons.wiki.models import RenderedWikiVersion, WikiVersion
+
+logger = logging.getLogger(__name__)
+
+
+def versions_to_render(all_versions=False):
+    rendered = RenderedWikiVersion.objects.filter(
+        version=OuterRef('pk'),
+        node=OuterRef('wiki_page__node'),
+        renderer_version=wiki_settings.WIKI_RENDERER_VERSION,
+    )
+    versions = WikiVersion.objects.filter(wiki_page__deleted__isnull=True, wiki_page__node__isnull=False)
+    if not all_versions:
+        versions = versions.annotate(
+            newest_version=Max('wiki_page__versions__identifier')
+        ).filter(identifier=F('newest_version'))
+    return versions.annotate(is_rendered=Exists(rendered)).filter(is_rendered=False)
+
+
+class Command(BaseCommand):
+    """Fill the wiki render cache.
+
+    Examples:
+
+        python manage.py warm_wiki_render_cache
+        python manage.py warm_wiki_render_cache --all-versions --batch-size 200
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument('--all-versions', action='store_true', dest='all_versions', help='Render every version, not only the current version of each page')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of versions rendered per transaction')
+
+    def handle(self, *args, **options):
+        queryset = versions_to_render(options['all_versions']).select_related('wiki_page__node').order_by('id')
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                for node, versions in groupby(sorted(batch, key=lambda version: version.wiki_page.node_id), key=lambda version: version.wiki_page.node):
+                    RenderedWikiVersion.render(list(versions), node)
+            last_id = batch[-1].id
+            total += len(batch)
+            logger.info('Rendered {} wiki versions'.format(total))
+        self.stdout.write('Rendered {} wiki versions with renderer version {}'.format(total, wiki_settings.WIKI_RENDERER_VERSION))
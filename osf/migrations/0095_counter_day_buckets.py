@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-02 15:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import osf.utils.datetime_aware_jsonfield
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0094_update_preprintprovider_group_auth'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='pagecounter',
+            old_name='date',
+            new_name='legacy_date',
+        ),
+        migrations.AlterField(
+            model_name='pagecounter',
+            name='legacy_date',
+            field=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(db_column='date', default=dict),
+        ),
+        migrations.RenameField(
+            model_name='useractivitycounter',
+            old_name='action',
+            new_name='legacy_action',
+        ),
+        migrations.AlterField(
+            model_name='useractivitycounter',
+            name='legacy_action',
+            field=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(db_column='action', default=dict),
+        ),
+        migrations.RenameField(
+            model_name='useractivitycounter',
+            old_name='date',
+            new_name='legacy_date',
+        ),
+        migrations.AlterField(
+            model_name='useractivitycounter',
+            name='legacy_date',
+            field=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(db_column='date', default=dict),
+        ),
+        migrations.CreateModel(
+            name='PageCounterDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('unique', models.PositiveIntegerField(default=0)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='osf.PageCounter')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserActivityCounterDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(blank=True, default=b'', max_length=255)),
+                ('date', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('counter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='osf.UserActivityCounter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pagecounterday',
+            unique_together=set([('page', 'date')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='useractivitycounterday',
+            unique_together=set([('counter', 'action', 'date')]),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-09 14:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Keep in sync with osf.models.node_relation.EXPECTED_CLOSURE_SQL
+POPULATE_NODE_CLOSURE = """
+    INSERT INTO osf_nodeclosure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE closure(ancestor_id, descendant_id, depth, path) AS (
+        SELECT parent_id, child_id, 1, ARRAY[parent_id, child_id]
+        FROM osf_noderelation
+        WHERE is_node_link IS FALSE
+    UNION ALL
+        SELECT C.ancestor_id, R.child_id, C.depth + 1, C.path || R.child_id
+        FROM closure AS C
+            JOIN osf_noderelation AS R ON R.parent_id = C.descendant_id
+        WHERE R.is_node_link IS FALSE
+            AND NOT R.child_id = ANY(C.path)
+    ) SELECT ancestor_id, descendant_id, MIN(depth)
+    FROM closure
+    GROUP BY ancestor_id, descendant_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0095_counter_day_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='osf.AbstractNode')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='osf.AbstractNode')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='nodeclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='nodeclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+        migrations.RunSQL(POPULATE_NODE_CLOSURE, migrations.RunSQL.noop),
+    ]
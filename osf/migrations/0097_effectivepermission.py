@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-11 10:05
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Keep in sync with osf.models.effective_permission.EFFECTIVE_PERMISSIONS_SQL
+POPULATE_EFFECTIVE_PERMISSIONS = """
+    INSERT INTO osf_effectivepermission (user_id, node_id, read, write, admin, parent_admin)
+    SELECT user_id, node_id, bool_or(read), bool_or(write), bool_or(admin), bool_or(parent_admin)
+    FROM (
+        SELECT C.user_id, C.node_id AS node_id, C.read, C.write, C.admin, FALSE AS parent_admin
+        FROM osf_contributor AS C
+    UNION ALL
+        SELECT C.user_id, NC.descendant_id AS node_id, FALSE, FALSE, FALSE, TRUE
+        FROM osf_nodeclosure AS NC
+            JOIN osf_contributor AS C ON C.node_id = NC.ancestor_id
+        WHERE C.admin IS TRUE
+    ) AS P
+    GROUP BY user_id, node_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('osf', '0096_nodeclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read', models.BooleanField(default=False)),
+                ('write', models.BooleanField(default=False)),
+                ('admin', models.BooleanField(default=False)),
+                ('parent_admin', models.BooleanField(default=False)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to='osf.AbstractNode')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='effectivepermission',
+            unique_together=set([('user', 'node')]),
+        ),
+        migrations.RunSQL(POPULATE_EFFECTIVE_PERMISSIONS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-13 15:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import osf.utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0097_effectivepermission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedSearchUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('node', 'node'), ('file', 'file'), ('user', 'user')], max_length=8)),
+                ('object_id', models.IntegerField()),
+                ('include_files', models.BooleanField(default=False)),
+                ('created', osf.utils.fields.NonNaiveDateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('claimed', osf.utils.fields.NonNaiveDateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='queuedsearchupdate',
+            unique_together=set([('object_type', 'object_id')]),
+        ),
+    ]
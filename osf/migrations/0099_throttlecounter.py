@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-16 09:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import osf.utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0098_queuedsearchupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('bucket', models.BigIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('expires', osf.utils.fields.NonNaiveDateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='throttlecounter',
+            unique_together=set([('key', 'bucket')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-04-24 14:08
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.utils.timezone
+import osf.utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0101_forkjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedShareUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('node', 'node'), ('preprint', 'preprint')], max_length=8)),
+                ('object_id', models.IntegerField()),
+                ('share_type', models.CharField(blank=True, max_length=64, null=True)),
+                ('old_subjects', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('retries', models.PositiveIntegerField(default=0)),
+                ('created', osf.utils.fields.NonNaiveDateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('available', osf.utils.fields.NonNaiveDateTimeField(default=django.utils.timezone.now)),
+                ('claimed', osf.utils.fields.NonNaiveDateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='queuedshareupdate',
+            unique_together=set([('object_type', 'object_id')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-05-02 10:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0102_queuedshareupdate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedsearchupdate',
+            name='retries',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
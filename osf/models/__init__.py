@@ -15,6 +15,8 @@ from osf.models.conference import Conference, MailRecord  # noqa
 from osf.models.citation import CitationStyle  # noqa
 from osf.models.archive import ArchiveJob, ArchiveTarget  # noqa
 from osf.models.queued_mail import QueuedMail  # noqa
+from osf.models.queued_search_update import QueuedSearchUpdate  # noqa
+from osf.models.queued_share_update import QueuedShareUpdate  # noqa
 from osf.models.external import ExternalAccount, ExternalProvider  # noqa
 from osf.models.oauth import ApiOAuth2Application, ApiOAuth2PersonalToken, ApiOAuth2Scope  # noqa
 from osf.models.licenses import NodeLicense, NodeLicenseRecord  # noqa
@@ -31,11 +33,14 @@ from osf.models.files import (  # noqa
     File, Folder,  # noqa
     FileVersion, TrashedFile, TrashedFileNode, TrashedFolder,  # noqa
 )  # noqa
-from osf.models.node_relation import NodeRelation  # noqa
-from osf.models.analytics import UserActivityCounter, PageCounter  # noqa
+from osf.models.node_relation import NodeRelation, NodeClosure  # noqa
+from osf.models.effective_permission import EffectivePermission  # noqa
+from osf.models.analytics import UserActivityCounter, UserActivityCounterDay, PageCounter, PageCounterDay  # noqa
 from osf.models.admin_profile import AdminProfile  # noqa
 from osf.models.admin_log_entry import AdminLogEntry  # noqa
 from osf.models.maintenance_state import MaintenanceState  # noqa
 from osf.models.banner import ScheduledBanner  # noqa
 from osf.models.quickfiles import QuickFilesNode  # noqa
 from osf.models.action import NodeRequestAction, ReviewAction  # noqa
+from osf.models.throttle_counter import ThrottleCounter  # noqa
+from osf.models.fork_job import ForkJob  # noqa
@@ -1,25 +1,85 @@
+import datetime as dt
 import logging
+from collections import defaultdict
 
 from dateutil import parser
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.utils import timezone
 
-from framework.sessions import session
+from framework.analytics.buffer import counter_buffer
+from framework.sessions import mark_session_dirty, session
 from osf.models.base import BaseModel
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 
 logger = logging.getLogger(__name__)
 
+DATE_FORMAT = '%Y/%m/%d'
+
+
+def _parse_day(date_string):
+    return dt.datetime.strptime(date_string, DATE_FORMAT).date()
+
+
+def _in_range(day, start, end):
+    return (start is None or day >= start) and (end is None or day <= end)
+
 
 class UserActivityCounter(BaseModel):
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=5, null=False, blank=False, db_index=True,
                            unique=True)  # 5 in prod
-    action = DateTimeAwareJSONField(default=dict)
-    date = DateTimeAwareJSONField(default=dict)
+    # Per-day history lives in UserActivityCounterDay. These blobs only hold
+    # history that has not yet been exploded by `explode_counter_dates`.
+    legacy_action = DateTimeAwareJSONField(default=dict, db_column='action')
+    legacy_date = DateTimeAwareJSONField(default=dict, db_column='date')
     total = models.PositiveIntegerField(default=0)
 
+    @property
+    def action(self):
+        """Per-action counts in the legacy ``{action: {'total': n, 'date': {'YYYY/MM/DD': n}}}`` shape."""
+        actions = {}
+        for action, values in (self.legacy_action or {}).items():
+            actions[action] = {'total': values.get('total', 0), 'date': dict(values.get('date', {}))}
+        for action, day, total in self.days.exclude(action='').values_list('action', 'date', 'total'):
+            entry = actions.setdefault(action, {'total': 0, 'date': {}})
+            key = day.strftime(DATE_FORMAT)
+            entry['total'] += total
+            entry['date'][key] = entry['date'].get(key, 0) + total
+        return actions
+
+    @property
+    def date(self):
+        """Per-day counts in the legacy ``{'YYYY/MM/DD': {'total': n}}`` shape."""
+        return {
+            day.strftime(DATE_FORMAT): {'total': total}
+            for day, total in self.get_daily_totals().items()
+        }
+
+    def get_daily_totals(self, start=None, end=None, action=None):
+        """Return a dict of ``datetime.date`` -> activity count, optionally
+        limited to an inclusive date range and a single action.
+        """
+        totals = defaultdict(int)
+        if action is None:
+            for key, values in (self.legacy_date or {}).items():
+                totals[_parse_day(key)] += values.get('total', 0)
+        else:
+            for key, count in (self.legacy_action or {}).get(action, {}).get('date', {}).items():
+                totals[_parse_day(key)] += count
+        totals = defaultdict(int, {day: count for day, count in totals.items() if _in_range(day, start, end)})
+
+        days = self.days.all()
+        if action is not None:
+            days = days.filter(action=action)
+        if start is not None:
+            days = days.filter(date__gte=start)
+        if end is not None:
+            days = days.filter(date__lte=end)
+        for day, total in days.values('date').annotate(sum=models.Sum('total')).values_list('date', 'sum'):
+            totals[day] += total
+        return dict(totals)
+
     @classmethod
     def get_total_activity_count(cls, user_id):
         try:
@@ -29,40 +89,82 @@ class UserActivityCounter(BaseModel):
 
     @classmethod
     def increment(cls, user_id, action, date_string):
-        date = parser.parse(date_string).strftime('%Y/%m/%d')
-        with transaction.atomic():
-            # select_for_update locks the row but only inside a transaction
-            uac, created = cls.objects.select_for_update().get_or_create(_id=user_id)
-            if uac.total > 0:
-                uac.total += 1
-            else:
-                uac.total = 1
-            if action in uac.action:
-                uac.action[action]['total'] += 1
-                if date in uac.action[action]['date']:
-                    uac.action[action]['date'][date] += 1
-                else:
-                    uac.action[action]['date'][date] = 1
-            else:
-                uac.action[action] = dict(total=1, date={date: 1})
-            if date in uac.date:
-                uac.date[date]['total'] += 1
-            else:
-                uac.date[date] = dict(total=1)
-            uac.save()
+        day = parser.parse(date_string).date()
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO osf_useractivitycounter (_id, created, modified, total, action, date)
+                VALUES (%s, %s, %s, 1, '{}'::jsonb, '{}'::jsonb)
+                ON CONFLICT (_id) DO UPDATE SET
+                    modified = EXCLUDED.modified,
+                    total = osf_useractivitycounter.total + 1
+                RETURNING id;
+            """, [user_id, now, now])
+            counter_id = cursor.fetchone()[0]
+            cursor.execute("""
+                INSERT INTO osf_useractivitycounterday (counter_id, action, date, total)
+                VALUES (%s, %s, %s, 1)
+                ON CONFLICT (counter_id, action, date) DO UPDATE SET
+                    total = osf_useractivitycounterday.total + 1;
+            """, [counter_id, action, day])
         return True
 
 
+class UserActivityCounterDay(models.Model):
+    """Number of times a user performed ``action`` on ``date``. Rows with an
+    empty ``action`` hold legacy per-day activity that was not attributed to
+    an action.
+    """
+    counter = models.ForeignKey(UserActivityCounter, related_name='days', on_delete=models.CASCADE)
+    action = models.CharField(max_length=255, blank=True, default='')
+    date = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('counter', 'action', 'date')
+
+
 class PageCounter(BaseModel):
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=300, null=False, blank=False, db_index=True,
                            unique=True)  # 272 in prod
-    date = DateTimeAwareJSONField(default=dict)
+    # Per-day history lives in PageCounterDay. This blob only holds history
+    # that has not yet been exploded by `explode_counter_dates`.
+    legacy_date = DateTimeAwareJSONField(default=dict, db_column='date')
 
     total = models.PositiveIntegerField(default=0)
     unique = models.PositiveIntegerField(default=0)
 
+    @property
+    def date(self):
+        """Per-day counts in the legacy ``{'YYYY/MM/DD': {'total': n, 'unique': n}}`` shape."""
+        return {
+            day.strftime(DATE_FORMAT): counts
+            for day, counts in self.get_daily_counts().items()
+        }
+
+    def get_daily_counts(self, start=None, end=None):
+        """Return a dict of ``datetime.date`` -> ``{'total': n, 'unique': n}``,
+        optionally limited to an inclusive date range.
+        """
+        counts = {}
+        for key, values in (self.legacy_date or {}).items():
+            day = _parse_day(key)
+            if _in_range(day, start, end):
+                counts[day] = {'total': values.get('total', 0), 'unique': values.get('unique', 0)}
+
+        days = self.days.all()
+        if start is not None:
+            days = days.filter(date__gte=start)
+        if end is not None:
+            days = days.filter(date__lte=end)
+        for day, total, unique in days.values_list('date', 'total', 'unique'):
+            entry = counts.setdefault(day, {'total': 0, 'unique': 0})
+            entry['total'] += total
+            entry['unique'] += unique
+        return counts
+
     @staticmethod
     def clean_page(page):
         return page.replace(
@@ -73,72 +175,135 @@ class PageCounter(BaseModel):
 
     @classmethod
     def update_counter(cls, page, node_info):
+        """Record a view of ``page``. Increments are buffered in process and
+        written by ``bulk_increment`` so that no row lock is taken here.
+        """
         cleaned_page = cls.clean_page(page)
-        date = timezone.now()
-        date_string = date.strftime('%Y/%m/%d')
+        date_string = timezone.now().strftime(DATE_FORMAT)
         visited_by_date = session.data.get('visited_by_date', {'date': date_string, 'pages': []})
 
-        with transaction.atomic():
-            model_instance, created = cls.objects.select_for_update().get_or_create(_id=cleaned_page)
-
-            # if they visited something today
-            if date_string == visited_by_date['date']:
-                # if they haven't visited this page today
-                if cleaned_page not in visited_by_date['pages']:
-                    # if the model_instance has today in it
-                    if date_string in model_instance.date.keys():
-                        # increment the number of unique visitors for today
-                        model_instance.date[date_string]['unique'] += 1
-                    else:
-                        # set the number of unique visitors for today to 1
-                        model_instance.date[date_string] = dict(unique=1)
-            # if they haven't visited something today
-            else:
-                # set their visited by date to blank
-                visited_by_date['date'] = date_string
-                visited_by_date['pages'] = []
-                # if the model_instance has today in it
-                if date_string in model_instance.date.keys():
-                    # increment the number of unique visitors for today
-                    model_instance.date[date_string]['unique'] += 1
-                else:
-                    # set the number of unique visitors to 1
-                    model_instance.date[date_string] = dict(unique=1)
-
-            # update their sessions
+        # if they haven't visited something today, set their visited by date to blank
+        if date_string != visited_by_date['date']:
+            visited_by_date = {'date': date_string, 'pages': []}
+        day_unique = 0 if cleaned_page in visited_by_date['pages'] else 1
+
+        # update their sessions
+        if day_unique:
             visited_by_date['pages'].append(cleaned_page)
-            session.data['visited_by_date'] = visited_by_date
-
-            if date_string in model_instance.date.keys():
-                if 'total' not in model_instance.date[date_string].keys():
-                    model_instance.date[date_string].update(total=0)
-                model_instance.date[date_string]['total'] += 1
-            else:
-                model_instance.date[date_string] = dict(total=1)
-
-            # if a download counter is being updated, only perform the update
-            # if the user who is downloading isn't a contributor to the project
-            page_type = cleaned_page.split(':')[0]
-            if page_type == 'download' and node_info:
-                if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
-                    model_instance.save()
-                    return
-
-            visited = session.data.get('visited', [])
-            if page not in visited:
-                model_instance.unique += 1
-                visited.append(page)
-                session.data['visited'] = visited
-
-            session.save()
-            model_instance.total += 1
-
-            model_instance.save()
+        session.data['visited_by_date'] = visited_by_date
+
+        # if a download counter is being updated, only count it towards the
+        # totals if the user who is downloading isn't a contributor to the project
+        page_type = cleaned_page.split(':')[0]
+        if page_type == 'download' and node_info:
+            if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
+                counter_buffer.increment(cleaned_page, date_string, day_total=1, day_unique=day_unique)
+                return
+
+        visited = session.data.get('visited', [])
+        unique = 0
+        if page not in visited:
+            unique = 1
+            visited.append(page)
+            session.data['visited'] = visited
+        mark_session_dirty()
+
+        counter_buffer.increment(cleaned_page, date_string, total=1, unique=unique, day_total=1, day_unique=day_unique)
+
+    @classmethod
+    def bulk_increment(cls, pending):
+        """Additively upsert buffered increments.
+
+        :param dict pending: Maps ``(cleaned_page, date_string)`` to a dict of
+            ``total``, ``unique``, ``day_total`` and ``day_unique`` increments
+        """
+        # A single INSERT ... ON CONFLICT may only touch each row once, so
+        # aggregate per page before upserting the counters themselves
+        page_totals = defaultdict(lambda: [0, 0])
+        for (page, _), counts in pending.items():
+            page_totals[page][0] += counts['total']
+            page_totals[page][1] += counts['unique']
+
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            values, params = [], []
+            for page, (total, unique) in sorted(page_totals.items()):
+                values.append("(%s, %s, %s, %s, %s, '{}'::jsonb)")
+                params.extend([page, now, now, total, unique])
+            cursor.execute("""
+                INSERT INTO osf_pagecounter (_id, created, modified, total, "unique", date)
+                VALUES {values}
+                ON CONFLICT (_id) DO UPDATE SET
+                    modified = EXCLUDED.modified,
+                    total = osf_pagecounter.total + EXCLUDED.total,
+                    "unique" = osf_pagecounter."unique" + EXCLUDED."unique"
+                RETURNING _id, id;
+            """.format(values=', '.join(values)), params)
+            page_ids = dict(cursor.fetchall())
+
+            PageCounterDay.bulk_increment([
+                (page_ids[page], _parse_day(date_string), counts['day_total'], counts['day_unique'])
+                for (page, date_string), counts in pending.items()
+            ], cursor=cursor)
 
     @classmethod
     def get_basic_counters(cls, page):
+        cleaned_page = cls.clean_page(page)
+        pending = counter_buffer.pending(cleaned_page)
         try:
-            counter = cls.objects.get(_id=cls.clean_page(page))
-            return (counter.unique, counter.total)
+            counter = cls.objects.get(_id=cleaned_page)
+            unique, total = counter.unique, counter.total
         except cls.DoesNotExist:
-            return (None, None)
+            if pending is None:
+                return (None, None)
+            unique, total = 0, 0
+        if pending is not None:
+            unique += pending[0]
+            total += pending[1]
+        return (unique, total)
+
+    @classmethod
+    def get_totals_by_prefix(cls, prefix):
+        """Return a dict of page -> total for every counter whose page starts
+        with ``prefix``, including increments not yet flushed.
+        """
+        # Don't worry. The only % at the end of the LIKE clause, the index is still used
+        totals = dict(cls.objects.filter(_id__startswith=prefix).values_list('_id', 'total'))
+        for page, total in counter_buffer.pending_totals(prefix).items():
+            totals[page] = totals.get(page, 0) + total
+        return totals
+
+
+class PageCounterDay(models.Model):
+    """Views (or downloads) of a page on a single day."""
+    page = models.ForeignKey(PageCounter, related_name='days', on_delete=models.CASCADE)
+    date = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    unique = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('page', 'date')
+
+    @classmethod
+    def bulk_increment(cls, rows, cursor=None):
+        """Additively upsert ``(page_id, date, total, unique)`` rows. Each
+        ``(page_id, date)`` pair may appear at most once.
+        """
+        if not rows:
+            return
+        values, params = [], []
+        for row in sorted(rows):
+            values.append('(%s, %s, %s, %s)')
+            params.extend(row)
+        sql = """
+            INSERT INTO osf_pagecounterday (page_id, date, total, "unique")
+            VALUES {values}
+            ON CONFLICT (page_id, date) DO UPDATE SET
+                total = osf_pagecounterday.total + EXCLUDED.total,
+                "unique" = osf_pagecounterday."unique" + EXCLUDED."unique";
+        """.format(values=', '.join(values))
+        if cursor is not None:
+            cursor.execute(sql, params)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
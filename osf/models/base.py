@@ -1,5 +1,8 @@
+import collections
 import logging
 import random
+import threading
+import time
 
 import bson
 from django.contrib.contenttypes.fields import (GenericForeignKey,
@@ -9,34 +12,93 @@ from django.core.exceptions import MultipleObjectsReturned
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import models
 from django.db.models import ForeignKey
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django_extensions.db.models import TimeStampedModel
 from include import IncludeQuerySet
 
+from framework.metrics import metrics
+from osf.utils import guid_cache
 from osf.utils.caching import cached_property
 from osf.exceptions import ValidationError
 from osf.utils.fields import LowercaseCharField, NonNaiveDateTimeField
+from website import settings as website_settings
 
 ALPHABET = '23456789abcdefghjkmnpqrstuvwxyz'
 
 logger = logging.getLogger(__name__)
 
 
-def generate_guid(length=5):
-    while True:
-        guid_id = ''.join(random.sample(ALPHABET, length))
+class GuidAllocator(object):
+    """Hands out unused guids from an in-memory pool.
 
-        try:
-            # is the guid in the blacklist
-            BlackListGuid.objects.get(guid=guid_id)
-        except BlackListGuid.DoesNotExist:
-            # it's not, check and see if it's already in the database
-            try:
-                Guid.objects.get(_id=guid_id)
-            except Guid.DoesNotExist:
-                # valid and unique guid
-                return guid_id
+    The pool is refilled a block at a time: a block of random candidates is
+    checked against both ``Guid`` and ``BlackListGuid`` in a single query and
+    the unused ones are kept, so creating many guids costs one query per
+    block instead of two per guid. Blocks expire after ``ttl`` seconds so that
+    ids taken by other processes in the meantime are not handed out.
+    """
+    def __init__(self, block_size=None, ttl=None):
+        self._block_size = block_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._pools = collections.defaultdict(collections.deque)
+        self._expires = {}
+        self.generated = 0
+        self.rejected = 0
+
+    @property
+    def block_size(self):
+        return self._block_size or website_settings.GUID_POOL_BLOCK_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl or website_settings.GUID_POOL_TTL
+
+    def depth(self, length=5):
+        return len(self._pools[length])
+
+    @property
+    def collision_rate(self):
+        return float(self.rejected) / self.generated if self.generated else 0.0
+
+    def allocate(self, length=5):
+        with self._lock:
+            pool = self._pools[length]
+            if self._expires.get(length, 0) < time.time():
+                pool.clear()
+            while not pool:
+                self._refill(length)
+            return pool.popleft()
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+            self._expires.clear()
+
+    def _refill(self, length):
+        candidates = {''.join(random.sample(ALPHABET, length)) for _ in range(self.block_size)}
+        taken = set(
+            Guid.objects.filter(_id__in=candidates).order_by().values_list('_id', flat=True).union(
+                BlackListGuid.objects.filter(guid__in=candidates).order_by().values_list('guid', flat=True)
+            )
+        )
+        fresh = candidates - taken
+        self.generated += len(candidates)
+        self.rejected += len(taken)
+        metrics.incr('guids.generated', len(candidates))
+        metrics.incr('guids.rejected', len(taken))
+        self._pools[length].extend(fresh)
+        self._expires[length] = time.time() + self.ttl
+
+
+guid_allocator = GuidAllocator()
+metrics.register_gauge('guids.pool_depth', guid_allocator.depth)
+metrics.register_gauge('guids.collision_rate', lambda: guid_allocator.collision_rate)
+
+
+def generate_guid(length=5):
+    return guid_allocator.allocate(length)
 
 
 def generate_object_id():
@@ -146,8 +208,10 @@ class Guid(BaseModel):
     # Override load in order to load by GUID
     @classmethod
     def load(cls, data, select_for_update=False):
+        if not select_for_update:
+            return guid_cache.load_guid(data)
         try:
-            return cls.objects.get(_id=data) if not select_for_update else cls.objects.filter(_id=data).select_for_update().get()
+            return cls.objects.filter(_id=data).select_for_update().get()
         except cls.DoesNotExist:
             return None
 
@@ -159,6 +223,12 @@ class Guid(BaseModel):
         )
 
 
+@receiver(post_save, sender=Guid)
+@receiver(post_delete, sender=Guid)
+def evict_cached_guid(sender, instance, **kwargs):
+    guid_cache.evict_guid(instance._id)
+
+
 class BlackListGuid(BaseModel):
     id = models.AutoField(primary_key=True)
     guid = LowercaseCharField(max_length=255, unique=True, db_index=True)
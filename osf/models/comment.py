@@ -1,10 +1,11 @@
 
 import pytz
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.utils import timezone
 from osf.models import Node
 from osf.models import NodeLog
+from osf.models.contributor import Contributor
 from osf.models.base import GuidMixin, Guid, BaseModel
 from osf.models.mixins import CommentableMixin
 from osf.models.spam import SpamMixin
@@ -130,6 +131,37 @@ class Comment(GuidMixin, SpamMixin, CommentableMixin, BaseModel):
 
         return 0
 
+    @classmethod
+    def find_n_unread_for_nodes(cls, user, nodes):
+        """Count the unread comments on the overview page of each of ``nodes``, as
+        ``find_n_unread`` does for one node.
+
+        :return: dict mapping the pk of each node to its number of unread comments
+        """
+        counts = {node.pk: 0 for node in nodes}
+        if user is None:
+            return counts
+        contributed = set(Contributor.objects.filter(user=user, node__in=nodes).values_list('node_id', flat=True))
+        nodes = [node for node in nodes if node.pk in contributed]
+        if not nodes:
+            return counts
+
+        root_targets = dict(Guid.objects.filter(_id__in=[node._id for node in nodes]).values_list('_id', 'id'))
+        unread = Q()
+        for node in nodes:
+            view_timestamp = user.get_node_comment_timestamps(target_id=node._id)
+            if not view_timestamp.tzinfo:
+                view_timestamp = view_timestamp.replace(tzinfo=pytz.utc)
+            unread |= (
+                Q(node=node) & Q(root_target_id=root_targets.get(node._id)) &
+                (Q(created__gt=view_timestamp) | Q(modified__gt=view_timestamp))
+            )
+        counts.update(
+            cls.objects.filter(unread & ~Q(user=user) & Q(is_deleted=False))
+            .order_by().values('node').annotate(count=Count('id')).values_list('node', 'count')
+        )
+        return counts
+
     @classmethod
     def create(cls, auth, **kwargs):
         comment = cls(**kwargs)
@@ -0,0 +1,113 @@
+from django.db import connection, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from osf.models.contributor import Contributor
+from osf.models.node_relation import NodeRelation
+
+# The nodes in %(nodes)s and all of their descendants
+SUBTREE_SQL = """
+    SELECT unnest(%(nodes)s::int[])
+    UNION
+    SELECT descendant_id FROM osf_nodeclosure WHERE ancestor_id = ANY(%(nodes)s::int[])
+"""
+
+# The effective permissions implied by osf_contributor and osf_nodeclosure;
+# {where} restricts the contributors and nodes considered.
+EFFECTIVE_PERMISSIONS_SQL = """
+    INSERT INTO osf_effectivepermission (user_id, node_id, read, write, admin, parent_admin)
+    SELECT user_id, node_id, bool_or(read), bool_or(write), bool_or(admin), bool_or(parent_admin)
+    FROM (
+        SELECT C.user_id, C.node_id AS node_id, C.read, C.write, C.admin, FALSE AS parent_admin
+        FROM osf_contributor AS C
+        WHERE TRUE {where}
+    UNION ALL
+        SELECT C.user_id, NC.descendant_id AS node_id, FALSE, FALSE, FALSE, TRUE
+        FROM osf_nodeclosure AS NC
+            JOIN osf_contributor AS C ON C.node_id = NC.ancestor_id
+        WHERE C.admin IS TRUE {where_descendant}
+    ) AS P
+    GROUP BY user_id, node_id
+    ON CONFLICT (user_id, node_id) DO UPDATE SET
+        read = EXCLUDED.read,
+        write = EXCLUDED.write,
+        admin = EXCLUDED.admin,
+        parent_admin = EXCLUDED.parent_admin;
+"""
+
+
+class EffectivePermission(models.Model):
+    """What a user may do on a node, taking admin permission on its ancestors
+    into account, so that permission checks and visibility filters are a single
+    lookup rather than a walk up the node tree.
+
+    There is a row for every contributor of a node and for every admin of one
+    of its ancestors. Rows are maintained by the Contributor and NodeRelation
+    signal handlers below; writes that bypass them (``bulk_create``,
+    ``QuerySet.update``) must call ``refresh``.
+    """
+    user = models.ForeignKey('OSFUser', related_name='effective_permissions', on_delete=models.CASCADE)
+    node = models.ForeignKey('AbstractNode', related_name='effective_permissions', on_delete=models.CASCADE)
+    # Permissions as a contributor of the node itself
+    read = models.BooleanField(default=False)
+    write = models.BooleanField(default=False)
+    admin = models.BooleanField(default=False)
+    # Admin on any ancestor, which implies read
+    parent_admin = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('user', 'node')
+
+    @property
+    def can_read(self):
+        return self.read or self.admin or self.parent_admin
+
+    @classmethod
+    def refresh(cls, node_ids, user_ids=None):
+        """Recompute the rows for ``node_ids`` and all of their descendants,
+        only for ``user_ids`` if given.
+        """
+        params = {'nodes': list(node_ids), 'users': list(user_ids or [])}
+        user_filter = ' AND user_id = ANY(%(users)s::int[])' if user_ids is not None else ''
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM osf_effectivepermission WHERE node_id IN ({subtree}){users};'.format(
+                    subtree=SUBTREE_SQL, users=user_filter
+                ), params
+            )
+            cursor.execute(EFFECTIVE_PERMISSIONS_SQL.format(
+                where='AND C.node_id IN ({}){}'.format(SUBTREE_SQL, user_filter.replace('user_id', 'C.user_id')),
+                where_descendant='AND NC.descendant_id IN ({}){}'.format(SUBTREE_SQL, user_filter.replace('user_id', 'C.user_id')),
+            ), params)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every row."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('DELETE FROM osf_effectivepermission;')
+            cursor.execute(EFFECTIVE_PERMISSIONS_SQL.format(where='', where_descendant=''))
+
+
+@receiver(post_save, sender=Contributor)
+def update_effective_permissions_for_contributor(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not {'read', 'write', 'admin'} & set(update_fields)):
+        return
+    EffectivePermission.refresh([instance.node_id], [instance.user_id])
+
+
+@receiver(post_delete, sender=Contributor)
+def remove_effective_permissions_for_contributor(sender, instance, **kwargs):
+    EffectivePermission.refresh([instance.node_id], [instance.user_id])
+
+
+# Connected after the handlers that maintain NodeClosure, which they rely on
+@receiver(post_save, sender=NodeRelation)
+def update_effective_permissions_for_relation(sender, instance, raw=False, **kwargs):
+    if not raw and not instance.is_node_link:
+        EffectivePermission.refresh([instance.child_id])
+
+
+@receiver(post_delete, sender=NodeRelation)
+def remove_effective_permissions_for_relation(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        EffectivePermission.refresh([instance.child_id])
@@ -1,22 +1,27 @@
 import abc
+import contextlib
 import datetime as dt
 import functools
 import httplib as http
 import logging
 
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.utils import OperationalError
 from django.utils import timezone
 from flask import request
 from oauthlib.oauth2 import (AccessDeniedError, InvalidGrantError,
     TokenExpiredError, MissingTokenError)
+from psycopg2 import errorcodes
 from requests.exceptions import HTTPError as RequestsHTTPError
 from requests_oauthlib import OAuth1Session, OAuth2Session
 
 from framework.exceptions import HTTPError, PermissionsError
-from framework.sessions import session
+from framework.metrics import metrics
+from framework.sessions import mark_session_dirty, session
 from osf.models import base
 from osf.utils.fields import EncryptedTextField, NonNaiveDateTimeField
+from website import settings
 from website.oauth.utils import PROVIDER_LOOKUP
 from website.security import random_string
 from website.util import web_url_for
@@ -28,6 +33,32 @@ OAUTH2 = 2
 
 generate_client_secret = functools.partial(random_string, length=40)
 
+
+@contextlib.contextmanager
+def own_transaction(model):
+    """Run the block in a transaction of its own on ``model``'s database and
+    yield the database alias to use.
+
+    Inside another transaction, e.g. a request's, ``transaction.atomic`` only
+    makes a savepoint, so row locks and writes would last until the outer
+    transaction ends. If ``settings.OAUTH_REFRESH_OWN_CONNECTION`` is set the
+    block then runs on a new connection instead, and commits when it ends.
+    """
+    using = router.db_for_write(model)
+    outer = connections[using]
+    if not (settings.OAUTH_REFRESH_OWN_CONNECTION and outer.in_atomic_block):
+        with transaction.atomic(using=using):
+            yield using
+        return
+    connections[using] = outer.copy()
+    try:
+        with transaction.atomic(using=using):
+            yield using
+    finally:
+        connections[using].close()
+        connections[using] = outer
+
+
 class ExternalAccount(base.ObjectIDMixin, base.BaseModel):
     """An account on an external service.
 
@@ -182,7 +213,7 @@ class ExternalProvider(object):
 
             url = oauth.authorization_url(self.auth_url_base)
 
-        session.save()
+        mark_session_dirty()
         return url
 
     @abc.abstractproperty
@@ -305,7 +336,7 @@ class ExternalProvider(object):
 
         if self.short_name in session.data.get('oauth_states', {}):
             del session.data['oauth_states'][self.short_name]
-            session.save()
+            mark_session_dirty()
 
         return True
 
@@ -380,6 +411,14 @@ class ExternalProvider(object):
         kwarg `resp_expiry_fn` allows subclasses to specify a function that will return the
         datetime-formatted oauth_key expiry key, given a successful refresh response from
         `auto_refresh_url`. A default using 'expires_at' as a key is provided.
+
+        Refreshes of an account are single-flight: the account's row is locked, in a
+        transaction of its own (see `own_transaction`), while its tokens are refreshed.
+        A caller that finds it locked waits up to OAUTH_REFRESH_LOCK_TIMEOUT seconds for
+        the lock. Once the lock is taken the tokens are reloaded, since providers may
+        revoke a refresh token once it is used, and another worker may have refreshed
+        them already; ``self.account`` then holds the current oauth_key even if this
+        returns False.
         """
         extra = extra or {}
         # Ensure this is an authenticated Provider that uses token refreshing
@@ -401,39 +440,74 @@ class ExternalProvider(object):
             lambda x: timezone.now() + timezone.timedelta(seconds=float(x['expires_in']))
         )
 
-        client = OAuth2Session(
-            self.client_id,
-            token={
-                'access_token': self.account.oauth_key,
-                'refresh_token': self.account.refresh_token,
-                'token_type': 'Bearer',
-                'expires_in': '-30',
-            }
-        )
-
-        extra.update({
-            'client_id': self.client_id,
-            'client_secret': self.client_secret
-        })
-
         try:
-            token = client.refresh_token(
-                self.auto_refresh_url,
-                **extra
-            )
-        except (AccessDeniedError, InvalidGrantError, TokenExpiredError):
-            if not force:
-                return False
-            else:
-                raise
+            with own_transaction(ExternalAccount) as using:
+                locked = self._lock_account(using)
+                if locked is None:
+                    return False
+                for field in ('oauth_key', 'refresh_token', 'expires_at', 'date_last_refreshed'):
+                    setattr(self.account, field, getattr(locked, field))
+                # The tokens may have been refreshed since they were loaded
+                if not (force or self._needs_refresh()):
+                    return False
+
+                client = OAuth2Session(
+                    self.client_id,
+                    token={
+                        'access_token': self.account.oauth_key,
+                        'refresh_token': self.account.refresh_token,
+                        'token_type': 'Bearer',
+                        'expires_in': '-30',
+                    }
+                )
 
-        self.account.oauth_key = token[resp_auth_token_key]
-        self.account.refresh_token = token[resp_refresh_token_key]
-        self.account.expires_at = resp_expiry_fn(token)
-        self.account.date_last_refreshed = timezone.now()
-        self.account.save()
+                extra.update({
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret
+                })
+
+                try:
+                    with metrics.timer('oauth.refresh'):
+                        token = client.refresh_token(
+                            self.auto_refresh_url,
+                            **extra
+                        )
+                except (AccessDeniedError, InvalidGrantError, TokenExpiredError):
+                    if not force:
+                        return False
+                    else:
+                        raise
+
+                self.account.oauth_key = token[resp_auth_token_key]
+                self.account.refresh_token = token[resp_refresh_token_key]
+                self.account.expires_at = resp_expiry_fn(token)
+                self.account.date_last_refreshed = timezone.now()
+                self.account.save(using=using)
+        except OperationalError as e:
+            if getattr(e.__cause__, 'pgcode', None) != errorcodes.LOCK_NOT_AVAILABLE:
+                raise
+            # Another worker is still refreshing this account; use what it last saved
+            metrics.incr('oauth.refresh.in_flight')
+            self.account.refresh_from_db()
+            return False
         return True
 
+    def _lock_account(self, using):
+        """Lock and return the account's row, waiting at most
+        OAUTH_REFRESH_LOCK_TIMEOUT seconds. Must be called in a transaction.
+        """
+        with connections[using].cursor() as cursor:
+            cursor.execute('SHOW lock_timeout')
+            lock_timeout = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, true)",
+                ['{}ms'.format(int(settings.OAUTH_REFRESH_LOCK_TIMEOUT * 1000))]
+            )
+            locked = ExternalAccount.objects.using(using).select_for_update().filter(pk=self.account.pk).first()
+            # Don't shorten other waits in a transaction this one is nested in
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+        return locked
+
     def _needs_refresh(self):
         """Determines whether or not an associated ExternalAccount needs
         a oauth_key.
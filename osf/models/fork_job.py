@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from framework.auth.core import Auth
+from framework.exceptions import PermissionsError
+from osf.models.base import BaseModel, ObjectIDMixin
+from osf.models.node_relation import NodeRelation
+from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+from osf.utils.fields import NonNaiveDateTimeField
+from website import settings
+from website import mails
+
+logger = logging.getLogger(__name__)
+
+
+class ForkJobQuerySet(models.QuerySet):
+
+    def stale(self):
+        """Jobs that are not done and have not made progress for
+        ``FORK_JOB_TIMEOUT_TIMEDELTA``, e.g. because their worker died.
+        """
+        return self.filter(
+            status__in=[ForkJob.QUEUED, ForkJob.RUNNING],
+            modified__lt=timezone.now() - settings.FORK_JOB_TIMEOUT_TIMEDELTA,
+        )
+
+
+class ForkJob(ObjectIDMixin, BaseModel):
+    """Forks a project with many components outside of the request, see
+    ``website.project.tasks.run_fork_job``.
+
+    The tree is forked breadth-first, one node per transaction. Each transaction
+    also records the node in ``forked_nodes``, so a job that is run again after
+    its worker died carries on where it stopped.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCESS, 'Success'),
+        (FAILED, 'Failed'),
+    )
+
+    objects = ForkJobQuerySet.as_manager()
+
+    src_node = models.ForeignKey('AbstractNode', related_name='fork_jobs', on_delete=models.CASCADE)
+    # The fork of src_node, once it exists
+    dst_node = models.ForeignKey('AbstractNode', related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    initiator = models.ForeignKey('OSFUser', related_name='+', on_delete=models.CASCADE)
+    # Title requested for the fork; the default is 'Fork of <title>'
+    title = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    # Maps the id of every node forked so far (as a string) to the id of its fork
+    forked_nodes = DateTimeAwareJSONField(default=dict, blank=True)
+    # Number of nodes in the tree when the job was created
+    total_nodes = models.PositiveIntegerField(default=1)
+    attempts = models.PositiveIntegerField(default=0)
+    date_completed = NonNaiveDateTimeField(null=True, blank=True)
+
+    def __repr__(self):
+        return '<{}(_id={!r}, src_node={!r}, status={!r})>'.format(self.__class__.__name__, self._id, self.src_node_id, self.status)
+
+    @classmethod
+    def start(cls, node, user, title=None):
+        """Create a job forking ``node`` for ``user``, and run it once the
+        current transaction has been committed.
+        """
+        from framework.postcommit_tasks.handlers import enqueue_postcommit_task
+        from website.project.tasks import run_fork_job
+
+        AbstractNode = apps.get_model('osf.AbstractNode')
+        job = cls.objects.create(
+            src_node=node,
+            initiator=user,
+            title=title,
+            total_nodes=AbstractNode.objects.get_children(node, active=True).count() + 1,
+        )
+        enqueue_postcommit_task(run_fork_job, (job._id, ), {}, celery=True)
+        return job
+
+    @property
+    def node(self):
+        return self.src_node
+
+    @property
+    def done(self):
+        return self.status in (self.SUCCESS, self.FAILED)
+
+    @property
+    def forked_count(self):
+        return len(self.forked_nodes)
+
+    def run(self):
+        """Fork the nodes of the tree that are not forked yet, level by level."""
+        AbstractNode = apps.get_model('osf.AbstractNode')
+        started = ForkJob.objects.filter(id=self.id, status__in=[self.QUEUED, self.RUNNING]).update(
+            status=self.RUNNING, attempts=F('attempts') + 1, modified=timezone.now(),
+        )
+        if not started:
+            return
+        self.refresh_from_db()
+        auth = Auth(self.initiator)
+
+        level = [(self.src_node_id, None)]
+        while level:
+            forks = {}
+            for node_id, parent_fork_id in level:
+                fork_id = self.fork_one(node_id, parent_fork_id, auth)
+                if fork_id is not None:
+                    forks[node_id] = fork_id
+            level = [
+                (child_id, forks[parent_id])
+                for parent_id, child_id in NodeRelation.objects.filter(
+                    parent_id__in=forks.keys(), is_node_link=False, child__is_deleted=False,
+                ).order_by('parent_id', '_order').values_list('parent_id', 'child_id')
+            ]
+
+        linking_nodes = NodeRelation.objects.filter(
+            parent_id__in=[int(node_id) for node_id in self.forked_nodes], is_node_link=True,
+        ).values_list('parent_id', flat=True)
+        for fork in AbstractNode.objects.filter(id__in=[self.forked_nodes[str(node_id)] for node_id in set(linking_nodes)]):
+            fork.order_fork_relations()
+        self.succeed()
+
+    def fork_one(self, node_id, parent_fork_id, auth):
+        """Fork the node with ``node_id`` unless it is forked already, and
+        return the id of its fork, or None if ``auth`` cannot fork it.
+        """
+        AbstractNode = apps.get_model('osf.AbstractNode')
+        with transaction.atomic():
+            # Locked so that a job resumed while a stuck run is still going forks each node once
+            job = ForkJob.objects.select_for_update().get(id=self.id)
+            fork_id = job.forked_nodes.get(str(node_id))
+            if fork_id is None:
+                node = AbstractNode.objects.get(id=node_id)
+                parent = AbstractNode.objects.get(id=parent_fork_id) if parent_fork_id else None
+                try:
+                    fork = node.fork_node_without_children(auth, title='' if parent else self.title, parent=parent)
+                except PermissionsError:
+                    if parent is None:
+                        raise
+                    return None  # Omit the components the initiator cannot fork, like fork_node
+                fork_id = job.forked_nodes[str(node_id)] = fork.id
+                if parent is None:
+                    job.dst_node = fork
+                job.save()
+        self.forked_nodes = job.forked_nodes
+        self.dst_node_id = job.dst_node_id
+        return fork_id
+
+    def finish(self, status):
+        """Set the final ``status``, unless another run of the job did.
+
+        :return: whether the status was set
+        """
+        now = timezone.now()
+        finished = ForkJob.objects.filter(id=self.id, status__in=[self.QUEUED, self.RUNNING]).update(
+            status=status, date_completed=now, modified=now,
+        )
+        self.status, self.date_completed = status, now
+        return bool(finished)
+
+    def succeed(self):
+        if self.finish(self.SUCCESS):
+            mails.send_mail(
+                self.initiator.email, mails.FORK_COMPLETED, title=self.src_node.title, guid=self.dst_node._id,
+                mimetype='html', can_change_preferences=False,
+            )
+
+    def fail(self):
+        """Give up, deleting the nodes forked so far."""
+        AbstractNode = apps.get_model('osf.AbstractNode')
+        with transaction.atomic():
+            if not self.finish(self.FAILED):
+                return
+            forked_nodes = ForkJob.objects.get(id=self.id).forked_nodes
+            AbstractNode.objects.filter(id__in=forked_nodes.values()).update(is_deleted=True, deleted_date=timezone.now())
+        logger.error('Fork job {} failed after forking {} of {} nodes'.format(self._id, len(forked_nodes), self.total_nodes))
+        mails.send_mail(
+            self.initiator.email, mails.FORK_FAILED, title=self.src_node.title, guid=self.src_node._id,
+            mimetype='html', can_change_preferences=False,
+        )
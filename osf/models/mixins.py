@@ -3,7 +3,7 @@ import pytz
 from django.apps import apps
 from django.contrib.auth.models import Group
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 from guardian.shortcuts import assign_perm
@@ -193,7 +193,54 @@ class AddonModelMixin(models.Model):
     def addons(self):
         return self.get_addons()
 
+    @property
+    def _addon_settings(self):
+        """Addon settings memoized by `get_addon`, by addon short name, including deleted
+        settings and None for addons the owner does not have.
+        """
+        return self.__dict__.setdefault('_addon_settings_cache', {})
+
+    @classmethod
+    def _addon_settings_models(cls):
+        return [
+            (config.short_name, getattr(config, '{}_settings'.format(cls.settings_type), None))
+            for config in cls.ADDONS_AVAILABLE
+            if getattr(config, '{}_settings'.format(cls.settings_type), None)
+        ]
+
+    @classmethod
+    def prefetch_addons(cls, owners):
+        """Load the addon settings of all of ``owners`` and memoize them on each owner,
+        with one query for which addons any of them have and one per such addon.
+
+        :param list owners: Instances of this class, e.g. a page of nodes or users
+        """
+        owners = {owner.pk: owner for owner in owners if owner.pk}
+        if not owners:
+            return
+        settings_models = dict(cls._addon_settings_models())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ' UNION ALL '.join(
+                    'SELECT %s WHERE EXISTS (SELECT 1 FROM {} WHERE owner_id = ANY(%s))'.format(model._meta.db_table)
+                    for model in settings_models.values()
+                ),
+                [param for name in settings_models for param in (name, owners.keys())]
+            )
+            present = [row[0] for row in cursor.fetchall()]
+
+        for owner in owners.values():
+            owner._addon_settings.update({name: None for name in settings_models})
+            owner._addon_settings_loaded = True
+        for name in present:
+            for settings_obj in settings_models[name].objects.filter(owner_id__in=owners.keys()):
+                owner = owners[settings_obj.owner_id]
+                settings_obj.owner = owner
+                owner._addon_settings[name] = settings_obj
+
     def get_addons(self):
+        if not getattr(self, '_addon_settings_loaded', False):
+            self.prefetch_addons([self])
         return filter(None, [
             self.get_addon(config.short_name)
             for config in self.ADDONS_AVAILABLE
@@ -227,12 +274,17 @@ class AddonModelMixin(models.Model):
             return None
         if not settings_model:
             return None
-        try:
-            settings_obj = settings_model.objects.get(owner=self)
-            if not settings_obj.deleted or deleted:
-                return settings_obj
-        except ObjectDoesNotExist:
-            pass
+        if name in self._addon_settings:
+            settings_obj = self._addon_settings[name]
+        else:
+            try:
+                settings_obj = settings_model.objects.get(owner=self)
+            except ObjectDoesNotExist:
+                settings_obj = None
+            if self.pk:
+                self._addon_settings[name] = settings_obj
+        if settings_obj and (not settings_obj.deleted or deleted):
+            return settings_obj
         return None
 
     def add_addon(self, addon_name, auth=None, override=False, _force=False):
@@ -264,6 +316,7 @@ class AddonModelMixin(models.Model):
         ret = model(owner=self)
         ret.on_add()
         ret.save()  # TODO This doesn't feel right
+        self._addon_settings[addon_name] = ret
         return ret
 
     def config_addons(self, config, auth=None, save=True):
@@ -298,8 +351,14 @@ class AddonModelMixin(models.Model):
         if getattr(addon, 'external_account', None):
             addon.deauthorize(auth=auth)
         addon.delete(save=True)
+        self._addon_settings.pop(addon_name, None)
         return True
 
+    def refresh_from_db(self, *args, **kwargs):
+        super(AddonModelMixin, self).refresh_from_db(*args, **kwargs)
+        self.__dict__.pop('_addon_settings_cache', None)
+        self._addon_settings_loaded = False
+
     def _settings_model(self, addon_model, config=None):
         if not config:
             config = apps.get_app_config('addons_{}'.format(addon_model))
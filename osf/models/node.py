@@ -1,6 +1,8 @@
+import collections
 import functools
 import itertools
 import logging
+import operator
 import re
 import urlparse
 import warnings
@@ -14,15 +16,15 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.core.paginator import Paginator
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.db import models, transaction, connection
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_delete
 from django.db.models.expressions import F
-from django.db.models.aggregates import Max
+from django.db.models.aggregates import Max, Sum
+from django.db.models.expressions import Case, When
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.functional import cached_property
 from keen import scoped_keys
-from psycopg2._psycopg import AsIs
 from typedmodels.models import TypedModel, TypedModelManager
 from include import IncludeManager
 
@@ -33,11 +35,12 @@ from framework.sentry import log_exception
 from osf.exceptions import ValidationValueError
 from osf.models.contributor import (Contributor, RecentlyAddedContributor,
                                     get_contributor_permissions)
+from osf.models.effective_permission import EffectivePermission
 from osf.models.identifiers import Identifier, IdentifierMixin
 from osf.models.licenses import NodeLicenseRecord
 from osf.models.mixins import (AddonModelMixin, CommentableMixin, Loggable,
                                NodeLinkMixin, Taggable, TaxonomizableMixin)
-from osf.models.node_relation import NodeRelation
+from osf.models.node_relation import NodeClosure, NodeRelation
 from osf.models.nodelog import NodeLog
 from osf.models.sanctions import RegistrationApproval
 from osf.models.private_link import PrivateLink
@@ -80,52 +83,10 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
         return self.filter(id__in=self.exclude(type='osf.collection').exclude(type='osf.quickfilesnode').values_list('root_id', flat=True))
 
     def get_children(self, root, active=False):
-        # If `root` is a root node, we can use the 'descendants' related name
-        # rather than doing a recursive query
-        if root.id == root.root_id:
-            query = root.descendants.exclude(id=root.id)
-            if active:
-                query = query.filter(is_deleted=False)
-            return query
-        else:
-            sql = """
-                WITH RECURSIVE descendants AS (
-                SELECT
-                    parent_id,
-                    child_id,
-                    1 AS LEVEL,
-                    ARRAY[parent_id] as pids
-                FROM %s
-                %s
-                WHERE is_node_link IS FALSE AND parent_id = %s %s
-                UNION ALL
-                SELECT
-                    d.parent_id,
-                    s.child_id,
-                    d.level + 1,
-                    d.pids || s.parent_id
-                FROM descendants AS d
-                    JOIN %s AS s
-                    ON d.child_id = s.parent_id
-                WHERE s.is_node_link IS FALSE AND %s = ANY(pids)
-                ) SELECT array_agg(DISTINCT child_id)
-                FROM descendants
-                WHERE parent_id = %s;
-            """
-            with connection.cursor() as cursor:
-                node_relation_table = AsIs(NodeRelation._meta.db_table)
-                cursor.execute(sql, [
-                    node_relation_table,
-                    AsIs('LEFT JOIN osf_abstractnode ON {}.child_id = osf_abstractnode.id'.format(node_relation_table) if active else ''),
-                    root.pk,
-                    AsIs('AND osf_abstractnode.is_deleted IS FALSE' if active else ''),
-                    node_relation_table,
-                    root.pk,
-                    root.pk])
-                row = cursor.fetchone()[0]
-                if not row:
-                    return AbstractNode.objects.none()
-                return AbstractNode.objects.filter(id__in=row)
+        query = AbstractNode.objects.filter(ancestor_links__ancestor=root)
+        if active:
+            query = query.filter(is_deleted=False)
+        return query
 
     def can_view(self, user=None, private_link=None):
         qs = self.filter(is_public=True)
@@ -144,23 +105,11 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
             if not isinstance(user, int):
                 raise TypeError('"user" must be either {} or {}. Got {!r}'.format(int, OSFUser, user))
 
-            sqs = Contributor.objects.filter(node=models.OuterRef('pk'), user__id=user, read=True)
+            sqs = EffectivePermission.objects.filter(
+                Q(read=True) | Q(admin=True) | Q(parent_admin=True),
+                node=models.OuterRef('pk'), user_id=user,
+            )
             qs |= self.annotate(can_view=models.Exists(sqs)).filter(can_view=True)
-            qs |= self.extra(where=['''
-                "osf_abstractnode".id in (
-                    WITH RECURSIVE implicit_read AS (
-                        SELECT "osf_contributor"."node_id"
-                        FROM "osf_contributor"
-                        WHERE "osf_contributor"."user_id" = %s
-                        AND "osf_contributor"."admin" is TRUE
-                    UNION ALL
-                        SELECT "osf_noderelation"."child_id"
-                        FROM "implicit_read"
-                        LEFT JOIN "osf_noderelation" ON "osf_noderelation"."parent_id" = "implicit_read"."node_id"
-                        WHERE "osf_noderelation"."is_node_link" IS FALSE
-                    ) SELECT * FROM implicit_read
-                )
-            '''], params=(user, ))
 
         return qs
 
@@ -183,6 +132,100 @@ class AbstractNodeManager(TypedModelManager, IncludeManager):
         return self.get_queryset().can_view(user=user, private_link=private_link)
 
 
+def get_inherited_log_bounds(nodes):
+    """Map each of ``nodes``, a list of ``(id, forked_from_id,
+    inherited_logs_until)`` tuples, to a dict of the nodes it inherits logs
+    from and the id of the last log it inherits from each. A fork inherits the
+    logs of the node it was forked from up to the fork, and so on up the chain
+    of forks; they are not copied to the fork.
+    """
+    bounds = {node_id: {} for node_id, _, _ in nodes}
+    # (node the logs are inherited by, node they belong to, last inherited log id)
+    frontier = [
+        (node_id, forked_from_id, until) for node_id, forked_from_id, until in nodes
+        if forked_from_id and until is not None
+    ]
+    while frontier:
+        sources = {
+            source_id: (forked_from_id, until)
+            for source_id, forked_from_id, until in AbstractNode.objects.filter(
+                id__in={source_id for _, source_id, _ in frontier}
+            ).values_list('id', 'forked_from_id', 'inherited_logs_until')
+        }
+        next_frontier = []
+        for node_id, source_id, until in frontier:
+            if bounds[node_id].get(source_id, -1) >= until:
+                continue
+            bounds[node_id][source_id] = until
+            forked_from_id, source_until = sources.get(source_id, (None, None))
+            if forked_from_id and source_until is not None:
+                next_frontier.append((node_id, forked_from_id, min(until, source_until)))
+        frontier = next_frontier
+    return bounds
+
+
+def inherited_logs_q(sources):
+    """Return a Q for the logs in ``sources``, a dict of node id to last log id."""
+    return reduce(operator.or_, (Q(node_id=source_id, id__lte=until) for source_id, until in sources.items()))
+
+
+def get_logs_query(nodes):
+    """Return a Q for the logs of ``nodes``, a list of ``(id, forked_from_id,
+    inherited_logs_until)`` tuples, including the logs they inherit (see
+    ``get_inherited_log_bounds``).
+    """
+    query = Q(node_id__in=[node_id for node_id, _, _ in nodes])
+    merged = {}
+    for sources in get_inherited_log_bounds(nodes).values():
+        for source_id, until in sources.items():
+            # A source reached through several forks is limited by the latest fork
+            merged[source_id] = max(until, merged.get(source_id, until))
+    if merged:
+        query |= inherited_logs_q(merged)
+    return query
+
+
+def count_inherited_logs(nodes):
+    """Return a dict of node id to the number of logs each of ``nodes``
+    inherits, counted in a single query.
+    """
+    bounds = {
+        node_id: sources for node_id, sources in get_inherited_log_bounds([
+            (node.id, node.forked_from_id, node.inherited_logs_until) for node in nodes
+        ]).items() if sources
+    }
+    counts = {node.id: 0 for node in nodes}
+    if bounds:
+        merged = NodeLog.objects.filter(
+            reduce(operator.or_, (inherited_logs_q(sources) for sources in bounds.values()))
+        ).aggregate(**{
+            'node_{}'.format(node_id): Sum(Case(When(inherited_logs_q(sources), then=1), default=0, output_field=models.IntegerField()))
+            for node_id, sources in bounds.items()
+        })
+        counts.update({node_id: merged['node_{}'.format(node_id)] or 0 for node_id in bounds})
+    return counts
+
+
+def get_inheriting_node_ids(node_id, log_id=None):
+    """Return the ids of the forks whose logs include the logs of ``node_id``
+    (only those that include its log ``log_id``, if given), following chains of
+    forks. Forks come after the forks they were forked from.
+    """
+    forks = AbstractNode.objects.filter(forked_from_id=node_id, inherited_logs_until__isnull=False)
+    if log_id is not None:
+        forks = forks.filter(inherited_logs_until__gte=log_id)
+    found = []
+    frontier = list(forks.values_list('id', flat=True))
+    while frontier:
+        found.extend(frontier)
+        # A fork of a fork inherits everything its source inherited
+        frontier = list(
+            AbstractNode.objects.filter(forked_from_id__in=frontier, inherited_logs_until__isnull=False)
+            .exclude(id__in=found).values_list('id', flat=True)
+        )
+    return found
+
+
 class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixin,
                    NodeLinkMixin, CommentableMixin, SpamMixin, TaxonomizableMixin,
                    Taggable, Loggable, GuidMixin, BaseModel):
@@ -230,6 +273,15 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         'preprint_file',
     }
 
+    # Node fields that are part of the search documents of its files
+    FILE_SEARCH_UPDATE_FIELDS = {
+        'title',
+        'retraction',
+        'is_public',
+        'is_deleted',
+        'spam_status',
+    }
+
     # Node fields that trigger a check to the spam filter on save
     SPAM_CHECK_FIELDS = {
         'title',
@@ -249,26 +301,6 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
     PRIVATE = 'private'
     PUBLIC = 'public'
 
-    LICENSE_QUERY = re.sub('\s+', ' ', '''WITH RECURSIVE ascendants AS (
-            SELECT
-                N.node_license_id,
-                R.parent_id
-            FROM "{noderelation}" AS R
-                JOIN "{abstractnode}" AS N ON N.id = R.parent_id
-            WHERE R.is_node_link IS FALSE
-                AND R.child_id = %s
-        UNION ALL
-            SELECT
-                N.node_license_id,
-                R.parent_id
-            FROM ascendants AS D
-                JOIN "{noderelation}" AS R ON D.parent_id = R.child_id
-                JOIN "{abstractnode}" AS N ON N.id = R.parent_id
-            WHERE R.is_node_link IS FALSE
-            AND D.node_license_id IS NULL
-    ) SELECT {fields} FROM "{nodelicenserecord}"
-    WHERE id = (SELECT node_license_id FROM ascendants WHERE node_license_id IS NOT NULL) LIMIT 1;''')
-
     affiliated_institutions = models.ManyToManyField('Institution', related_name='nodes')
     category = models.CharField(max_length=255,
                                 choices=CATEGORY_MAP.items(),
@@ -300,6 +332,9 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
                                     related_name='forks',
                                     on_delete=models.SET_NULL,
                                     null=True, blank=True)
+    # For forks, the id of the last log of forked_from that is part of this
+    # node's logs; see get_logs_query. Null for nodes that own all their logs.
+    inherited_logs_until = models.IntegerField(null=True, blank=True)
     is_fork = models.BooleanField(default=False, db_index=True)
     is_public = models.BooleanField(default=False, db_index=True)
     is_deleted = models.BooleanField(default=False, db_index=True)
@@ -686,17 +721,20 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
     def bulk_update_search(cls, nodes, index=None):
         from website import search
         try:
-            serialize = functools.partial(search.search.update_node, index=index, bulk=True, async=False)
+            serialize = functools.partial(search.search.update_node, index=index, bulk=True, async=False, include_files=False)
             search.search.bulk_update_nodes(serialize, nodes, index=index)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
 
-    def update_search(self):
+    def update_search(self, include_files=True):
+        """Queue the node for reindexing, along with its files unless
+        ``include_files`` is False because only the node's own document changed.
+        """
         from website import search
 
         try:
-            search.search.update_node(self, bulk=False, async=True)
+            search.search.update_node(self, bulk=False, async=True, include_files=include_files)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
@@ -728,7 +766,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             raise UserNotAffiliatedError('User is not affiliated with {}'.format(inst.name))
         if not self.is_affiliated_with_institution(inst):
             self.affiliated_institutions.add(inst)
-            self.update_search()
+            self.update_search(include_files=False)
         if log:
             NodeLog = apps.get_model('osf.NodeLog')
 
@@ -761,7 +799,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
                 )
             if save:
                 self.save()
-            self.update_search()
+            self.update_search(include_files=False)
             return True
         return False
 
@@ -798,12 +836,20 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             (user and self.has_permission(user, 'write')) or is_api_node
         )
 
+    @property
+    def logs(self):
+        """The logs of this node, including the logs a fork inherits from the
+        node it was forked from.
+        """
+        return NodeLog.objects.filter(get_logs_query([(self.id, self.forked_from_id, self.inherited_logs_until)]))
+
     def get_aggregate_logs_query(self, auth):
-        return (
-            (
-                Q(node_id__in=list(Node.objects.get_children(self).can_view(user=auth.user, private_link=auth.private_link).values_list('id', flat=True)) + [self.id])
-            ) & Q(should_hide=False)
+        nodes = list(
+            Node.objects.get_children(self).can_view(user=auth.user, private_link=auth.private_link)
+            .values_list('id', 'forked_from_id', 'inherited_logs_until')
         )
+        nodes.append((self.id, self.forked_from_id, self.inherited_logs_until))
+        return get_logs_query(nodes) & Q(should_hide=False)
 
     def get_aggregate_logs_queryset(self, auth):
         query = self.get_aggregate_logs_query(auth)
@@ -841,11 +887,12 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         """
         if not user:
             return False
-        query = {'node': self, permission: True}
-        has_permission = user.contributor_set.filter(**query).exists()
-        if not has_permission and permission == 'read' and check_parent:
-            return self.is_admin_parent(user)
-        return has_permission
+        perms = EffectivePermission.objects.filter(node=self, user=user).first()
+        if perms is None:
+            return False
+        if getattr(perms, permission):
+            return True
+        return permission == 'read' and check_parent and (perms.admin or perms.parent_admin)
 
     def has_permission_on_children(self, user, permission):
         """Checks if the given user has a given permission on any child nodes
@@ -859,33 +906,49 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return False
 
     def is_admin_parent(self, user):
-        if self.has_permission(user, 'admin', check_parent=False):
-            return True
-        parent = self.parent_node
-        if parent:
-            return parent.is_admin_parent(user)
-        return False
+        if not user:
+            return False
+        return EffectivePermission.objects.filter(
+            Q(admin=True) | Q(parent_admin=True),
+            node=self, user=user,
+        ).exists()
 
     def find_readable_descendants(self, auth):
         """ Returns a generator of first descendant node(s) readable by <user>
         in each descendant branch.
         """
-        new_branches = []
-        for node in self.nodes_primary.filter(is_deleted=False):
-            if node.can_view(auth):
-                yield node
-            else:
-                new_branches.append(node)
+        # Load the whole (undeleted) subtree at once, then walk it in memory
+        children = collections.defaultdict(list)
+        relations = NodeRelation.objects.filter(
+            is_node_link=False,
+            child__is_deleted=False,
+            child__ancestor_links__ancestor=self,
+        ).select_related('child').order_by('parent_id', '_order')
+        for relation in relations:
+            children[relation.parent_id].append(relation.child)
+
+        def walk(parent):
+            new_branches = []
+            for node in children[parent.id]:
+                if node.can_view(auth):
+                    yield node
+                else:
+                    new_branches.append(node)
+
+            for bnode in new_branches:
+                for node in walk(bnode):
+                    yield node
 
-        for bnode in new_branches:
-            for node in bnode.find_readable_descendants(auth):
-                yield node
+        return walk(self)
 
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """Ancestors of this node, nearest first."""
+        ancestor_ids = list(
+            NodeClosure.objects.filter(descendant=self).order_by('depth').values_list('ancestor_id', flat=True)
+        )
+        ancestors = AbstractNode.objects.in_bulk(ancestor_ids)
+        return [ancestors[pk] for pk in ancestor_ids]
 
     @property
     def admin_contributor_ids(self):
@@ -905,9 +968,12 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
         contributor_ids = set(self.contributors.values_list('guids___id', flat=True))
         admin_ids = set(get_admin_contributor_ids(self)) if include_self else set()
-        for parent in self.parents:
-            admins = get_admin_contributor_ids(parent)
-            admin_ids.update(set(admins).difference(contributor_ids))
+        parent_admin_ids = EffectivePermission.objects.filter(
+            node=self,
+            user__is_active=True,
+            parent_admin=True
+        ).values_list('user__guids___id', flat=True)
+        admin_ids.update(set(parent_admin_ids).difference(contributor_ids))
         return admin_ids
 
     @property
@@ -998,17 +1064,10 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
     def license(self):
         if self.node_license_id:
             return self.node_license
-        with connection.cursor() as cursor:
-            cursor.execute(self.LICENSE_QUERY.format(
-                abstractnode=AbstractNode._meta.db_table,
-                noderelation=NodeRelation._meta.db_table,
-                nodelicenserecord=NodeLicenseRecord._meta.db_table,
-                fields=', '.join('"{}"."{}"'.format(NodeLicenseRecord._meta.db_table, f.column) for f in NodeLicenseRecord._meta.concrete_fields)
-            ), [self.id])
-            res = cursor.fetchone()
-            if res:
-                return NodeLicenseRecord.from_db(self._state.db, None, res)
-        return None
+        # The license of the nearest ancestor that has one
+        return NodeLicenseRecord.objects.filter(
+            nodes__ancestor_links__descendant=self
+        ).order_by('nodes__ancestor_links__depth').first()
 
     @property
     def visible_contributors(self):
@@ -1201,7 +1260,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
                 project_signals.contributor_added.send(self,
                                                        contributor=contributor,
                                                        auth=auth, email_template=send_email)
-            self.update_search()
+            self.update_search(include_files=False)
             self.save_node_preprints()
             return contrib_to_add, True
 
@@ -1432,7 +1491,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             )
 
         self.save()
-        self.update_search()
+        self.update_search(include_files=False)
         # send signal to remove this user from project subscriptions
         project_signals.contributor_removed.send(self, user=contributor)
 
@@ -1615,39 +1674,10 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return self.private_links.filter(is_deleted=True).values_list('key', flat=True)
 
     def get_root(self):
-        sql = """
-            WITH RECURSIVE ascendants AS (
-              SELECT
-                parent_id,
-                child_id,
-                1 AS LEVEL,
-                ARRAY[child_id] as cids
-              FROM %s
-              WHERE is_node_link IS FALSE and child_id = %s
-              UNION ALL
-              SELECT
-                S.parent_id,
-                D.child_id,
-                D.level + 1,
-                D.cids || S.child_id
-              FROM ascendants AS D
-                JOIN %s AS S
-                  ON D.parent_id = S.child_id
-              WHERE S.is_node_link IS FALSE
-                AND %s = ANY(cids)
-            ) SELECT parent_id
-              FROM ascendants
-              WHERE child_id = %s
-              ORDER BY level DESC
-              LIMIT 1;
-        """
-        with connection.cursor() as cursor:
-            node_relation_table = AsIs(NodeRelation._meta.db_table)
-            cursor.execute(sql, [node_relation_table, self.pk, node_relation_table, self.pk, self.pk])
-            res = cursor.fetchone()
-            if res:
-                return AbstractNode.objects.get(pk=res[0])
-            return self
+        root_id = NodeClosure.objects.filter(descendant=self).order_by('-depth').values_list('ancestor_id', flat=True).first()
+        if root_id:
+            return AbstractNode.objects.get(pk=root_id)
+        return self
 
     def find_readable_antecedent(self, auth):
         """ Returns first antecendant node readable by <user>.
@@ -1666,6 +1696,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             contrib.node = self
             contribs.append(contrib)
         Contributor.objects.bulk_create(contribs)
+        EffectivePermission.refresh([self.id])
 
     def register_node(self, schema, auth, data, parent=None):
         """Make a frozen copy of a node.
@@ -1701,6 +1732,8 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         registered.registered_meta[schema._id] = data
 
         registered.forked_from = self.forked_from
+        # Registrations keep a copy of the logs, see clone_logs below
+        registered.inherited_logs_until = None
         registered.creator = self.creator
         registered.node_license = original.license.copy() if original.license else None
         registered.wiki_private_uuids = {}
@@ -1858,15 +1891,58 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
                 return True
         return False
 
-    # TODO: Optimize me (e.g. use bulk create)
     def fork_node(self, auth, title=None, parent=None):
-        """Recursively fork a node.
+        """Recursively fork a node. Large trees are forked by a ``ForkJob``
+        instead, see ``website.project.tasks.run_fork_job``.
 
         :param Auth auth: Consolidated authorization
         :param str title: Optional text to prepend to forked title
         :param Node parent: Sets parent, should only be non-null when recursing
         :return: Forked node
         """
+        forked = self.fork_node_without_children(auth, title=title, parent=parent)
+
+        for node_relation in self.node_relations.filter(child__is_deleted=False, is_node_link=False):
+            try:  # Catch the potential PermissionsError above
+                node_relation.child.fork_node(
+                    auth=auth,
+                    title='',
+                    parent=forked,
+                )
+            except PermissionsError:
+                pass  # If this exception is thrown omit the node from the result set
+        forked.order_fork_relations()
+
+        return forked
+
+    def order_fork_relations(self):
+        """Order the components and node links of this fork like those of the
+        node it was forked from. Node links are copied before the components
+        are forked, so they are out of order when a node has both.
+        """
+        positions = {
+            (is_node_link, child_id): position
+            for position, (is_node_link, child_id) in enumerate(
+                self.forked_from.node_relations.values_list('is_node_link', 'child_id')
+            )
+        }
+        relations = [
+            (positions.get((is_node_link, child_id if is_node_link else forked_from_id), len(positions)), relation_id)
+            for relation_id, is_node_link, child_id, forked_from_id in self.node_relations.values_list(
+                'id', 'is_node_link', 'child_id', 'child__forked_from_id'
+            )
+        ]
+        if relations != sorted(relations):
+            self.set_noderelation_order([relation_id for _, relation_id in sorted(relations)])
+
+    def fork_node_without_children(self, auth, title=None, parent=None):
+        """Fork this node, but not its components. Node links are copied.
+
+        :param Auth auth: Consolidated authorization
+        :param str title: Optional text to prepend to forked title
+        :param Node parent: Sets parent, the fork of this node's parent
+        :return: Forked node
+        """
         Registration = apps.get_model('osf.Registration')
         PREFIX = 'Fork of '
         user = auth.user
@@ -1891,6 +1967,8 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         forked.is_fork = True
         forked.forked_date = when
         forked.forked_from = original
+        # The fork's logs include the original's logs up to now, without copying them
+        forked.inherited_logs_until = original.logs.aggregate(Max('id'))['id__max']
         forked.creator = user
         forked.node_license = original.license.copy() if original.license else None
         forked.wiki_private_uuids = {}
@@ -1908,25 +1986,13 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             node_relation = NodeRelation.objects.get(parent=parent.forked_from, child=original)
             NodeRelation.objects.get_or_create(_order=node_relation._order, parent=parent, child=forked)
 
-        for node_relation in original.node_relations.filter(child__is_deleted=False):
-            node_contained = node_relation.child
-            # Fork child nodes
-            if not node_relation.is_node_link:
-                try:  # Catch the potential PermissionsError above
-                    node_contained.fork_node(
-                        auth=auth,
-                        title='',
-                        parent=forked,
-                    )
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-            else:
-                # Copy linked nodes
-                NodeRelation.objects.get_or_create(
-                    is_node_link=True,
-                    parent=forked,
-                    child=node_contained
-                )
+        # Copy linked nodes
+        for node_relation in original.node_relations.filter(child__is_deleted=False, is_node_link=True):
+            NodeRelation.objects.get_or_create(
+                is_node_link=True,
+                parent=forked,
+                child_id=node_relation.child_id
+            )
 
         if title is None:
             forked.title = PREFIX + original.title
@@ -1965,8 +2031,6 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             save=False,
         )
 
-        # Clone each log from the original node for this fork.
-        self.clone_logs(forked)
         forked.refresh_from_db()
 
         # After fork callback
@@ -1975,8 +2039,9 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
         return forked
 
-    def clone_logs(self, node, page_size=100):
-        paginator = Paginator(self.logs.order_by('pk').all(), page_size)
+    def clone_logs(self, node, page_size=100, logs=None):
+        logs = self.logs if logs is None else logs
+        paginator = Paginator(logs.order_by('pk').all(), page_size)
         for page_num in paginator.page_range:
             page = paginator.page(page_num)
             # Instantiate NodeLogs "manually"
@@ -1999,6 +2064,16 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             ]
             NodeLog.objects.bulk_create(logs_to_create)
 
+    def materialize_inherited_logs(self):
+        """Copy the logs this fork inherits (see ``get_inherited_log_bounds``)
+        to its own logs, e.g. before the node they belong to is deleted.
+        """
+        if self.inherited_logs_until is None:
+            return
+        self.clone_logs(self, logs=self.logs.exclude(node_id=self.id))
+        AbstractNode.objects.filter(id=self.id).update(inherited_logs_until=None)
+        self.inherited_logs_until = None
+
     def use_as_template(self, auth, changes=None, top_level=True, parent=None):
         """Create a new project, using an existing project as a template.
 
@@ -2048,6 +2123,8 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         # set attributes which may NOT be overridden by `changes`
         new.creator = auth.user
         new.template_node = self
+        # Templated projects start a new history: they never had the template's logs
+        new.inherited_logs_until = None
         # Need to save in order to access contributors m2m table
         new.save(suppress_log=True)
         new.add_contributor(contributor=auth.user, permissions=CREATOR_PERMISSIONS, log=False, save=False)
@@ -3034,3 +3111,17 @@ def set_parent_and_root(sender, instance, created, *args, **kwargs):
     if not instance.root:
         instance.root = instance.get_root()
         instance.save()
+
+
+@receiver(pre_delete, sender=AbstractNode)
+@receiver(pre_delete, sender=Node)
+@receiver(pre_delete, sender='osf.Registration')
+@receiver(pre_delete, sender='osf.QuickFilesNode')
+def materialize_inherited_logs(sender, instance, **kwargs):
+    # Forks lose the logs they inherit from a node when it is deleted; copy
+    # them first, forks of forks before the forks they were forked from
+    inheriting_node_ids = get_inheriting_node_ids(instance.id)
+    for node in AbstractNode.objects.filter(id__in=inheriting_node_ids).order_by('-id'):
+        node.materialize_inherited_logs()
+    # ...and keep the copies from going with it through NodeLog.original_node
+    NodeLog.objects.filter(node_id__in=inheriting_node_ids, original_node_id=instance.id).update(original_node=None)
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from .base import BaseModel, ObjectIDMixin
 
@@ -25,3 +27,139 @@ class NodeRelation(ObjectIDMixin, BaseModel):
         index_together = (
             ('is_node_link', 'child', 'parent'),
         )
+
+
+# Every (ancestor, descendant) pair implied by the component (non node link)
+# NodeRelations, computed from scratch. Used to backfill and check NodeClosure.
+EXPECTED_CLOSURE_SQL = """
+    WITH RECURSIVE closure(ancestor_id, descendant_id, depth, path) AS (
+        SELECT parent_id, child_id, 1, ARRAY[parent_id, child_id]
+        FROM osf_noderelation
+        WHERE is_node_link IS FALSE
+    UNION ALL
+        SELECT C.ancestor_id, R.child_id, C.depth + 1, C.path || R.child_id
+        FROM closure AS C
+            JOIN osf_noderelation AS R ON R.parent_id = C.descendant_id
+        WHERE R.is_node_link IS FALSE
+            AND NOT R.child_id = ANY(C.path)
+    ) SELECT ancestor_id, descendant_id, MIN(depth) AS depth
+    FROM closure
+    GROUP BY ancestor_id, descendant_id
+"""
+
+
+class NodeClosure(models.Model):
+    """One row per (ancestor, descendant) pair in the component tree, so that
+    ancestor and descendant lookups are a single indexed join instead of a
+    recursive walk of NodeRelation. Node links are not followed.
+
+    Rows are maintained by the NodeRelation signal handlers below; writes that
+    bypass them (raw SQL, ``bulk_create``) must be followed by
+    ``python manage.py backfill_node_closure``.
+    """
+    ancestor = models.ForeignKey('AbstractNode', related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey('AbstractNode', related_name='ancestor_links', on_delete=models.CASCADE)
+    # 1 for a direct parent, 2 for a grandparent...
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        index_together = (
+            ('descendant', 'depth'),
+        )
+
+    @classmethod
+    def link(cls, parent_id, child_id):
+        """Record that ``child_id`` (and its subtree) now sits below
+        ``parent_id`` (and its ancestors).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO osf_nodeclosure (ancestor_id, descendant_id, depth)
+                SELECT A.ancestor_id, D.descendant_id, A.depth + D.depth + 1
+                FROM (
+                    SELECT ancestor_id, depth FROM osf_nodeclosure WHERE descendant_id = %(parent)s
+                    UNION ALL SELECT %(parent)s, 0
+                ) AS A CROSS JOIN (
+                    SELECT descendant_id, depth FROM osf_nodeclosure WHERE ancestor_id = %(child)s
+                    UNION ALL SELECT %(child)s, 0
+                ) AS D
+                WHERE A.ancestor_id <> D.descendant_id
+                ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+            """, {'parent': parent_id, 'child': child_id})
+
+    @classmethod
+    def unlink(cls, parent_id, child_id):
+        """Remove the pairs that went through the ``parent_id`` -> ``child_id`` edge."""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM osf_nodeclosure
+                WHERE ancestor_id IN (
+                    SELECT ancestor_id FROM osf_nodeclosure WHERE descendant_id = %(parent)s
+                    UNION ALL SELECT %(parent)s
+                ) AND descendant_id IN (
+                    SELECT descendant_id FROM osf_nodeclosure WHERE ancestor_id = %(child)s
+                    UNION ALL SELECT %(child)s
+                );
+            """, {'parent': parent_id, 'child': child_id})
+
+    @classmethod
+    def find_inconsistencies(cls):
+        """Compare the table against NodeRelation.
+        :return: (missing, stale) lists of (ancestor_id, descendant_id, depth)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                WITH expected AS ({expected})
+                SELECT ancestor_id, descendant_id, depth, TRUE FROM (
+                    SELECT ancestor_id, descendant_id, depth FROM expected
+                    EXCEPT SELECT ancestor_id, descendant_id, depth FROM osf_nodeclosure
+                ) AS missing
+                UNION ALL
+                SELECT ancestor_id, descendant_id, depth, FALSE FROM (
+                    SELECT ancestor_id, descendant_id, depth FROM osf_nodeclosure
+                    EXCEPT SELECT ancestor_id, descendant_id, depth FROM expected
+                ) AS stale;
+            """.format(expected=EXPECTED_CLOSURE_SQL))
+            rows = cursor.fetchall()
+        missing = [row[:3] for row in rows if row[3]]
+        stale = [row[:3] for row in rows if not row[3]]
+        return missing, stale
+
+    @classmethod
+    def rebuild(cls):
+        """Make the table match NodeRelation.
+        :return: (inserted, deleted) row counts
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE expected_nodeclosure AS {expected};'.format(expected=EXPECTED_CLOSURE_SQL))
+            cursor.execute("""
+                DELETE FROM osf_nodeclosure AS C
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM expected_nodeclosure AS E
+                    WHERE E.ancestor_id = C.ancestor_id
+                        AND E.descendant_id = C.descendant_id
+                        AND E.depth = C.depth
+                );
+            """)
+            deleted = cursor.rowcount
+            cursor.execute("""
+                INSERT INTO osf_nodeclosure (ancestor_id, descendant_id, depth)
+                SELECT ancestor_id, descendant_id, depth FROM expected_nodeclosure
+                ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+            """)
+            inserted = cursor.rowcount
+            cursor.execute('DROP TABLE expected_nodeclosure;')
+        return inserted, deleted
+
+
+@receiver(post_save, sender=NodeRelation)
+def add_node_closure(sender, instance, created, raw=False, **kwargs):
+    if not raw and not instance.is_node_link:
+        NodeClosure.link(instance.parent_id, instance.child_id)
+
+
+@receiver(post_delete, sender=NodeRelation)
+def remove_node_closure(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        NodeClosure.unlink(instance.parent_id, instance.child_id)
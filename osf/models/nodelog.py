@@ -150,7 +150,8 @@ class NodeLog(ObjectIDMixin, BaseModel):
     user = models.ForeignKey('OSFUser', related_name='logs', db_index=True,
                              null=True, blank=True, on_delete=models.CASCADE)
     foreign_user = models.CharField(max_length=255, null=True, blank=True)
-    node = models.ForeignKey('AbstractNode', related_name='logs',
+    # AbstractNode.logs also includes the logs a fork inherits
+    node = models.ForeignKey('AbstractNode', related_name='own_logs',
                              db_index=True, null=True, blank=True, on_delete=models.CASCADE)
     original_node = models.ForeignKey('AbstractNode', db_index=True,
                                       null=True, blank=True, on_delete=models.CASCADE)
@@ -0,0 +1,119 @@
+from django.db import connection, models
+from django.utils import timezone
+
+from framework.metrics import metrics
+from osf.utils.fields import NonNaiveDateTimeField
+from website import settings as osf_settings
+
+ENQUEUE_SQL = """
+    INSERT INTO osf_queuedsearchupdate (object_type, object_id, include_files, created, claimed, retries)
+    SELECT %(object_type)s, unnest(%(ids)s::int[]), %(include_files)s, now(), NULL, 0
+    ON CONFLICT (object_type, object_id) DO UPDATE SET
+        include_files = osf_queuedsearchupdate.include_files OR EXCLUDED.include_files,
+        retries = 0,
+        -- An entry that is being indexed must be indexed again
+        created = CASE WHEN osf_queuedsearchupdate.claimed IS NULL
+                       THEN osf_queuedsearchupdate.created
+                       ELSE EXCLUDED.created END,
+        claimed = NULL;
+"""
+
+# Claims are stamped with the statement timestamp so that release only removes
+# entries that have not been enqueued again since they were claimed
+CLAIM_SQL = """
+    UPDATE osf_queuedsearchupdate SET claimed = statement_timestamp()
+    WHERE id IN (
+        SELECT id FROM osf_queuedsearchupdate
+        WHERE claimed IS NULL OR claimed < statement_timestamp() - %(timeout)s * interval '1 second'
+        ORDER BY created
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, object_type, object_id, include_files, created, claimed, retries;
+"""
+
+# Entries that failed to index keep their claim, so they are retried once it times out
+RETRY_SQL = """
+    UPDATE osf_queuedsearchupdate SET retries = retries + 1
+    WHERE (id, claimed) IN (SELECT unnest(%s::int[]), unnest(%s::timestamptz[]));
+"""
+
+
+class QueuedSearchUpdate(models.Model):
+    """An object whose search document is out of date.
+
+    Saves record the object here, in the same transaction as the change, and
+    ``website.search.elastic_search.drain_search_queue`` reindexes the queued
+    objects in batches. There is at most one entry per object; ``created`` is
+    when it first became stale, which is what indexing lag is measured from.
+    """
+    NODE = 'node'
+    FILE = 'file'
+    USER = 'user'
+    OBJECT_TYPE_CHOICES = (
+        (NODE, 'node'),
+        (FILE, 'file'),
+        (USER, 'user'),
+    )
+
+    object_type = models.CharField(max_length=8, choices=OBJECT_TYPE_CHOICES)
+    object_id = models.IntegerField()
+    # Whether the files of a node must be reindexed as well
+    include_files = models.BooleanField(default=False)
+    created = NonNaiveDateTimeField(default=timezone.now, db_index=True)
+    # Set while a drain is indexing the entry
+    claimed = NonNaiveDateTimeField(null=True, blank=True)
+    # Drains that failed to index the entry since it was queued
+    retries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('object_type', 'object_id')
+
+    def __repr__(self):
+        return '<QueuedSearchUpdate {} {}>'.format(self.object_type, self.object_id)
+
+    @classmethod
+    def enqueue(cls, object_type, ids, include_files=False):
+        ids = [int(id_) for id_ in ids]
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(ENQUEUE_SQL, {'object_type': object_type, 'ids': ids, 'include_files': include_files})
+
+    @classmethod
+    def claim(cls, limit):
+        """Claim up to ``limit`` of the oldest entries that are not being
+        indexed by another drain. Claims that are not released within
+        ``SEARCH_QUEUE_CLAIM_TIMEOUT`` seconds are assumed to have failed and
+        may be claimed again.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(CLAIM_SQL, {'limit': limit, 'timeout': osf_settings.SEARCH_QUEUE_CLAIM_TIMEOUT})
+            return [cls(*row) for row in cursor.fetchall()]
+
+    @classmethod
+    def release(cls, entries):
+        """Remove claimed ``entries`` once they have been indexed."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM osf_queuedsearchupdate WHERE (id, claimed) IN (SELECT unnest(%s::int[]), unnest(%s::timestamptz[]));',
+                [[entry.id for entry in entries], [entry.claimed for entry in entries]]
+            )
+
+    @classmethod
+    def retry(cls, entries):
+        """Count a failed attempt to index claimed ``entries``. They are
+        claimed again once their claim times out.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(RETRY_SQL, [[entry.id for entry in entries], [entry.claimed for entry in entries]])
+
+    @classmethod
+    def lag(cls):
+        """Seconds since the oldest queued change, or 0 if the queue is empty."""
+        oldest = cls.objects.order_by('created').values_list('created', flat=True).first()
+        return (timezone.now() - oldest).total_seconds() if oldest else 0
+
+
+metrics.register_gauge('search.queue.lag_seconds', QueuedSearchUpdate.lag)
+metrics.register_gauge('search.queue.size', lambda: QueuedSearchUpdate.objects.count())
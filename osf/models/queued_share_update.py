@@ -0,0 +1,137 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, models
+from django.utils import timezone
+
+from framework.metrics import metrics
+from osf.utils.fields import NonNaiveDateTimeField
+from website import settings as osf_settings
+
+ENQUEUE_SQL = """
+    INSERT INTO osf_queuedshareupdate (object_type, object_id, share_type, old_subjects, retries, created, available, claimed)
+    SELECT %(object_type)s, unnest(%(ids)s::int[]), %(share_type)s, %(old_subjects)s::int[], 0, now(), now(), NULL
+    ON CONFLICT (object_type, object_id) DO UPDATE SET
+        share_type = EXCLUDED.share_type,
+        -- Subjects removed by any of the merged changes must be sent as deleted
+        old_subjects = ARRAY(
+            SELECT DISTINCT unnest(osf_queuedshareupdate.old_subjects || EXCLUDED.old_subjects)
+        ),
+        -- An entry that is being sent must be sent again
+        created = CASE WHEN osf_queuedshareupdate.claimed IS NULL
+                       THEN osf_queuedshareupdate.created
+                       ELSE EXCLUDED.created END,
+        retries = 0,
+        available = EXCLUDED.available,
+        claimed = NULL;
+"""
+
+# Claims are stamped with the statement timestamp so that release and retry
+# only touch entries that have not been enqueued again since they were claimed
+CLAIM_SQL = """
+    UPDATE osf_queuedshareupdate SET claimed = statement_timestamp()
+    WHERE id IN (
+        SELECT id FROM osf_queuedshareupdate
+        WHERE available <= statement_timestamp()
+        AND (claimed IS NULL OR claimed < statement_timestamp() - %(timeout)s * interval '1 second')
+        ORDER BY created
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, object_type, object_id, share_type, old_subjects, retries, created, available, claimed;
+"""
+
+RETRY_SQL = """
+    UPDATE osf_queuedshareupdate SET
+        retries = retries + 1,
+        available = statement_timestamp() + %(countdown)s * interval '1 second',
+        claimed = NULL
+    WHERE (id, claimed) IN (SELECT unnest(%(ids)s::int[]), unnest(%(claims)s::timestamptz[]));
+"""
+
+
+class QueuedShareUpdate(models.Model):
+    """An object whose SHARE record is out of date.
+
+    Node and preprint changes record the object here, and
+    ``website.share.tasks.flush_share_outbox`` sends the queued objects to
+    SHARE in batches. There is at most one entry per object, so a burst of
+    edits is sent once. Entries whose batch failed on SHARE's side are retried
+    once ``available`` has passed.
+    """
+    NODE = 'node'
+    PREPRINT = 'preprint'
+    OBJECT_TYPE_CHOICES = (
+        (NODE, 'node'),
+        (PREPRINT, 'preprint'),
+    )
+
+    object_type = models.CharField(max_length=8, choices=OBJECT_TYPE_CHOICES)
+    object_id = models.IntegerField()
+    # SHARE type of a preprint, or None for the provider's default
+    share_type = models.CharField(max_length=64, null=True, blank=True)
+    # Ids of subjects removed from a preprint since it was last sent
+    old_subjects = ArrayField(models.IntegerField(), default=list, blank=True)
+    retries = models.PositiveIntegerField(default=0)
+    created = NonNaiveDateTimeField(default=timezone.now, db_index=True)
+    # When the entry may be sent; later than created while backing off
+    available = NonNaiveDateTimeField(default=timezone.now)
+    # Set while a flush is sending the entry
+    claimed = NonNaiveDateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('object_type', 'object_id')
+
+    def __repr__(self):
+        return '<QueuedShareUpdate {} {}>'.format(self.object_type, self.object_id)
+
+    @classmethod
+    def enqueue(cls, object_type, ids, share_type=None, old_subjects=None):
+        ids = [int(id_) for id_ in ids]
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(ENQUEUE_SQL, {
+                'object_type': object_type,
+                'ids': ids,
+                'share_type': share_type,
+                'old_subjects': [int(id_) for id_ in old_subjects or []],
+            })
+
+    @classmethod
+    def claim(cls, limit):
+        """Claim up to ``limit`` of the oldest available entries that are not
+        being sent by another flush. Claims that are not released within
+        ``SHARE_OUTBOX_CLAIM_TIMEOUT`` seconds are assumed to have failed and
+        may be claimed again.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(CLAIM_SQL, {'limit': limit, 'timeout': osf_settings.SHARE_OUTBOX_CLAIM_TIMEOUT})
+            return [cls(*row) for row in cursor.fetchall()]
+
+    @classmethod
+    def release(cls, entries):
+        """Remove claimed ``entries`` once they have been sent."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM osf_queuedshareupdate WHERE (id, claimed) IN (SELECT unnest(%s::int[]), unnest(%s::timestamptz[]));',
+                [[entry.id for entry in entries], [entry.claimed for entry in entries]]
+            )
+
+    @classmethod
+    def retry(cls, entries, countdown):
+        """Make claimed ``entries`` available again in ``countdown`` seconds."""
+        with connection.cursor() as cursor:
+            cursor.execute(RETRY_SQL, {
+                'ids': [entry.id for entry in entries],
+                'claims': [entry.claimed for entry in entries],
+                'countdown': countdown,
+            })
+
+    @classmethod
+    def lag(cls):
+        """Seconds since the oldest queued change, or 0 if the outbox is empty."""
+        oldest = cls.objects.order_by('created').values_list('created', flat=True).first()
+        return (timezone.now() - oldest).total_seconds() if oldest else 0
+
+
+metrics.register_gauge('share.outbox.lag_seconds', QueuedShareUpdate.lag)
+metrics.register_gauge('share.outbox.depth', lambda: QueuedShareUpdate.objects.count())
@@ -0,0 +1,24 @@
+from django.db import models
+from django.utils import timezone
+
+from osf.utils.fields import NonNaiveDateTimeField
+
+
+class ThrottleCounter(models.Model):
+    """Number of requests made under one API throttle key in one time bucket.
+
+    Written by ``api.base.throttle_store.DatabaseThrottleStore``; see that module
+    for how buckets are counted. ``key`` is a hash of the throttle's cache key.
+    """
+    key = models.CharField(max_length=64)
+    bucket = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+    # When the bucket no longer falls in any window it may be counted in
+    expires = NonNaiveDateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('key', 'bucket')
+
+    @classmethod
+    def delete_expired(cls):
+        return cls.objects.filter(expires__lt=timezone.now()).delete()[0]
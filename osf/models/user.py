@@ -31,11 +31,13 @@ from framework.auth.exceptions import (ChangePasswordError, ExpiredTokenError,
                                        MergeConfirmedRequiredError,
                                        MergeConflictError)
 from framework.exceptions import PermissionsError
+from framework.sessions.store import load_session
 from framework.sessions.utils import remove_sessions_for_user
 from osf.utils.requests import get_current_request
 from osf.exceptions import reraise_django_validation_errors, MaxRetriesError
 from osf.models.base import BaseModel, GuidMixin, GuidMixinQuerySet
 from osf.models.contributor import Contributor, RecentlyAddedContributor
+from osf.models.effective_permission import EffectivePermission
 from osf.models.institution import Institution
 from osf.models.mixins import AddonModelMixin
 from osf.models.session import Session
@@ -681,6 +683,7 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
                 node.contributor_set.filter(user=user).delete()
             else:
                 node.contributor_set.filter(user=user).update(user=self)
+                EffectivePermission.refresh([node.id], [user.id, self.id])
 
             node.save()
 
@@ -1207,7 +1210,7 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
 
         """
         for node in self.contributor_to:
-            node.update_search()
+            node.update_search(include_files=False)
 
     def update_date_last_login(self):
         self.date_last_login = timezone.now()
@@ -1333,6 +1336,22 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
         """Returns number of "shared projects" (projects that both users are contributors for)"""
         return self._projects_in_common_query(other_user).count()
 
+    def n_projects_in_common_by_user(self, other_users):
+        """Returns the number of "shared projects" with each of other_users in a single query,
+        as a dict keyed by user id. Users without shared projects are omitted.
+        """
+        shared = (self.nodes
+                  .filter(is_deleted=False)
+                  .exclude(type='osf.collection')
+                  .values('id'))
+        return dict(
+            Contributor.objects
+            .filter(user__in=other_users, node__in=shared)
+            .values('user_id')
+            .annotate(n=models.Count('node_id', distinct=True))
+            .values_list('user_id', 'n')
+        )
+
     def add_unclaimed_record(self, node, referrer, given_name, email=None):
         """Add a new project entry in the unclaimed records dictionary.
 
@@ -1466,7 +1485,7 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
         except itsdangerous.BadSignature:
             return None
 
-        user_session = Session.load(token)
+        user_session = load_session(token)
 
         if user_session is None:
             return None
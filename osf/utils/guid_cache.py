@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Read-through caches of ``osf.models.Guid`` rows, used by ``Guid.load``.
+
+A guid maps to the same (content type, object id) for its whole life unless it
+is explicitly re-pointed, so resolving a short url or an embed can skip the
+``osf_guid`` query. Only the mapping is cached; the referent is always loaded
+from the database.
+
+The backend is chosen with ``settings.GUID_CACHE``:
+
+* ``'local'``: a bounded, in-process LRU. Saving or deleting a ``Guid`` only
+  evicts it from the cache of the process that made the change, so other
+  processes may resolve a re-pointed guid to its old referent for up to
+  ``GUID_CACHE_TTL`` seconds.
+* ``'django'``: the Django cache named by ``settings.GUID_CACHE_ALIAS``
+  (e.g. a memcached or redis cache shared by every worker).
+* ``None``: no caching; every lookup goes to the database.
+
+Queryset ``update()`` calls bypass the eviction signals; call ``evict_guid``
+after re-pointing guids in bulk.
+"""
+import logging
+
+from django.apps import apps
+from django.db import transaction
+
+from framework.caching import BaseStore, DjangoCacheMixin, NullStore, StoreSelector, TTLCache
+from framework.metrics import metrics
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'osf-guid:'
+
+
+def to_cache(guid):
+    return (guid.id, guid._id, guid.content_type_id, guid.object_id, guid.created)
+
+
+def from_cache(value):
+    Guid = apps.get_model('osf.Guid')
+    id_, _id, content_type_id, object_id, created = value
+    guid = Guid(id=id_, _id=_id, content_type_id=content_type_id, object_id=object_id, created=created)
+    guid._state.adding = False
+    guid._state.db = 'default'
+    return guid
+
+
+class LocalGuidStore(BaseStore):
+    """Per-process LRU of guid rows with a per-entry TTL."""
+
+    def __init__(self, max_size=None, ttl=None):
+        self.entries = TTLCache(
+            max_size or settings.GUID_CACHE_MAX_SIZE,
+            ttl or settings.GUID_CACHE_TTL,
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, guid_id):
+        value = self.entries.get(guid_id)
+        return from_cache(value) if value is not None else None
+
+    def set(self, guid):
+        self.entries.set(guid._id, to_cache(guid))
+
+    def delete(self, guid_id):
+        self.entries.delete(guid_id)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class DjangoGuidStore(DjangoCacheMixin, BaseStore):
+    """Store backed by a (possibly shared) Django cache."""
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.GUID_CACHE_ALIAS
+        self.ttl = ttl or settings.GUID_CACHE_TTL
+
+    def get(self, guid_id):
+        value = self.cache.get(CACHE_KEY_PREFIX + guid_id)
+        return from_cache(value) if value is not None else None
+
+    def set(self, guid):
+        self.cache.set(CACHE_KEY_PREFIX + guid._id, to_cache(guid), self.ttl)
+
+    def delete(self, guid_id):
+        self.cache.delete(CACHE_KEY_PREFIX + guid_id)
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    'local': LocalGuidStore,
+    'django': DjangoGuidStore,
+    None: NullStore,
+}
+
+get_store = StoreSelector(BACKENDS, lambda: settings.GUID_CACHE)
+
+
+def load_guid(guid_id):
+    """Load a guid by ``_id``, consulting the cache before the database.
+    Returns ``None`` if no such guid exists.
+    """
+    if not guid_id or not isinstance(guid_id, basestring):
+        return None
+    guid_id = guid_id.lower()
+    store = get_store()
+    try:
+        guid = store.get(guid_id)
+    except Exception:
+        logger.exception('Failed to read guid {} from cache'.format(guid_id))
+        guid = None
+    if guid is not None:
+        metrics.incr('guid_cache.hit')
+        return guid
+    metrics.incr('guid_cache.miss')
+    Guid = apps.get_model('osf.Guid')
+    try:
+        guid = Guid.objects.get(_id=guid_id)
+    except Guid.DoesNotExist:
+        return None
+    cache_guid(guid)
+    return guid
+
+
+def cache_guid(guid):
+    try:
+        get_store().set(guid)
+    except Exception:
+        logger.exception('Failed to cache guid {}'.format(guid._id))
+
+
+def evict_guid(guid_id):
+    """Evict ``guid_id`` now, and again once the current transaction commits,
+    in case another request cached the old row in the meantime.
+    """
+    guid_id = guid_id.lower()
+
+    def evict():
+        try:
+            get_store().delete(guid_id)
+        except Exception:
+            logger.exception('Failed to evict guid {} from cache'.format(guid_id))
+    evict()
+    transaction.on_commit(evict)
@@ -13,8 +13,10 @@ from flask import Flask
 from datetime import datetime
 
 from framework import analytics, sessions
+from framework.analytics.buffer import CounterBuffer, counter_buffer
 from framework.sessions import session
-from osf.models import PageCounter, Session
+from osf.management.commands.explode_counter_dates import explode_page_counters, explode_user_activity_counters
+from osf.models import PageCounter, PageCounterDay, Session, UserActivityCounter
 
 from tests.base import OsfTestCase
 from osf_tests.factories import UserFactory, ProjectFactory
@@ -45,6 +47,52 @@ class TestAnalytics(OsfTestCase):
         analytics.increment_user_activity_counters(user._id, 'project_created', date.isoformat())
         assert_equal(user.get_activity_points(), 1)
 
+    def test_increment_user_activity_counters_writes_day_rows(self):
+        user = UserFactory()
+        date = timezone.now()
+        date_string = date.strftime('%Y/%m/%d')
+
+        analytics.increment_user_activity_counters(user._id, 'project_created', date.isoformat())
+        analytics.increment_user_activity_counters(user._id, 'project_created', date.isoformat())
+        analytics.increment_user_activity_counters(user._id, 'file_added', date.isoformat())
+
+        counter = UserActivityCounter.objects.get(_id=user._id)
+        assert_equal(counter.total, 3)
+        assert_equal(counter.days.count(), 2)
+        assert_equal(counter.date, {date_string: {'total': 3}})
+        assert_equal(counter.action['project_created'], {'total': 2, 'date': {date_string: 2}})
+
+    def test_explode_counter_dates(self):
+        user = UserFactory()
+        page_counter = PageCounter.objects.create(_id='node:abcde', total=3, unique=2, legacy_date={
+            '2017/01/01': {'total': 1, 'unique': 1},
+            '2017/01/02': {'total': 2, 'unique': 1},
+        })
+        activity_counter = UserActivityCounter.objects.create(
+            _id=user._id,
+            total=3,
+            legacy_action={'project_created': {'total': 2, 'date': {'2017/01/01': 2}}},
+            legacy_date={'2017/01/01': {'total': 3}},
+        )
+        page_date, activity_date, activity_action = page_counter.date, activity_counter.date, activity_counter.action
+
+        assert_equal(explode_page_counters(batch_size=1), 1)
+        assert_equal(explode_user_activity_counters(batch_size=1), 1)
+
+        page_counter.reload()
+        activity_counter.reload()
+        assert_equal(page_counter.legacy_date, {})
+        assert_equal(page_counter.days.count(), 2)
+        assert_equal(page_counter.date, page_date)
+        assert_equal(activity_counter.legacy_date, {})
+        assert_equal(activity_counter.legacy_action, {})
+        assert_equal(activity_counter.date, activity_date)
+        assert_equal(activity_counter.action, activity_action)
+        assert_equal(activity_counter.days.get(action='').total, 1)
+
+        # Re-running is a no-op
+        assert_equal(explode_page_counters(batch_size=1), 0)
+
 
 class UpdateCountersTestCase(OsfTestCase):
 
@@ -54,8 +102,10 @@ class UpdateCountersTestCase(OsfTestCase):
         self.ctx.push()
         # TODO: Think of something better @sloria @jmcarp
         sessions.set_session(Session())
+        counter_buffer.drain()
 
     def tearDown(self):
+        counter_buffer.drain()
         self.ctx.pop()
 
 
@@ -167,6 +217,61 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters(page)
         assert_equal(count, (3, 5))
 
+    def test_update_counter_is_buffered_until_flush(self):
+        page = 'node:{}'.format(self.node._id)
+        analytics.update_counter(page)
+
+        assert_false(PageCounter.objects.filter(_id=page).exists())
+        assert_equal(analytics.get_basic_counters(page), (1, 1))
+
+        counter_buffer.flush()
+
+        counter = PageCounter.objects.get(_id=page)
+        assert_equal((counter.unique, counter.total), (1, 1))
+        assert_equal(analytics.get_basic_counters(page), (1, 1))
+
+    def test_flush_adds_to_existing_counts(self):
+        page = 'node:{}'.format(self.node._id)
+        date_string = timezone.now().strftime('%Y/%m/%d')
+        PageCounter.objects.create(_id=page, total=5, unique=3, legacy_date={date_string: {'total': 5, 'unique': 3}})
+
+        analytics.update_counter(page)
+        session.data['visited'].append(page)
+        analytics.update_counter(page)
+        assert_equal(analytics.get_basic_counters(page), (4, 7))
+
+        counter_buffer.flush()
+
+        counter = PageCounter.objects.get(_id=page)
+        assert_equal((counter.unique, counter.total), (4, 7))
+        assert_equal(counter.date[date_string], {'total': 7, 'unique': 4})
+        assert_equal(counter.days.get().total, 2)
+        assert_equal(analytics.get_basic_counters(page), (4, 7))
+
+    def test_get_daily_counts_range(self):
+        page = 'node:{}'.format(self.node._id)
+        counter = PageCounter.objects.create(_id=page, legacy_date={'2017/01/01': {'total': 3, 'unique': 1}})
+        PageCounterDay.objects.create(page=counter, date=datetime(2017, 1, 2).date(), total=4, unique=2)
+        PageCounterDay.objects.create(page=counter, date=datetime(2017, 1, 3).date(), total=5, unique=3)
+
+        assert_equal(counter.date, {
+            '2017/01/01': {'total': 3, 'unique': 1},
+            '2017/01/02': {'total': 4, 'unique': 2},
+            '2017/01/03': {'total': 5, 'unique': 3},
+        })
+        assert_equal(
+            counter.get_daily_counts(start=datetime(2017, 1, 1).date(), end=datetime(2017, 1, 2).date()),
+            {datetime(2017, 1, 1).date(): {'total': 3, 'unique': 1}, datetime(2017, 1, 2).date(): {'total': 4, 'unique': 2}}
+        )
+
+    def test_get_totals_by_prefix_merges_pending(self):
+        prefix = 'download:{}:{}:'.format(self.node._id, self.fid)
+        PageCounter.objects.create(_id=prefix + '0', total=2, unique=1)
+        analytics.update_counter(prefix + '0')
+        analytics.update_counter(prefix + '1')
+
+        assert_equal(PageCounter.get_totals_by_prefix(prefix), {prefix + '0': 3, prefix + '1': 1})
+
     @unittest.skip('Reverted the fix for #2281. Unskip this once we use GUIDs for keys in the download counts collection')
     def test_update_counters_different_files(self):
         # Regression test for https://github.com/CenterForOpenScience/osf.io/issues/2281
@@ -194,3 +299,34 @@ class TestUpdateCounters(UpdateCountersTestCase):
         assert_equal(count, (1, 2))
         count = analytics.get_basic_counters('download:{0}:{1}'.format(self.node._id, fid2))
         assert_equal(count, (1, 1))
+
+
+class TestCounterBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = CounterBuffer(flush_interval=60, flush_threshold=2)
+
+    def test_increments_are_merged_per_page_and_day(self):
+        self.buffer.increment('node:abc12', '2017/01/01', total=1, unique=1)
+        self.buffer.increment('node:abc12', '2017/01/01', total=1)
+        self.buffer.increment('node:abc12', '2017/01/02', total=1, unique=1)
+
+        assert_equal(len(self.buffer), 2)
+        assert_equal(self.buffer.pending('node:abc12'), (2, 3))
+        assert_is_none(self.buffer.pending('node:xyz12'))
+
+    def test_is_due_on_threshold(self):
+        assert_false(self.buffer.is_due())
+        self.buffer.increment('node:abc12', '2017/01/01', total=1)
+        assert_false(self.buffer.is_due())
+        self.buffer.increment('node:xyz12', '2017/01/01', total=1)
+        assert_true(self.buffer.is_due())
+
+    def test_drain_and_restore(self):
+        self.buffer.increment('node:abc12', '2017/01/01', total=1, unique=1)
+        pending = self.buffer.drain()
+        assert_equal(len(self.buffer), 0)
+        assert_equal(pending[('node:abc12', '2017/01/01')]['total'], 1)
+
+        self.buffer.restore(pending)
+        assert_equal(self.buffer.pending('node:abc12'), (1, 1))
@@ -2,6 +2,7 @@
 """Unit tests for website.app."""
 
 import framework
+import framework.analytics.buffer
 
 from flask import Flask
 from nose.tools import *  # noqa (PEP8 asserts)
@@ -38,6 +39,7 @@ def test_attach_handlers():
         framework.django.handlers.close_old_django_db_connections,
         framework.celery_tasks.handlers.celery_teardown_request,
         framework.transactions.handlers.transaction_teardown_request,
+        framework.analytics.buffer.flush_counters_if_due,
     }
 
     # Check that necessary handlers are attached and correctly ordered
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import time
+
+import mock
+import psycopg2
+import pytest
+from django.conf import settings
+from django.db.utils import OperationalError
+
+from osf.db import router as router_module
+from osf.db.backends.postgresql.base import WriteTrackingCursorWrapper
+from osf.db.router import PostgreSQLFailoverRouter, pin_to_primary, unpin
+
+
+@pytest.fixture()
+def health():
+    # name -> (transaction_read_only, replication lag), or None if unreachable
+    return {
+        'default': (u'off', 0.0),
+        'replica1': (u'on', 0.5),
+        'replica2': (u'on', 0.5),
+    }
+
+
+@pytest.fixture()
+def primary_conn():
+    conn = mock.MagicMock(in_atomic_block=False, savepoint_ids=[], run_on_commit=[])
+    conn.on_commit.side_effect = lambda func: conn.run_on_commit.append((set(conn.savepoint_ids), func))
+    return conn
+
+
+@pytest.yield_fixture()
+def fake_databases(health):
+    with mock.patch.multiple(
+        PostgreSQLFailoverRouter,
+        _get_dsns=lambda self: self.DSNS.update({name: 'postgres://{}'.format(name) for name in health}),
+        _query=lambda self, name, dsn: health[name],
+    ):
+        yield
+
+
+@pytest.yield_fixture()
+def router(fake_databases, primary_conn):
+    with mock.patch.object(router_module, 'connections', {'default': primary_conn}), \
+            mock.patch.object(router_module, 'in_request', return_value=True):
+        unpin()
+        yield PostgreSQLFailoverRouter()
+        unpin()
+
+
+class TestPostgreSQLFailoverRouter:
+
+    def test_detects_primary_and_replicas(self, router):
+        assert router.CACHED_MASTER == 'default'
+        assert sorted(router.REPLICAS) == ['replica1', 'replica2']
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self, router):
+        assert router.db_for_read(None) in ('replica1', 'replica2')
+        assert router.db_for_write(None) == 'default'
+
+    def test_lagging_replica_is_not_read_from(self, health, fake_databases):
+        health['replica2'] = (u'on', 60.0)
+        assert PostgreSQLFailoverRouter().REPLICAS == ['replica1']
+
+    def test_unreachable_replica_is_not_read_from(self, health, fake_databases):
+        health['replica1'] = None
+        assert PostgreSQLFailoverRouter().REPLICAS == ['replica2']
+
+    def test_reads_go_to_primary_without_healthy_replicas(self, router):
+        router.REPLICAS = []
+        assert router.db_for_read(None) == 'default'
+
+    def test_reads_after_write_are_pinned_to_primary(self, router):
+        router.db_for_write(None)
+        assert router.db_for_read(None) == 'default'
+        unpin()
+        assert router.db_for_read(None) in ('replica1', 'replica2')
+
+    def test_pin_expires(self, router):
+        pin_to_primary()
+        with mock.patch('osf.db.router.time.time', return_value=time.time() + settings.DATABASE_REPLICA_MAX_LAG + 1):
+            assert router.db_for_read(None) in ('replica1', 'replica2')
+
+    def test_pin_lasts_at_least_replica_lag(self, router):
+        pin_to_primary(seconds=0)
+        with mock.patch('osf.db.router.time.time', return_value=time.time() + settings.DATABASE_REPLICA_MAX_LAG - 1):
+            assert router.db_for_read(None) == 'default'
+
+    def test_reads_outside_requests_go_to_primary(self, router):
+        with mock.patch.object(router_module, 'in_request', return_value=False):
+            assert router.db_for_read(None) == 'default'
+
+    def test_reads_in_request_transaction_go_to_replica(self, router, primary_conn):
+        primary_conn.in_atomic_block = True
+        assert router.db_for_read(None) in ('replica1', 'replica2')
+        primary_conn.savepoint_ids = ['s1']
+        assert router.db_for_read(None) == 'default'
+
+    def test_reads_after_write_in_request_transaction_go_to_primary(self, router, primary_conn):
+        primary_conn.in_atomic_block = True
+        router.db_for_write(None)
+        assert router.db_for_read(None) == 'default'
+        # Still pinned once the transaction commits, but not if it rolls back
+        assert not router_module._local.pinned_until
+        primary_conn.run_on_commit = []
+        assert router.db_for_read(None) in ('replica1', 'replica2')
+
+    def test_raw_cursor_writes_pin_transaction_to_primary(self, router, primary_conn):
+        primary_conn.in_atomic_block = True
+        cursor = WriteTrackingCursorWrapper(mock.Mock(), primary_conn)
+        cursor.execute('SELECT 1')
+        assert router.db_for_read(None) in ('replica1', 'replica2')
+        cursor.execute('\n  INSERT INTO osf_basefilenode (name) VALUES (%s)', ['copy'])
+        assert router.db_for_read(None) == 'default'
+        assert len(primary_conn.run_on_commit) == 1
+
+    def test_reads_of_instance_stay_on_its_database(self, router):
+        instance = mock.Mock()
+        instance._state.db = 'replica2'
+        assert router.db_for_read(None, instance=instance) == 'replica2'
+
+    def test_failover_is_detected_after_check_interval(self, router, health):
+        health['default'] = None
+        health['replica1'] = (u'off', 0.0)
+        assert router.db_for_write(None) == 'default'
+        router.CHECKED_AT = 0
+        assert router.db_for_write(None) == 'replica1'
+        assert router.REPLICAS == ['replica2']
+
+    def test_keeps_primary_through_transient_failures(self, router, health):
+        health['default'] = None
+        for _ in range(settings.DATABASE_ROUTER_MAX_FAILURES - 1):
+            router.CHECKED_AT = 0
+            assert router.db_for_write(None) == 'default'
+
+        health['default'] = (u'off', 0.0)
+        router.CHECKED_AT = 0
+        assert router.db_for_write(None) == 'default'
+        assert router.failures == 0
+
+    def test_raises_after_consecutive_failures(self, router, health):
+        health['default'] = None
+        for _ in range(settings.DATABASE_ROUTER_MAX_FAILURES - 1):
+            router.CHECKED_AT = 0
+            router.db_for_read(None)
+        router.CHECKED_AT = 0
+        with pytest.raises(OperationalError):
+            router.db_for_read(None)
+
+        health['default'] = (u'off', 0.0)
+        router.CHECKED_AT = 0
+        assert router.db_for_write(None) == 'default'
+
+    def test_forked_process_gets_its_own_connections(self, router):
+        inherited = mock.Mock()
+        router._conns['default'] = inherited
+        lock = router._lock
+        with mock.patch.object(router_module.os, 'getpid', return_value=router._pid + 1):
+            router.db_for_write(None)
+            assert router._conns == {}
+            assert router._lock is not lock
+        assert not inherited.close.called
+
+    def test_allow_relation_between_known_databases(self, router):
+        obj1, obj2 = mock.Mock(), mock.Mock()
+        obj1._state.db, obj2._state.db = 'default', 'replica1'
+        assert router.allow_relation(obj1, obj2) is True
+        obj2._state.db = 'other'
+        assert router.allow_relation(obj1, obj2) is None
+
+    def test_only_primary_is_migrated(self, router):
+        assert router.allow_migrate('replica1', 'osf') is False
+        assert router.allow_migrate('default', 'osf') is None
+
+
+class TestHealthCheckQuery:
+
+    @pytest.fixture()
+    def router(self):
+        router = PostgreSQLFailoverRouter.__new__(PostgreSQLFailoverRouter)
+        router._reset_connections()
+        return router
+
+    def test_unreachable_database_is_skipped(self, router):
+        with mock.patch.object(PostgreSQLFailoverRouter, '_get_conn', side_effect=psycopg2.OperationalError):
+            assert router._query('replica1', 'postgres://replica1') is None
+
+    def test_broken_connection_is_replaced(self, router):
+        broken = mock.Mock(closed=False)
+        broken.cursor.side_effect = psycopg2.InterfaceError
+        fresh = mock.Mock(closed=False)
+        fresh.cursor.return_value.fetchone.return_value = (u'on', 1.5)
+        router._conns['replica1'] = broken
+        with mock.patch.object(PostgreSQLFailoverRouter, '_get_conn', return_value=fresh):
+            assert router._query('replica1', 'postgres://replica1') == (u'on', 1.5)
+            assert broken.close.called
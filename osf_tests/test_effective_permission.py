@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from framework.auth.core import Auth
+from osf.models import AbstractNode, EffectivePermission, NodeRelation
+from osf.utils.permissions import ADMIN, READ, WRITE
+from osf_tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def permissions(user, node):
+    return EffectivePermission.objects.filter(user=user, node=node).values('read', 'write', 'admin', 'parent_admin').first()
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project():
+    return ProjectFactory()
+
+
+@pytest.fixture()
+def child(project):
+    return NodeFactory(parent=project, creator=project.creator)
+
+
+@pytest.fixture()
+def grandchild(child):
+    return NodeFactory(parent=child, creator=child.creator)
+
+
+class TestEffectivePermission:
+
+    def test_contributor_permissions_are_indexed(self, user, project):
+        project.add_contributor(user, permissions=[READ, WRITE], auth=Auth(project.creator), save=True)
+        assert permissions(user, project) == {'read': True, 'write': True, 'admin': False, 'parent_admin': False}
+
+    def test_admin_of_ancestor_has_parent_admin_on_descendants(self, user, project, child, grandchild):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        assert permissions(user, grandchild) == {'read': False, 'write': False, 'admin': False, 'parent_admin': True}
+        assert grandchild.has_permission(user, 'read')
+        assert not grandchild.has_permission(user, 'read', check_parent=False)
+        assert not grandchild.has_permission(user, 'write')
+
+    def test_permission_change_updates_descendants(self, user, project, grandchild):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        project.set_permissions(user, [READ], save=True)
+        assert permissions(user, project)['admin'] is False
+        assert permissions(user, grandchild) is None
+        assert not grandchild.has_permission(user, 'read')
+
+    def test_removing_contributor_removes_permissions(self, user, project, child):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        project.remove_contributor(user, auth=Auth(project.creator))
+        assert permissions(user, project) is None
+        assert permissions(user, child) is None
+
+    def test_attaching_and_detaching_subtree(self, user, project):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        subtree = ProjectFactory()
+        leaf = NodeFactory(parent=subtree, creator=subtree.creator)
+
+        relation = NodeRelation.objects.create(parent=project, child=subtree, is_node_link=False)
+        assert leaf.has_permission(user, 'read')
+        assert leaf in AbstractNode.objects.can_view(user=user)
+
+        relation.delete()
+        assert not leaf.has_permission(user, 'read')
+        assert leaf not in AbstractNode.objects.can_view(user=user)
+
+    def test_node_links_do_not_grant_permissions(self, user, project):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        linked = ProjectFactory()
+        project.add_node_link(linked, auth=Auth(project.creator), save=True)
+        assert not linked.has_permission(user, 'read')
+
+    def test_can_view_uses_explicit_and_implicit_permissions(self, user, project, child, grandchild):
+        other = ProjectFactory()
+        other.add_contributor(user, permissions=[READ], auth=Auth(other.creator), save=True)
+        child.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(child.creator), save=True)
+        visible = set(AbstractNode.objects.can_view(user=user))
+        assert {other, child, grandchild} <= visible
+        assert project not in visible
+
+    def test_rebuild_restores_rows(self, user, project, child):
+        project.add_contributor(user, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        expected = set(EffectivePermission.objects.values_list('user_id', 'node_id', 'read', 'write', 'admin', 'parent_admin'))
+        EffectivePermission.objects.all().delete()
+        EffectivePermission.rebuild()
+        assert set(EffectivePermission.objects.values_list('user_id', 'node_id', 'read', 'write', 'admin', 'parent_admin')) == expected
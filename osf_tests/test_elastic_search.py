@@ -8,6 +8,8 @@ import functools
 
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from framework.auth.core import Auth
 
@@ -644,6 +646,25 @@ class TestAddContributor(OsfTestCase):
         assert_equal(len(contribs['users'][0]['social']), 1)
         assert_equal(contribs['users'][0]['social']['orcid'], user.social_links['orcid'])
 
+    def test_search_projects_in_common(self):
+        with run_celery_tasks():
+            other = factories.UserFactory(fullname='Roger1 Meddows')
+            project = factories.ProjectFactory(creator=self.user)
+            project.add_contributor(other, auth=Auth(self.user), save=True)
+        contribs = search.search_contributor('Roger1', current_user=self.user)
+        in_common = {contrib['id']: contrib['n_projects_in_common'] for contrib in contribs['users']}
+        assert_equal(in_common, {self.user._id: -1, other._id: 1})
+
+    def test_search_loads_users_in_bulk(self):
+        with run_celery_tasks():
+            for i in range(5):
+                factories.UserFactory(fullname='Roger1 Bulk{}'.format(i))
+        assert self.user._id
+        with CaptureQueriesContext(connection) as queries:
+            contribs = search.search_contributor('Roger1', current_user=self.user)
+        assert_equal(len(contribs['users']), 6)
+        assert_less_equal(len(queries), 2)
+
 
 class TestProjectSearchResults(OsfTestCase):
     def setUp(self):
@@ -2,14 +2,22 @@
 import string
 import random
 
+import json
+import time
+from datetime import datetime
+
 import jwe
+import mock
 import pytest
-from django.db import connection
+import pytz
+import responses
+from django.db import connection, transaction
 from psycopg2._psycopg import AsIs
 
 from osf.models import ExternalAccount
 from osf.utils.fields import EncryptedTextField, SENSITIVE_DATA_KEY, ensure_bytes
-from .factories import ExternalAccountFactory
+from website import settings
+from .factories import ExternalAccountFactory, MockOAuth2Provider
 
 @pytest.mark.django_db
 class TestEncryptedExternalAccountFields(object):
@@ -122,3 +130,45 @@ class TestEncryptedTextField:
         my_value_decrypted = field.from_db_value(my_value_encrypted, None, None, None)
         assert isinstance(my_value_decrypted, bytes)
         assert my_value_decrypted == ensure_bytes(my_value)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRefreshInTransaction(object):
+
+    @responses.activate
+    def test_refresh_commits_before_outer_transaction(self):
+        account = ExternalAccountFactory(
+            provider='mock2',
+            oauth_key='old_key',
+            refresh_token='old_refresh',
+            expires_at=datetime.utcfromtimestamp(time.time() - 200).replace(tzinfo=pytz.utc),
+        )
+        provider = MockOAuth2Provider(account)
+        responses.add(
+            responses.Response(
+                responses.POST,
+                provider.auto_refresh_url,
+                body=json.dumps({
+                    'access_token': 'refreshed_access_token',
+                    'expires_in': 3600,
+                    'refresh_token': 'refreshed_refresh_token'
+                })
+            )
+        )
+        other = connection.copy()
+        try:
+            with mock.patch.object(settings, 'OAUTH_REFRESH_OWN_CONNECTION', True):
+                with transaction.atomic():
+                    assert provider.refresh_oauth_key(force=True)
+                    # Other connections can lock the account and see the new tokens at once
+                    with other.cursor() as cursor:
+                        cursor.execute("SET lock_timeout = '1s'")
+                        cursor.execute(
+                            'SELECT date_last_refreshed FROM osf_externalaccount WHERE id = %s FOR UPDATE',
+                            [account.id]
+                        )
+                        assert cursor.fetchone()[0] is not None
+        finally:
+            other.close()
+        account.reload()
+        assert account.oauth_key == 'refreshed_access_token'
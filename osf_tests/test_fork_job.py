@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import mock
+import pytest
+from django.utils import timezone
+
+from framework.auth.core import Auth
+from osf.models import AbstractNode, ForkJob, NodeRelation
+from osf_tests.factories import NodeFactory, ProjectFactory, UserFactory
+from website import mails
+from website.project.tasks import resume_fork_jobs, run_fork_job
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.yield_fixture(autouse=True)
+def mock_send_mail():
+    with mock.patch.object(mails, 'send_mail') as mock_send_mail:
+        yield mock_send_mail
+
+
+@pytest.fixture()
+def user():
+    return UserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    project = ProjectFactory(creator=user, title='Root')
+    linked = ProjectFactory(creator=user, title='Linked')
+    first = NodeFactory(parent=project, creator=user, title='First')
+    project.add_pointer(linked, auth=Auth(user))
+    NodeFactory(parent=project, creator=user, title='Second')
+    NodeFactory(parent=first, creator=user, title='Grandchild')
+    return project
+
+
+@pytest.fixture()
+def job(user, project):
+    return ForkJob.objects.create(src_node=project, initiator=user, total_nodes=4)
+
+
+def tree(node):
+    return [
+        (relation.child.title, relation.is_node_link, tree(relation.child) if not relation.is_node_link else [])
+        for relation in NodeRelation.objects.filter(parent=node).select_related('child')
+    ]
+
+
+class TestForkJob:
+
+    def test_run_forks_the_tree(self, job, project, user, mock_send_mail):
+        job.run()
+        job.reload()
+        assert job.status == ForkJob.SUCCESS
+        assert job.forked_count == 4
+        fork = job.dst_node
+        assert fork.forked_from == project
+        assert fork.title == 'Fork of Root'
+        assert tree(fork) == tree(project)
+        assert all(node.is_fork for node in AbstractNode.objects.get_children(fork))
+        mock_send_mail.assert_called_with(
+            user.email, mails.FORK_COMPLETED, title=project.title, guid=fork._id,
+            mimetype='html', can_change_preferences=False,
+        )
+
+    def test_run_resumes_after_a_crash(self, job, project):
+        fork_node_without_children = AbstractNode.fork_node_without_children
+        calls = []
+
+        def crash_on_third_node(node, *args, **kwargs):
+            calls.append(node.title)
+            if len(calls) == 3:
+                raise SystemExit
+            return fork_node_without_children(node, *args, **kwargs)
+
+        with mock.patch.object(AbstractNode, 'fork_node_without_children', autospec=True, side_effect=crash_on_third_node):
+            with pytest.raises(SystemExit):
+                job.run()
+        job.reload()
+        assert job.status == ForkJob.RUNNING
+        assert job.forked_count == 2
+
+        job.run()
+        job.reload()
+        assert job.status == ForkJob.SUCCESS
+        assert job.attempts == 2
+        assert tree(job.dst_node) == tree(project)
+        for node in AbstractNode.objects.get_children(project):
+            assert node.forks.count() == 1
+
+    def test_fail_deletes_the_partial_fork(self, job, user, project, mock_send_mail):
+        job.fork_one(project.id, None, Auth(user))
+        job.fail()
+        job.reload()
+        assert job.status == ForkJob.FAILED
+        assert job.dst_node.is_deleted
+        mock_send_mail.assert_called_with(
+            user.email, mails.FORK_FAILED, title=project.title, guid=project._id,
+            mimetype='html', can_change_preferences=False,
+        )
+
+    def test_done_job_is_not_run_again(self, job):
+        job.run()
+        with mock.patch.object(AbstractNode, 'fork_node_without_children') as mock_fork:
+            run_fork_job(job._id)
+        assert not mock_fork.called
+        assert ForkJob.objects.get(id=job.id).attempts == 1
+
+    def test_resume_stale_jobs(self, job, user, project):
+        fresh = ForkJob.objects.create(src_node=project, initiator=user)
+        exhausted = ForkJob.objects.create(src_node=project, initiator=user, attempts=3)
+        long_ago = timezone.now() - datetime.timedelta(days=1)
+        ForkJob.objects.filter(id__in=[job.id, exhausted.id]).update(modified=long_ago)
+
+        with mock.patch('website.project.tasks.run_fork_job.delay') as mock_delay:
+            resume_fork_jobs()
+        mock_delay.assert_called_once_with(job._id)
+        assert ForkJob.objects.get(id=exhausted.id).status == ForkJob.FAILED
+        assert ForkJob.objects.get(id=fresh.id).status == ForkJob.QUEUED
+
+    def test_fork_node_keeps_relation_order(self, project, user):
+        fork = project.fork_node(Auth(user))
+        assert tree(fork) == tree(project)
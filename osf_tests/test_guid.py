@@ -1,9 +1,13 @@
+import time
+
 import mock
 import pytest
 import urllib
 from django.core.exceptions import MultipleObjectsReturned
 
-from osf.models import Guid, NodeLicenseRecord, OSFUser
+from osf.models import BlackListGuid, Guid, NodeLicenseRecord, OSFUser
+from osf.models.base import GuidAllocator
+from osf.utils import guid_cache
 from osf_tests.factories import AuthUserFactory, UserFactory, NodeFactory, NodeLicenseRecordFactory, \
     RegistrationFactory, PreprintFactory, PreprintProviderFactory
 from tests.base import OsfTestCase
@@ -311,3 +315,98 @@ class TestResolveGuid(OsfTestCase):
 
         res = self.app.get(pp.url + 'download', auth=non_contrib.auth, expect_errors=True)
         assert res.status_code == 410
+
+
+@pytest.mark.django_db
+class TestGuidAllocator:
+
+    @pytest.fixture()
+    def allocator(self):
+        return GuidAllocator(block_size=3, ttl=60)
+
+    def test_allocates_unused_guids(self, allocator):
+        guids = {allocator.allocate() for _ in range(10)}
+        assert len(guids) == 10
+        assert all(len(guid) == 5 for guid in guids)
+
+    def test_skips_existing_and_blacklisted_guids(self, allocator):
+        existing = UserFactory()._id
+        BlackListGuid.objects.create(guid='abcde')
+        with mock.patch('osf.models.base.random.sample', side_effect=[list(existing), list('abcde'), list('fghjk')]):
+            assert allocator.allocate() == 'fghjk'
+        assert allocator.generated == 3
+        assert allocator.rejected == 2
+        assert allocator.collision_rate == pytest.approx(2 / 3.0)
+
+    def test_one_query_per_block(self, allocator, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            allocator.allocate()
+            allocator.allocate()
+        assert allocator.depth() == allocator.block_size - 2
+
+    def test_expired_block_is_discarded(self, allocator):
+        allocator.allocate()
+        with mock.patch('osf.models.base.time.time', return_value=time.time() + 61):
+            with mock.patch('osf.models.base.random.sample', return_value=list('mnpqr')):
+                assert allocator.allocate() == 'mnpqr'
+
+
+@pytest.mark.django_db
+class TestGuidCache:
+
+    @pytest.yield_fixture()
+    def local_store(self):
+        local_store = guid_cache.LocalGuidStore(max_size=2, ttl=60)
+        with mock.patch.object(guid_cache.get_store, 'store', local_store):
+            yield local_store
+
+    def test_load_reads_through_cache(self, local_store, django_assert_num_queries):
+        node = NodeFactory()
+        assert Guid.load(node._id).referent == node
+        with django_assert_num_queries(1):
+            guid = Guid.load(node._id.upper())
+            assert guid.referent == node
+        assert guid.pk == node.guids.first().pk
+
+    def test_missing_guid_is_not_cached(self, local_store):
+        assert Guid.load('abcde') is None
+        assert Guid.load(None) is None
+        assert len(local_store) == 0
+
+    def test_lru_eviction(self, local_store):
+        first, second, third = NodeFactory(), NodeFactory(), NodeFactory()
+        Guid.load(first._id)
+        Guid.load(second._id)
+        Guid.load(first._id)
+        Guid.load(third._id)
+
+        assert len(local_store) == 2
+        assert local_store.get(second._id) is None
+        assert local_store.get(first._id) is not None
+
+    def test_ttl(self, local_store):
+        node = NodeFactory()
+        Guid.load(node._id)
+        with mock.patch('framework.caching.time.time', return_value=time.time() + 61):
+            assert local_store.get(node._id) is None
+
+    def test_repointing_evicts_guid(self, local_store):
+        node, other = NodeFactory(), NodeFactory()
+        guid = Guid.load(node._id)
+        guid.referent = other
+        guid.save()
+
+        assert local_store.get(node._id) is None
+        assert Guid.load(node._id).referent == other
+
+    def test_deleting_evicts_guid(self, local_store):
+        node = NodeFactory()
+        Guid.load(node._id).delete()
+
+        assert local_store.get(node._id) is None
+        assert Guid.load(node._id) is None
+
+    def test_select_for_update_skips_cache(self, local_store):
+        node = NodeFactory()
+        Guid.load(node._id, select_for_update=True)
+        assert len(local_store) == 0
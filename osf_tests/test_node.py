@@ -1,5 +1,7 @@
 import datetime
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 import mock
 import pytest
@@ -28,12 +30,14 @@ from osf.models import (
     Contributor,
     MetaSchema,
     Sanction,
+    NodeClosure,
     NodeRelation,
+    QueuedShareUpdate,
     Registration,
     DraftRegistration,
     DraftRegistrationApproval,
 )
-from osf.models.node import AbstractNodeQuerySet
+from osf.models.node import AbstractNodeQuerySet, count_inherited_logs
 from osf.models.spam import SpamStatus
 from osf.exceptions import ValidationError, ValidationValueError
 from framework.auth.core import Auth
@@ -403,6 +407,72 @@ class TestParentNode:
         assert project.parent_node is None
 
 
+class TestNodeClosure:
+
+    @pytest.fixture()
+    def child(self, project, user):
+        return NodeFactory(parent=project, creator=user)
+
+    def closure(self, node):
+        return set(NodeClosure.objects.filter(descendant=node).values_list('ancestor_id', 'depth'))
+
+    def test_components_record_all_ancestors(self, project, child):
+        grandchild = NodeFactory(parent=child)
+        assert self.closure(child) == {(project.id, 1)}
+        assert self.closure(grandchild) == {(child.id, 1), (project.id, 2)}
+        assert self.closure(project) == set()
+
+    def test_node_links_are_not_recorded(self, project):
+        linked = ProjectFactory()
+        project.add_node_link(linked, auth=Auth(project.creator), save=True)
+        assert self.closure(linked) == set()
+
+    def test_attaching_subtree_records_its_descendants(self, project):
+        subtree = ProjectFactory()
+        leaf = NodeFactory(parent=subtree)
+        NodeRelation.objects.create(parent=project, child=subtree, is_node_link=False)
+        assert self.closure(leaf) == {(subtree.id, 1), (project.id, 2)}
+
+    def test_deleting_relation_removes_paths_through_it(self, project, child):
+        grandchild = NodeFactory(parent=child)
+        NodeRelation.objects.get(parent=project, child=child).delete()
+        assert self.closure(child) == set()
+        assert self.closure(grandchild) == {(child.id, 1)}
+
+    def test_parents_and_root(self, project, child):
+        grandchild = NodeFactory(parent=child)
+        assert grandchild.parents == [child, project]
+        assert grandchild.get_root() == project
+        assert project.get_root() == project
+
+    def test_admin_of_ancestor_can_view_and_is_admin_parent(self, project, child):
+        grandchild = NodeFactory(parent=child, creator=child.creator)
+        admin = AuthUserFactory()
+        project.add_contributor(admin, permissions=[READ, WRITE, ADMIN], auth=Auth(project.creator), save=True)
+        assert grandchild.is_admin_parent(admin)
+        assert grandchild in AbstractNode.objects.can_view(user=admin)
+        assert admin._id in grandchild.parent_admin_contributor_ids
+
+    def test_find_readable_descendants(self, project, child):
+        user = AuthUserFactory()
+        grandchild = NodeFactory(parent=child)
+        grandchild.add_contributor(user, auth=Auth(grandchild.creator), save=True)
+        NodeFactory(parent=child)
+        assert list(project.find_readable_descendants(Auth(user))) == [grandchild]
+
+    def test_find_inconsistencies_and_rebuild(self, project, child):
+        grandchild = NodeFactory(parent=child)
+        NodeClosure.objects.filter(descendant=grandchild, ancestor=project).delete()
+        NodeClosure.objects.create(ancestor=grandchild, descendant=project, depth=1)
+
+        missing, stale = NodeClosure.find_inconsistencies()
+        assert missing == [(project.id, grandchild.id, 2)]
+        assert stale == [(grandchild.id, project.id, 1)]
+
+        assert NodeClosure.rebuild() == (1, 1)
+        assert NodeClosure.find_inconsistencies() == ([], [])
+
+
 class TestRoot:
     @pytest.fixture()
     def project(self, user):
@@ -3393,21 +3463,21 @@ class TestOnNodeUpdate:
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
-    def test_updates_share(self, requests, node, user):
+    @mock.patch('website.share.tasks.get_session')
+    def test_updates_share(self, get_session, node, user):
         on_node_updated(node._id, user._id, False, {'is_public'})
 
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
 
-        assert requests.post.called
+        assert get_session().post.called
         assert kwargs['headers']['Authorization'] == 'Bearer Token'
         assert graph[0]['uri'] == '{}{}/'.format(settings.DOMAIN, node._id)
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
-    def test_update_share_correctly_for_projects(self, requests, node, user, request_context):
+    @mock.patch('website.share.tasks.get_session')
+    def test_update_share_correctly_for_projects(self, get_session, node, user, request_context):
         cases = [{
             'is_deleted': False,
             'attrs': {'is_public': True, 'is_deleted': False, 'spam_status': SpamStatus.HAM}
@@ -3429,15 +3499,15 @@ class TestOnNodeUpdate:
 
             on_node_updated(node._id, user._id, False, {'is_public'})
 
-            kwargs = requests.post.call_args[1]
+            kwargs = get_session().post.call_args[1]
             graph = kwargs['json']['data']['attributes']['data']['@graph']
             assert graph[1]['is_deleted'] == case['is_deleted']
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
+    @mock.patch('website.share.tasks.get_session')
     @mock.patch('osf.models.registrations.Registration.archiving', mock.PropertyMock(return_value=False))
-    def test_update_share_correctly_for_registrations(self, requests, registration, user, request_context):
+    def test_update_share_correctly_for_registrations(self, get_session, registration, user, request_context):
         cases = [{
             'is_deleted': False,
             'attrs': {'is_public': True, 'is_deleted': False}
@@ -3460,56 +3530,56 @@ class TestOnNodeUpdate:
             on_node_updated(registration._id, user._id, False, {'is_public'})
 
             assert registration.is_registration
-            kwargs = requests.post.call_args[1]
+            kwargs = get_session().post.call_args[1]
             graph = kwargs['json']['data']['attributes']['data']['@graph']
             payload = (item for item in graph if 'is_deleted' in item.keys()).next()
             assert payload['is_deleted'] == case['is_deleted']
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
-    def test_update_share_correctly_for_projects_with_qa_tags(self, requests, node, user, request_context):
+    @mock.patch('website.share.tasks.get_session')
+    def test_update_share_correctly_for_projects_with_qa_tags(self, get_session, node, user, request_context):
         node.add_tag(settings.DO_NOT_INDEX_LIST['tags'][0], auth=Auth(user))
         on_node_updated(node._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is True
 
         node.remove_tag(settings.DO_NOT_INDEX_LIST['tags'][0], auth=Auth(user), save=True)
         on_node_updated(node._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is False
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
+    @mock.patch('website.share.tasks.get_session')
     @mock.patch('osf.models.registrations.Registration.archiving', mock.PropertyMock(return_value=False))
-    def test_update_share_correctly_for_registrations_with_qa_tags(self, requests, registration, user, request_context):
+    def test_update_share_correctly_for_registrations_with_qa_tags(self, get_session, registration, user, request_context):
         registration.add_tag(settings.DO_NOT_INDEX_LIST['tags'][0], auth=Auth(user))
         on_node_updated(registration._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is True
 
         registration.remove_tag(settings.DO_NOT_INDEX_LIST['tags'][0], auth=Auth(user), save=True)
         on_node_updated(registration._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is False
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
-    def test_update_share_correctly_for_projects_with_qa_titles(self, requests, node, user, request_context):
+    @mock.patch('website.share.tasks.get_session')
+    def test_update_share_correctly_for_projects_with_qa_titles(self, get_session, node, user, request_context):
         node.title = settings.DO_NOT_INDEX_LIST['titles'][0].join(random.choice(string.ascii_lowercase) for i in range(5))
         node.save()
         on_node_updated(node._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is True
@@ -3518,20 +3588,20 @@ class TestOnNodeUpdate:
         node.save()
         assert node.title not in settings.DO_NOT_INDEX_LIST['titles']
         on_node_updated(node._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is False
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'https://share.osf.io')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'Token')
-    @mock.patch('website.project.tasks.requests')
+    @mock.patch('website.share.tasks.get_session')
     @mock.patch('osf.models.registrations.Registration.archiving', mock.PropertyMock(return_value=False))
-    def test_update_share_correctly_for_registrations_with_qa_titles(self, requests, registration, user, request_context):
+    def test_update_share_correctly_for_registrations_with_qa_titles(self, get_session, registration, user, request_context):
         registration.title = settings.DO_NOT_INDEX_LIST['titles'][0].join(random.choice(string.ascii_lowercase) for i in range(5))
         registration.save()
         on_node_updated(registration._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is True
@@ -3540,37 +3610,38 @@ class TestOnNodeUpdate:
         registration.save()
         assert registration.title not in settings.DO_NOT_INDEX_LIST['titles']
         on_node_updated(registration._id, user._id, False, {'is_public'})
-        kwargs = requests.post.call_args[1]
+        kwargs = get_session().post.call_args[1]
         graph = kwargs['json']['data']['attributes']['data']['@graph']
         payload = (item for item in graph if 'is_deleted' in item.keys()).next()
         assert payload['is_deleted'] is False
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', None)
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', None)
-    @mock.patch('website.project.tasks.requests')
-    def test_skips_no_settings(self, requests, node, user, request_context):
+    @mock.patch('website.share.tasks.get_session')
+    def test_skips_no_settings(self, get_session, node, user, request_context):
         on_node_updated(node._id, user._id, False, {'is_public'})
-        assert requests.post.called is False
+        assert get_session().post.called is False
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'a_real_url')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'a_real_token')
-    @mock.patch('website.project.tasks._async_update_node_share.delay')
-    @mock.patch('website.project.tasks.requests')
-    def test_call_async_update_on_500_failure(self, requests, mock_async, node, user, request_context):
-        requests.post.return_value = MockShareResponse(501)
+    @mock.patch('website.share.tasks.get_session')
+    def test_retry_on_500_failure(self, get_session, node, user, request_context):
+        get_session().post.return_value = MockShareResponse(501)
         on_node_updated(node._id, user._id, False, {'is_public'})
-        assert mock_async.called
+        entry = QueuedShareUpdate.objects.get(object_type=QueuedShareUpdate.NODE, object_id=node.id)
+        assert entry.retries == 1
+        assert entry.claimed is None
+        assert entry.available > entry.created
 
     @mock.patch('website.project.tasks.settings.SHARE_URL', 'a_real_url')
     @mock.patch('website.project.tasks.settings.SHARE_API_TOKEN', 'a_real_token')
     @mock.patch('website.project.tasks.send_desk_share_error')
-    @mock.patch('website.project.tasks._async_update_node_share.delay')
-    @mock.patch('website.project.tasks.requests')
-    def test_no_call_async_update_on_400_failure(self, requests, mock_async, mock_mail, node, user, request_context):
-        requests.post.return_value = MockShareResponse(400)
+    @mock.patch('website.share.tasks.get_session')
+    def test_no_retry_on_400_failure(self, get_session, mock_mail, node, user, request_context):
+        get_session().post.return_value = MockShareResponse(400)
         on_node_updated(node._id, user._id, False, {'is_public'})
         assert mock_mail.called
-        assert not mock_async.called
+        assert not QueuedShareUpdate.objects.filter(object_id=node.id).exists()
 
 # copied from tests/test_models.py
 class TestRemoveNode:
@@ -3914,9 +3985,100 @@ class TestNodeLog:
         assert project._id == log_project_created_original.node._id
         assert project._id == log_project_created_fork.original_node._id
         assert project._id == log_node_forked.original_node._id
-        assert fork._id == log_project_created_fork.node._id
+        # Inherited, not copied
+        assert log_project_created_original == log_project_created_fork
         assert fork._id == log_node_forked.node._id
 
+    def test_fork_inherits_logs_up_to_the_fork(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        project.add_tag('before', auth=Auth(user))
+        fork = project.fork_node(auth=Auth(user))
+        project.add_tag('after', auth=Auth(user))
+        fork.add_tag('fork', auth=Auth(user))
+
+        assert set(fork.own_logs.values_list('action', flat=True)) == {NodeLog.NODE_FORKED, NodeLog.TAG_ADDED}
+        fork_tags = [log.params['tag'] for log in fork.logs.filter(action=NodeLog.TAG_ADDED)]
+        assert fork_tags == ['fork', 'before']
+        assert fork.logs.count() == project.logs.count() - 1 + 2
+
+        fork_of_fork = fork.fork_node(auth=Auth(user))
+        fork.add_tag('fork after', auth=Auth(user))
+        assert [log.params['tag'] for log in fork_of_fork.logs.filter(action=NodeLog.TAG_ADDED)] == ['fork', 'before']
+
+    def test_fork_aggregate_logs_include_inherited_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        NodeFactory(parent=project, creator=user)
+        fork = project.fork_node(auth=Auth(user))
+        aggregate = fork.get_aggregate_logs_queryset(Auth(user))
+        assert set(aggregate.values_list('action', flat=True)) == set(
+            project.get_aggregate_logs_queryset(Auth(user)).values_list('action', flat=True)
+        ) | {NodeLog.NODE_FORKED}
+        assert aggregate.count() == project.get_aggregate_logs_queryset(Auth(user)).count() + 2
+
+    def test_registration_of_fork_copies_inherited_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        fork = project.fork_node(auth=Auth(user))
+        registration = RegistrationFactory(project=fork, creator=user)
+        assert registration.inherited_logs_until is None
+        assert registration.own_logs.count() >= fork.logs.count()
+
+    def test_count_inherited_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        fork = project.fork_node(auth=Auth(user))
+        fork_of_fork = fork.fork_node(auth=Auth(user))
+        project.add_tag('after', auth=Auth(user))
+        nodes = [project, fork, fork_of_fork]
+
+        with CaptureQueriesContext(connection) as ctx:
+            counts = count_inherited_logs(nodes)
+        # One query for each level of forks, and one to count
+        assert len(ctx.captured_queries) == 3
+        assert counts == {
+            node.id: node.logs.count() - node.own_logs.count()
+            for node in nodes
+        }
+        assert counts[project.id] == 0
+
+    def test_hard_deleting_node_keeps_forks_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        project.add_tag('before', auth=Auth(user))
+        fork = project.fork_node(auth=Auth(user))
+        fork_of_fork = fork.fork_node(auth=Auth(user))
+        project.add_tag('after', auth=Auth(user))
+        fork_actions = sorted(fork.logs.values_list('action', flat=True))
+        fork_of_fork_actions = sorted(fork_of_fork.logs.values_list('action', flat=True))
+
+        project.delete()
+        fork.reload()
+        fork_of_fork.reload()
+
+        assert fork.inherited_logs_until is None
+        assert fork_of_fork.inherited_logs_until is None
+        assert sorted(fork.logs.values_list('action', flat=True)) == fork_actions
+        assert sorted(fork_of_fork.logs.values_list('action', flat=True)) == fork_of_fork_actions
+
+    def test_hard_deleting_fork_keeps_forks_of_fork_logs(self):
+        user = UserFactory()
+        project = ProjectFactory(creator=user)
+        fork = project.fork_node(auth=Auth(user))
+        fork.add_tag('fork', auth=Auth(user))
+        fork_of_fork = fork.fork_node(auth=Auth(user))
+        project_actions = sorted(project.logs.values_list('action', flat=True))
+        fork_of_fork_actions = sorted(fork_of_fork.logs.values_list('action', flat=True))
+
+        fork.delete()
+        project.reload()
+        fork_of_fork.reload()
+
+        assert fork_of_fork.inherited_logs_until is None
+        assert sorted(fork_of_fork.logs.values_list('action', flat=True)) == fork_of_fork_actions
+        assert sorted(project.logs.values_list('action', flat=True)) == project_actions
+
 
 class TestProjectWithAddons:
 
@@ -3991,6 +4153,47 @@ class TestAddonMethods:
             addon_count
         )
 
+    def test_get_addons_is_memoized(self, node, auth):
+        node.reload()
+        addon_names = node.get_addon_names()
+        with CaptureQueriesContext(connection) as ctx:
+            assert node.get_addon_names() == addon_names
+            assert node.get_addon('wiki')
+            assert node.get_addon('dropbox') is None
+        assert len(ctx.captured_queries) == 0
+
+    def test_get_addons_query_count(self, node, auth):
+        node.reload()
+        with CaptureQueriesContext(connection) as ctx:
+            addons = node.get_addons()
+        # One query for which addons the node has, and one for each of them
+        assert len(ctx.captured_queries) == len(addons) + 1
+
+    def test_memoized_addons_follow_add_and_delete(self, node, auth):
+        node.get_addons()
+        node.add_addon('dropbox', auth)
+        assert 'dropbox' in node.get_addon_names()
+        node.delete_addon('dropbox', auth)
+        assert 'dropbox' not in node.get_addon_names()
+        assert node.get_addon('dropbox', deleted=True).deleted
+
+    def test_memoized_addons_include_settings_saved_for_node(self, node, auth):
+        node.get_addons()
+        NodeSettings = node._settings_model('dropbox')
+        NodeSettings(owner=node).save()
+        assert node.get_addon('dropbox')
+
+    def test_prefetch_addons(self, node, auth):
+        other = NodeFactory(creator=node.creator)
+        other.add_addon('dropbox', auth)
+        nodes = list(AbstractNode.objects.filter(id__in=[node.id, other.id]))
+        AbstractNode.prefetch_addons(nodes)
+        with CaptureQueriesContext(connection) as ctx:
+            addons = {each.id: each.get_addon_names() for each in nodes}
+        assert len(ctx.captured_queries) == 0
+        assert 'dropbox' in addons[other.id]
+        assert 'dropbox' not in addons[node.id]
+
 # copied from tests/test_models.py
 class TestAddonCallbacks:
     """Verify that callback functions are called at the right times, with the
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import functools
+import time
+
+import gevent
+import mock
+import pytest
+
+from framework.metrics import MetricsRegistry
+from framework.postcommit_tasks import handlers
+from osf_tests.factories import NodeFactory
+from osf.models import AbstractNode
+
+
+def noop(*args, **kwargs):
+    pass
+
+
+def fail(*args, **kwargs):
+    raise ValueError('boom')
+
+
+@pytest.fixture(autouse=True)
+def postcommit_request():
+    handlers.postcommit_before_request()
+    yield
+    handlers.postcommit_before_request()
+
+
+@pytest.fixture()
+def registry():
+    registry = MetricsRegistry()
+    with mock.patch('framework.postcommit_tasks.handlers.metrics', registry):
+        yield registry
+
+
+@pytest.mark.django_db
+class TestEnqueuePostcommitTask:
+
+    def test_equivalent_calls_for_same_object_coalesce(self):
+        node = NodeFactory()
+        same_node = AbstractNode.objects.get(id=node.id)
+        handlers.enqueue_postcommit_task(noop, (node, ), {})
+        handlers.enqueue_postcommit_task(noop, (same_node, ), {})
+        handlers.enqueue_postcommit_task(noop, (NodeFactory(), ), {})
+
+        assert len(handlers.postcommit_queue()) == 2
+
+    def test_once_per_request_false_does_not_coalesce(self):
+        handlers.enqueue_postcommit_task(noop, ('abc12', ), {}, once_per_request=False)
+        handlers.enqueue_postcommit_task(noop, ('abc12', ), {}, once_per_request=False)
+
+        assert len(handlers.postcommit_queue()) == 2
+
+    def test_coalesced_calls_are_counted(self, registry):
+        handlers.enqueue_postcommit_task(noop, ('abc12', ), {})
+        handlers.enqueue_postcommit_task(noop, ('abc12', ), {})
+        handlers.postcommit_after_request(mock.Mock(status_code=200))
+
+        assert registry.snapshot()['postcommit.coalesced'] == 1
+
+
+class TestPostcommitExecutor:
+
+    def test_records_latency_per_task(self, registry):
+        executor = handlers.PostcommitExecutor(size=2, timeout=1)
+        executor.run([('tests.noop', noop), ('tests.noop', noop)])
+
+        stats = registry.snapshot()['postcommit.tests.noop']
+        assert stats['count'] == 2
+        assert stats['failures'] == 0
+
+    def test_records_failures_and_reraises(self, registry):
+        executor = handlers.PostcommitExecutor(size=2, timeout=1)
+        with pytest.raises(ValueError):
+            executor.run([('tests.fail', fail)])
+
+        assert registry.snapshot()['postcommit.tests.fail']['failures'] == 1
+
+    def test_reuses_pool(self, registry):
+        executor = handlers.PostcommitExecutor(size=2, timeout=1)
+        executor.run([('tests.noop', noop)])
+        pool = executor.pool
+        executor.run([('tests.noop', noop)])
+
+        assert executor.pool is pool
+
+    def test_forked_process_gets_own_pool(self, registry):
+        executor = handlers.PostcommitExecutor(size=2, timeout=1)
+        pool = executor.pool
+        with mock.patch('framework.postcommit_tasks.handlers.os.getpid', return_value=-1):
+            assert executor.pool is not pool
+
+    def test_timed_out_tasks_are_killed(self, registry):
+        executor = handlers.PostcommitExecutor(size=1, timeout=0.1)
+        executor.run([('tests.hang', functools.partial(gevent.sleep, 2))])
+        start = time.time()
+        executor.run([('tests.noop', noop)])
+
+        assert time.time() - start < 1
+        assert registry.snapshot()['postcommit.tests.noop']['count'] == 1
+        assert registry.snapshot()['postcommit.timeouts'] == 1
+        assert len(executor.pool) == 0
@@ -0,0 +1,35 @@
+import pytest
+
+from framework.auth.core import Auth
+from osf.management.commands.purge_test_node import remove_logs_and_files
+from osf_tests.factories import ProjectFactory
+
+
+@pytest.mark.django_db
+class TestPurgeTestNode:
+
+    def test_purging_fork_keeps_parent_logs(self):
+        project = ProjectFactory()
+        auth = Auth(project.creator)
+        project.add_tag('before', auth=auth)
+        fork = project.fork_node(auth=auth)
+        fork.add_tag('fork', auth=auth)
+        project_logs = list(project.logs.values_list('id', flat=True))
+
+        remove_logs_and_files(fork._id)
+
+        assert list(project.logs.values_list('id', flat=True)) == project_logs
+        assert fork.own_logs.count() == 1
+
+    def test_purging_node_keeps_forks_logs(self):
+        project = ProjectFactory()
+        auth = Auth(project.creator)
+        project.add_tag('before', auth=auth)
+        fork = project.fork_node(auth=auth)
+        fork_actions = sorted(fork.logs.values_list('action', flat=True))
+
+        remove_logs_and_files(project._id)
+        fork.reload()
+
+        assert project.own_logs.count() == 1
+        assert sorted(fork.logs.values_list('action', flat=True)) == fork_actions
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import mock
+import pytest
+from flask import Flask
+
+from framework.celery_tasks import handlers as celery_handlers
+from osf.models import QueuedSearchUpdate
+from osf_tests.factories import ProjectFactory, UserFactory
+from website import settings
+from website.project.tasks import on_node_updated
+from website.search import elastic_search, search
+
+pytestmark = pytest.mark.django_db
+
+
+def queued():
+    return set(QueuedSearchUpdate.objects.values_list('object_type', 'object_id', 'include_files'))
+
+
+@pytest.yield_fixture()
+def mock_drain():
+    with mock.patch('website.search.search.drain_queue') as mock_drain:
+        yield mock_drain
+
+
+@pytest.yield_fixture()
+def mock_bulk():
+    with mock.patch('website.search.elastic_search.helpers.bulk') as mock_bulk:
+        mock_bulk.return_value = (0, [])
+        yield mock_bulk
+
+
+def bulk_actions(mock_bulk):
+    return [action for call in mock_bulk.call_args_list for action in call[0][1]]
+
+
+@pytest.fixture()
+def project(mock_drain):
+    project = ProjectFactory(is_public=True, title='Queued project')
+    QueuedSearchUpdate.objects.all().delete()
+    return project
+
+
+@pytest.fixture()
+def file_(project):
+    file_ = project.get_addon('osfstorage').get_root().append_file('queued.txt')
+    QueuedSearchUpdate.objects.all().delete()
+    return file_
+
+
+class TestQueuedSearchUpdate:
+
+    def test_enqueue_keeps_one_entry_per_object(self):
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [1, 2])
+        created = QueuedSearchUpdate.objects.get(object_id=1).created
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [1], include_files=True)
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [1])
+        assert queued() == {('node', 1, True), ('node', 2, False)}
+        assert QueuedSearchUpdate.objects.get(object_id=1).created == created
+
+    def test_release_keeps_entries_enqueued_after_claim(self):
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [1, 2])
+        entries = QueuedSearchUpdate.claim(10)
+        assert {entry.object_id for entry in entries} == {1, 2}
+        assert QueuedSearchUpdate.claim(10) == []
+
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [2])
+        QueuedSearchUpdate.release(entries)
+        assert queued() == {('user', 2, False)}
+        assert [entry.object_id for entry in QueuedSearchUpdate.claim(10)] == [2]
+
+    def test_enqueue_resets_retries(self):
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [1])
+        QueuedSearchUpdate.retry(QueuedSearchUpdate.claim(10))
+        assert QueuedSearchUpdate.objects.get().retries == 1
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [1])
+        assert [entry.retries for entry in QueuedSearchUpdate.claim(10)] == [0]
+
+    def test_lag(self):
+        assert QueuedSearchUpdate.lag() == 0
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [1])
+        assert QueuedSearchUpdate.lag() >= 0
+
+
+class TestSearchQueue:
+
+    def test_node_metadata_change_skips_files(self, project, file_):
+        on_node_updated(project._id, project.creator._id, False, ['description'])
+        assert queued() == {('node', project.id, False)}
+
+    def test_node_title_change_includes_files(self, project, file_):
+        on_node_updated(project._id, project.creator._id, False, ['title'])
+        assert queued() == {('node', project.id, True)}
+
+    def test_user_and_file_updates_are_queued(self, mock_drain, file_):
+        user = UserFactory()
+        user.update_search()
+        file_.save()
+        assert {('user', user.id, False), ('file', file_.id, False)} <= queued()
+        assert mock_drain.called
+
+    def test_drain_indexes_node_without_files(self, project, file_, mock_bulk):
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [project.id])
+        assert elastic_search.drain_search_queue() == 1
+        ids = {action['_id'] for action in bulk_actions(mock_bulk)}
+        assert project._id in ids
+        assert file_._id not in ids
+        assert not QueuedSearchUpdate.objects.exists()
+
+    def test_drain_indexes_node_with_files(self, project, file_, mock_bulk):
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [project.id], include_files=True)
+        elastic_search.drain_search_queue()
+        actions = {action['_id']: action['_op_type'] for action in bulk_actions(mock_bulk)}
+        assert actions[project._id] == 'update'
+        assert actions[file_._id] == 'update'
+
+    def test_drain_deletes_documents_of_private_nodes(self, project, file_, mock_bulk):
+        project.is_public = False
+        project.save()
+        QueuedSearchUpdate.objects.all().delete()
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [project.id], include_files=True)
+        elastic_search.drain_search_queue()
+        actions = {action['_id']: action['_op_type'] for action in bulk_actions(mock_bulk)}
+        assert actions[project._id] == 'delete'
+        assert actions[file_._id] == 'delete'
+
+    def test_drain_in_batches(self, mock_bulk):
+        users = [UserFactory() for _ in range(3)]
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [user.id for user in users])
+        assert elastic_search.drain_search_queue(batch_size=2) == 3
+        assert not QueuedSearchUpdate.objects.exists()
+
+    def test_unreachable_search_leaves_entries_claimed(self, project, mock_bulk):
+        mock_bulk.side_effect = elastic_search.ConnectionError
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [project.id])
+        with pytest.raises(elastic_search.ConnectionError):
+            elastic_search.drain_search_queue()
+        entry = QueuedSearchUpdate.objects.get(object_id=project.id)
+        assert entry.claimed is not None
+        assert entry.retries == 0
+
+    def test_failed_entry_does_not_block_batch(self, mock_bulk):
+        users = [UserFactory() for _ in range(3)]
+
+        def bulk(client, actions, **kwargs):
+            errors = [{'update': {'_id': action['_id']}} for action in actions if action['_id'] == users[1]._id]
+            return len(actions) - len(errors), errors
+        mock_bulk.side_effect = bulk
+
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [user.id for user in users])
+        assert elastic_search.drain_search_queue() == 3
+        entry = QueuedSearchUpdate.objects.get()
+        assert entry.object_id == users[1].id
+        assert entry.retries == 1
+        assert entry.claimed is not None
+
+    def test_failed_entry_is_dropped_after_max_retries(self, project, mock_bulk):
+        mock_bulk.return_value = (0, [{'update': {'_id': project._id}}])
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [project.id])
+        QueuedSearchUpdate.objects.update(retries=settings.SEARCH_QUEUE_MAX_RETRIES)
+        elastic_search.drain_search_queue()
+        assert not QueuedSearchUpdate.objects.exists()
+
+
+class TestDrainQueue:
+
+    @pytest.yield_fixture()
+    def mock_drain_async(self):
+        with mock.patch.object(settings, 'USE_CELERY', True), \
+                mock.patch.object(search, 'search_engine', elastic_search), \
+                mock.patch.object(elastic_search, 'drain_search_queue') as mock_drain_inline, \
+                mock.patch.object(elastic_search.drain_search_queue_async, 'apply_async') as mock_apply_async:
+            yield mock_apply_async
+        assert not mock_drain_inline.called
+
+    def test_drain_is_queued_until_end_of_request(self, mock_drain_async):
+        with Flask('search').test_request_context():
+            celery_handlers.celery_before_request()
+            search.drain_queue()
+            assert [task.task for task in celery_handlers.queue()] == [elastic_search.drain_search_queue_async.name]
+            celery_handlers.celery_before_request()
+        assert not mock_drain_async.called
+
+    def test_drain_outside_request_runs_in_worker_after_commit(self, mock_drain_async):
+        with mock.patch.object(search.transaction, 'on_commit') as mock_on_commit:
+            search.drain_queue()
+            assert not mock_drain_async.called
+            mock_on_commit.call_args[0][0]()
+        mock_drain_async.assert_called_once_with()
@@ -1,6 +1,9 @@
+import mock
 import pytest
+from flask import Flask
 
-from framework.sessions import utils
+from framework import sessions
+from framework.sessions import store, utils
 from tests.base import DbTestCase
 from osf_tests.factories import SessionFactory, UserFactory
 from osf.models import OSFUser, Session
@@ -31,6 +34,80 @@ class TestSession:
         assert Session.objects.count() == 1
 
 
+@pytest.mark.django_db
+class TestSessionCache:
+
+    @pytest.yield_fixture()
+    def cache_store(self):
+        cache_store = store.DjangoSessionStore(alias='default', ttl=60)
+        cache_store.clear()
+        with mock.patch.object(store.get_store, 'store', cache_store):
+            yield cache_store
+        cache_store.clear()
+
+    def test_get_returns_copy(self, cache_store):
+        session = SessionFactory(data={'foo': 'bar'})
+        cache_store.set(session)
+
+        cached = cache_store.get(session._id)
+        assert cached.pk == session.pk
+        assert cached.data == {'foo': 'bar'}
+
+        cached.data['foo'] = 'baz'
+        assert cache_store.get(session._id).data == {'foo': 'bar'}
+
+    def test_load_session_reads_through_cache(self, cache_store):
+        session = SessionFactory(data={'auth_user_id': 'abc12'})
+        assert store.load_session(session._id).data == {'auth_user_id': 'abc12'}
+        with mock.patch.object(Session, 'load') as mock_load:
+            assert store.load_session(session._id).data == {'auth_user_id': 'abc12'}
+            assert not mock_load.called
+
+        utils.remove_session(session)
+        assert cache_store.get(session._id) is None
+        assert store.load_session(session._id) is None
+
+    def test_cached_session_can_be_saved(self, cache_store):
+        session = SessionFactory(data={'auth_user_id': 'abc12'})
+        store.load_session(session._id)
+        cached = store.load_session(session._id)
+        cached.data['foo'] = 'bar'
+        cached.save()
+
+        assert Session.objects.count() == 1
+        session.reload()
+        assert session.data == {'auth_user_id': 'abc12', 'foo': 'bar'}
+
+
+@pytest.mark.django_db
+class TestLazySessionWrites:
+
+    @pytest.fixture(autouse=True)
+    def request_context(self):
+        ctx = Flask('sessions').test_request_context()
+        ctx.push()
+        yield
+        ctx.pop()
+
+    def test_dirty_session_is_saved_once_after_request(self):
+        session = SessionFactory()
+        sessions.set_session(session)
+        session.data['foo'] = 'bar'
+        sessions.mark_session_dirty()
+        sessions.mark_session_dirty()
+
+        with mock.patch.object(Session, 'save') as mock_save:
+            sessions.after_request(mock.Mock(headers={}))
+            sessions.after_request(mock.Mock(headers={}))
+        assert mock_save.call_count == 1
+
+    def test_clean_session_is_not_saved(self):
+        sessions.set_session(SessionFactory())
+        with mock.patch.object(Session, 'save') as mock_save:
+            sessions.after_request(mock.Mock(headers={}))
+        assert not mock_save.called
+
+
 class SessionUtilsTestCase(DbTestCase):
     def setUp(self, *args, **kwargs):
         super(SessionUtilsTestCase, self).setUp(*args, **kwargs)
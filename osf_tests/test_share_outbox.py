@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import mock
+import pytest
+
+from osf.models import QueuedShareUpdate
+from osf_tests.factories import PreprintFactory, ProjectFactory
+from osf_tests.utils import MockShareResponse
+from website import settings
+from website.share import tasks
+
+pytestmark = pytest.mark.django_db
+
+
+def queued():
+    return set(QueuedShareUpdate.objects.values_list('object_type', 'object_id'))
+
+
+def posted_graphs(post):
+    return [call[1]['json']['data']['attributes']['data']['@graph'] for call in post.call_args_list]
+
+
+@pytest.yield_fixture()
+def share_settings():
+    with mock.patch.object(settings, 'SHARE_URL', 'https://share.osf.io/'), \
+            mock.patch.object(settings, 'SHARE_API_TOKEN', 'Token'), \
+            mock.patch.object(settings, 'USE_CELERY', True):
+        yield
+
+
+@pytest.yield_fixture()
+def post(share_settings):
+    with mock.patch.object(tasks, 'get_session') as mock_get_session:
+        mock_get_session.return_value.post.return_value = MockShareResponse(200)
+        yield mock_get_session.return_value.post
+
+
+@pytest.yield_fixture()
+def mock_desk_error():
+    with mock.patch('website.project.tasks.send_desk_share_error') as mock_desk_error:
+        yield mock_desk_error
+
+
+@pytest.fixture()
+def projects():
+    return [ProjectFactory(is_public=True) for _ in range(3)]
+
+
+class TestQueuedShareUpdate:
+
+    def test_enqueue_keeps_one_entry_per_object(self):
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.NODE, [1, 2])
+        created = QueuedShareUpdate.objects.get(object_id=1).created
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.NODE, [1])
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.PREPRINT, [1])
+        assert queued() == {('node', 1), ('node', 2), ('preprint', 1)}
+        assert QueuedShareUpdate.objects.get(object_type='node', object_id=1).created == created
+
+    def test_enqueue_merges_old_subjects(self):
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.PREPRINT, [1], old_subjects=[10, 11])
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.PREPRINT, [1], share_type='thesis', old_subjects=[11, 12])
+        entry = QueuedShareUpdate.objects.get()
+        assert sorted(entry.old_subjects) == [10, 11, 12]
+        assert entry.share_type == 'thesis'
+
+    def test_retry_postpones_entries(self):
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.NODE, [1])
+        QueuedShareUpdate.retry(QueuedShareUpdate.claim(10), countdown=60)
+        entry = QueuedShareUpdate.objects.get()
+        assert entry.retries == 1
+        assert entry.claimed is None
+        assert QueuedShareUpdate.claim(10) == []
+
+    def test_enqueue_resets_retries(self):
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.NODE, [1])
+        QueuedShareUpdate.retry(QueuedShareUpdate.claim(10), countdown=60)
+        QueuedShareUpdate.enqueue(QueuedShareUpdate.NODE, [1])
+        assert [entry.retries for entry in QueuedShareUpdate.claim(10)] == [0]
+
+
+class TestShareOutbox:
+
+    def test_enqueue_without_share_url(self):
+        with mock.patch.object(settings, 'SHARE_URL', None):
+            tasks.enqueue(QueuedShareUpdate.NODE, [1])
+        assert not QueuedShareUpdate.objects.exists()
+
+    def test_flush_sends_one_graph_per_endpoint(self, post, projects):
+        tasks.enqueue(QueuedShareUpdate.NODE, [project.id for project in projects])
+        assert tasks.flush_share_outbox() == 3
+
+        assert post.call_count == 1
+        assert post.call_args[0][0] == 'https://share.osf.io/api/normalizeddata/'
+        assert post.call_args[1]['headers']['Authorization'] == 'Bearer Token'
+        (graph, ) = posted_graphs(post)
+        assert {item['uri'] for item in graph if 'uri' in item} == {
+            '{}{}/'.format(settings.DOMAIN, project._id) for project in projects
+        }
+        assert len({item['@id'] for item in graph}) == len(graph)
+        assert not QueuedShareUpdate.objects.exists()
+
+    def test_flush_groups_preprints_by_provider(self, post, projects):
+        preprint = PreprintFactory()
+        preprint.provider.access_token = 'Provider token'
+        preprint.provider.save()
+        tasks.enqueue(QueuedShareUpdate.NODE, [projects[0].id])
+        tasks.enqueue(QueuedShareUpdate.PREPRINT, [preprint.id])
+        tasks.flush_share_outbox()
+
+        assert {(call[0][0], call[1]['headers']['Authorization']) for call in post.call_args_list} == {
+            ('https://share.osf.io/api/normalizeddata/', 'Bearer Token'),
+            ('https://share.osf.io/api/v2/normalizeddata/', 'Bearer Provider token'),
+        }
+
+    def test_flush_in_batches(self, post, projects):
+        tasks.enqueue(QueuedShareUpdate.NODE, [project.id for project in projects])
+        assert tasks.flush_share_outbox(batch_size=2) == 3
+        assert post.call_count == 2
+
+    def test_server_error_retries_batch(self, post, projects, mock_desk_error):
+        post.return_value = MockShareResponse(502)
+        tasks.enqueue(QueuedShareUpdate.NODE, [project.id for project in projects])
+        tasks.flush_share_outbox()
+
+        assert post.call_count == 1
+        assert set(QueuedShareUpdate.objects.values_list('retries', flat=True)) == {1}
+        assert not mock_desk_error.called
+
+    def test_server_error_reports_exhausted_entries(self, post, projects, mock_desk_error):
+        post.return_value = MockShareResponse(502)
+        tasks.enqueue(QueuedShareUpdate.NODE, [projects[0].id])
+        QueuedShareUpdate.objects.update(retries=settings.SHARE_OUTBOX_MAX_RETRIES)
+        tasks.flush_share_outbox()
+
+        mock_desk_error.assert_called_once_with(projects[0], post.return_value, settings.SHARE_OUTBOX_MAX_RETRIES)
+        assert not QueuedShareUpdate.objects.exists()
+
+    def test_rejected_batch_is_sent_record_by_record(self, post, projects, mock_desk_error):
+        rejected = '{}{}/'.format(settings.DOMAIN, projects[1]._id)
+
+        def respond(url, json, headers):
+            uris = {item.get('uri') for item in json['data']['attributes']['data']['@graph']}
+            return MockShareResponse(400 if rejected in uris else 200)
+        post.side_effect = respond
+
+        tasks.enqueue(QueuedShareUpdate.NODE, [project.id for project in projects])
+        tasks.flush_share_outbox()
+
+        assert post.call_count == 4
+        assert mock_desk_error.call_count == 1
+        assert mock_desk_error.call_args[0][0] == projects[1]
+        assert not QueuedShareUpdate.objects.exists()
+
+    def test_unserializable_entry_does_not_block_batch(self, post, projects):
+        from website.project.tasks import format_node
+
+        def serialize(node):
+            if node == projects[1]:
+                raise ValueError('Cannot serialize')
+            return format_node(node)
+
+        tasks.enqueue(QueuedShareUpdate.NODE, [project.id for project in projects])
+        with mock.patch('website.project.tasks.format_node', side_effect=serialize):
+            tasks.flush_share_outbox()
+
+        assert post.call_count == 1
+        uris = {item.get('uri') for item in posted_graphs(post)[0]}
+        assert '{}{}/'.format(settings.DOMAIN, projects[0]._id) in uris
+        assert '{}{}/'.format(settings.DOMAIN, projects[1]._id) not in uris
+        entry = QueuedShareUpdate.objects.get()
+        assert entry.object_id == projects[1].id
+        assert entry.retries == 1
+        assert entry.claimed is None
+
+    def test_unserializable_entry_is_dropped_after_max_retries(self, post, projects):
+        tasks.enqueue(QueuedShareUpdate.NODE, [projects[0].id])
+        QueuedShareUpdate.objects.update(retries=settings.SHARE_OUTBOX_MAX_RETRIES)
+        with mock.patch('website.project.tasks.format_node', side_effect=ValueError('Cannot serialize')):
+            tasks.flush_share_outbox()
+
+        assert not post.called
+        assert not QueuedShareUpdate.objects.exists()
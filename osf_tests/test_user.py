@@ -603,6 +603,19 @@ class TestProjectsInCommon:
         assert user.n_projects_in_common(user2) == 1
         assert user.n_projects_in_common(user3) == 0
 
+    def test_n_projects_in_common_by_user(self, user, auth):
+        user2 = UserFactory()
+        user3 = UserFactory()
+        user4 = UserFactory()
+        for _ in range(2):
+            project = NodeFactory(creator=user)
+            project.add_contributor(contributor=user2, auth=auth, save=True)
+        project.add_contributor(contributor=user3, auth=auth, save=True)
+        deleted = NodeFactory(creator=user, is_deleted=True)
+        deleted.add_contributor(contributor=user4, auth=auth, save=True)
+
+        assert user.n_projects_in_common_by_user([user2, user3, user4]) == {user2.id: 2, user3.id: 1}
+
 
 class TestCookieMethods:
 
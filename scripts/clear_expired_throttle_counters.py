@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Delete API throttle counters whose buckets have left every throttle window."""
+import logging
+
+import django
+django.setup()
+
+from framework.celery_tasks import app as celery_app
+from osf.models import ThrottleCounter
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    deleted = ThrottleCounter.delete_expired()
+    logger.info('Deleted {} expired throttle counters'.format(deleted))
+
+
+@celery_app.task(name='scripts.clear_expired_throttle_counters')
+def run_main():
+    main()
+
+if __name__ == '__main__':
+    main()
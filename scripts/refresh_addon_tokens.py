@@ -1,9 +1,21 @@
 #!/usr/bin/env python
 # encoding: utf-8
+"""Refresh the tokens of OAuth accounts before their refresh tokens expire.
 
+Accounts are refreshed by a pool of ``workers`` threads. Each provider has its
+own token bucket, so one provider's rate limit does not hold up the others.
+An account whose tokens are being refreshed by a request is refreshed once the
+request's refresh is done, from the tokens it saved, or skipped if that takes
+longer than OAUTH_REFRESH_LOCK_TIMEOUT (see ``ExternalProvider.refresh_oauth_key``).
+"""
+
+import functools
 import logging
 import math
+import threading
 import time
+from itertools import izip_longest
+from multiprocessing.dummy import Pool
 from django.utils import timezone
 
 import django
@@ -11,10 +23,13 @@ from oauthlib.oauth2 import OAuth2Error
 from dateutil.relativedelta import relativedelta
 django.setup()
 
+from django.db import connection
+
 from framework.celery_tasks import app as celery_app
 
 from scripts import utils as scripts_utils
 
+from website import settings
 from website.app import init_app
 from addons.box.models import Provider as Box
 from addons.googledrive.models import GoogleDriveProvider
@@ -27,6 +42,32 @@ logging.basicConfig(level=logging.INFO)
 PROVIDER_CLASSES = (Box, GoogleDriveProvider, Mendeley, )
 
 
+class TokenBucket(object):
+    """Thread-safe token bucket allowing ``rate`` calls per ``per`` seconds,
+    in bursts of up to ``rate`` calls.
+    """
+
+    def __init__(self, rate, per=1):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.tokens = self.rate
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.time()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.per / self.rate
+            time.sleep(wait)
+
+
 def look_up_provider(addon_short_name):
     for Provider in PROVIDER_CLASSES:
         if Provider.short_name == addon_short_name:
@@ -42,54 +83,78 @@ def get_targets(delta, addon_short_name):
         provider=addon_short_name
     )
 
-def main(delta, Provider, rate_limit, dry_run):
-    allowance = rate_limit[0]
-    last_call = time.time()
-    for record in get_targets(delta, Provider.short_name):
-        if Provider(record).has_expired_credentials:
+def refresh(Provider, record, bucket, dry_run):
+    if Provider(record).has_expired_credentials:
+        logger.info(
+            'Found expired record {}, skipping'.format(record.__repr__())
+        )
+        return
+
+    logger.info(
+        'Refreshing tokens on record {0}; expires at {1}'.format(
+            record.__repr__(),
+            record.expires_at.strftime('%c')
+        )
+    )
+    if not dry_run:
+        bucket.acquire()
+        success = False
+        try:
+            success = Provider(record).refresh_oauth_key(force=True)
+        except OAuth2Error as e:
+            logger.error(e)
+        else:
             logger.info(
-                'Found expired record {}, skipping'.format(record.__repr__())
+                'Status of record {}: {}'.format(
+                    record.__repr__(),
+                    'SUCCESS' if success else 'FAILURE')
             )
-            continue
 
-        logger.info(
-            'Refreshing tokens on record {0}; expires at {1}'.format(
-                record.__repr__(),
-                record.expires_at.strftime('%c')
-            )
-        )
-        if not dry_run:
-            if allowance < 1:
-                try:
-                    time.sleep(rate_limit[1] - (time.time() - last_call))
-                except (ValueError, IOError):
-                    pass  # Value/IOError indicates negative sleep time in Py 3.5/2.7, respectively
-                allowance = rate_limit[0]
-
-            allowance -= 1
-            last_call = time.time()
-            success = False
-            try:
-                success = Provider(record).refresh_oauth_key(force=True)
-            except OAuth2Error as e:
-                logger.error(e)
-            else:
-                logger.info(
-                    'Status of record {}: {}'.format(
-                        record.__repr__(),
-                        'SUCCESS' if success else 'FAILURE')
-                )
+def get_jobs(delta, Provider, rate_limit, dry_run):
+    bucket = TokenBucket(*rate_limit)
+    return [
+        functools.partial(refresh, Provider, record, bucket, dry_run)
+        for record in get_targets(delta, Provider.short_name)
+    ]
+
+def run_job(job):
+    try:
+        job()
+    except Exception:
+        logger.exception('Failed to refresh tokens')
+    finally:
+        # Worker threads each open their own database connection
+        connection.close()
+
+def run_jobs(jobs, workers=None):
+    workers = workers or settings.OAUTH_REFRESH_WORKERS
+    if workers <= 1:
+        for job in jobs:
+            job()
+        return
+    pool = Pool(workers)
+    try:
+        pool.map(run_job, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def main(delta, Provider, rate_limit, dry_run, workers=None):
+    run_jobs(get_jobs(delta, Provider, rate_limit, dry_run), workers=workers)
 
 
 @celery_app.task(name='scripts.refresh_addon_tokens')
-def run_main(addons=None, rate_limit=(5, 1), dry_run=True):
+def run_main(addons=None, rate_limit=None, dry_run=True, workers=None):
     """
     :param dict addons: of form {'<addon_short_name>': int(<refresh_token validity duration in days>)}
-    :param tuple rate_limit: of form (<requests>, <seconds>). Default is five per second
+    :param tuple rate_limit: of form (<requests>, <seconds>), applied to each provider. Default is
+        the provider's entry in OAUTH_REFRESH_RATE_LIMITS, or five per second
+    :param int workers: Number of accounts refreshed at once. Default is OAUTH_REFRESH_WORKERS
     """
     init_app(set_backends=True, routes=False)
     if not dry_run:
         scripts_utils.add_file_logger(logger, __file__)
+    jobs_by_provider = []
     for addon in addons:
         days = math.ceil(int(addons[addon])*0.75)
         delta = relativedelta(days=days)
@@ -97,4 +162,8 @@ def run_main(addons=None, rate_limit=(5, 1), dry_run=True):
         if not Provider:
             logger.error('Unable to find Provider class for addon {}'.format(addon))
         else:
-            main(delta, Provider, rate_limit, dry_run=dry_run)
+            provider_rate_limit = rate_limit or settings.OAUTH_REFRESH_RATE_LIMITS.get(addon, (5, 1))
+            jobs_by_provider.append(get_jobs(delta, Provider, provider_rate_limit, dry_run))
+    # Interleave providers so that the workers are not all waiting on one provider's limit
+    jobs = [job for batch in izip_longest(*jobs_by_provider) for job in batch if job is not None]
+    run_jobs(jobs, workers=workers)
@@ -17,7 +17,7 @@ from dateutil.relativedelta import relativedelta
 from website.oauth.models import ExternalAccount
 
 from scripts.refresh_addon_tokens import (
-    get_targets, main, look_up_provider, PROVIDER_CLASSES
+    get_targets, main, look_up_provider, run_main, PROVIDER_CLASSES, TokenBucket
 )
 
 
@@ -74,3 +74,42 @@ class TestRefreshTokens(OsfTestCase):
         assert_equal(1, mock_box_refresh.call_count)
         assert_equal(1, mock_drive_refresh.call_count)
         assert_equal(1, mock_mendeley_refresh.call_count)
+
+    @mock.patch('scripts.refresh_addon_tokens.Box.refresh_oauth_key')
+    def test_refresh_inline(self, mock_box_refresh):
+        BoxAccountFactory(date_last_refreshed=timezone.now() - datetime.timedelta(days=4))
+        main(delta=relativedelta(days=3), Provider=look_up_provider('box'), rate_limit=(5, 1), dry_run=False, workers=1)
+        assert_equal(1, mock_box_refresh.call_count)
+
+    @mock.patch('scripts.refresh_addon_tokens.run_jobs')
+    @mock.patch('scripts.refresh_addon_tokens.init_app')
+    def test_run_main_interleaves_providers(self, mock_init_app, mock_run_jobs):
+        then = timezone.now() - datetime.timedelta(days=4)
+        box_accounts = [BoxAccountFactory(date_last_refreshed=then) for _ in range(2)]
+        drive_account = GoogleDriveAccountFactory(date_last_refreshed=then)
+        run_main(addons={'box': 4, 'googledrive': 4}, dry_run=True)
+
+        jobs = mock_run_jobs.call_args[0][0]
+        assert_not_equal(jobs[0].args[0].short_name, jobs[1].args[0].short_name)
+        assert_equal(
+            sorted(job.args[1]._id for job in jobs),
+            sorted(account._id for account in box_accounts + [drive_account])
+        )
+
+
+class TestTokenBucket(OsfTestCase):
+
+    def test_limits_rate(self):
+        clock = [1000.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch('scripts.refresh_addon_tokens.time.time', side_effect=lambda: clock[0]), \
+                mock.patch('scripts.refresh_addon_tokens.time.sleep', side_effect=sleep) as mock_sleep:
+            bucket = TokenBucket(2, 1)
+            bucket.acquire()
+            bucket.acquire()
+            assert_false(mock_sleep.called)
+            bucket.acquire()
+            mock_sleep.assert_called_once_with(0.5)
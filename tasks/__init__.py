@@ -210,6 +210,20 @@ def rebuild_search(ctx):
     migrate_search(ctx, delete=False)
 
 
+@task
+def precompile_templates(ctx):
+    """Compile every Mako template to settings.MAKO_MODULE_DIRECTORY, so that
+    new workers load compiled templates instead of compiling them.
+    """
+    from website.app import setup_django
+    setup_django()
+    from framework.routing import precompile_templates
+    import website.mails  # noqa: creates the mail template lookup
+
+    compiled, failed = precompile_templates()
+    print('Compiled {} templates to {} ({} failed)'.format(compiled, settings.MAKO_MODULE_DIRECTORY, failed))
+
+
 @task
 def mailserver(ctx, port=1025):
     """Run a SMTP test server."""
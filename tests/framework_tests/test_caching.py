@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import mock
+from nose.tools import *  # noqa (PEP8 asserts)
+
+from framework.caching import NullStore, StoreSelector, TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+
+        assert_equal(len(cache), 2)
+        assert_is_none(cache.get('second'))
+        assert_equal(cache.get('first'), 1)
+
+    def test_ttl(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('key', 'value')
+        with mock.patch('framework.caching.time.time', return_value=time.time() + 61):
+            assert_is_none(cache.get('key'))
+        assert_not_in('key', cache)
+
+    def test_on_evict(self):
+        evicted = []
+        cache = TTLCache(max_size=1, ttl=60, on_evict=lambda key, value: evicted.append((key, value)))
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.delete('second')
+        cache.delete('missing')
+
+        assert_equal(evicted, [('first', 1), ('second', 2)])
+
+
+class TestStoreSelector(unittest.TestCase):
+
+    def test_creates_store_once(self):
+        backend = mock.Mock()
+        get_store = StoreSelector({'mock': backend}, lambda: 'mock')
+
+        assert_is(get_store(), get_store())
+        assert_equal(backend.call_count, 1)
+
+
+class TestNullStore(unittest.TestCase):
+
+    def test_caches_nothing(self):
+        store = NullStore()
+        store.set('key', 'value')
+
+        assert_is_none(store.get('key'))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import weakref
+
+import mock
+from nose.tools import *  # noqa (PEP8 asserts)
+
+from framework import mako_modules
+from framework.mako_modules import CachedTemplateLookup, load_template, module_filename, precompile
+from website import settings
+
+
+class TestMakoModules(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = tempfile.mkdtemp()
+        self.modules = tempfile.mkdtemp()
+        self.settings_patch = mock.patch.object(settings, 'MAKO_MODULE_DIRECTORY', self.modules)
+        self.settings_patch.start()
+        self.instances_patch = mock.patch.object(CachedTemplateLookup, 'instances', weakref.WeakSet())
+        self.instances_patch.start()
+        self.write('base.mako', 'Hello ${next.body()}')
+        self.write('page.mako', '<%inherit file="base.mako"/>${name}')
+
+    def tearDown(self):
+        self.instances_patch.stop()
+        self.settings_patch.stop()
+        shutil.rmtree(self.templates)
+        shutil.rmtree(self.modules)
+
+    def write(self, name, text):
+        path = os.path.join(self.templates, name)
+        with open(path, 'w') as fp:
+            fp.write(text)
+        return path
+
+    def module_files(self):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(self.modules)
+            for name in files if name.endswith('.py')
+        )
+
+    def test_lookup_writes_modules(self):
+        lookup = CachedTemplateLookup(directories=[self.templates])
+        assert_equal(lookup.get_template('page.mako').render(name='world'), 'Hello world')
+        assert_equal(len(self.module_files()), 2)
+
+    def test_new_lookup_reuses_modules(self):
+        CachedTemplateLookup(directories=[self.templates]).get_template('page.mako').render(name='world')
+        with mock.patch('mako.template._compile_module_file') as mock_compile:
+            template = CachedTemplateLookup(directories=[self.templates]).get_template('page.mako')
+            assert_equal(template.render(name='world'), 'Hello world')
+        assert_false(mock_compile.called)
+
+    def test_touched_template_is_not_recompiled(self):
+        path = os.path.join(self.templates, 'base.mako')
+        CachedTemplateLookup(directories=[self.templates]).get_template('base.mako')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        with mock.patch('mako.template._compile_module_file') as mock_compile:
+            CachedTemplateLookup(directories=[self.templates]).get_template('base.mako')
+        assert_false(mock_compile.called)
+
+    def test_touched_template_is_not_reloaded(self):
+        path = os.path.join(self.templates, 'base.mako')
+        lookup = CachedTemplateLookup(directories=[self.templates])
+        template = lookup.get_template('base.mako')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        with mock.patch.object(mako_modules, 'module_filename', wraps=mako_modules.module_filename) as mock_module_filename:
+            assert_is(lookup.get_template('base.mako'), template)
+            assert_is(lookup.get_template('base.mako'), template)
+        assert_equal(mock_module_filename.call_count, 1)
+
+    def test_changed_template_is_reloaded(self):
+        lookup = CachedTemplateLookup(directories=[self.templates])
+        assert_equal(lookup.get_template('page.mako').render(name='world'), 'Hello world')
+        path = self.write('page.mako', '<%inherit file="base.mako"/>${name}!')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        assert_equal(lookup.get_template('page.mako').render(name='world'), 'Hello world!')
+
+    def test_changed_template_gets_new_module(self):
+        path = os.path.join(self.templates, 'base.mako')
+        before = module_filename(path, 'base.mako', {})
+        self.write('base.mako', 'Goodbye ${next.body()}')
+        assert_not_equal(module_filename(path, 'base.mako', {}), before)
+        assert_equal(
+            CachedTemplateLookup(directories=[self.templates]).get_template('page.mako').render(name='world'),
+            'Goodbye world'
+        )
+
+    def test_options_and_uri_change_module(self):
+        path = os.path.join(self.templates, 'base.mako')
+        plain = module_filename(path, 'base.mako', {})
+        assert_not_equal(module_filename(path, 'base.mako', {'default_filters': ['h']}), plain)
+        assert_not_equal(module_filename(path, '/base.mako', {}), plain)
+        assert_true(plain.startswith(self.modules))
+
+    def test_load_template(self):
+        path = os.path.join(self.templates, 'page.mako')
+        lookup = CachedTemplateLookup(directories=[self.templates])
+        template = load_template(path, uri='page.mako', lookup=lookup, default_filters=['h'])
+        assert_equal(template.render(name='<b>'), 'Hello &lt;b&gt;')
+        assert_equal(len(self.module_files()), 2)
+
+    def test_precompile(self):
+        CachedTemplateLookup(directories=[self.templates])
+        CachedTemplateLookup(directories=[self.templates])
+        assert_equal(precompile(), (2, 0))
+        assert_equal(len(self.module_files()), 2)
+
+    def test_precompile_reports_failures(self):
+        self.write('broken.mako', '% if')
+        CachedTemplateLookup(directories=[self.templates])
+        with mock.patch.object(mako_modules.logger, 'exception'):
+            assert_equal(precompile(), (2, 1))
+
+    def test_precompile_pages(self):
+        loaded = []
+        assert_equal(precompile(loaded.append, [self.templates]), (2, 0))
+        assert_equal(loaded, [os.path.join(self.templates, 'base.mako'), os.path.join(self.templates, 'page.mako')])
@@ -22,7 +22,7 @@ from tests.base import OsfTestCase, get_default_metaschema
 from osf_tests.factories import (AuthUserFactory, ProjectFactory,
                              RegistrationFactory)
 from website import settings
-from addons.base import views
+from addons.base import auth_cache, views
 from addons.github.exceptions import ApiError
 from addons.github.models import GithubFolder, GithubFile, GithubFileNode
 from addons.github.tests.factories import GitHubAccountFactory
@@ -134,6 +134,85 @@ class TestAddonAuth(OsfTestCase):
         assert_equal(res.status_code, 403)
 
 
+class TestAddonAuthCache(TestAddonAuth):
+
+    def setUp(self):
+        super(TestAddonAuthCache, self).setUp()
+        self.store = auth_cache.LocalAuthStore(max_size=100, ttl=60)
+        patcher = mock.patch.object(auth_cache.get_store, 'store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_data(self, user=None, **kwargs):
+        res = self.app.get(self.build_url(**kwargs), auth=(user or self.user).auth)
+        return jwt.decode(jwe.decrypt(res.json['payload'].encode('utf-8'), self.JWE_KEY), settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM)['data']
+
+    def test_cached_auth_skips_node_lookup(self):
+        data = self.get_data()
+        with mock.patch.object(views.AbstractNode, 'load') as mock_load:
+            assert_equal(self.get_data(), data)
+            assert_false(mock_load.called)
+        assert_equal(len(self.store), 1)
+
+    def test_actions_are_cached_by_class(self):
+        self.get_data(action='metadata')
+        self.get_data(action='revisions')
+        self.get_data(action='download')
+        self.get_data(action='upload')
+        assert_equal(len(self.store), 3)
+
+    def test_contributor_removal_invalidates_auth(self):
+        contributor = AuthUserFactory()
+        self.node.add_contributor(contributor, auth=self.auth_obj)
+        self.get_data(user=contributor)
+
+        self.node.remove_contributor(contributor, auth=self.auth_obj)
+        res = self.app.get(self.build_url(), auth=contributor.auth, expect_errors=True)
+        assert_equal(res.status_code, 403)
+
+    def test_making_node_private_invalidates_auth(self):
+        self.node.set_privacy('public', auth=self.auth_obj)
+        url = self.build_url()
+        self.app.get(url)
+
+        self.node.set_privacy('private', auth=self.auth_obj)
+        res = self.app.get(url, expect_errors=True)
+        assert_equal(res.status_code, 401)
+
+    def test_addon_settings_change_invalidates_auth(self):
+        self.get_data()
+        self.node_addon.repo = 'changed-repo'
+        self.node_addon.save()
+        assert_equal(self.get_data()['settings']['repo'], 'changed-repo')
+
+    def test_external_account_change_invalidates_auth(self):
+        self.get_data()
+        self.oauth_settings.oauth_key = 'refreshed-token'
+        self.oauth_settings.save()
+        assert_equal(self.get_data()['credentials'], {'token': 'refreshed-token'})
+
+    def test_view_only_requests_are_not_cached(self):
+        assert_is_none(views.get_auth_cache_key(Auth(private_key='abcde'), self.node._id, 'github', 'download'))
+
+    def test_unrelated_saves_do_not_invalidate(self):
+        with mock.patch.object(auth_cache, 'invalidate') as mock_invalidate:
+            self.user.fullname = 'Changed Name'
+            self.user.save()
+            self.node.title = 'Changed title'
+            self.node.save()
+        assert_false(mock_invalidate.called)
+
+    def test_evicted_entries_leave_tag_index(self):
+        store = auth_cache.LocalAuthStore(max_size=1, ttl=60)
+        store.set('first', {}, ['node:1'])
+        store.set('second', {}, ['node:1', 'user:1'])
+        assert_equal(store._tagged, {'node:1': {'second'}, 'user:1': {'second'}})
+
+        store.invalidate('user:1')
+        assert_equal(len(store), 0)
+        assert_equal(store._tagged, {})
+
+
 class TestAddonLogs(OsfTestCase):
 
     def setUp(self):
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 import furl
+import json
 import responses
 import mock
+import time
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import unittest
 
 from framework.auth import cas
+from framework.metrics import metrics
 
 from tests.base import OsfTestCase, fake
 from osf_tests.factories import UserFactory
@@ -219,6 +222,142 @@ class TestCASClient(OsfTestCase):
         assert 0
 
 
+class TestCASProfileCache(OsfTestCase):
+
+    def setUp(self):
+        OsfTestCase.setUp(self)
+        self.client = cas.CasClient('http://accounts.test.test')
+        self.profile_url = self.client.get_profile_url()
+        self.user = UserFactory()
+        self.token = fake.md5()
+        self.store = self.make_store()
+        self.store_patch = mock.patch.object(cas.get_profile_store, 'store', self.store)
+        self.store_patch.start()
+
+    def tearDown(self):
+        self.store_patch.stop()
+        self.store.clear()
+        OsfTestCase.tearDown(self)
+
+    def make_store(self):
+        return cas.LocalProfileStore(max_size=100, ttl=30)
+
+    def add_profile_response(self, status=200):
+        responses.add(
+            responses.Response(
+                responses.GET,
+                self.profile_url,
+                body=json.dumps({'id': self.user._id, 'scope': ['osf.full_read']}),
+                status=status,
+            )
+        )
+
+    @responses.activate
+    def test_profile_is_cached(self):
+        self.add_profile_response()
+        first = self.client.profile(self.token)
+        second = self.client.profile(self.token)
+        assert_equal(len(responses.calls), 1)
+        assert_equal(second.user, self.user._id)
+        assert_equal(second.attributes['accessToken'], self.token)
+        assert_equal(second.attributes['accessTokenScope'], {'osf.full_read'})
+        assert_is_not(first, second)
+
+    @responses.activate
+    def test_profile_cache_is_keyed_by_token_hash(self):
+        self.add_profile_response()
+        self.client.profile(self.token)
+        self.client.profile(fake.md5())
+        assert_equal(len(responses.calls), 2)
+        assert_not_in(self.token, self.store.entries)
+        assert_in(cas.make_profile_key(self.token), self.store.entries)
+
+    @responses.activate
+    def test_failed_profile_is_not_cached(self):
+        self.add_profile_response(status=401)
+        for _ in range(2):
+            with assert_raises(cas.CasHTTPError):
+                self.client.profile(self.token)
+        assert_equal(len(responses.calls), 2)
+
+    @responses.activate
+    def test_cached_profile_expires(self):
+        self.add_profile_response()
+        self.client.profile(self.token)
+        with mock.patch('framework.caching.time.time', return_value=time.time() + 31):
+            self.client.profile(self.token)
+        assert_equal(len(responses.calls), 2)
+
+    @responses.activate
+    def test_revoking_token_evicts_it(self):
+        self.add_profile_response()
+        responses.add(responses.Response(responses.POST, self.client.get_auth_token_revocation_url(), status=204))
+        self.client.profile(self.token)
+        self.client.revoke_tokens({'token': self.token})
+        self.client.profile(self.token)
+        assert_equal(len([call for call in responses.calls if call.request.method == 'GET']), 2)
+
+    @responses.activate
+    def test_profile_cached_during_revocation_is_evicted(self):
+        def revoke(request):
+            # A concurrent request looks the token up while CAS revokes it
+            self.store.set(cas.make_profile_key(self.token), make_successful_response(self.user))
+            return (204, {}, '')
+
+        responses.add_callback(responses.POST, self.client.get_auth_token_revocation_url(), callback=revoke)
+        assert_true(self.client.revoke_tokens({'token': self.token}))
+        assert_is_none(self.store.get(cas.make_profile_key(self.token)))
+
+    @responses.activate
+    def test_revoking_application_tokens_clears_cache(self):
+        self.add_profile_response()
+        responses.add(responses.Response(responses.POST, self.client.get_auth_token_revocation_url(), status=204))
+        self.client.profile(self.token)
+        self.client.revoke_application_tokens('fake_id', 'fake_secret')
+        assert_equal(len(self.store), 0)
+
+    @responses.activate
+    def test_profile_metrics(self):
+        self.add_profile_response()
+        before = metrics.snapshot('cas.')
+        self.client.profile(self.token)
+        self.client.profile(self.token)
+        after = metrics.snapshot('cas.')
+        assert_equal(after['cas.profile']['count'] - before.get('cas.profile', {}).get('count', 0), 1)
+        assert_equal(after['cas.profile_cache.hit'] - before.get('cas.profile_cache.hit', 0), 1)
+        assert_greater(after['cas.profile_cache.hit_rate'], 0)
+
+
+class TestSharedCASProfileCache(OsfTestCase):
+    """Two stores on the same Django cache stand in for two worker processes."""
+
+    def setUp(self):
+        OsfTestCase.setUp(self)
+        self.client = cas.CasClient('http://accounts.test.test')
+        self.token = fake.md5()
+        self.worker = cas.DjangoProfileStore(alias='default', ttl=30)
+        self.other_worker = cas.DjangoProfileStore(alias='default', ttl=30)
+        self.worker.cache.clear()
+        self.worker.set(cas.make_profile_key(self.token), make_successful_response(UserFactory()))
+        responses.add(responses.Response(responses.POST, self.client.get_auth_token_revocation_url(), status=204))
+
+    def tearDown(self):
+        self.worker.cache.clear()
+        OsfTestCase.tearDown(self)
+
+    @responses.activate
+    def test_revoking_token_in_another_process_evicts_it(self):
+        with mock.patch.object(cas.get_profile_store, 'store', self.other_worker):
+            self.client.revoke_tokens({'token': self.token})
+        assert_is_none(self.worker.get(cas.make_profile_key(self.token)))
+
+    @responses.activate
+    def test_revoking_application_tokens_in_another_process_evicts_them(self):
+        with mock.patch.object(cas.get_profile_store, 'store', self.other_worker):
+            self.client.revoke_application_tokens('fake_id', 'fake_secret')
+        assert_is_none(self.worker.get(cas.make_profile_key(self.token)))
+
+
 class TestCASTicketAuthentication(OsfTestCase):
 
     def setUp(self):
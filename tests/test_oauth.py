@@ -5,15 +5,20 @@ import json
 import time
 import urlparse
 
+from django.db import connection, transaction
+from django.db.utils import OperationalError
+import mock
 import responses
 from nose.tools import *  # noqa
 import pytz
 from oauthlib.oauth2 import OAuth2Error
+from psycopg2 import errorcodes
 
 from framework.auth import authenticate
 from framework.exceptions import PermissionsError, HTTPError
 from framework.sessions import session
 from osf.models.external import ExternalAccount, ExternalProvider, OAUTH1, OAUTH2
+from website import settings
 from website.util import api_url_for, web_url_for
 
 from tests.base import OsfTestCase
@@ -772,3 +777,83 @@ class TestExternalProviderOAuth2(OsfTestCase):
 
         with assert_raises(OAuth2Error):
             self.provider.refresh_oauth_key(force=True)
+
+    @responses.activate
+    def test_refresh_gives_up_waiting_for_account_being_refreshed(self):
+        external_account = ExternalAccountFactory(
+            provider='mock2',
+            provider_id='mock_provider_id',
+            provider_name='Mock Provider',
+            oauth_key='old_key',
+            expires_at=datetime.utcfromtimestamp(time.time() - 200).replace(tzinfo=pytz.utc),
+        )
+        ExternalAccount.objects.filter(pk=external_account.pk).update(oauth_key='new_key')
+        self.provider.account = external_account
+        lock_timeout = OperationalError('canceling statement due to lock timeout')
+        lock_timeout.__cause__ = mock.Mock(pgcode=errorcodes.LOCK_NOT_AVAILABLE)
+
+        with mock.patch.object(MockOAuth2Provider, '_lock_account', side_effect=lock_timeout):
+            assert_false(self.provider.refresh_oauth_key(force=True))
+        assert_equal(len(responses.calls), 0)
+        assert_equal(external_account.oauth_key, 'new_key')
+
+    def test_lock_account_restores_lock_timeout(self):
+        external_account = ExternalAccountFactory(provider='mock2')
+        self.provider.account = external_account
+        with mock.patch.object(settings, 'OAUTH_REFRESH_LOCK_TIMEOUT', 2):
+            with transaction.atomic():
+                assert_equal(self.provider._lock_account('default'), external_account)
+                with connection.cursor() as cursor:
+                    cursor.execute('SHOW lock_timeout')
+                    assert_equal(cursor.fetchone()[0], '0')
+
+    @responses.activate
+    def test_refresh_uses_tokens_refreshed_by_another_worker(self):
+        external_account = ExternalAccountFactory(
+            provider='mock2',
+            provider_id='mock_provider_id',
+            provider_name='Mock Provider',
+            oauth_key='old_key',
+            refresh_token='old_refresh',
+            expires_at=datetime.utcfromtimestamp(time.time() - 200).replace(tzinfo=pytz.utc),
+        )
+        ExternalAccount.objects.filter(pk=external_account.pk).update(
+            oauth_key='new_key',
+            refresh_token='new_refresh',
+            expires_at=datetime.utcfromtimestamp(time.time() + 3600).replace(tzinfo=pytz.utc),
+        )
+        self.provider.account = external_account
+
+        assert_false(self.provider.refresh_oauth_key(force=False))
+        assert_equal(len(responses.calls), 0)
+        assert_equal(external_account.oauth_key, 'new_key')
+        assert_equal(external_account.refresh_token, 'new_refresh')
+
+    @responses.activate
+    def test_forced_refresh_uses_latest_refresh_token(self):
+        external_account = ExternalAccountFactory(
+            provider='mock2',
+            provider_id='mock_provider_id',
+            provider_name='Mock Provider',
+            oauth_key='old_key',
+            refresh_token='old_refresh',
+            expires_at=datetime.utcfromtimestamp(time.time() - 200).replace(tzinfo=pytz.utc),
+        )
+        ExternalAccount.objects.filter(pk=external_account.pk).update(refresh_token='rotated_refresh')
+        responses.add(
+            responses.Response(
+                responses.POST,
+                self.provider.auto_refresh_url,
+                body=json.dumps({
+                    'access_token': 'refreshed_access_token',
+                    'expires_in': 3600,
+                    'refresh_token': 'refreshed_refresh_token'
+                })
+            )
+        )
+        self.provider.account = external_account
+
+        assert_true(self.provider.refresh_oauth_key(force=True))
+        assert_in('refresh_token=rotated_refresh', responses.calls[0].request.body)
+        external_account.reload()
+        assert_equal(external_account.refresh_token, 'refreshed_refresh_token')
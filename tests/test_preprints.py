@@ -671,14 +671,15 @@ class TestPreprintSaveShareHook(OsfTestCase):
         self.preprint.set_subjects([[self.subject_two._id]], auth=self.auth)
         assert not mock_on_preprint_updated.called
 
-    @mock.patch('website.preprints.tasks.requests')
+    @mock.patch('website.share.tasks.get_session')
     @mock.patch('website.preprints.tasks.settings.SHARE_URL', 'ima_real_website')
-    def test_send_to_share_is_true(self, mock_requests):
+    def test_send_to_share_is_true(self, get_session):
         self.preprint.provider.access_token = 'Snowmobiling'
         self.preprint.provider.save()
         on_preprint_updated(self.preprint._id)
 
-        assert mock_requests.post.called
+        assert get_session().post.called
+        assert get_session().post.call_args[0][0] == 'ima_real_websiteapi/v2/normalizeddata/'
 
     @mock.patch('website.preprints.tasks.on_preprint_updated.si')
     def test_node_contributor_changes_updates_preprints_share(self, mock_on_preprint_updated):
@@ -711,20 +712,20 @@ class TestPreprintSaveShareHook(OsfTestCase):
 
     @mock.patch('website.preprints.tasks.settings.SHARE_URL', 'a_real_url')
     @mock.patch('website.preprints.tasks._async_update_preprint_share.delay')
-    @mock.patch('website.preprints.tasks.requests')
-    def test_call_async_update_on_500_failure(self, requests, mock_async):
+    @mock.patch('website.share.tasks.get_session')
+    def test_call_async_update_on_500_failure(self, get_session, mock_async):
         self.preprint.provider.access_token = 'Snowmobiling'
-        requests.post.return_value = MockShareResponse(501)
+        get_session().post.return_value = MockShareResponse(501)
         update_preprint_share(self.preprint)
         assert mock_async.called
 
     @mock.patch('website.preprints.tasks.settings.SHARE_URL', 'a_real_url')
     @mock.patch('website.preprints.tasks.send_desk_share_preprint_error')
     @mock.patch('website.preprints.tasks._async_update_preprint_share.delay')
-    @mock.patch('website.preprints.tasks.requests')
-    def test_no_call_async_update_on_400_failure(self, requests, mock_async, mock_mail):
+    @mock.patch('website.share.tasks.get_session')
+    def test_no_call_async_update_on_400_failure(self, get_session, mock_async, mock_mail):
         self.preprint.provider.access_token = 'Snowmobiling'
-        requests.post.return_value = MockShareResponse(400)
+        get_session().post.return_value = MockShareResponse(400)
         update_preprint_share(self.preprint)
         assert not mock_async.called
         assert mock_mail.called
@@ -12,6 +12,7 @@ from osf.models.files import BaseFileNode
 from tests.base import OsfTestCase
 from osf_tests.factories import AuthUserFactory, ProjectFactory
 from website.files import exceptions
+from website.files.utils import insert_file_nodes
 from osf import models
 
 
@@ -713,3 +714,22 @@ class TestSubclasses(FilesTestCase):
             mock.call('bar', version='foo'),
             mock.call(None, version='zyzz', bar='baz'),
         ])
+
+
+class TestInsertFileNodes(FilesTestCase):
+
+    def test_inserts_file_nodes(self):
+        files = [S3File(node=self.node, _path='/file{}'.format(i), name='file{}'.format(i), provider='s3') for i in range(3)]
+        assert_equal(insert_file_nodes(files), files)
+        for file_node in files:
+            assert_equal(S3File.objects.get(id=file_node.id)._path, file_node._path)
+
+    def test_skips_files_inserted_concurrently(self):
+        existing = S3File(node=self.node, _path='/file', name='file', provider='s3')
+        existing.save()
+        duplicate = S3File(node=self.node, _path='/file', name='file', provider='s3')
+        new = S3File(node=self.node, _path='/new', name='new', provider='s3')
+
+        assert_equal(insert_file_nodes([duplicate, new]), [new])
+        assert_is_none(duplicate.pk)
+        assert_equal(S3File.objects.filter(node=self.node, _path='/file').count(), 1)
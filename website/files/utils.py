@@ -1,30 +1,150 @@
+import bson
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.utils import timezone
+
+# The subtree under %(src_id)s, skipping trashed nodes like Folder.children does,
+# with a new primary key drawn for every node
+COPY_TREE_SQL = """
+    WITH RECURSIVE tree AS (
+        SELECT id, parent_id
+        FROM osf_basefilenode
+        WHERE id = %(src_id)s
+    UNION ALL
+        SELECT F.id, F.parent_id
+        FROM osf_basefilenode F
+        JOIN tree ON F.parent_id = tree.id
+        WHERE F.type <> ALL(%(trashed_types)s)
+    )
+    SELECT id, parent_id, nextval(pg_get_serial_sequence('osf_basefilenode', 'id'))
+    FROM tree;
+"""
+
+COPY_VERSIONS_SQL = """
+    INSERT INTO osf_basefilenode_versions (basefilenode_id, fileversion_id)
+    SELECT copy.new_id, V.fileversion_id
+    FROM unnest(%(new_ids)s::int[], %(old_ids)s::int[]) AS copy(new_id, old_id)
+    JOIN osf_basefilenode_versions V ON V.basefilenode_id = copy.old_id
+    ORDER BY V.id;
+"""
 
 
 def copy_files(src, target_node, parent=None, name=None):
     """Copy the files from src to the target node
+
+    The whole tree is copied with a fixed number of queries: one reads the
+    subtree and reserves the new ids, one inserts all the copies and one links
+    them to the versions of their originals. Like ``BaseModel.clone``, the
+    copies do not keep their originals' foreign keys, guids or tags.
+
     :param Folder src: The source to copy children from
     :param Node target_node: The node settings of the project to copy files to
     :param Folder parent: The parent of to attach the clone of src to, if applicable
+    :return: The copy of src
     """
+    from addons.osfstorage.models import OsfStorageFile
+    from osf.models import BaseFileNode, TrashedFileNode
+    from website.search import search
+
     assert not parent or not parent.is_file, 'Parent must be a folder'
 
-    cloned = src.clone()
-    cloned.parent = parent
-    cloned.node = target_node
-    cloned.name = name or cloned.name
-    cloned.copied_from = src
+    with connection.cursor() as cursor:
+        cursor.execute(COPY_TREE_SQL, {
+            'src_id': src.id,
+            'trashed_types': list(TrashedFileNode._typedmodels_subtypes),
+        })
+        tree = cursor.fetchall()
+
+    new_ids = {old_id: new_id for old_id, _, new_id in tree}
+    old_ids = [old_id for old_id, _, _ in tree]
+    values = {
+        'old_ids': old_ids,
+        'new_ids': [new_ids[old_id] for old_id in old_ids],
+        'parent_ids': [
+            new_ids[parent_id] if old_id != src.id else getattr(parent, 'id', None)
+            for old_id, parent_id, _ in tree
+        ],
+        'object_ids': [str(bson.ObjectId()) for _ in old_ids],
+        'src_id': src.id,
+        'name': name or src.name,
+        'node_id': target_node.id,
+        'now': timezone.now(),
+    }
+
+    overrides = {
+        'id': 'copy.new_id',
+        '_id': 'copy.object_id',
+        'parent_id': 'copy.parent_id',
+        'node_id': '%(node_id)s',
+        'copied_from_id': 'F.id',
+        'name': 'CASE WHEN F.id = %(src_id)s THEN %(name)s ELSE F.name END',
+        'created': '%(now)s',
+        'modified': '%(now)s',
+    }
+    columns, expressions = [], []
+    for field in BaseFileNode._meta.concrete_fields:
+        columns.append('"{}"'.format(field.column))
+        if field.column in overrides:
+            expressions.append(overrides[field.column])
+        elif field.is_relation:
+            expressions.append('NULL')  # Like clone, which empties every foreign key
+        else:
+            expressions.append('F."{}"'.format(field.column))
 
-    cloned.save()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO osf_basefilenode ({columns})
+            SELECT {expressions}
+            FROM unnest(%(new_ids)s::int[], %(old_ids)s::int[], %(parent_ids)s::int[], %(object_ids)s::text[])
+                AS copy(new_id, old_id, parent_id, object_id)
+            JOIN osf_basefilenode F ON F.id = copy.old_id
+            RETURNING id, type;
+        """.format(columns=', '.join(columns), expressions=', '.join(expressions)), values)
+        copied = cursor.fetchall()
+        cursor.execute(COPY_VERSIONS_SQL, values)
 
-    if src.is_file and src.versions.exists():
-        cloned.versions.add(*src.versions.all())
+    # OsfStorageFile.save indexes each file it saves
+    search.update_files([id_ for id_, type_ in copied if type_ == OsfStorageFile._typedmodels_type])
 
-    if not src.is_file:
-        for child in src.children:
-            copy_files(child, target_node, parent=cloned)
+    return BaseFileNode.objects.get(id=new_ids[src.id])
 
-    return cloned
+
+def insert_file_nodes(file_nodes, batch_size=1000):
+    """Insert unsaved file nodes, skipping any that would violate a uniqueness
+    index because another request inserted the same file first.
+
+    :param list file_nodes: Unsaved ``BaseFileNode`` instances
+    :return: The file nodes that were inserted, with their primary keys set
+    """
+    from osf.models import BaseFileNode
+
+    fields = [field for field in BaseFileNode._meta.concrete_fields if not field.primary_key]
+    columns = ', '.join('"{}"'.format(field.column) for field in fields)
+    row = '({})'.format(', '.join(['%s'] * len(fields)))
+    ids = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(file_nodes), batch_size):
+            batch = file_nodes[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(file_node, True), connection)
+                for file_node in batch for field in fields
+            ]
+            cursor.execute("""
+                INSERT INTO osf_basefilenode ({columns})
+                VALUES {rows}
+                ON CONFLICT DO NOTHING
+                RETURNING _id, id;
+            """.format(columns=columns, rows=', '.join([row] * len(batch))), params)
+            ids.update(cursor.fetchall())
+
+    inserted = []
+    for file_node in file_nodes:
+        if file_node._id in ids:
+            file_node.id = ids[file_node._id]
+            file_node._state.adding = False
+            file_node._state.db = connection.alias
+            inserted.append(file_node)
+    return inserted
 
 
 class GenWrapper(object):
@@ -21,16 +21,17 @@ Usage: ::
 import os
 import logging
 
-from mako.lookup import TemplateLookup, Template
+from mako.lookup import Template
 
 from framework.email import tasks
+from framework.mako_modules import CachedTemplateLookup
 from website import settings
 
 logger = logging.getLogger(__name__)
 
 EMAIL_TEMPLATES_DIR = os.path.join(settings.TEMPLATES_PATH, 'emails')
 
-_tpl_lookup = TemplateLookup(
+_tpl_lookup = CachedTemplateLookup(
     directories=[EMAIL_TEMPLATES_DIR],
 )
 
@@ -3,13 +3,13 @@ import logging
 import urlparse
 
 import random
-import requests
 
 from framework.exceptions import HTTPError
 from framework.celery_tasks import app as celery_app
 from framework import sentry
 
 from website import settings, mails
+from website.share import tasks as share_tasks
 from website.util.share import GraphNode, format_contributor, format_subject
 from website.identifiers.tasks import update_ezid_metadata_on_change
 from website.identifiers.utils import request_identifiers_from_ezid, parse_identifiers
@@ -33,9 +33,15 @@ def on_preprint_updated(preprint_id, update_share=True, share_type=None, old_sub
             sentry.log_exception()
             sentry.log_message(err.args[0])
     if update_share:
-        update_preprint_share(preprint, old_subjects, share_type)
+        queue_preprint_share(preprint, old_subjects, share_type)
+
+def queue_preprint_share(preprint, old_subjects=None, share_type=None):
+    # Sent by the next flush of the SHARE outbox, with the other changes queued by then
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    share_tasks.enqueue(QueuedShareUpdate.PREPRINT, [preprint.id], share_type=share_type, old_subjects=old_subjects)
 
 def update_preprint_share(preprint, old_subjects=None, share_type=None):
+    # Sends preprint to SHARE right away
     if settings.SHARE_URL:
         if not preprint.provider.access_token:
             raise ValueError('No access_token for {}. Unable to send {} to SHARE.'.format(preprint.provider, preprint))
@@ -64,17 +70,6 @@ def _async_update_preprint_share(self, preprint_id, old_subjects, share_type):
     data = serialize_share_preprint_data(preprint, share_type, old_subjects)
     resp = send_share_preprint_data(preprint, data)
     try:
-        resp = requests.post('{}api/v2/normalizeddata/'.format(settings.SHARE_URL), json={
-            'data': {
-                'type': 'NormalizedData',
-                'attributes': {
-                    'tasks': [],
-                    'raw': None,
-                    'data': {'@graph': format_preprint(preprint, share_type, old_subjects)}
-                }
-            }
-        }, headers={'Authorization': 'Bearer {}'.format(preprint.provider.access_token), 'Content-Type': 'application/vnd.api+json'})
-        logger.debug(resp.content)
         resp.raise_for_status()
     except Exception as e:
         if resp.status_code >= 500:
@@ -88,21 +83,10 @@ def _async_update_preprint_share(self, preprint_id, old_subjects, share_type):
             send_desk_share_preprint_error(preprint, resp, self.request.retries)
 
 def serialize_share_preprint_data(preprint, share_type, old_subjects):
-    return {
-        'data': {
-            'type': 'NormalizedData',
-            'attributes': {
-                'tasks': [],
-                'raw': None,
-                'data': {'@graph': format_preprint(preprint, share_type, old_subjects)}
-            }
-        }
-    }
+    return share_tasks.serialize_graph(format_preprint(preprint, share_type, old_subjects))
 
 def send_share_preprint_data(preprint, data):
-    resp = requests.post('{}api/v2/normalizeddata/'.format(settings.SHARE_URL), json=data, headers={'Authorization': 'Bearer {}'.format(preprint.provider.access_token), 'Content-Type': 'application/vnd.api+json'})
-    logger.debug(resp.content)
-    return resp
+    return share_tasks.send_normalized_data('{}api/v2/normalizeddata/'.format(settings.SHARE_URL), preprint.provider.access_token, data)
 
 def format_preprint(preprint, share_type, old_subjects=None):
     if old_subjects is None:
@@ -2,11 +2,13 @@ from django.apps import apps
 import logging
 import urlparse
 import random
-import requests
 
 from framework.celery_tasks import app as celery_app
+from framework.exceptions import PermissionsError
 
 from website import settings, mails
+from website.exceptions import NodeStateError
+from website.share import tasks as share_tasks
 from website.util.share import GraphNode, format_contributor
 
 
@@ -31,11 +33,50 @@ def on_node_updated(node_id, user_id, first_save, saved_fields, request_headers=
         need_update = False
 
     if need_update:
-        node.update_search()
-        update_node_share(node)
+        node.update_search(include_files=bool(node.FILE_SEARCH_UPDATE_FIELDS.intersection(saved_fields)))
+        queue_node_share(node)
+
+@celery_app.task(bind=True, max_retries=2, acks_late=True)
+def run_fork_job(self, job_id):
+    """Run a ForkJob. The message is acknowledged after the task, so the job
+    is run again if the worker dies; ForkJob.run skips the nodes forked already.
+    """
+    ForkJob = apps.get_model('osf.ForkJob')
+    job = ForkJob.load(job_id)
+    if job is None or job.done:
+        return
+    try:
+        job.run()
+    except (PermissionsError, NodeStateError):
+        logger.exception('Fork job {} cannot be completed'.format(job_id))
+        job.fail()
+    except Exception as e:
+        if self.request.retries == self.max_retries or job.attempts >= settings.FORK_JOB_MAX_ATTEMPTS:
+            logger.exception('Fork job {} failed'.format(job_id))
+            job.fail()
+            return
+        raise self.retry(exc=e, countdown=(random.random() + 1) * 60)
+
+
+@celery_app.task(ignore_results=True)
+def resume_fork_jobs():
+    """Run the fork jobs that stopped making progress again."""
+    ForkJob = apps.get_model('osf.ForkJob')
+    for job in ForkJob.objects.stale():
+        if job.attempts >= settings.FORK_JOB_MAX_ATTEMPTS:
+            job.fail()
+        else:
+            logger.info('Resuming fork job {}'.format(job._id))
+            run_fork_job.delay(job._id)
+
+
+def queue_node_share(node):
+    # Sent by the next flush of the SHARE outbox, with the other changes queued by then
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    share_tasks.enqueue(QueuedShareUpdate.NODE, [node.id])
 
 def update_node_share(node):
-    # Wrapper that ensures share_url and token exist
+    # Sends node to SHARE right away; wrapper that ensures share_url and token exist
     if settings.SHARE_URL:
         if not settings.SHARE_API_TOKEN:
             return logger.warning('SHARE_API_TOKEN not set. Could not send "{}" to SHARE.'.format(node._id))
@@ -76,36 +117,19 @@ def _async_update_node_share(self, node_id):
             send_desk_share_error(node, resp, self.request.retries)
 
 def send_share_node_data(data):
-    resp = requests.post('{}api/normalizeddata/'.format(settings.SHARE_URL), json=data, headers={'Authorization': 'Bearer {}'.format(settings.SHARE_API_TOKEN), 'Content-Type': 'application/vnd.api+json'})
-    logger.debug(resp.content)
-    return resp
+    return share_tasks.send_normalized_data('{}api/normalizeddata/'.format(settings.SHARE_URL), settings.SHARE_API_TOKEN, data)
 
 def serialize_share_node_data(node):
-    return {
-        'data': {
-            'type': 'NormalizedData',
-            'attributes': {
-                'tasks': [],
-                'raw': None,
-                'data': {'@graph': format_registration(node) if node.is_registration else format_node(node)}
-            }
-        }
-    }
+    return share_tasks.serialize_graph(format_registration(node) if node.is_registration else format_node(node))
 
 def format_node(node):
     is_qa_node = bool(set(settings.DO_NOT_INDEX_LIST['tags']).intersection(node.tags.all().values_list('name', flat=True))) \
         or any(substring in node.title for substring in settings.DO_NOT_INDEX_LIST['titles'])
+    # Blank node ids are unique so that the graph can be sent along with others
+    project_graph = GraphNode('project', is_deleted=not node.is_public or node.is_deleted or node.is_spammy or is_qa_node)
     return [
-        {
-            '@id': '_:123',
-            '@type': 'workidentifier',
-            'creative_work': {'@id': '_:789', '@type': 'project'},
-            'uri': '{}{}/'.format(settings.DOMAIN, node._id),
-        }, {
-            '@id': '_:789',
-            '@type': 'project',
-            'is_deleted': not node.is_public or node.is_deleted or node.is_spammy or is_qa_node
-        }
+        GraphNode('workidentifier', creative_work=project_graph, uri='{}{}/'.format(settings.DOMAIN, node._id)).serialize(),
+        project_graph.serialize(),
     ]
 
 def format_registration(node):
@@ -14,7 +14,7 @@ from framework.auth.signals import user_registered
 from framework.auth.utils import validate_email, validate_recaptcha
 from framework.exceptions import HTTPError
 from framework.flask import redirect  # VOL-aware redirect
-from framework.sessions import session
+from framework.sessions import mark_session_dirty, session
 from framework.transactions.handlers import no_auto_transaction
 from framework.utils import get_timestamp, throttle_period_expired
 from osf.models import AbstractNode, OSFUser, PreprintService
@@ -640,7 +640,7 @@ def claim_user_registered(auth, node, **kwargs):
     session.data['unreg_user'] = {
         'uid': uid, 'pid': pid, 'token': token
     }
-    session.save()
+    mark_session_dirty()
 
     form = PasswordForm(request.form)
     if request.method == 'POST':
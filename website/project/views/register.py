@@ -22,7 +22,7 @@ from website.project.decorators import (
     must_not_be_retracted_registration
 )
 from website.identifiers.utils import build_ezid_metadata
-from osf.models import Identifier, MetaSchema
+from osf.models import AbstractNode, Identifier, MetaSchema
 from website.project.utils import serialize_node
 from osf.utils.permissions import ADMIN
 from website import language
@@ -178,7 +178,9 @@ def project_before_register(auth, node, **kwargs):
     }
     errors = {}
 
-    addon_set = [n.get_addons() for n in itertools.chain([node], node.get_descendants_recursive(primary_only=True))]
+    nodes = list(itertools.chain([node], node.get_descendants_recursive(primary_only=True)))
+    AbstractNode.prefetch_addons(nodes)
+    addon_set = [n.get_addons() for n in nodes]
     for addon in itertools.chain(*addon_set):
         if not addon.complete:
             continue
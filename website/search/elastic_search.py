@@ -15,22 +15,30 @@ import six
 
 from django.apps import apps
 from django.core.paginator import Paginator
+from django.db import connection, transaction
 from django.db.models import Q
+from django.utils import timezone
 from elasticsearch import (ConnectionError, Elasticsearch, NotFoundError,
                            RequestError, TransportError, helpers)
 from framework.celery_tasks import app as celery_app
 from framework.database import paginated
+from framework.metrics import metrics
 from osf.models import AbstractNode
 from osf.models import OSFUser
 from osf.models import BaseFileNode
 from osf.models import Institution
 from osf.models import QuickFilesNode
+from osf.models import QueuedSearchUpdate
 from osf.utils.sanitize import unescape_entities
 from website import settings
 from website.filters import profile_image_url
 from osf.models.licenses import serialize_node_license_record
 from website.search import exceptions
 from website.search.util import build_query, clean_splitters
+from website.search_migration import (
+    JSON_UPDATE_NODES_SQL, JSON_DELETE_NODES_SQL, JSON_UPDATE_FILES_SQL,
+    JSON_UPDATE_USERS_SQL, JSON_DELETE_USERS_SQL,
+)
 from website.views import validate_page_num
 
 logger = logging.getLogger(__name__)
@@ -236,23 +244,26 @@ def search(query, index=None, doc_type='_all', raw=False):
     return return_value
 
 def format_results(results):
+    parents = load_parents(
+        result.get('parent_id') for result in results
+        if result.get('category') in {'file', 'project', 'component', 'registration', 'preprint'}
+    )
     ret = []
     for result in results:
         if result.get('category') == 'user':
             result['url'] = '/profile/' + result['id']
         elif result.get('category') == 'file':
-            parent_info = load_parent(result.get('parent_id'))
+            parent_info = parents.get(result.get('parent_id'))
             result['parent_url'] = parent_info.get('url') if parent_info else None
             result['parent_title'] = parent_info.get('title') if parent_info else None
         elif result.get('category') in {'project', 'component', 'registration', 'preprint'}:
-            result = format_result(result, result.get('parent_id'))
+            result = format_result(result, parent_info=parents.get(result.get('parent_id')))
         elif not result.get('category'):
             continue
         ret.append(result)
     return ret
 
-def format_result(result, parent_id=None):
-    parent_info = load_parent(parent_id)
+def format_result(result, parent_info=None):
     formatted_result = {
         'contributors': result['contributors'],
         'wiki_link': result['url'] + 'wiki/',
@@ -282,8 +293,7 @@ def format_result(result, parent_id=None):
     return formatted_result
 
 
-def load_parent(parent_id):
-    parent = AbstractNode.load(parent_id)
+def serialize_parent(parent):
     if parent and parent.is_public:
         return {
             'title': parent.title,
@@ -294,6 +304,20 @@ def load_parent(parent_id):
     return None
 
 
+def load_parents(parent_ids):
+    """Load the parents of a page of results in one query.
+
+    :return: dict mapping the guid of each public parent to its serialized form
+    """
+    parent_ids = {parent_id for parent_id in parent_ids if parent_id}
+    if not parent_ids:
+        return {}
+    return {
+        parent._id: serialize_parent(parent)
+        for parent in AbstractNode.objects.filter(guids___id__in=parent_ids, is_public=True)
+    }
+
+
 COMPONENT_CATEGORIES = set(settings.NODE_CATEGORY_MAP.keys())
 
 
@@ -371,18 +395,20 @@ def serialize_node(node, category):
         'preprint_url': node.preprint_url,
     }
     if not node.is_retracted:
-        for wiki in node.get_wiki_pages_latest():
+        from addons.wiki.models import WikiVersion
+        for wiki in WikiVersion.prefetch_rendered(node.get_wiki_pages_latest().select_related('wiki_page'), node):
             # '.' is not allowed in field names in ES2
             elastic_document['wikis'][wiki.wiki_page.page_name.replace('.', ' ')] = wiki.raw_text(node)
 
     return elastic_document
 
 @requires_search
-def update_node(node, index=None, bulk=False, async=False):
+def update_node(node, index=None, bulk=False, async=False, include_files=True):
     from addons.osfstorage.models import OsfStorageFile
     index = index or INDEX
-    for file_ in paginated(OsfStorageFile, Q(node=node)):
-        update_file(file_, index=index)
+    if include_files:
+        for file_ in paginated(OsfStorageFile, Q(node=node)):
+            update_file(file_, index=index)
 
     is_qa_node = bool(set(settings.DO_NOT_INDEX_LIST['tags']).intersection(node.tags.all().values_list('name', flat=True))) or any(substring in node.title for substring in settings.DO_NOT_INDEX_LIST['titles'])
     if node.is_deleted or not node.is_public or node.archiving or (node.is_spammy and settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH) or node.is_quickfiles or is_qa_node:
@@ -556,6 +582,136 @@ def update_file(file_, index=None, delete=False):
         refresh=True
     )
 
+def sql_array(ids):
+    return 'ARRAY[{}]::int[]'.format(','.join(str(int(id_)) for id_ in ids))
+
+def serialize_queued(sql, index, id_filter):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            index=index,
+            id_filter=id_filter,
+            spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH
+        ))
+        return cursor.fetchone()[0] or []
+
+def index_queued(entries, index=None, refresh=False):
+    """Reindex the objects of a batch of QueuedSearchUpdates with the set-based
+    queries that are used to migrate the index.
+
+    :return: The numbers of documents updated and deleted, and the errors of
+        the documents that could not be updated
+    """
+    index = index or INDEX
+    ids = {object_type: [] for object_type, _ in QueuedSearchUpdate.OBJECT_TYPE_CHOICES}
+    for entry in entries:
+        ids[entry.object_type].append(entry.object_id)
+    file_node_ids = [entry.object_id for entry in entries if entry.object_type == QueuedSearchUpdate.NODE and entry.include_files]
+
+    updates, deletes = [], []
+    if ids[QueuedSearchUpdate.NODE]:
+        id_filter = 'id = ANY({})'.format(sql_array(ids[QueuedSearchUpdate.NODE]))
+        updates += serialize_queued(JSON_UPDATE_NODES_SQL, index, id_filter)
+        deletes += serialize_queued(JSON_DELETE_NODES_SQL, index, id_filter)
+    if ids[QueuedSearchUpdate.FILE] or file_node_ids:
+        file_updates = serialize_queued(
+            JSON_UPDATE_FILES_SQL, index,
+            "type = 'osf.osfstoragefile' AND (id = ANY({}) OR node_id = ANY({}))".format(
+                sql_array(ids[QueuedSearchUpdate.FILE]), sql_array(file_node_ids)
+            )
+        )
+        updates += file_updates
+        # Files that are not serialized are trashed, or belong to nodes that are not indexed
+        indexed = {action['_id'] for action in file_updates}
+        queued = BaseFileNode.objects.filter(
+            Q(id__in=ids[QueuedSearchUpdate.FILE]) | Q(node_id__in=file_node_ids, type='osf.osfstoragefile')
+        ).values_list('_id', flat=True)
+        deletes += [
+            {'_op_type': 'delete', '_index': index, '_type': 'file', '_id': file_id}
+            for file_id in queued if file_id not in indexed
+        ]
+    if ids[QueuedSearchUpdate.USER]:
+        id_filter = 'id = ANY({})'.format(sql_array(ids[QueuedSearchUpdate.USER]))
+        updates += serialize_queued(JSON_UPDATE_USERS_SQL, index, id_filter)
+        deletes += serialize_queued(JSON_DELETE_USERS_SQL, index, id_filter)
+
+    errors = []
+    if updates:
+        _, errors = helpers.bulk(client(), updates, refresh=refresh, raise_on_error=False)
+    if deletes:
+        helpers.bulk(client(), deletes, refresh=refresh, raise_on_error=False)  # ignore 404s
+    return len(updates), len(deletes), errors
+
+def index_batch(entries, index=None, refresh=False):
+    """Reindex the objects of ``entries``. If the batch fails, its entries are
+    reindexed one at a time to find the ones that cannot be indexed. Errors
+    reaching Elasticsearch are raised, leaving the batch claimed.
+
+    :return: The entries that were indexed, and those that failed
+    """
+    try:
+        with transaction.atomic():
+            updated, deleted, errors = index_queued(entries, index=index, refresh=refresh)
+    except TransportError:
+        raise
+    except Exception:
+        if len(entries) == 1:
+            logger.exception('Could not index {!r}'.format(entries[0]))
+            return [], entries
+    else:
+        if not errors:
+            metrics.incr('search.queue.updated', updated)
+            metrics.incr('search.queue.deleted', deleted)
+            return entries, []
+        if len(entries) == 1:
+            logger.error('Could not index {!r}: {}'.format(entries[0], errors))
+            return [], entries
+
+    indexed, failed = [], []
+    for entry in entries:
+        entry_indexed, entry_failed = index_batch([entry], index=index, refresh=refresh)
+        indexed += entry_indexed
+        failed += entry_failed
+    return indexed, failed
+
+@requires_search
+def drain_search_queue(batch_size=None, index=None, refresh=False):
+    """Reindex queued objects in batches of ``batch_size`` until the queue is
+    empty. Entries that fail to index stay claimed and are retried once their
+    claim times out, and are dropped after ``SEARCH_QUEUE_MAX_RETRIES`` retries.
+
+    :return int: Number of queue entries handled
+    """
+    batch_size = batch_size or settings.SEARCH_QUEUE_BATCH_SIZE
+    total = 0
+    while True:
+        entries = QueuedSearchUpdate.claim(batch_size)
+        if not entries:
+            break
+        with metrics.timer('search.queue.batch'):
+            indexed, failed = index_batch(entries, index=index, refresh=refresh)
+        QueuedSearchUpdate.release(indexed)
+        exhausted = [entry for entry in failed if entry.retries >= settings.SEARCH_QUEUE_MAX_RETRIES]
+        for entry in exhausted:
+            logger.error('Giving up indexing {!r} after {} retries'.format(entry, entry.retries))
+        QueuedSearchUpdate.release(exhausted)
+        QueuedSearchUpdate.retry([entry for entry in failed if entry not in exhausted])
+        metrics.incr('search.queue.failed', len(exhausted))
+        now = timezone.now()
+        for entry in indexed:
+            metrics.record('search.index_lag', (now - entry.created).total_seconds())
+        if indexed:
+            logger.info('Reindexed {} queued objects, the oldest changed {:.3f}s ago'.format(
+                len(indexed), (now - min(entry.created for entry in indexed)).total_seconds()
+            ))
+        total += len(entries)
+        if len(entries) < batch_size:
+            break
+    return total
+
+@celery_app.task(ignore_results=True)
+def drain_search_queue_async(batch_size=None):
+    drain_search_queue(batch_size=batch_size)
+
 @requires_search
 def update_institution(institution, index=None):
     index = index or INDEX
@@ -685,21 +841,30 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
     pages = math.ceil(results['counts'].get('user', 0) / size)
     validate_page_num(page, pages)
 
+    # Load the users of the page and their projects in common with current_user in bulk
+    users_by_id = {
+        user._id: user
+        for user in OSFUser.objects.filter(guids___id__in=[doc['id'] for doc in docs])
+    }
+    if current_user:
+        projects_in_common = current_user.n_projects_in_common_by_user(list(users_by_id.values()))
+
     users = []
     for doc in docs:
         # TODO: use utils.serialize_user
-        user = OSFUser.load(doc['id'])
+        user = users_by_id.get(doc['id'])
+
+        if user is None:
+            logger.error('Could not load user {0}'.format(doc['id']))
+            continue
 
         if current_user and current_user._id == user._id:
             n_projects_in_common = -1
         elif current_user:
-            n_projects_in_common = current_user.n_projects_in_common(user)
+            n_projects_in_common = projects_in_common.get(user.id, 0)
         else:
             n_projects_in_common = 0
 
-        if user is None:
-            logger.error('Could not load user {0}'.format(doc['id']))
-            continue
         if user.is_active:  # exclude merged, unregistered, etc.
             current_employment = None
             education = None
@@ -1,7 +1,10 @@
 import logging
 
-from framework.celery_tasks.handlers import enqueue_task
+from django.db import transaction
 
+from framework.celery_tasks.handlers import enqueue_task, in_request_context
+
+from osf.models import QueuedSearchUpdate
 from website import settings
 
 logger = logging.getLogger(__name__)
@@ -24,13 +27,29 @@ def search(query, index=None, doc_type=None, raw=None):
     index = index or settings.ELASTIC_INDEX
     return search_engine.search(query, index=index, doc_type=doc_type, raw=raw)
 
+def drain_queue():
+    """Reindex the objects queued by this request or task, once it has committed."""
+    if not settings.USE_CELERY:
+        search_engine.drain_search_queue(refresh=True)
+    elif in_request_context():
+        enqueue_task(search_engine.drain_search_queue_async.s())
+    else:
+        # enqueue_task would drain inline in the calling task; hand the drain
+        # to a worker once the caller's transaction has committed instead
+        transaction.on_commit(lambda: search_engine.drain_search_queue_async.apply_async())
+
 @requires_search
-def update_node(node, index=None, bulk=False, async=True, saved_fields=None):
+def update_node(node, index=None, bulk=False, async=True, saved_fields=None, include_files=True):
     kwargs = {
         'index': index,
         'bulk': bulk
     }
-    if async:
+    if async and index is None:
+        # The queue entry is written in the same transaction as the change,
+        # so the drain sees the committed state of the node
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.NODE, [node.id], include_files=include_files)
+        drain_queue()
+    elif async:
         node_id = node._id
         # We need the transaction to be committed before trying to run celery tasks.
         # For example, when updating a Node's privacy, is_public must be True in the
@@ -42,7 +61,7 @@ def update_node(node, index=None, bulk=False, async=True, saved_fields=None):
             search_engine.update_node_async(node_id=node_id, **kwargs)
     else:
         index = index or settings.ELASTIC_INDEX
-        return search_engine.update_node(node, **kwargs)
+        return search_engine.update_node(node, include_files=include_files, **kwargs)
 
 @requires_search
 def bulk_update_nodes(serialize, nodes, index=None):
@@ -69,6 +88,10 @@ def update_contributors_async(user_id):
 
 @requires_search
 def update_user(user, index=None, async=True):
+    if async and index is None and user.is_active:
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.USER, [user.id])
+        drain_queue()
+        return
     index = index or settings.ELASTIC_INDEX
     if async:
         user_id = user.id
@@ -81,9 +104,20 @@ def update_user(user, index=None, async=True):
 
 @requires_search
 def update_file(file_, index=None, delete=False):
+    if index is None and not delete:
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.FILE, [file_.id])
+        drain_queue()
+        return
     index = index or settings.ELASTIC_INDEX
     search_engine.update_file(file_, index=index, delete=delete)
 
+@requires_search
+def update_files(file_ids):
+    """Queue the files with ``file_ids`` for reindexing, e.g. after copying them in bulk."""
+    if file_ids:
+        QueuedSearchUpdate.enqueue(QueuedSearchUpdate.FILE, file_ids)
+        drain_queue()
+
 @requires_search
 def update_institution(institution, index=None):
     index = index or settings.ELASTIC_INDEX
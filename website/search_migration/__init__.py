@@ -1,3 +1,6 @@
+# Each query serializes the rows matching {id_filter}, a condition on the queried
+# table such as "id > 0 AND id <= 10000", as a JSON array of bulk actions.
+
 JSON_UPDATE_NODES_SQL = """
 SELECT json_agg(
     json_build_object(
@@ -322,8 +325,7 @@ WHERE (TYPE = 'osf.node' OR TYPE = 'osf.registration' OR TYPE = 'osf.quickfilesn
             FROM osf_archivejob AJ
             WHERE (AJ.status != 'FAILURE' AND AJ.status != 'SUCCESS'
                    AND AJ.dst_node_id IS NOT NULL)))
-  AND id > {page_start}
-  AND id <= {page_end}
+  AND {id_filter}
 LIMIT 1;
 """
 
@@ -473,8 +475,7 @@ WHERE name IS NOT NULL
                                              WHERE (AJ.status != 'FAILURE' AND AJ.status != 'SUCCESS'
                                                 AND AJ.dst_node_id IS NOT NULL)))
                         )
-      AND id > {page_start}
-      AND id <= {page_end}
+      AND {id_filter}
 LIMIT 1;
 """
 
@@ -601,8 +602,7 @@ FROM osf_osfuser AS U
             LIMIT 1
             ) USER_GUID ON TRUE
 WHERE is_active = TRUE
-      AND id > {page_start}
-      AND id <= {page_end}
+      AND {id_filter}
 LIMIT 1;
 """
 
@@ -670,8 +670,7 @@ WHERE NOT ((TYPE = 'osf.node' OR TYPE = 'osf.registration' OR TYPE = 'osf.quickf
                WHERE (AJ.status != 'FAILURE' AND AJ.status != 'SUCCESS'
                    AND AJ.dst_node_id IS NOT NULL)))
   )
-  AND id > {page_start}
-  AND id <= {page_end}
+  AND {id_filter}
 LIMIT 1;
 """
 
@@ -707,8 +706,7 @@ WHERE NOT (name IS NOT NULL
                                                 AND AJ.dst_node_id IS NOT NULL)))
                         )
       )
-      AND id > {page_start}
-      AND id <= {page_end}
+      AND {id_filter}
 LIMIT 1;
 """
 
@@ -732,7 +730,6 @@ FROM osf_osfuser AS U
             LIMIT 1
             ) USER_GUID ON TRUE
 WHERE is_active != TRUE
-  AND id > {page_start}
-  AND id <= {page_end}
+  AND {id_filter}
 LIMIT 1;
 """
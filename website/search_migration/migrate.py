@@ -56,8 +56,7 @@ def sql_migrate(index, sql, max_id, increment, es_args=None, **kwargs):
         with connection.cursor() as cursor:
             cursor.execute(sql.format(
                 index=index,
-                page_start=page_start,
-                page_end=page_end,
+                id_filter='id > {} AND id <= {}'.format(page_start, page_end),
                 **kwargs))
             ser_objs = cursor.fetchone()[0]
             if ser_objs:
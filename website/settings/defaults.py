@@ -89,6 +89,8 @@ EXTERNAL_EMBER_APPS = {}
 
 LOG_PATH = os.path.join(APP_PATH, 'logs')
 TEMPLATES_PATH = os.path.join(BASE_PATH, 'templates')
+# Compiled Mako templates; see framework.mako_modules. Share it between workers to compile each template once.
+MAKO_MODULE_DIRECTORY = '/tmp/mako_modules'
 ANALYTICS_PATH = os.path.join(BASE_PATH, 'analytics')
 
 # User management & registration
@@ -107,6 +109,12 @@ ELASTIC_KWARGS = {
     # 'client_cert': None,
     # 'client_key': None
 }
+# Objects reindexed per bulk request when draining osf_queuedsearchupdate
+SEARCH_QUEUE_BATCH_SIZE = 500
+# Seconds after which queue entries claimed by a drain that did not finish are retried
+SEARCH_QUEUE_CLAIM_TIMEOUT = 300
+# Failed attempts to index a queue entry before it is dropped and reported
+SEARCH_QUEUE_MAX_RETRIES = 4
 
 # Sessions
 COOKIE_NAME = 'osf'
@@ -118,6 +126,18 @@ OSF_SESSION_TIMEOUT = 30 * 24 * 60 * 60  # 30 days in seconds
 SECRET_KEY = 'CHANGEME'
 SESSION_COOKIE_SECURE = SECURE_MODE
 SESSION_COOKIE_HTTPONLY = True
+# Read-through session cache. Can be 'django' (the Django cache named by
+# SESSION_CACHE_ALIAS, which must be shared by every worker), or None
+SESSION_CACHE = None
+SESSION_CACHE_ALIAS = 'default'
+SESSION_CACHE_TTL = 60  # seconds
+
+# Read-through cache of guid -> referent mappings used by Guid.load. Can be 'local'
+# (per-process LRU), 'django' (the Django cache named by GUID_CACHE_ALIAS), or None
+GUID_CACHE = None
+GUID_CACHE_ALIAS = 'default'
+GUID_CACHE_TTL = 5 * 60  # seconds
+GUID_CACHE_MAX_SIZE = 50000
 
 # local path to private key and cert for local development using https, overwrite in local.py
 OSF_SERVER_KEY = None
@@ -190,6 +210,12 @@ DB_NAME = 'osf20130903'
 DB_USER = None
 DB_PASS = None
 
+# Page and download counters are buffered in process and flushed in batches
+# Seconds between flushes
+PAGE_COUNTER_FLUSH_INTERVAL = 10
+# Flush early once this many (page, day) pairs are pending
+PAGE_COUNTER_FLUSH_THRESHOLD = 500
+
 # Cache settings
 SESSION_HISTORY_LENGTH = 5
 SESSION_HISTORY_IGNORE_RULES = [
@@ -352,8 +378,29 @@ SHARE_PREPRINT_PROVIDER_PREPEND = None
 SHARE_REGISTRATION_URL = ''
 SHARE_URL = None
 SHARE_API_TOKEN = None  # Required to send project updates to SHARE
+# Objects sent per NormalizedData request when flushing osf_queuedshareupdate
+SHARE_OUTBOX_BATCH_SIZE = 100
+# Seconds after which outbox entries claimed by a flush that did not finish are retried
+SHARE_OUTBOX_CLAIM_TIMEOUT = 300
+# Retries of an outbox entry whose batch failed on SHARE's side before the desk is told
+SHARE_OUTBOX_MAX_RETRIES = 4
+# Keep-alive connections to SHARE per process
+SHARE_POOL_SIZE = 4
 
 CAS_SERVER_URL = 'http://localhost:8080'
+CAS_REQUEST_TIMEOUT = 10  # seconds
+# Keep-alive connections to CAS per process
+CAS_POOL_SIZE = 10
+# Cache of successful bearer token profiles. Can be None (no caching), 'local' (per-process
+# LRU) or 'django' (the Django cache named by CAS_PROFILE_CACHE_ALIAS). Revoking a token or
+# changing its scopes only evicts it from the caches it can reach, and other processes honor
+# the old token for up to CAS_PROFILE_CACHE_TTL seconds. So only use 'django', and only once
+# CACHES points CAS_PROFILE_CACHE_ALIAS at a cache shared by every worker (memcached, redis);
+# Django's default cache is per process.
+CAS_PROFILE_CACHE = None
+CAS_PROFILE_CACHE_ALIAS = 'default'
+CAS_PROFILE_CACHE_TTL = 30  # seconds
+CAS_PROFILE_CACHE_MAX_SIZE = 10000
 MFR_SERVER_URL = 'http://localhost:7778'
 
 ###### ARCHIVER ###########
@@ -366,6 +413,14 @@ ARCHIVE_TIMEOUT_TIMEDELTA = timedelta(1)  # 24 hours
 
 ENABLE_ARCHIVER = True
 
+###### FORKS ###########
+# Projects with more nodes than this are forked by a ForkJob in celery instead of in the request
+FORK_SYNC_MAX_NODES = 20
+# A fork job that has made no progress for this long is run again by website.project.tasks.resume_fork_jobs
+FORK_JOB_TIMEOUT_TIMEDELTA = timedelta(minutes=30)
+# Runs of a fork job after which it is given up
+FORK_JOB_MAX_ATTEMPTS = 3
+
 JWT_SECRET = 'changeme'
 JWT_ALGORITHM = 'HS256'
 
@@ -381,6 +436,16 @@ RABBITMQ_VHOST = os.environ.get('RABBITMQ_VHOST', '/')
 # Seconds, not an actual celery setting
 CELERY_RETRY_BACKOFF_BASE = 5
 
+# Guids are handed out from a per-process pool, refilled this many candidates at a time
+GUID_POOL_BLOCK_SIZE = 100
+# Seconds before an unused block is discarded
+GUID_POOL_TTL = 60
+
+# Size of each process's greenlet pool for postcommit tasks, shared by its requests; one db connection per greenlet
+POSTCOMMIT_POOL_SIZE = 30
+# Seconds a request waits for its postcommit tasks
+POSTCOMMIT_TIMEOUT = 5.0
+
 class CeleryConfig:
     """
     Celery Configuration
@@ -408,6 +473,8 @@ class CeleryConfig:
         'website.search.elastic_search',
         'scripts.generate_sitemap',
         'scripts.generate_prereg_csv',
+        'scripts.clear_expired_throttle_counters',
+        'website.share.tasks',
     }
 
     med_pri_modules = {
@@ -470,6 +537,7 @@ class CeleryConfig:
         'website.archiver.tasks',
         'website.search.search',
         'website.project.tasks',
+        'website.share.tasks',
         'scripts.populate_new_and_noteworthy_projects',
         'scripts.populate_popular_projects_and_registrations',
         'scripts.refresh_addon_tokens',
@@ -486,6 +554,7 @@ class CeleryConfig:
         'scripts.generate_sitemap',
         'scripts.premigrate_created_modified',
         'scripts.generate_prereg_csv',
+        'scripts.clear_expired_throttle_counters',
     )
 
     # Modules that need metrics and release requirements
@@ -599,6 +668,22 @@ class CeleryConfig:
                 'task': 'scripts.generate_prereg_csv',
                 'schedule': crontab(minute=0, hour=10, day_of_week=0),  # Sunday 5:00 a.m.
             },
+            'drain_search_queue': {
+                'task': 'website.search.elastic_search.drain_search_queue_async',
+                'schedule': crontab(minute='*'),  # Every minute, retries entries left by failed drains
+            },
+            'clear_expired_throttle_counters': {
+                'task': 'scripts.clear_expired_throttle_counters',
+                'schedule': crontab(minute=15),  # Hourly
+            },
+            'resume_fork_jobs': {
+                'task': 'website.project.tasks.resume_fork_jobs',
+                'schedule': crontab(minute='*/10'),  # Every 10 minutes
+            },
+            'flush_share_outbox': {
+                'task': 'website.share.tasks.flush_share_outbox_async',
+                'schedule': crontab(minute='*'),  # Every minute
+            },
         }
 
         # Tasks that need metrics and release requirements
@@ -646,12 +731,33 @@ class CeleryConfig:
         # })
 
 
+# scripts/refresh_addon_tokens.py: accounts refreshed at once, and (<requests>, <seconds>)
+# allowed per provider
+OAUTH_REFRESH_WORKERS = 4
+OAUTH_REFRESH_RATE_LIMITS = {
+    'box': (5, 1),
+    'googledrive': (5, 1),
+    'mendeley': (5, 1),
+}
+# Seconds a token refresh waits for another worker's refresh of the same account
+OAUTH_REFRESH_LOCK_TIMEOUT = 5
+# Refresh tokens on a separate database connection when called inside a transaction
+# (e.g. a request's), so the account is unlocked and its new tokens are visible at once
+OAUTH_REFRESH_OWN_CONNECTION = True
+
 WATERBUTLER_JWE_SALT = 'yusaltydough'
 WATERBUTLER_JWE_SECRET = 'CirclesAre4Squares'
 
 WATERBUTLER_JWT_SECRET = 'ILiekTrianglesALot'
 WATERBUTLER_JWT_ALGORITHM = 'HS256'
 WATERBUTLER_JWT_EXPIRATION = 15
+# Cache of get_auth decisions and addon credentials. Can be 'local' (per-process LRU),
+# 'django' (the Django cache named by WATERBUTLER_AUTH_CACHE_ALIAS), or None.
+# Keep the TTL well under WATERBUTLER_JWT_EXPIRATION
+WATERBUTLER_AUTH_CACHE = None
+WATERBUTLER_AUTH_CACHE_ALIAS = 'default'
+WATERBUTLER_AUTH_CACHE_TTL = 5  # seconds
+WATERBUTLER_AUTH_CACHE_MAX_SIZE = 10000
 
 SENSITIVE_DATA_SALT = 'yusaltydough'
 SENSITIVE_DATA_SECRET = 'TrainglesAre5Squares'
@@ -665,6 +771,9 @@ ENABLE_INSTITUTIONS = True
 ENABLE_VARNISH = False
 ENABLE_ESI = False
 VARNISH_SERVERS = []  # This should be set in local.py or cache invalidation won't work
+VARNISH_BAN_TIMEOUT = 0.3  # seconds
+# Concurrent BAN requests (and keep-alive connections per Varnish server)
+VARNISH_BAN_POOL_SIZE = 10
 ESI_MEDIA_TYPES = {'application/vnd.api+json', 'application/json'}
 
 # Used for gathering meta information about the current build
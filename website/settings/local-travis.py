@@ -44,6 +44,8 @@ SEARCH_ENGINE = 'elastic'
 
 USE_EMAIL = False
 USE_CELERY = False
+# Tests run inside a transaction that other connections cannot see
+OAUTH_REFRESH_OWN_CONNECTION = False
 
 # Email
 MAIL_SERVER = 'localhost:1025'  # For local testing
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Send node and preprint changes to SHARE through the outbox in
+osf_queuedshareupdate.
+
+Changes are queued with ``enqueue`` and sent by ``flush_share_outbox``, which
+runs every minute. A flush posts the records of all queued objects that share
+a SHARE endpoint and token as one ``NormalizedData`` graph, over a keep-alive
+session. Batches that fail with a server error are retried with backoff; records
+that SHARE rejects, or that still fail after ``SHARE_OUTBOX_MAX_RETRIES``
+retries, are reported to the support desk.
+"""
+import logging
+import random
+import threading
+from collections import OrderedDict, namedtuple
+
+import requests
+from django.apps import apps
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from framework.celery_tasks import app as celery_app
+from framework.metrics import metrics
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+# A queued object serialized for SHARE; report_error(resp, retries) mails the desk
+Record = namedtuple('Record', ['entry', 'url', 'token', 'graph', 'report_error'])
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return this process's keep-alive session for requests to SHARE."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.SHARE_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def send_normalized_data(url, token, data):
+    resp = get_session().post(url, json=data, headers={'Authorization': 'Bearer {}'.format(token), 'Content-Type': 'application/vnd.api+json'})
+    logger.debug(resp.content)
+    return resp
+
+
+def serialize_graph(graph):
+    return {
+        'data': {
+            'type': 'NormalizedData',
+            'attributes': {
+                'tasks': [],
+                'raw': None,
+                'data': {'@graph': graph}
+            }
+        }
+    }
+
+
+def enqueue(object_type, ids, share_type=None, old_subjects=None):
+    """Queue the objects with ``ids`` to be sent to SHARE."""
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    if not settings.SHARE_URL:
+        return
+    QueuedShareUpdate.enqueue(object_type, ids, share_type=share_type, old_subjects=old_subjects)
+    if not settings.USE_CELERY:
+        # There is no beat to flush the outbox
+        flush_share_outbox()
+
+
+def retry_countdown(retries):
+    return (random.random() + 1) * min(60 + settings.CELERY_RETRY_BACKOFF_BASE ** retries, 60 * 10)
+
+
+def serialize_entry(entry, nodes, preprints):
+    """Serialize the claimed ``entry``.
+
+    :return: The record to send, or None if the entry cannot be sent
+    """
+    from website.preprints.tasks import format_preprint, send_desk_share_preprint_error
+    from website.project.tasks import format_node, format_registration, send_desk_share_error
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+
+    if entry.object_type == QueuedShareUpdate.NODE:
+        node = nodes.get(entry.object_id)
+        if node is None:
+            return None
+        if not settings.SHARE_API_TOKEN:
+            logger.warning('SHARE_API_TOKEN not set. Could not send "{}" to SHARE.'.format(node._id))
+            return None
+        return Record(
+            entry,
+            '{}api/normalizeddata/'.format(settings.SHARE_URL),
+            settings.SHARE_API_TOKEN,
+            format_registration(node) if node.is_registration else format_node(node),
+            lambda resp, retries, node=node: send_desk_share_error(node, resp, retries),
+        )
+    preprint = preprints.get(entry.object_id)
+    if preprint is None:
+        return None
+    if not preprint.provider.access_token:
+        logger.error('No access_token for {}. Unable to send {} to SHARE.'.format(preprint.provider, preprint))
+        return None
+    share_type = entry.share_type or preprint.provider.share_publish_type
+    return Record(
+        entry,
+        '{}api/v2/normalizeddata/'.format(settings.SHARE_URL),
+        preprint.provider.access_token,
+        format_preprint(preprint, share_type, entry.old_subjects),
+        lambda resp, retries, preprint=preprint: send_desk_share_preprint_error(preprint, resp, retries),
+    )
+
+
+def serialize_entries(entries):
+    """Serialize the claimed ``entries``. An entry that fails to serialize
+    does not keep the rest of the batch from being sent.
+
+    :return: The records to send, the entries that cannot be sent and the
+        entries that failed to serialize
+    """
+    AbstractNode = apps.get_model('osf.AbstractNode')
+    PreprintService = apps.get_model('osf.PreprintService')
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+
+    nodes = AbstractNode.objects.in_bulk([
+        entry.object_id for entry in entries if entry.object_type == QueuedShareUpdate.NODE
+    ])
+    preprints = PreprintService.objects.select_related('node', 'provider').in_bulk([
+        entry.object_id for entry in entries if entry.object_type == QueuedShareUpdate.PREPRINT
+    ])
+
+    records, dropped, failed = [], [], []
+    for entry in entries:
+        try:
+            record = serialize_entry(entry, nodes, preprints)
+        except Exception:
+            logger.exception('Could not serialize {!r} for SHARE'.format(entry))
+            failed.append(entry)
+            continue
+        if record is None:
+            dropped.append(entry)
+        else:
+            records.append(record)
+    return records, dropped, failed
+
+
+def retry_failed(entries):
+    """Retry ``entries`` that failed to serialize with backoff, giving up on
+    those that have already been retried ``SHARE_OUTBOX_MAX_RETRIES`` times.
+    """
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    exhausted = [entry for entry in entries if entry.retries >= settings.SHARE_OUTBOX_MAX_RETRIES]
+    for entry in exhausted:
+        logger.error('Giving up sending {!r} to SHARE: it could not be serialized'.format(entry))
+    QueuedShareUpdate.release(exhausted)
+    metrics.incr('share.outbox.failed', len(exhausted))
+    for retries in {entry.retries for entry in entries if entry not in exhausted}:
+        QueuedShareUpdate.retry(
+            [entry for entry in entries if entry.retries == retries and entry not in exhausted],
+            retry_countdown(retries),
+        )
+
+
+def send_batch(records):
+    """Send ``records``, which share an endpoint and token, as one graph."""
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    entries = [record.entry for record in records]
+    graph = [item for record in records for item in record.graph]
+    try:
+        resp = send_normalized_data(records[0].url, records[0].token, serialize_graph(graph))
+    except requests.RequestException:
+        logger.exception('Could not reach SHARE')
+        resp = None
+    else:
+        try:
+            resp.raise_for_status()
+        except Exception:
+            pass
+        else:
+            QueuedShareUpdate.release(entries)
+            now = timezone.now()
+            for entry in entries:
+                metrics.record('share.outbox.lag', (now - entry.created).total_seconds())
+            metrics.incr('share.outbox.sent', len(entries))
+            return
+
+    if resp is not None and resp.status_code < 500:
+        if len(records) > 1:
+            # Find the records SHARE rejects
+            for record in records:
+                send_batch([record])
+            return
+        records[0].report_error(resp, records[0].entry.retries)
+        QueuedShareUpdate.release(entries)
+        metrics.incr('share.outbox.rejected')
+        return
+
+    exhausted = [record for record in records if record.entry.retries >= settings.SHARE_OUTBOX_MAX_RETRIES]
+    for record in exhausted:
+        if resp is not None:
+            record.report_error(resp, record.entry.retries)
+        else:
+            logger.error('Giving up sending {!r} to SHARE'.format(record.entry))
+    QueuedShareUpdate.release([record.entry for record in exhausted])
+    metrics.incr('share.outbox.failed', len(exhausted))
+    for retries in {record.entry.retries for record in records if record not in exhausted}:
+        QueuedShareUpdate.retry(
+            [record.entry for record in records if record.entry.retries == retries and record not in exhausted],
+            retry_countdown(retries),
+        )
+
+
+def flush_share_outbox(batch_size=None):
+    """Send queued objects in batches of ``batch_size`` until no entry is
+    available. Entries that cannot be serialized are retried with backoff and
+    dropped after ``SHARE_OUTBOX_MAX_RETRIES`` retries.
+
+    :return int: Number of entries handled
+    """
+    QueuedShareUpdate = apps.get_model('osf.QueuedShareUpdate')
+    if not settings.SHARE_URL:
+        return 0
+    batch_size = batch_size or settings.SHARE_OUTBOX_BATCH_SIZE
+    total = 0
+    while True:
+        entries = QueuedShareUpdate.claim(batch_size)
+        if not entries:
+            break
+        with metrics.timer('share.outbox.batch'):
+            records, dropped, failed = serialize_entries(entries)
+            QueuedShareUpdate.release(dropped)
+            retry_failed(failed)
+            batches = OrderedDict()
+            for record in records:
+                batches.setdefault((record.url, record.token), []).append(record)
+            for batch in batches.values():
+                send_batch(batch)
+        total += len(entries)
+        if len(entries) < batch_size:
+            break
+    return total
+
+
+@celery_app.task(ignore_results=True)
+def flush_share_outbox_async(batch_size=None):
+    flush_share_outbox(batch_size=batch_size)
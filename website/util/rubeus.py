@@ -235,9 +235,13 @@ class NodeFileCollector(object):
         data = []
         if node.can_view(auth=self.auth):
             serialized_addons = self._collect_addons(node)
+            children = list(self.find_readable_descendants(node, visited=[]))
+            if grid_root and node == grid_root:
+                # The addons of each child are collected as well
+                node.prefetch_addons(children)
             serialized_children = [
                 self._serialize_node(child, parent=node, grid_root=grid_root)
-                for child in self.find_readable_descendants(node, visited=[])
+                for child in children
             ]
             data = serialized_addons + serialized_children
         return self._serialize_node(node, children=data)